@@ -11,6 +11,7 @@ from statsmodels.tsa.vector_ar.vecm import coint_johansen
 import os
 import warnings
 import traceback
+from yelp_bi.geodesic import pairwise
 
 # Try importing folium for interactive maps
 try:
@@ -107,11 +108,13 @@ try:
 
     # Run Local Regressions (GWR-like)
     results = []
-    bandwidth = 1.0 # Hardcoded bandwidth for competition speed
+    bandwidth_km = 111.0 # Hardcoded bandwidth (~1 degree) for competition speed
 
-    for idx, target_row in reg_data_std.iterrows():
-        dists = np.sqrt((reg_data_std['lat'] - target_row['lat'])**2 + (reg_data_std['lon'] - target_row['lon'])**2)
-        weights = np.exp(-(dists**2) / (2 * bandwidth**2))
+    # Great-circle distances between all cities, computed once
+    dist_km = pairwise(reg_data_std[['lon', 'lat']].values)
+
+    for i, (idx, target_row) in enumerate(reg_data_std.iterrows()):
+        weights = np.exp(-(dist_km[i]**2) / (2 * bandwidth_km**2))
         
         X = sm.add_constant(reg_data_std[X_cols])
         y = reg_data_std[y_col]
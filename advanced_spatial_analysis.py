@@ -10,8 +10,8 @@ from mgwr.sel_bw import Sel_BW
 import libpysal as ps
 from shapely.geometry import Point
 import os
-import glob
 import warnings
+from yelp_bi.facility_catalog import load_facilities
 
 # Suppress warnings
 warnings.filterwarnings('ignore')
@@ -65,9 +65,7 @@ avg_price = df_2024.groupby('mapped_loc')['price'].mean().reset_index()
 
 # Load Supply Chain Distances (from OSM)
 # We need to re-calculate avg distance per location from the raw facility file
-list_of_files = glob.glob('supply_chain_spatial_fast/supply_chain_facilities_*.csv')
-latest_file = max(list_of_files, key=os.path.getctime)
-df_facilities = pd.read_csv(latest_file)
+df_facilities = load_facilities(columns=['commodity', 'facility_type', 'search_location', 'distance_to_location_km'])
 
 # Filter for Chili Production
 chili_prod = df_facilities[
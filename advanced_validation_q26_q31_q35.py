@@ -2,7 +2,7 @@
 import pandas as pd
 import numpy as np
 import statsmodels.api as sm
-from statsmodels.stats.outliers_influence import variance_inflation_factor
+from yelp_bi.sdm.collinearity import vif
 from sklearn.metrics import mean_absolute_percentage_error
 import os
 
@@ -48,7 +48,7 @@ def advanced_validation():
     
     vif_data = pd.DataFrame()
     vif_data["Variable"] = X_const.columns
-    vif_data["VIF"] = [variance_inflation_factor(X_const.values, i) for i in range(X_const.shape[1])]
+    vif_data["VIF"] = vif(X_const).values
     
     print(vif_data.sort_values('VIF', ascending=False).to_string(index=False))
     
@@ -0,0 +1,92 @@
+"""
+Benchmark: Geodesic Distance Matrices
+=====================================
+Times geodesic.py on 10k x 10k many-to-many blocks (the size of a
+market-level InfoPangan panel against the OSM facility snapshot) and
+compares it with the per-row haversine loop it replaced.
+
+Usage:
+    python benchmarks/bench_geodesic.py            # 10k x 10k
+    python benchmarks/bench_geodesic.py --n 2000   # quicker run
+"""
+
+import os
+import sys
+import math
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yelp_bi.geodesic import cdist, iter_blocks, nearest, vincenty, haversine  # noqa: E402
+
+
+def random_coords(n: int, seed: int) -> np.ndarray:
+    """(n, 2) random (lon, lat) over Java"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(105.0, 115.0, n), rng.uniform(-8.8, -5.8, n)])
+
+
+def timed(label: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"  {label:<45s} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark geodesic distance matrices')
+    parser.add_argument('--n', type=int, default=10_000, help='Points per side (default: 10000)')
+    parser.add_argument('--block-size', type=int, default=4096, help='Tile size for iter_blocks')
+    args = parser.parse_args()
+
+    a = random_coords(args.n, seed=0)
+    b = random_coords(args.n, seed=1)
+    print(f"Geodesic benchmark: {args.n:,} x {args.n:,} pairs")
+
+    D64 = timed('cdist haversine float64', cdist, a, b)
+    print(f"    output {D64.nbytes / 1e6:,.0f} MB")
+    D32 = timed('cdist haversine float32', cdist, a, b, dtype=np.float32)
+    print(f"    output {D32.nbytes / 1e6:,.0f} MB, max abs error vs float64 "
+          f"{np.abs(D64 - D32).max() * 1000:.1f} m")
+    del D64, D32
+
+    def nearest_by_blocks():
+        best = np.full(len(a), np.inf, dtype=np.float32)
+        for (r0, _), block in iter_blocks(a, b, block_size=args.block_size, dtype=np.float32):
+            rows = slice(r0, r0 + len(block))
+            best[rows] = np.minimum(best[rows], block.min(axis=1))
+        return best
+
+    best = timed(f'iter_blocks float32 ({args.block_size} tiles, min only)', nearest_by_blocks)
+    dist_km, _ = timed('nearest (unit-sphere KD-tree)', nearest, a, b)
+    print(f"    max |blocks - KD-tree| {np.abs(best - dist_km).max() * 1000:.1f} m")
+
+    m = min(args.n, 1000)
+    timed(f'cdist vincenty float64 ({m:,} x {m:,})', cdist, a[:m], b[:m], method='vincenty')
+
+    # Baseline: the scalar math haversine previously used in supply_chain_explorer
+    def haversine_math(lat1, lon1, lat2, lon2):
+        a_ = (math.sin(math.radians(lat2 - lat1) / 2) ** 2
+              + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2))
+              * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+        return 6371 * 2 * math.asin(math.sqrt(a_))
+
+    k = min(args.n, 500)
+    def scalar_loop():
+        return [[haversine_math(a[i, 1], a[i, 0], b[j, 1], b[j, 0]) for j in range(k)] for i in range(k)]
+    elapsed = time.perf_counter()
+    scalar_loop()
+    elapsed = time.perf_counter() - elapsed
+    print(f"  {f'scalar haversine loop ({k} x {k})':<45s} {elapsed:8.3f} s "
+          f"(~{elapsed * (args.n / k) ** 2:,.0f} s extrapolated)")
+
+    # Sanity: vectorized Vincenty agrees with haversine to within the ellipsoid effect
+    rel = abs(vincenty(-6.2088, 106.8456, -6.9175, 107.6191) / haversine(-6.2088, 106.8456, -6.9175, 107.6191) - 1)
+    print(f"\nJakarta-Bandung: vincenty/haversine relative difference {rel:.4%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: CLI Startup Time
+===========================
+Times `python -m yelp_bi.sdm diagnostics --dry-run` (parse arguments, import
+the package, build the phase graph, read nothing) against a bare
+`import pandas, numpy, scipy.stats`, and checks that none of the heavy
+optional dependencies (libpysal, esda, spreg, statsmodels, plotting) are
+imported on the way. The budget applies to the package overhead (CLI minus
+the bare imports), which does not depend on how fast the machine loads
+pandas and scipy. Exits with status 1 when the median overhead exceeds the
+budget or an optional dependency leaks into startup.
+
+Usage:
+    python benchmarks/bench_startup.py                # 7 runs, 0.5 s budget
+    python benchmarks/bench_startup.py --budget 0.3 --runs 11
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported by the phases that need them, never at startup
+LAZY = ['libpysal', 'esda', 'spreg', 'statsmodels', 'matplotlib', 'seaborn', 'geopandas', 'splot']
+
+CLI = [sys.executable, '-m', 'yelp_bi.sdm', 'diagnostics', '--dry-run']
+FLOOR = [sys.executable, '-c', 'import pandas, numpy, scipy.stats']
+MODULES = [sys.executable, '-c',
+           'import sys, runpy; sys.argv = ["yelp_bi.sdm", "diagnostics", "--dry-run"]; '
+           'runpy.run_module("yelp_bi.sdm", run_name="__main__"); '
+           'print(" ".join(sorted({m.split(".")[0] for m in sys.modules})), file=sys.stderr)']
+
+
+def run(cmd, cwd, env):
+    """Wall time of one subprocess run (s) and its stderr"""
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed:\n{proc.stdout}{proc.stderr}")
+    return elapsed, proc.stderr
+
+
+def median_time(cmd, runs, cwd, env):
+    run(cmd, cwd, env)  # warm the bytecode / file caches
+    return statistics.median(run(cmd, cwd, env)[0] for _ in range(runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark startup of python -m yelp_bi.sdm')
+    parser.add_argument('--runs', type=int, default=7, help='Timed runs per command (default: 7)')
+    parser.add_argument('--budget', type=float, default=0.5,
+                        help='Maximum startup over the bare imports, in seconds (default: 0.5)')
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    # Empty working directory: nothing to read, and the project's sdm_results/ is not touched
+    with tempfile.TemporaryDirectory() as cwd:
+        print(f"Startup benchmark: median of {args.runs} runs")
+        floor = median_time(FLOOR, args.runs, cwd, env)
+        print(f"  {'import pandas, numpy, scipy.stats':<45s} {floor:8.3f} s")
+        cli = median_time(CLI, args.runs, cwd, env)
+        print(f"  {'python -m yelp_bi.sdm diagnostics --dry-run':<45s} {cli:8.3f} s")
+        print(f"    package overhead {cli - floor:.3f} s, budget {args.budget:.3f} s")
+        loaded = set(run(MODULES, cwd, env)[1].split())
+
+    leaked = [name for name in LAZY if name in loaded]
+    if leaked:
+        print(f"\n✗ Imported at startup: {', '.join(leaked)}")
+    overhead = cli - floor
+    if overhead > args.budget:
+        print(f"\n✗ Startup overhead {overhead:.3f} s is over the {args.budget:.3f} s budget")
+    if leaked or overhead > args.budget:
+        sys.exit(1)
+    print("\n✓ Within budget, no optional dependency imported")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import csv
-from datetime import datetime
+
+from yelp_bi.asof_join import asof_positions, to_int64_dates
 
 # Data kurs USD-IDR (dari TradingEconomics)
 exchange_rates = {
@@ -65,16 +66,16 @@ exchange_rates = {
     "2025-11-03": 16686, "2025-11-10": 16712, "2025-11-17": 16672, "2025-11-24": 16654.9
 }
 
-def find_nearest_exchange_rate(target_date):
-    """Cari kurs terdekat untuk tanggal tertentu"""
-    target_dt = datetime.strptime(target_date, "%Y-%m-%d")
+def find_nearest_exchange_rates(target_dates):
+    """Cari kurs terdekat untuk banyak tanggal sekaligus (as-of join, nearest)"""
+    rate_dates = sorted(exchange_rates)
+    pos = asof_positions(to_int64_dates(rate_dates), to_int64_dates(target_dates), direction='nearest')
+    return [exchange_rates[rate_dates[p]] for p in pos]
 
-    # Convert all exchange rate dates to datetime
-    rate_dates = {datetime.strptime(d, "%Y-%m-%d"): r for d, r in exchange_rates.items()}
 
-    # Find the nearest date
-    nearest_date = min(rate_dates.keys(), key=lambda d: abs((d - target_dt).days))
-    return rate_dates[nearest_date]
+def find_nearest_exchange_rate(target_date):
+    """Cari kurs terdekat untuk tanggal tertentu"""
+    return find_nearest_exchange_rates([target_date])[0]
 
 # Baca data harga bensin
 input_file = 'indonesia_gasoline_prices_5y.csv'
@@ -87,13 +88,14 @@ with open(input_file, 'r') as infile, open(output_file, 'w', newline='') as outf
 
     writer.writeheader()
 
-    for row in reader:
+    # Cari kurs terdekat untuk semua baris sekaligus
+    rows = list(reader)
+    rates = find_nearest_exchange_rates([row['Date'] for row in rows])
+
+    for row, exchange_rate in zip(rows, rates):
         date = row['Date']
         price_usd = float(row['Price_USD_per_Liter'])
 
-        # Cari kurs terdekat
-        exchange_rate = find_nearest_exchange_rate(date)
-
         # Hitung harga dalam IDR
         price_idr = price_usd * exchange_rate
 
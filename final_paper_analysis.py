@@ -6,11 +6,12 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 import json
-import glob
 from datetime import datetime
 import statsmodels.api as sm
 from scipy import stats
 import warnings
+from yelp_bi.facility_catalog import load_facilities
+from yelp_bi.sdm.feature_store import read_source
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
@@ -31,9 +32,7 @@ sns.set_context("paper", font_scale=1.4)
 COLORS = sns.color_palette("viridis", 10)
 
 # File Paths
-PATH_PRICES = 'cleaned_pihps_data/cleaned_combined.csv'
-PATH_SUPPLY_CHAIN = 'supply_chain_spatial_fast' # Directory
-PATH_WEATHER = 'weather_pihps_historical.csv'
+PATH_SUPPLY_CHAIN = 'latest' # Facility snapshot version (see facility_catalog.py)
 PATH_PRODUCTION = 'bps-jakarta-data/jawa_barat_food_production_2024.csv'
 PATH_GEOJSON = 'GeoJSON/Indonesia_cities.geojson' # Using cities for simplicity in this script
 
@@ -49,8 +48,7 @@ try:
 
     # A. Load Prices (PIHPS)
     print("   - Loading Prices...")
-    df_prices = pd.read_csv(PATH_PRICES)
-    df_prices['date'] = pd.to_datetime(df_prices['date'])
+    df_prices = read_source('pihps')
     df_prices['commodity_name'] = df_prices['commodity_name'].str.strip() # CLEAN WHITESPACE
     
     # Filter for Jakarta & West Java cities only (Study Area)
@@ -65,16 +63,13 @@ try:
 
     # B. Load Supply Chain (OSM)
     print("   - Loading Supply Chain Facilities...")
-    # Find the latest facility file
-    list_of_files = glob.glob(f'{PATH_SUPPLY_CHAIN}/supply_chain_facilities_*.csv')
-    latest_file = max(list_of_files, key=os.path.getctime)
-    df_facilities = pd.read_csv(latest_file)
-    print(f"     Loaded {len(df_facilities)} facilities from {latest_file}")
+    df_facilities = load_facilities(PATH_SUPPLY_CHAIN, columns=[
+        'commodity', 'facility_type', 'search_location', 'distance_to_location_km'])
+    print(f"     Loaded {len(df_facilities)} facilities (snapshot: {PATH_SUPPLY_CHAIN})")
 
     # C. Load Weather
     print("   - Loading Weather...")
-    df_weather = pd.read_csv(PATH_WEATHER)
-    df_weather['date'] = pd.to_datetime(df_weather['date'])
+    df_weather = read_source('weather')
 
     # D. Load Production (BPS)
     print("   - Loading Production Data...")
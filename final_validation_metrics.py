@@ -2,7 +2,7 @@
 import pandas as pd
 import numpy as np
 import statsmodels.api as sm
-from statsmodels.stats.outliers_influence import variance_inflation_factor
+from yelp_bi.sdm.collinearity import vif
 from sklearn.metrics import mean_absolute_percentage_error
 import json
 
@@ -32,10 +32,7 @@ def run_metrics():
     X_const = sm.add_constant(X)
     
     # 1. VIF
-    vif_dict = {}
-    for i in range(X_const.shape[1]):
-        vif_dict[X_const.columns[i]] = variance_inflation_factor(X_const.values, i)
-    results['vif'] = vif_dict
+    results['vif'] = vif(X_const).to_dict()
     
     # 2. Out of Sample MAPE
     df_clean['date'] = pd.to_datetime(df_clean['date'])
@@ -7,6 +7,7 @@ import geopandas as gpd
 import networkx as nx
 from scipy.stats import pearsonr
 import os
+from yelp_bi.sdm.backtest import forecast_metrics
 
 # Setup Style
 import matplotlib
@@ -62,10 +63,23 @@ vars_exog = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr', 'luas_pa
 desc_exog = df[vars_exog].describe().T[['mean', 'std', 'min', 'max']]
 desc_exog.to_csv(f'{output_dir}/Tabel_4_2_Statistik_Eksogen.csv')
 
-# Tabel 4.8: Model Fit (Hardcoded from Validation)
+# Out-of-sample forecasts from the expanding-window backtest
+# (SDMEstimationFixed.backtest_panel_sdm, run by run_all_fixed in sdm_estimation_FIXED.py)
+backtest_file = 'sdm_results/fase4_fixed/4_backtest_forecasts.csv'
+try:
+    backtest = pd.read_csv(backtest_file, parse_dates=['origin', 'period'])
+    backtest_h1 = backtest[(backtest['model'] == 'sdm') & (backtest['horizon'] == 1)]
+    # Same metric as 4_backtest_metrics.csv
+    oos_mape = f"{forecast_metrics(backtest_h1, by=['horizon'])['MAPE'].iloc[0]:.2f}%"
+except FileNotFoundError:
+    print(f"Warning: {backtest_file} not found; run the backtest for out-of-sample metrics.")
+    backtest_h1 = None
+    oos_mape = 'n/a'
+
+# Tabel 4.8: Model Fit (in-sample values hardcoded from validation; MAPE from the backtest)
 model_fit = pd.DataFrame({
-    'Metric': ['Pseudo R-squared', 'Log-Likelihood', 'AIC', 'BIC', 'RMSE', 'MAPE (Out-of-Sample)'],
-    'Value': [0.984, -4521.2, 9134.4, 9250.1, 154.3, '1.25%']
+    'Metric': ['Pseudo R-squared', 'Log-Likelihood', 'AIC', 'BIC', 'RMSE', 'MAPE (Out-of-Sample, 1 month)'],
+    'Value': [0.984, -4521.2, 9134.4, 9250.1, 154.3, oos_mape]
 })
 model_fit.to_csv(f'{output_dir}/Tabel_4_8_Model_Fit.csv', index=False)
 
@@ -178,19 +192,17 @@ except Exception as e:
     print(f"Error generating Fig 4.7: {e}")
 
 try:
-    # Gambar 4.10: Actual vs Predicted (Synthetic for illustration based on MAPE)
-    # Create synthetic test data matching MAPE 1.25%
-    test_len = 12
-    t = np.arange(test_len)
-    actual = np.sin(t/2) * 500 + 13000 + np.random.normal(0, 50, test_len)
-    pred = actual + np.random.normal(0, 13000*0.0125, test_len) # 1.25% error
+    # Gambar 4.10: Actual vs one-month-ahead backtest forecasts (average over locations)
+    if backtest_h1 is None:
+        raise FileNotFoundError(backtest_file)
+    by_period = backtest_h1.groupby('period')[['actual', 'forecast']].mean()
 
     plt.figure(figsize=(10, 5))
-    plt.plot(t, actual, 'b-', label='Aktual', marker='o')
-    plt.plot(t, pred, 'r--', label='Prediksi Model (SDM)', marker='x')
-    plt.title('Validasi Out-of-Sample (2024-2025)', fontsize=14)
+    plt.plot(by_period.index, by_period['actual'], 'b-', label='Aktual', marker='o')
+    plt.plot(by_period.index, by_period['forecast'], 'r--', label='Prediksi Model (SDM)', marker='x')
+    plt.title(f'Validasi Out-of-Sample (MAPE {oos_mape})', fontsize=14)
     plt.ylabel('Harga (IDR)')
-    plt.xlabel('Bulan ke-')
+    plt.xlabel('Bulan')
     plt.legend()
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
@@ -5,7 +5,6 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy.spatial import cKDTree
 from scipy import stats
 import geopandas as gpd
 from shapely.geometry import Point, LineString
@@ -13,10 +12,12 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import statsmodels.api as sm
 from statsmodels.tsa.stattools import adfuller
-from statsmodels.stats.outliers_influence import variance_inflation_factor
-import glob
 import os
 import warnings
+from yelp_bi.sdm.collinearity import vif
+from yelp_bi.facility_catalog import load_facilities
+from yelp_bi.sdm.feature_store import read_source
+from yelp_bi.geodesic import nearest
 
 # ==============================================================================
 # CONFIGURATION & STYLE
@@ -47,22 +48,18 @@ print("="*80)
 print("\n[1/6] Loading & Merging Full Datasets...")
 
 # A. Supply Chain (OSM) - Static Spatial Structure
-list_of_files = glob.glob('supply_chain_spatial_fast/supply_chain_facilities_*.csv')
-latest_file = max(list_of_files, key=os.path.getctime)
-df_osm = pd.read_csv(latest_file)
-df_osm = df_osm[['name', 'latitude', 'longitude', 'facility_type', 'search_location']].dropna(subset=['latitude', 'longitude'])
+df_osm = load_facilities(columns=['name', 'latitude', 'longitude', 'facility_type', 'search_location'])
+df_osm = df_osm.dropna(subset=['latitude', 'longitude'])
 
 # B. Prices (PIHPS) - Time Series (2020-2024)
-df_prices = pd.read_csv('cleaned_pihps_data/cleaned_combined.csv')
-df_prices['date'] = pd.to_datetime(df_prices['date'])
+df_prices = read_source('pihps')
 df_prices['commodity_name'] = df_prices['commodity_name'].str.strip()
 # Filter: Cabai Rawit Merah (Most Volatile)
 df_prices = df_prices[df_prices['commodity_name'] == 'Cabai Rawit Merah']
 
 # C. Weather (Open-Meteo) - Time Series
 try:
-    df_weather = pd.read_csv('weather_pihps_historical.csv')
-    df_weather['date'] = pd.to_datetime(df_weather['date'])
+    df_weather = read_source('weather')
 except:
     print("Warning: Weather history not found. Simulating weather data for demo.")
     # Mock weather for demonstration if file missing
@@ -137,7 +134,7 @@ with open(f"{OUTPUT_DIR}/Table0_Assumption_Tests.txt", "w") as f:
     X_vif['intercept'] = 1
     vif_data = pd.DataFrame()
     vif_data["feature"] = X_vif.columns
-    vif_data["VIF"] = [variance_inflation_factor(X_vif.values, i) for i in range(len(X_vif.columns))]
+    vif_data["VIF"] = vif(X_vif).values
     f.write(vif_data.to_string())
     f.write("\n   Interpretation: VIF < 5 indicates no severe multicollinearity.\n")
 
@@ -225,8 +222,8 @@ retailers = df_osm[df_osm['facility_type'] == 'retail']
 
 def add_edges(source, target, radius_km):
     if source.empty or target.empty: return []
-    tree = cKDTree(target[['latitude', 'longitude']].values)
-    dists, idxs = tree.query(source[['latitude', 'longitude']].values, k=1, distance_upper_bound=radius_km/111.0)
+    dists, idxs = nearest(source[['longitude', 'latitude']].values, target[['longitude', 'latitude']].values,
+                          k=1, max_distance_km=radius_km)
     edges = []
     for i, (d, idx) in enumerate(zip(dists, idxs)):
         if d != float('inf'):
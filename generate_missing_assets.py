@@ -239,46 +239,41 @@ print("\nGenerating Gambar 4.6: Spatial Multiplier Matrix...")
 locations = ['Jakarta', 'Bandung', 'Bekasi', 'Depok', 'Bogor', 'Cirebon', 
              'Kab. Cirebon', 'Tasikmalaya', 'Kab. Tasikmalaya', 'Sukabumi']
 
-# Generate synthetic spatial multiplier matrix
-np.random.seed(42)
-n = len(locations)
-multiplier_matrix = np.eye(n) * 1.1  # Diagonal elements (self-effects)
-
-# Add off-diagonal elements based on proximity/connectivity
-for i in range(n):
-    for j in range(n):
-        if i != j:
-            # Jakarta has highest influence
-            if i == 0:  # Jakarta
-                multiplier_matrix[i, j] = np.random.uniform(0.25, 0.45)
-            elif j == 0:  # To Jakarta
-                multiplier_matrix[i, j] = np.random.uniform(0.15, 0.35)
-            # Nearby regions have higher multipliers
-            elif abs(i - j) <= 2:
-                multiplier_matrix[i, j] = np.random.uniform(0.20, 0.40)
-            else:
-                multiplier_matrix[i, j] = np.random.uniform(0.05, 0.20)
+# Multiplier block from the estimated model (fase5c): M[i, j] is the effect on
+# i of a shock at j, so the transpose puts the source region on the rows
+multiplier_file = 'sdm_results/fase5/5c_spatial_multiplier_matrix.csv'
+if os.path.exists(multiplier_file):
+    M = pd.read_csv(multiplier_file, index_col=0)
+    source = 'DKI Jakarta' if 'DKI Jakarta' in M.columns else M.columns[0]
+    # Shocked region plus the nine regions it affects most
+    keep = M[source].drop(source).nlargest(len(locations) - 1).index.tolist()
+    heatmap_locations = [source] + keep
+    multiplier_matrix = M.loc[heatmap_locations, heatmap_locations].T.values
+else:
+    multiplier_matrix = None
+    print(f"  {multiplier_file} not found; run FASE 5C first")
 
 # Create heatmap
-plt.figure(figsize=(12, 10))
-sns.heatmap(multiplier_matrix, 
-            xticklabels=locations, 
-            yticklabels=locations,
-            annot=True, 
-            fmt='.2f', 
-            cmap='YlOrRd',
-            cbar_kws={'label': 'Multiplier Value'},
-            linewidths=0.5)
-plt.title('Spatial Multiplier Matrix (I-ρW)⁻¹\nShock Propagation from Row to Column', 
-          fontsize=14, fontweight='bold', pad=20)
-plt.xlabel('Destination Region (j)', fontsize=12, fontweight='bold')
-plt.ylabel('Source Region (i)', fontsize=12, fontweight='bold')
-plt.xticks(rotation=45, ha='right')
-plt.yticks(rotation=0)
-plt.tight_layout()
-plt.savefig(f'{output_dir}/Gambar_4_6_Multiplier_Matrix.png', dpi=300, bbox_inches='tight')
-plt.close()
-print("✓ Gambar 4.6 saved")
+if multiplier_matrix is not None:
+    plt.figure(figsize=(12, 10))
+    sns.heatmap(multiplier_matrix, 
+                xticklabels=heatmap_locations, 
+                yticklabels=heatmap_locations,
+                annot=True, 
+                fmt='.2f', 
+                cmap='YlOrRd',
+                cbar_kws={'label': 'Multiplier Value'},
+                linewidths=0.5)
+    plt.title('Spatial Multiplier Matrix (I-ρW)⁻¹\nShock Propagation from Row to Column', 
+              fontsize=14, fontweight='bold', pad=20)
+    plt.xlabel('Destination Region (j)', fontsize=12, fontweight='bold')
+    plt.ylabel('Source Region (i)', fontsize=12, fontweight='bold')
+    plt.xticks(rotation=45, ha='right')
+    plt.yticks(rotation=0)
+    plt.tight_layout()
+    plt.savefig(f'{output_dir}/Gambar_4_6_Multiplier_Matrix.png', dpi=300, bbox_inches='tight')
+    plt.close()
+    print("✓ Gambar 4.6 saved")
 
 # ============================================================================
 # GAMBAR 4.9: Residual Spatial Pattern Map
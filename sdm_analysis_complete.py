@@ -1,1062 +1,16 @@
-"""
-Spatial Durbin Model (SDM) Analysis - Complete Implementation
-YELP BI 2025 - Rice Price Prediction
-
-This script implements a complete Spatial Durbin Model analysis following 7 phases:
-1. Data Preparation & Validation
-2. Exploratory Spatial Data Analysis (ESDA)
-3. Model Specification & Diagnostic Tests
-4. Model Estimation
-5. Output & Interpretation
-6. Validation & Robustness
-7. Policy Simulation
-
-Requirements:
-    pip install pandas numpy scipy statsmodels pysal spreg libpysal esda splot geopandas
-"""
-
-import os
-import warnings
-import numpy as np
-import pandas as pd
-from datetime import datetime
-from scipy import stats
-from scipy.spatial.distance import pdist, squareform
-from statsmodels.stats.diagnostic import het_breuschpagan
-from statsmodels.stats.outliers_influence import variance_inflation_factor
-from statsmodels.tsa.stattools import adfuller
-import libpysal
-from libpysal.weights import W, KNN, DistanceBand
-from libpysal import graph
-import spreg
-from esda.moran import Moran, Moran_Local
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-warnings.filterwarnings('ignore')
-
-# Create output directories
-os.makedirs('sdm_results', exist_ok=True)
-os.makedirs('sdm_results/fase1', exist_ok=True)
-os.makedirs('sdm_results/fase2', exist_ok=True)
-os.makedirs('sdm_results/fase3', exist_ok=True)
-os.makedirs('sdm_results/fase4', exist_ok=True)
-os.makedirs('sdm_results/fase5', exist_ok=True)
-os.makedirs('sdm_results/fase6', exist_ok=True)
-os.makedirs('sdm_results/fase7', exist_ok=True)
-
-
-class SpatialDurbinAnalysis:
-    """Complete Spatial Durbin Model Analysis Pipeline"""
-
-    def __init__(self, base_dir='.'):
-        self.base_dir = base_dir
-        self.results = {}
-        self.data = {}
-        self.models = {}
-        self.weights = {}
-
-        print("="*80)
-        print("SPATIAL DURBIN MODEL ANALYSIS - YELP BI 2025")
-        print("="*80)
-        print(f"Analysis started at: {datetime.now()}")
-        print()
-
-    # =========================================================================
-    # FASE 1: DATA PREPARATION & VALIDATION
-    # =========================================================================
-
-    def fase1a_check_data_quality(self):
-        """FASE 1A: Check completeness and structure of PIHPS data"""
-        print("\n" + "="*80)
-        print("FASE 1A: DATA QUALITY CHECK - PIHPS")
-        print("="*80)
-
-        # Load PIHPS data
-        pihps_path = os.path.join(self.base_dir, 'cleaned_pihps_data', 'cleaned_combined.csv')
-        df_pihps = pd.read_csv(pihps_path, parse_dates=['date'])
-
-        print(f"\nDataset shape: {df_pihps.shape}")
-        print(f"Date range: {df_pihps['date'].min()} to {df_pihps['date'].max()}")
-        print(f"Total days: {(df_pihps['date'].max() - df_pihps['date'].min()).days}")
-
-        # Missing values analysis
-        print("\n--- MISSING VALUES ANALYSIS ---")
-        missing = df_pihps.isnull().sum()
-        missing_pct = (missing / len(df_pihps)) * 100
-        missing_df = pd.DataFrame({
-            'Column': missing.index,
-            'Missing_Count': missing.values,
-            'Missing_Percentage': missing_pct.values
-        })
-        print(missing_df[missing_df['Missing_Count'] > 0])
-
-        # Missing by commodity
-        print("\n--- MISSING VALUES BY COMMODITY ---")
-        missing_by_commodity = df_pihps.groupby('commodity_id')['price'].apply(
-            lambda x: (x.isnull().sum(), x.isnull().sum()/len(x)*100)
-        )
-        missing_commodity_df = pd.DataFrame(
-            missing_by_commodity.tolist(),
-            index=missing_by_commodity.index,
-            columns=['Missing_Count', 'Missing_Pct']
-        )
-        print(missing_commodity_df)
-
-        # Missing by location
-        print("\n--- MISSING VALUES BY LOCATION ---")
-        missing_by_location = df_pihps.groupby('location_name')['price'].apply(
-            lambda x: (x.isnull().sum(), x.isnull().sum()/len(x)*100)
-        )
-        missing_location_df = pd.DataFrame(
-            missing_by_location.tolist(),
-            index=missing_by_location.index,
-            columns=['Missing_Count', 'Missing_Pct']
-        )
-        print(missing_location_df)
-
-        # Time range consistency
-        print("\n--- TIME RANGE CONSISTENCY CHECK ---")
-        time_consistency = df_pihps.groupby('location_name')['date'].agg(['min', 'max', 'count'])
-        time_consistency['days_span'] = (time_consistency['max'] - time_consistency['min']).dt.days
-        print(time_consistency)
-
-        # Panel structure: balanced or unbalanced?
-        print("\n--- PANEL STRUCTURE ANALYSIS ---")
-        panel_count = df_pihps.groupby(['location_name', 'commodity_id']).size()
-        print(f"Unique observation counts: {panel_count.unique()}")
-        print(f"Is balanced panel? {len(panel_count.unique()) == 1}")
-        print(f"Min observations per panel: {panel_count.min()}")
-        print(f"Max observations per panel: {panel_count.max()}")
-        print(f"Mean observations per panel: {panel_count.mean():.2f}")
-
-        # Descriptive statistics
-        print("\n--- DESCRIPTIVE STATISTICS (Price) ---")
-        desc_stats = df_pihps.groupby('commodity_id')['price'].describe()
-        print(desc_stats)
-
-        # Save results
-        self.data['pihps'] = df_pihps
-        self.results['fase1a'] = {
-            'missing_overall': missing_df,
-            'missing_by_commodity': missing_commodity_df,
-            'missing_by_location': missing_location_df,
-            'time_consistency': time_consistency,
-            'panel_structure': panel_count,
-            'descriptive_stats': desc_stats
-        }
-
-        # Export to CSV
-        missing_df.to_csv('sdm_results/fase1/1a_missing_values.csv', index=False)
-        missing_commodity_df.to_csv('sdm_results/fase1/1a_missing_by_commodity.csv')
-        missing_location_df.to_csv('sdm_results/fase1/1a_missing_by_location.csv')
-        time_consistency.to_csv('sdm_results/fase1/1a_time_consistency.csv')
-        desc_stats.to_csv('sdm_results/fase1/1a_descriptive_stats.csv')
-
-        print("\n✓ FASE 1A completed. Results saved to sdm_results/fase1/")
-        return df_pihps
-
-    def fase1b_merge_datasets(self):
-        """FASE 1B: Merge all 5 datasets and validate alignment"""
-        print("\n" + "="*80)
-        print("FASE 1B: DATASET MERGING & ALIGNMENT")
-        print("="*80)
-
-        df_pihps = self.data['pihps']
-
-        # Focus on rice commodities only (com_1 to com_6)
-        rice_commodities = ['com_1', 'com_2', 'com_3', 'com_4', 'com_5', 'com_6']
-        df = df_pihps[df_pihps['commodity_id'].isin(rice_commodities)].copy()
-
-        print(f"\nFiltered to rice commodities only: {df.shape[0]} rows")
-        print(f"Commodities: {df['commodity_id'].unique()}")
-        print(f"Locations: {df['location_name'].nunique()}")
-
-        # 1. Merge with Weather data
-        print("\n--- MERGING WITH WEATHER DATA ---")
-        weather_path = os.path.join(self.base_dir, 'weather_pihps_historical.csv')
-        df_weather = pd.read_csv(weather_path, parse_dates=['date'])
-
-        print(f"Weather data shape: {df_weather.shape}")
-        print(f"Weather locations: {df_weather['location_name'].nunique()}")
-
-        # Merge
-        df = df.merge(
-            df_weather[['date', 'location_name', 'temperature_mean_c',
-                       'precipitation_mm', 'rain_mm', 'precipitation_hours',
-                       'windspeed_max_kmh']],
-            on=['date', 'location_name'],
-            how='left'
-        )
-        print(f"After weather merge: {df.shape}")
-        print(f"Weather missing after merge: {df['precipitation_mm'].isnull().sum()} ({df['precipitation_mm'].isnull().sum()/len(df)*100:.2f}%)")
-
-        # 2. Merge with BBM data (monthly -> daily via forward fill)
-        print("\n--- MERGING WITH BBM DATA ---")
-        bbm_path = os.path.join(self.base_dir, 'indonesia_gasoline_prices_5y.csv')
-        df_bbm = pd.read_csv(bbm_path, parse_dates=['Date'])
-        df_bbm['year_month'] = df_bbm['Date'].dt.to_period('M')
-
-        # Create year_month in main data
-        df['year_month'] = pd.to_datetime(df['date']).dt.to_period('M')
-
-        # Merge on year_month
-        df = df.merge(
-            df_bbm[['year_month', 'Price_IDR_per_Liter']].rename(
-                columns={'Price_IDR_per_Liter': 'bbm_price_idr'}
-            ),
-            on='year_month',
-            how='left'
-        )
-
-        # Forward fill for missing BBM values within each location
-        df = df.sort_values(['location_name', 'commodity_id', 'date'])
-        df['bbm_price_idr'] = df.groupby(['location_name', 'commodity_id'])['bbm_price_idr'].ffill()
-
-        print(f"After BBM merge: {df.shape}")
-        print(f"BBM missing after merge: {df['bbm_price_idr'].isnull().sum()} ({df['bbm_price_idr'].isnull().sum()/len(df)*100:.2f}%)")
-
-        # 3. Merge with Luas Panen (yearly -> daily via constant value per year)
-        print("\n--- MERGING WITH LUAS PANEN DATA ---")
-        panen_path = os.path.join(self.base_dir, 'bps-jakarta-data', 'jawa_barat_rice_production_2020_2024.csv')
-        df_panen = pd.read_csv(panen_path)
-
-        # Create year in main data
-        df['year'] = pd.to_datetime(df['date']).dt.year
-
-        # Standardize location names for matching
-        # Note: Some locations in PIHPS may not match exactly with BPS
-        location_mapping = {
-            'Bandung': 'Bandung',
-            'Bekasi': 'Bekasi',
-            'Bogor': 'Bogor',
-            'Cianjur': 'Cianjur',
-            'Cirebon': 'Cirebon',
-            'Garut': 'Garut',
-            'Indramayu': 'Indramayu',
-            'Karawang': 'Karawang',
-            'Kuningan': 'Kuningan',
-            'Majalengka': 'Majalengka',
-            'Purwakarta': 'Purwakarta',
-            'Subang': 'Subang',
-            'Sukabumi': 'Sukabumi',
-            'Sumedang': 'Sumedang',
-            'Tasikmalaya': 'Tasikmalaya',
-            'DKI Jakarta': None  # Jakarta tidak ada data luas panen
-        }
-
-        df['kabupaten_kota'] = df['location_name'].map(location_mapping)
-
-        # Merge
-        df = df.merge(
-            df_panen[['year', 'kabupaten_kota', 'luas_panen_ha', 'produktivitas_ku_ha', 'produksi_ton']],
-            on=['year', 'kabupaten_kota'],
-            how='left'
-        )
-
-        print(f"After luas panen merge: {df.shape}")
-        print(f"Luas panen missing: {df['luas_panen_ha'].isnull().sum()} ({df['luas_panen_ha'].isnull().sum()/len(df)*100:.2f}%)")
-
-        # 4. Add distance variable (static, from facility data)
-        print("\n--- ADDING DISTANCE VARIABLE ---")
-        facility_path = os.path.join(self.base_dir, 'supply_chain_spatial_fast',
-                                     'supply_chain_facilities_20251128_141527.csv')
-        df_facility = pd.read_csv(facility_path)
-
-        # Calculate average distance per location
-        avg_distance = df_facility.groupby('search_location')['distance_to_location_km'].mean()
-
-        # Map to main data
-        df['avg_distance_km'] = df['location_name'].map(avg_distance)
-
-        # For locations not in facility data, use median distance
-        median_distance = avg_distance.median()
-        df['avg_distance_km'].fillna(median_distance, inplace=True)
-
-        print(f"Distance variable added. Missing: {df['avg_distance_km'].isnull().sum()}")
-
-        # Final data quality check
-        print("\n--- FINAL MERGED DATASET SUMMARY ---")
-        print(f"Final shape: {df.shape}")
-        print(f"Date range: {df['date'].min()} to {df['date'].max()}")
-        print(f"Unique locations: {df['location_name'].nunique()}")
-        print(f"Unique commodities: {df['commodity_id'].nunique()}")
-
-        print("\n--- MISSING VALUES IN MERGED DATASET ---")
-        key_vars = ['price', 'precipitation_mm', 'temperature_mean_c',
-                   'bbm_price_idr', 'luas_panen_ha', 'avg_distance_km']
-        missing_summary = pd.DataFrame({
-            'Variable': key_vars,
-            'Missing_Count': [df[v].isnull().sum() for v in key_vars],
-            'Missing_Pct': [(df[v].isnull().sum()/len(df)*100) for v in key_vars]
-        })
-        print(missing_summary)
-
-        # Correlation matrix
-        print("\n--- CORRELATION MATRIX (Key Variables) ---")
-        corr_vars = ['price', 'precipitation_mm', 'temperature_mean_c',
-                    'bbm_price_idr', 'luas_panen_ha', 'avg_distance_km']
-        corr_matrix = df[corr_vars].corr()
-        print(corr_matrix)
-
-        # Handle missing values: drop rows with missing price or key variables
-        print("\n--- HANDLING MISSING VALUES ---")
-        print(f"Rows before cleaning: {len(df)}")
-        df_clean = df.dropna(subset=['price', 'precipitation_mm', 'bbm_price_idr'])
-        print(f"Rows after dropping missing: {len(df_clean)}")
-        print(f"Rows dropped: {len(df) - len(df_clean)} ({(len(df) - len(df_clean))/len(df)*100:.2f}%)")
-
-        # For luas_panen, fill with 0 for Jakarta (no rice production)
-        df_clean['luas_panen_ha'].fillna(0, inplace=True)
-
-        # Save merged dataset
-        self.data['merged'] = df_clean
-        self.results['fase1b'] = {
-            'merge_summary': missing_summary,
-            'correlation_matrix': corr_matrix,
-            'final_shape': df_clean.shape
-        }
-
-        # Export
-        df_clean.to_csv('sdm_results/fase1/1b_merged_dataset.csv', index=False)
-        missing_summary.to_csv('sdm_results/fase1/1b_merge_missing_summary.csv', index=False)
-        corr_matrix.to_csv('sdm_results/fase1/1b_correlation_matrix.csv')
-
-        print("\n✓ FASE 1B completed. Merged dataset saved.")
-        return df_clean
-
-    # =========================================================================
-    # FASE 2: EXPLORATORY SPATIAL DATA ANALYSIS (ESDA)
-    # =========================================================================
-
-    def fase2a_global_morans_i(self, commodity='com_1'):
-        """FASE 2A: Global Moran's I test for spatial autocorrelation"""
-        print("\n" + "="*80)
-        print("FASE 2A: GLOBAL SPATIAL AUTOCORRELATION (MORAN'S I)")
-        print("="*80)
-
-        df = self.data['merged']
-
-        # Filter for specific commodity and aggregate by location-date
-        print(f"\nAnalyzing commodity: {commodity}")
-        df_commodity = df[df['commodity_id'] == commodity].copy()
-
-        # Aggregate to location-date level (average across time)
-        df_agg = df_commodity.groupby('location_name')['price'].mean().reset_index()
-
-        print(f"Locations analyzed: {len(df_agg)}")
-        print(f"Price range: {df_agg['price'].min():.2f} - {df_agg['price'].max():.2f}")
-
-        # Create spatial weights matrix (will use the one from fase2c, but create simple one here)
-        # Get unique locations and create a simple distance-based W
-        locations = df_agg['location_name'].unique()
-        n_locations = len(locations)
-
-        print(f"\n--- CREATING SPATIAL WEIGHTS MATRIX ---")
-        print(f"Number of spatial units: {n_locations}")
-
-        # For now, create a simple queen contiguity or k-NN weights
-        # We'll use distance-based from coordinates if available
-        # Get coordinates from weather data
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-
-        # Merge coordinates
-        df_agg = df_agg.merge(coords_df, on='location_name', how='left')
-
-        # Create KNN weights (k=3)
-        coords = df_agg[['longitude', 'latitude']].values
-        w_knn = KNN.from_array(coords, k=3)
-        w_knn.transform = 'r'  # Row-standardize
-
-        print(f"Weights matrix created: {w_knn.n} units, {w_knn.s0} total weights")
-
-        # Calculate Global Moran's I
-        print("\n--- GLOBAL MORAN'S I TEST ---")
-        y = df_agg['price'].values
-        moran = Moran(y, w_knn)
-
-        print(f"Moran's I: {moran.I:.4f}")
-        print(f"Expected I: {moran.EI:.4f}")
-        print(f"Variance: {moran.VI_norm:.6f}")
-        print(f"Z-score: {moran.z_norm:.4f}")
-        print(f"P-value: {moran.p_norm:.6f}")
-
-        # Interpretation
-        if moran.p_norm < 0.001:
-            sig = "***"
-        elif moran.p_norm < 0.01:
-            sig = "**"
-        elif moran.p_norm < 0.05:
-            sig = "*"
-        else:
-            sig = "ns"
-
-        print(f"\nInterpretation: Moran's I = {moran.I:.4f}{sig}")
-
-        if moran.I > 0 and moran.p_norm < 0.05:
-            print("→ Strong positive spatial autocorrelation detected")
-            print("→ High prices cluster with high prices (and low with low)")
-        elif moran.I < 0 and moran.p_norm < 0.05:
-            print("→ Negative spatial autocorrelation detected")
-            print("→ High prices cluster with low prices (dispersion)")
-        else:
-            print("→ No significant spatial autocorrelation")
-
-        # Save results
-        self.results['fase2a'] = {
-            'moran_I': moran.I,
-            'expected_I': moran.EI,
-            'variance': moran.VI_norm,
-            'z_score': moran.z_norm,
-            'p_value': moran.p_norm,
-            'significance': sig
-        }
-
-        self.weights['knn3'] = w_knn
-
-        # Export
-        results_df = pd.DataFrame([{
-            'Commodity': commodity,
-            'Moran_I': moran.I,
-            'Expected_I': moran.EI,
-            'Variance': moran.VI_norm,
-            'Z_score': moran.z_norm,
-            'P_value': moran.p_norm,
-            'Significance': sig
-        }])
-        results_df.to_csv('sdm_results/fase2/2a_global_morans_i.csv', index=False)
-
-        print("\n✓ FASE 2A completed. Results saved.")
-        return moran
-
-    def fase2b_local_morans_i(self, commodity='com_1'):
-        """FASE 2B: Local Moran's I (LISA) cluster analysis"""
-        print("\n" + "="*80)
-        print("FASE 2B: LOCAL SPATIAL AUTOCORRELATION (LISA)")
-        print("="*80)
-
-        df = self.data['merged']
-        w = self.weights['knn3']
-
-        # Filter for specific commodity
-        df_commodity = df[df['commodity_id'] == commodity].copy()
-        df_agg = df_commodity.groupby('location_name')['price'].mean().reset_index()
-
-        # Get coordinates
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-        df_agg = df_agg.merge(coords_df, on='location_name', how='left')
-
-        # Calculate Local Moran's I
-        print("\n--- LOCAL MORAN'S I (LISA) ---")
-        y = df_agg['price'].values
-        lisa = Moran_Local(y, w)
-
-        # Create results dataframe
-        df_agg['local_I'] = lisa.Is
-        df_agg['p_value'] = lisa.p_sim
-        df_agg['z_score'] = lisa.z_sim
-
-        # Classify clusters
-        # HH: High-High, LL: Low-Low, LH: Low-High, HL: High-Low
-        sig_level = 0.05
-        df_agg['significant'] = df_agg['p_value'] < sig_level
-
-        # Determine cluster type
-        y_mean = y.mean()
-        y_std = y.std()
-        df_agg['price_std'] = (df_agg['price'] - y_mean) / y_std
-
-        # Spatial lag
-        df_agg['lag_price'] = pd.Series([w[i].dot(y) for i in range(len(y))])
-        df_agg['lag_price_std'] = (df_agg['lag_price'] - y_mean) / y_std
-
-        # Cluster classification
-        def classify_cluster(row):
-            if not row['significant']:
-                return 'Not Significant'
-            if row['price_std'] > 0 and row['lag_price_std'] > 0:
-                return 'HH (High-High)'
-            elif row['price_std'] < 0 and row['lag_price_std'] < 0:
-                return 'LL (Low-Low)'
-            elif row['price_std'] < 0 and row['lag_price_std'] > 0:
-                return 'LH (Low-High)'
-            elif row['price_std'] > 0 and row['lag_price_std'] < 0:
-                return 'HL (High-Low)'
-            else:
-                return 'Not Significant'
-
-        df_agg['cluster_type'] = df_agg.apply(classify_cluster, axis=1)
-
-        # Summary
-        print("\n--- LISA CLUSTER SUMMARY ---")
-        cluster_summary = df_agg['cluster_type'].value_counts()
-        print(cluster_summary)
-
-        # Significant clusters only
-        print("\n--- SIGNIFICANT CLUSTERS (p < 0.05) ---")
-        sig_clusters = df_agg[df_agg['significant']].sort_values('local_I', ascending=False)
-        print(sig_clusters[['location_name', 'price', 'local_I', 'p_value', 'cluster_type']])
-
-        # Hot spots (HH clusters)
-        print("\n--- HOT SPOTS (High-High Clusters) ---")
-        hotspots = df_agg[df_agg['cluster_type'] == 'HH (High-High)']
-        if len(hotspots) > 0:
-            print(hotspots[['location_name', 'price', 'local_I', 'p_value']])
-        else:
-            print("No significant hot spots detected.")
-
-        # Cold spots (LL clusters)
-        print("\n--- COLD SPOTS (Low-Low Clusters) ---")
-        coldspots = df_agg[df_agg['cluster_type'] == 'LL (Low-Low)']
-        if len(coldspots) > 0:
-            print(coldspots[['location_name', 'price', 'local_I', 'p_value']])
-        else:
-            print("No significant cold spots detected.")
-
-        # Save results
-        self.results['fase2b'] = {
-            'lisa_results': df_agg,
-            'cluster_summary': cluster_summary
-        }
-
-        # Export
-        df_agg.to_csv('sdm_results/fase2/2b_lisa_clusters.csv', index=False)
-        cluster_summary.to_csv('sdm_results/fase2/2b_cluster_summary.csv')
-
-        print("\n✓ FASE 2B completed. Results saved.")
-        return lisa, df_agg
-
-    def fase2c_construct_spatial_weights(self):
-        """FASE 2C: Construct multiple spatial weight matrices"""
-        print("\n" + "="*80)
-        print("FASE 2C: SPATIAL WEIGHTS MATRIX CONSTRUCTION")
-        print("="*80)
-
-        # Get location coordinates
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-
-        coords = coords_df[['longitude', 'latitude']].values
-        locations = coords_df['location_name'].values
-        n = len(locations)
-
-        print(f"\nNumber of spatial units: {n}")
-        print(f"Locations: {', '.join(locations)}")
-
-        # 1. Distance-based weights (inverse distance)
-        print("\n--- 1. DISTANCE-BASED WEIGHTS (Inverse Distance) ---")
-        dist_matrix = squareform(pdist(coords, metric='euclidean'))
-
-        # Convert to km (rough approximation: 1 degree ≈ 111 km)
-        dist_matrix_km = dist_matrix * 111
-
-        # Inverse distance (avoid division by zero)
-        w_dist_array = 1.0 / (dist_matrix_km + 0.1)
-        np.fill_diagonal(w_dist_array, 0)
-
-        # Row-standardize
-        row_sums = w_dist_array.sum(axis=1, keepdims=True)
-        w_dist_array = w_dist_array / row_sums
-
-        # Create W object
-        neighbors_dist = {}
-        weights_dist = {}
-        for i in range(n):
-            neighbors_dist[i] = list(range(n))
-            neighbors_dist[i].remove(i)
-            weights_dist[i] = w_dist_array[i, neighbors_dist[i]].tolist()
-
-        w_distance = W(neighbors_dist, weights_dist)
-        print(f"Distance weights: {w_distance.n} units, {w_distance.s0:.2f} total weights")
-        print(f"Mean neighbors: {w_distance.mean_neighbors:.2f}")
-
-        # 2. K-Nearest Neighbors (k=3, 5, 8)
-        print("\n--- 2. K-NEAREST NEIGHBORS WEIGHTS ---")
-
-        for k in [3, 5, 8]:
-            w_knn = KNN.from_array(coords, k=k)
-            w_knn.transform = 'r'
-            print(f"  k={k}: {w_knn.n} units, {w_knn.s0:.2f} total weights, "
-                  f"mean neighbors: {w_knn.mean_neighbors:.2f}")
-            self.weights[f'knn{k}'] = w_knn
-
-        # 3. Distance band (threshold-based)
-        print("\n--- 3. DISTANCE BAND WEIGHTS ---")
-
-        # Find appropriate threshold (e.g., distance that ensures all units have at least 1 neighbor)
-        max_knn_dist = []
-        for i in range(n):
-            distances = dist_matrix_km[i]
-            distances_sorted = np.sort(distances[distances > 0])
-            max_knn_dist.append(distances_sorted[2])  # 3rd nearest neighbor
-
-        threshold = np.percentile(max_knn_dist, 75)  # 75th percentile
-        print(f"Distance threshold: {threshold:.2f} km")
-
-        # Create distance band weights
-        # Note: DistanceBand requires threshold in coordinate units
-        threshold_deg = threshold / 111
-        w_band = DistanceBand.from_array(coords, threshold=threshold_deg)
-        w_band.transform = 'r'
-        print(f"Distance band weights: {w_band.n} units, {w_band.s0:.2f} total weights")
-
-        # Save all weights
-        self.weights['distance'] = w_distance
-        self.weights['knn3'] = self.weights.get('knn3', KNN.from_array(coords, k=3))
-        self.weights['knn5'] = self.weights['knn5']
-        self.weights['knn8'] = self.weights['knn8']
-        self.weights['distance_band'] = w_band
-
-        # Summary comparison
-        print("\n--- WEIGHTS MATRIX COMPARISON ---")
-        comparison = pd.DataFrame({
-            'Type': ['Distance (inverse)', 'KNN (k=3)', 'KNN (k=5)', 'KNN (k=8)', 'Distance Band'],
-            'N_units': [w_distance.n, self.weights['knn3'].n, self.weights['knn5'].n,
-                       self.weights['knn8'].n, w_band.n],
-            'Total_weights': [w_distance.s0, self.weights['knn3'].s0, self.weights['knn5'].s0,
-                             self.weights['knn8'].s0, w_band.s0],
-            'Mean_neighbors': [w_distance.mean_neighbors, self.weights['knn3'].mean_neighbors,
-                              self.weights['knn5'].mean_neighbors, self.weights['knn8'].mean_neighbors,
-                              w_band.mean_neighbors]
-        })
-        print(comparison)
-
-        # Save
-        comparison.to_csv('sdm_results/fase2/2c_weights_comparison.csv', index=False)
-
-        # Save distance matrix
-        dist_df = pd.DataFrame(dist_matrix_km, index=locations, columns=locations)
-        dist_df.to_csv('sdm_results/fase2/2c_distance_matrix_km.csv')
-
-        print("\n✓ FASE 2C completed. Spatial weights matrices constructed.")
-        return self.weights
-
-    # =========================================================================
-    # FASE 3: MODEL SPECIFICATION & DIAGNOSTIC TESTS
-    # =========================================================================
-
-    def fase3a_stationarity_tests(self):
-        """FASE 3A: Augmented Dickey-Fuller test for stationarity"""
-        print("\n" + "="*80)
-        print("FASE 3A: STATIONARITY TESTS (ADF)")
-        print("="*80)
-
-        df = self.data['merged']
-
-        # Test variables
-        test_vars = ['price', 'precipitation_mm', 'temperature_mean_c',
-                    'bbm_price_idr', 'luas_panen_ha']
-
-        results_list = []
-
-        for var in test_vars:
-            print(f"\n--- Testing {var} ---")
-
-            # Overall test
-            data = df[var].dropna()
-            adf_result = adfuller(data, autolag='AIC')
-
-            result_dict = {
-                'Variable': var,
-                'ADF_Statistic': adf_result[0],
-                'P_value': adf_result[1],
-                'Lags_Used': adf_result[2],
-                'N_Obs': adf_result[3],
-                'Critical_1%': adf_result[4]['1%'],
-                'Critical_5%': adf_result[4]['5%'],
-                'Critical_10%': adf_result[4]['10%'],
-                'Stationary': adf_result[1] < 0.05
-            }
-
-            results_list.append(result_dict)
-
-            print(f"  ADF Statistic: {adf_result[0]:.4f}")
-            print(f"  P-value: {adf_result[1]:.6f}")
-            print(f"  Critical values: 1%={adf_result[4]['1%']:.4f}, "
-                  f"5%={adf_result[4]['5%']:.4f}, 10%={adf_result[4]['10%']:.4f}")
-            print(f"  Stationary: {'Yes' if adf_result[1] < 0.05 else 'No'}")
-
-        # Summary
-        adf_df = pd.DataFrame(results_list)
-
-        print("\n--- STATIONARITY TEST SUMMARY ---")
-        print(adf_df[['Variable', 'ADF_Statistic', 'P_value', 'Stationary']])
-
-        # Recommendations
-        print("\n--- RECOMMENDATIONS ---")
-        non_stationary = adf_df[~adf_df['Stationary']]['Variable'].tolist()
-        if len(non_stationary) > 0:
-            print(f"Non-stationary variables detected: {', '.join(non_stationary)}")
-            print("→ Consider differencing or using time fixed effects in the model")
-        else:
-            print("All variables are stationary ✓")
-
-        # Save
-        self.results['fase3a'] = adf_df
-        adf_df.to_csv('sdm_results/fase3/3a_stationarity_tests.csv', index=False)
-
-        print("\n✓ FASE 3A completed.")
-        return adf_df
-
-    def fase3b_multicollinearity_test(self):
-        """FASE 3B: VIF test for multicollinearity"""
-        print("\n" + "="*80)
-        print("FASE 3B: MULTICOLLINEARITY TEST (VIF)")
-        print("="*80)
-
-        df = self.data['merged']
-
-        # Select independent variables
-        X_vars = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
-                 'luas_panen_ha', 'avg_distance_km']
-
-        # Drop missing values
-        df_clean = df[X_vars + ['price']].dropna()
-
-        print(f"\nSample size: {len(df_clean)}")
-        print(f"Variables tested: {X_vars}")
-
-        # Calculate VIF
-        print("\n--- VARIANCE INFLATION FACTOR (VIF) ---")
-
-        X = df_clean[X_vars].values
-        vif_data = []
-
-        for i, var in enumerate(X_vars):
-            vif = variance_inflation_factor(X, i)
-            vif_data.append({
-                'Variable': var,
-                'VIF': vif,
-                'Tolerance': 1/vif if vif > 0 else np.inf,
-                'Multicollinearity': 'High' if vif > 10 else ('Moderate' if vif > 5 else 'Low')
-            })
-            print(f"  {var}: VIF = {vif:.2f}")
-
-        vif_df = pd.DataFrame(vif_data)
-
-        print("\n--- VIF SUMMARY ---")
-        print(vif_df)
-
-        # Interpretation
-        print("\n--- INTERPRETATION ---")
-        high_vif = vif_df[vif_df['VIF'] > 10]['Variable'].tolist()
-        moderate_vif = vif_df[(vif_df['VIF'] > 5) & (vif_df['VIF'] <= 10)]['Variable'].tolist()
-
-        if len(high_vif) > 0:
-            print(f"⚠ High multicollinearity detected: {', '.join(high_vif)}")
-            print("  → Consider dropping variables or combining them")
-        elif len(moderate_vif) > 0:
-            print(f"⚠ Moderate multicollinearity: {', '.join(moderate_vif)}")
-            print("  → Monitor these variables")
-        else:
-            print("✓ No severe multicollinearity detected (all VIF < 5)")
-
-        # Correlation matrix
-        print("\n--- CORRELATION MATRIX ---")
-        corr = df_clean[X_vars].corr()
-        print(corr)
-
-        # Save
-        self.results['fase3b'] = {
-            'vif': vif_df,
-            'correlation': corr
-        }
-        vif_df.to_csv('sdm_results/fase3/3b_vif_results.csv', index=False)
-        corr.to_csv('sdm_results/fase3/3b_correlation_matrix.csv')
-
-        print("\n✓ FASE 3B completed.")
-        return vif_df
-
-    def fase3c_heteroskedasticity_test(self):
-        """FASE 3C: Breusch-Pagan test for heteroskedasticity"""
-        print("\n" + "="*80)
-        print("FASE 3C: HETEROSKEDASTICITY TEST (Breusch-Pagan)")
-        print("="*80)
-
-        df = self.data['merged']
-
-        # Prepare data
-        X_vars = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
-                 'luas_panen_ha', 'avg_distance_km']
-
-        df_clean = df[X_vars + ['price']].dropna()
-
-        X = df_clean[X_vars].values
-        y = df_clean['price'].values
-
-        # Add constant
-        X_with_const = np.column_stack([np.ones(len(X)), X])
-
-        # Run OLS first
-        from scipy.linalg import lstsq
-        beta = lstsq(X_with_const, y)[0]
-        y_pred = X_with_const.dot(beta)
-        residuals = y - y_pred
-
-        # Breusch-Pagan test
-        print("\n--- BREUSCH-PAGAN TEST ---")
-        bp_stat, bp_pvalue, _, _ = het_breuschpagan(residuals, X_with_const)
-
-        print(f"LM Statistic: {bp_stat:.4f}")
-        print(f"P-value: {bp_pvalue:.6f}")
-        print(f"Null Hypothesis: Homoskedasticity (constant variance)")
-
-        if bp_pvalue < 0.05:
-            print(f"\n✗ Reject H0: Heteroskedasticity detected (p < 0.05)")
-            print("  → Use robust standard errors (White/HC3) in the model")
-        else:
-            print(f"\n✓ Fail to reject H0: Homoskedasticity assumed (p >= 0.05)")
-
-        # Save
-        results_df = pd.DataFrame([{
-            'Test': 'Breusch-Pagan',
-            'LM_Statistic': bp_stat,
-            'P_value': bp_pvalue,
-            'Heteroskedasticity': bp_pvalue < 0.05
-        }])
-
-        self.results['fase3c'] = results_df
-        results_df.to_csv('sdm_results/fase3/3c_heteroskedasticity_test.csv', index=False)
-
-        print("\n✓ FASE 3C completed.")
-        return results_df
-
-    def fase3d_spatial_diagnostics(self, commodity='com_1'):
-        """FASE 3D: Spatial model selection tests (LM-Lag, LM-Error, Robust LM)"""
-        print("\n" + "="*80)
-        print("FASE 3D: SPATIAL DIAGNOSTIC TESTS")
-        print("="*80)
-
-        df = self.data['merged']
-
-        # Filter for commodity and aggregate by location-year
-        df_commodity = df[df['commodity_id'] == commodity].copy()
-
-        # Aggregate to location-year level for cross-sectional analysis
-        df_agg = df_commodity.groupby(['location_name', 'year']).agg({
-            'price': 'mean',
-            'precipitation_mm': 'mean',
-            'temperature_mean_c': 'mean',
-            'bbm_price_idr': 'mean',
-            'luas_panen_ha': 'first',
-            'avg_distance_km': 'first'
-        }).reset_index()
-
-        # Get one year for cross-sectional test (e.g., 2024)
-        df_cross = df_agg[df_agg['year'] == 2024].copy()
-
-        print(f"\nCross-sectional sample (year=2024): {len(df_cross)} locations")
-
-        # Get coordinates
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-        df_cross = df_cross.merge(coords_df, on='location_name', how='left')
-        df_cross = df_cross.dropna()
-
-        # Prepare matrices
-        y = df_cross['price'].values.reshape(-1, 1)
-        X_vars = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
-                 'luas_panen_ha', 'avg_distance_km']
-        X = df_cross[X_vars].values
-
-        # Spatial weights (use knn3)
-        w = self.weights['knn3']
-
-        print(f"y shape: {y.shape}")
-        print(f"X shape: {X.shape}")
-        print(f"W: {w.n} units")
-
-        # Run OLS first to get diagnostics
-        print("\n--- OLS ESTIMATION (for diagnostics) ---")
-        ols = spreg.OLS(
-            y, X,
-            w=w,
-            spat_diag=True,
-            name_y='price',
-            name_x=X_vars
-        )
-
-        # Extract spatial diagnostic tests
-        print("\n--- SPATIAL DIAGNOSTIC TESTS ---")
-
-        # LM-Lag
-        print(f"\n1. LM-Lag (Lagrange Multiplier - Spatial Lag)")
-        print(f"   Statistic: {ols.lm_lag[0]:.4f}")
-        print(f"   P-value: {ols.lm_lag[1]:.6f}")
-        print(f"   Significant: {'Yes***' if ols.lm_lag[1] < 0.001 else ('Yes**' if ols.lm_lag[1] < 0.01 else ('Yes*' if ols.lm_lag[1] < 0.05 else 'No'))}")
-
-        # LM-Error
-        print(f"\n2. LM-Error (Lagrange Multiplier - Spatial Error)")
-        print(f"   Statistic: {ols.lm_error[0]:.4f}")
-        print(f"   P-value: {ols.lm_error[1]:.6f}")
-        print(f"   Significant: {'Yes***' if ols.lm_error[1] < 0.001 else ('Yes**' if ols.lm_error[1] < 0.01 else ('Yes*' if ols.lm_error[1] < 0.05 else 'No'))}")
-
-        # Robust LM-Lag
-        print(f"\n3. Robust LM-Lag")
-        print(f"   Statistic: {ols.rlm_lag[0]:.4f}")
-        print(f"   P-value: {ols.rlm_lag[1]:.6f}")
-        print(f"   Significant: {'Yes***' if ols.rlm_lag[1] < 0.001 else ('Yes**' if ols.rlm_lag[1] < 0.01 else ('Yes*' if ols.rlm_lag[1] < 0.05 else 'No'))}")
-
-        # Robust LM-Error
-        print(f"\n4. Robust LM-Error")
-        print(f"   Statistic: {ols.rlm_error[0]:.4f}")
-        print(f"   P-value: {ols.rlm_error[1]:.6f}")
-        print(f"   Significant: {'Yes***' if ols.rlm_error[1] < 0.001 else ('Yes**' if ols.rlm_error[1] < 0.01 else ('Yes*' if ols.rlm_error[1] < 0.05 else 'No'))}")
-
-        # Decision rule
-        print("\n--- MODEL SELECTION DECISION ---")
-        lm_lag_sig = ols.lm_lag[1] < 0.05
-        lm_error_sig = ols.lm_error[1] < 0.05
-        rlm_lag_sig = ols.rlm_lag[1] < 0.05
-        rlm_error_sig = ols.rlm_error[1] < 0.05
-
-        if rlm_lag_sig and rlm_error_sig:
-            recommendation = "Spatial Durbin Model (SDM) - Both lag and error significant"
-        elif rlm_lag_sig:
-            recommendation = "Spatial Lag Model (SAR) - Only lag significant"
-        elif rlm_error_sig:
-            recommendation = "Spatial Error Model (SEM) - Only error significant"
-        else:
-            recommendation = "OLS sufficient - No spatial dependence"
-
-        print(f"Recommended model: {recommendation}")
-
-        # Save results
-        diag_df = pd.DataFrame([{
-            'Test': 'LM-Lag',
-            'Statistic': ols.lm_lag[0],
-            'P_value': ols.lm_lag[1],
-            'Significant': lm_lag_sig
-        }, {
-            'Test': 'LM-Error',
-            'Statistic': ols.lm_error[0],
-            'P_value': ols.lm_error[1],
-            'Significant': lm_error_sig
-        }, {
-            'Test': 'Robust LM-Lag',
-            'Statistic': ols.rlm_lag[0],
-            'P_value': ols.rlm_lag[1],
-            'Significant': rlm_lag_sig
-        }, {
-            'Test': 'Robust LM-Error',
-            'Statistic': ols.rlm_error[0],
-            'P_value': ols.rlm_error[1],
-            'Significant': rlm_error_sig
-        }])
-
-        self.results['fase3d'] = {
-            'diagnostics': diag_df,
-            'recommendation': recommendation,
-            'ols_model': ols
-        }
-
-        diag_df.to_csv('sdm_results/fase3/3d_spatial_diagnostics.csv', index=False)
-
-        with open('sdm_results/fase3/3d_recommendation.txt', 'w') as f:
-            f.write(f"Recommended model: {recommendation}\n")
-
-        print("\n✓ FASE 3D completed.")
-        return diag_df, recommendation
-
-    def fase3e_hausman_test(self):
-        """FASE 3E: Hausman test for Fixed vs Random Effects"""
-        print("\n" + "="*80)
-        print("FASE 3E: HAUSMAN TEST (Fixed vs Random Effects)")
-        print("="*80)
-
-        print("\nNote: Hausman test requires panel data estimation.")
-        print("For Spatial Durbin Model with panel data:")
-        print("- Fixed Effects (FE): Controls for unobserved heterogeneity per location")
-        print("- Random Effects (RE): More efficient but stricter assumptions")
-
-        print("\nRecommendation for this analysis:")
-        print("→ Use Fixed Effects (FE) for robustness")
-        print("  - Controls for location-specific characteristics")
-        print("  - More appropriate for non-random sample of locations")
-        print("  - Standard in spatial panel econometrics")
-
-        # Save recommendation
-        with open('sdm_results/fase3/3e_hausman_recommendation.txt', 'w') as f:
-            f.write("Hausman Test Recommendation:\n")
-            f.write("Use Fixed Effects (FE) for Spatial Durbin Model\n\n")
-            f.write("Reasoning:\n")
-            f.write("1. Controls for location-specific unobserved heterogeneity\n")
-            f.write("2. Locations are not randomly sampled (specific Java Barat regions)\n")
-            f.write("3. More robust specification for spatial panel econometrics\n")
-
-        print("\n✓ FASE 3E completed.")
-        return "Fixed Effects (FE)"
-
-    # Note: Remaining phases will be implemented in the next part
-    # This is getting quite long, so I'll create helper methods and continue
-
-    def run_all_phases(self):
-        """Run all analysis phases sequentially"""
-        print("Starting complete SDM analysis pipeline...\n")
-
-        # FASE 1
-        self.fase1a_check_data_quality()
-        self.fase1b_merge_datasets()
-
-        # FASE 2
-        self.fase2a_global_morans_i()
-        self.fase2b_local_morans_i()
-        self.fase2c_construct_spatial_weights()
-
-        # FASE 3
-        self.fase3a_stationarity_tests()
-        self.fase3b_multicollinearity_test()
-        self.fase3c_heteroskedasticity_test()
-        self.fase3d_spatial_diagnostics()
-        self.fase3e_hausman_test()
-
-        print("\n" + "="*80)
-        print("PHASES 1-3 COMPLETED")
-        print("="*80)
-        print("\nNext: Run SDM estimation (Phase 4-7)")
-        print("Note: This will be implemented in a separate script due to complexity")
-
-
-# ============================================================================
-# MAIN EXECUTION
-# ============================================================================
-
-if __name__ == "__main__":
-    # Initialize analysis
-    sdm = SpatialDurbinAnalysis(base_dir='.')
-
-    # Run Phase 1-3 (Diagnostics)
-    print("Running diagnostic phases (1-3)...")
-
-    try:
-        # Phase 1
-        sdm.fase1a_check_data_quality()
-        sdm.fase1b_merge_datasets()
-
-        # Phase 2
-        sdm.fase2a_global_morans_i(commodity='com_1')
-        sdm.fase2b_local_morans_i(commodity='com_1')
-        sdm.fase2c_construct_spatial_weights()
-
-        # Phase 3
-        sdm.fase3a_stationarity_tests()
-        sdm.fase3b_multicollinearity_test()
-        sdm.fase3c_heteroskedasticity_test()
-        sdm.fase3d_spatial_diagnostics(commodity='com_1')
-        sdm.fase3e_hausman_test()
-
-        print("\n" + "="*80)
-        print("DIAGNOSTIC PHASES COMPLETED SUCCESSFULLY!")
-        print("="*80)
-        print("\nResults saved in: sdm_results/")
-        print("\nNext steps:")
-        print("1. Review diagnostic test results")
-        print("2. Confirm model specification")
-        print("3. Run SDM estimation (Phase 4-7)")
-
-    except Exception as e:
-        print(f"\n✗ Error occurred: {str(e)}")
-        import traceback
-        traceback.print_exc()
+"""
+Spatial Durbin Model (SDM) Analysis - Phases 1-3
+YELP BI 2025 - Rice Price Prediction
+
+Kept so `from sdm_analysis_complete import SpatialDurbinAnalysis` keeps
+working; the code lives in yelp_bi.sdm.analysis.
+
+Usage:
+    python sdm_analysis_complete.py        # same as `python -m yelp_bi.sdm diagnostics`
+"""
+
+from yelp_bi.sdm.analysis import SpatialDurbinAnalysis  # noqa: F401
+
+if __name__ == "__main__":
+    from yelp_bi.sdm.runner import main
+    main(['diagnostics'])
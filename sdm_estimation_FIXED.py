@@ -9,7 +9,7 @@ CRITICAL FIXES:
 
 This version uses:
 - Monthly panel data (15 locations × 60 months = 900 obs)
-- Panel_FE_Lag for dynamic SDM with time fixed effects
+- ML panel SDM (panel_sdm.py) with location fixed effects and month dummies
 - Economic weights from facility network
 - Lagged weather and BBM variables
 """
@@ -18,29 +18,44 @@ import os
 import warnings
 import numpy as np
 import pandas as pd
-from datetime import datetime
-from scipy import stats
-from scipy.linalg import inv
-from scipy.spatial.distance import pdist, squareform
-import libpysal
-from libpysal.weights import W, KNN
-import spreg
-from spreg import Panel_FE_Lag, GM_Lag, ML_Lag
-import matplotlib.pyplot as plt
-import seaborn as sns
+from yelp_bi.facility_catalog import load_facilities
+from yelp_bi.sdm.weights_registry import get_registry
+from yelp_bi.sdm.location_index import LocationIndex
+from yelp_bi.sdm.panel_sdm import fit_panel_sdm, fit_panel_sdm_many, commodity_summary
+from yelp_bi.sdm.backtest import PanelBacktest, forecast_metrics
+from yelp_bi.sdm.panel_builder import MonthlyPanelBuilder, with_month_dummies
+from yelp_bi.sdm.schemas import read_merged
 
 warnings.filterwarnings('ignore')
 
+MERGED_CSV = 'sdm_results/fase1/1b_merged_dataset.csv'
+
+
+# X variables of the panel SDM (all spatially lagged); month dummies are added on top
+X_VARS = [
+    'price_lag1',           # Autoregressive term
+    'precipitation_mm',      # Current rainfall
+    'rain_lag1', 'rain_lag2', 'rain_lag3',  # Lagged rainfall (early warning)
+    'temperature_mean_c',
+    'temp_lag1',
+    'bbm_price_idr',
+    'bbm_lag1',             # Lagged BBM (transport cost delay)
+    'luas_panen_ha',
+    'avg_distance_km'
+]
+
 
 class SDMEstimationFixed:
     """Fixed SDM Estimation with Panel Structure + Facility Weights + Temporal Lags"""
 
-    def __init__(self, base_dir='.'):
+    def __init__(self, base_dir='.', facility_version='latest'):
         self.base_dir = base_dir
+        self.facility_version = facility_version
         self.results = {}
         self.models = {}
         self.data = {}
         self.weights = {}
+        self.location_index = None
 
     def load_preprocessed_data(self):
         """Load preprocessed data from Phase 1"""
@@ -48,7 +63,7 @@ class SDMEstimationFixed:
         print("LOADING PREPROCESSED DATA")
         print("="*80)
 
-        df = pd.read_csv('sdm_results/fase1/1b_merged_dataset.csv', parse_dates=['date'])
+        df = read_merged(MERGED_CSV)
         print(f"\nDataset loaded: {df.shape}")
 
         self.data['merged'] = df
@@ -71,17 +86,19 @@ class SDMEstimationFixed:
         print("="*80)
 
         # Load facility data
-        facility_path = os.path.join(self.base_dir, 'supply_chain_spatial_fast',
-                                     'supply_chain_facilities_20251128_141527.csv')
-        df_facility = pd.read_csv(facility_path)
+        df_facility = load_facilities(self.facility_version,
+                                      columns=['facility_type', 'search_location'],
+                                      base_dir=self.base_dir)
 
         print(f"\nFacility data loaded: {len(df_facility)} facilities")
         print(f"Facility types: {df_facility['facility_type'].unique()}")
 
-        # Get unique locations
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-        locations = coords_df['location_name'].values
+        # Canonical location order shared by the weights and the panel
+        index = LocationIndex.from_weather(self.base_dir)
+        if 'merged' in self.data:
+            index = index.subset(self.data['merged']['location_name'].unique())
+        self.location_index = index
+        locations = index.names
         n_locations = len(locations)
 
         print(f"\nLocations: {n_locations}")
@@ -99,68 +116,29 @@ class SDMEstimationFixed:
         # W_econ[i,j] = sqrt(facilities_i * facilities_j) / distance_ij
         # This captures: more facilities = stronger connection, closer = stronger
 
-        coords = coords_df[['longitude', 'latitude']].values
-        dist_matrix = squareform(pdist(coords, metric='euclidean'))
-        dist_matrix_km = dist_matrix * 111  # rough conversion to km
-
         # Create facility vector
         facility_vector = np.array([facility_counts.get(loc, 1) for loc in locations])
 
-        # Economic weight matrix
-        w_econ_array = np.zeros((n_locations, n_locations))
-
-        for i in range(n_locations):
-            for j in range(n_locations):
-                if i != j:
-                    # Interaction term: geometric mean of facilities
-                    facility_interaction = np.sqrt(facility_vector[i] * facility_vector[j])
-
-                    # Distance decay
-                    distance = dist_matrix_km[i, j] + 0.1  # avoid division by zero
-
-                    # Economic weight
-                    w_econ_array[i, j] = facility_interaction / distance
-
-        # Row-standardize
-        row_sums = w_econ_array.sum(axis=1, keepdims=True)
-        w_econ_array = w_econ_array / row_sums
-
-        # Create W object
-        neighbors_econ = {}
-        weights_econ = {}
-        for i in range(n_locations):
-            neighbors_econ[i] = [j for j in range(n_locations) if i != j]
-            weights_econ[i] = w_econ_array[i, neighbors_econ[i]].tolist()
-
-        w_economic = W(neighbors_econ, weights_econ)
+        # Economic weight matrix (sparse CSR, row-standardized):
+        # geometric mean of facilities / (distance_km + 0.1)
+        registry = get_registry()
+        econ = registry.for_index('economic', index, mass=facility_vector)
+        w_economic = econ.w
 
         print(f"\n✓ Economic weights created:")
         print(f"  Mean neighbors: {w_economic.mean_neighbors:.2f}")
         print(f"  Total weights: {w_economic.s0:.2f}")
 
         # Step 3: Create geographic weights (KNN for comparison)
-        w_knn3 = KNN.from_array(coords, k=3)
-        w_knn3.transform = 'r'
+        w_knn3 = registry.for_index('knn:k=3', index).w
 
         # Step 4: Create COMBINED weights (α×W_geo + (1-α)×W_econ)
         print("\n--- Creating Combined Weights (Geographic + Economic) ---")
 
         combined_weights = {}
         for alpha in [0.3, 0.5, 0.7]:
-            w_combined_array = alpha * w_knn3.full()[0] + (1 - alpha) * w_econ_array
-
-            # Row-standardize combined
-            row_sums = w_combined_array.sum(axis=1, keepdims=True)
-            w_combined_array = w_combined_array / row_sums
-
-            neighbors_combined = {}
-            weights_combined = {}
-            for i in range(n_locations):
-                neighbors_combined[i] = list(range(n_locations))
-                neighbors_combined[i].remove(i)
-                weights_combined[i] = w_combined_array[i, neighbors_combined[i]].tolist()
-
-            w_combined = W(neighbors_combined, weights_combined)
+            w_combined = registry.for_index(f'combined:alpha={alpha},k=3', index,
+                                            mass=facility_vector).w
             combined_weights[f'combined_alpha{int(alpha*10)}'] = w_combined
 
             print(f"  α={alpha}: {w_combined.n} units, {w_combined.s0:.2f} total weights")
@@ -171,7 +149,7 @@ class SDMEstimationFixed:
         self.weights.update(combined_weights)
 
         # Save economic weight matrix
-        w_econ_df = pd.DataFrame(w_econ_array, index=locations, columns=locations)
+        w_econ_df = pd.DataFrame(econ.sparse.toarray(), index=locations, columns=locations)
         w_econ_df.to_csv('sdm_results/fase2/2c_economic_weights_matrix.csv')
 
         print("\n✓ FIX #2 completed: Facility network weights constructed")
@@ -199,63 +177,29 @@ class SDMEstimationFixed:
         print(f"\nCommodity: {commodity}")
         print(f"Raw data: {len(df_commodity)} rows")
 
-        # Aggregate to monthly panel
-        df_commodity['year_month'] = pd.to_datetime(df_commodity['date']).dt.to_period('M')
-
-        df_panel = df_commodity.groupby(['location_name', 'year_month']).agg({
-            'price': 'mean',
-            'precipitation_mm': 'sum',  # Monthly total
-            'temperature_mean_c': 'mean',
-            'bbm_price_idr': 'mean',
-            'luas_panen_ha': 'first',
-            'avg_distance_km': 'first',
-            'year': 'first'
-        }).reset_index()
-
-        df_panel['date'] = df_panel['year_month'].dt.to_timestamp()
-        df_panel = df_panel.sort_values(['location_name', 'date'])
+        # Monthly aggregate, maintained incrementally (only new or changed
+        # months are aggregated); FIX #3: lags (price AR(1), BBM 1 month,
+        # rainfall 1-3 months, temperature 1 month) within each location
+        builder = MonthlyPanelBuilder.open(MERGED_CSV)
+        n_updated = builder.update(df_commodity)
+        df_panel = builder.panel([commodity], dropna=False)
+        print(f"Monthly aggregate: {n_updated} location-months (re)aggregated")
 
         print(f"\nPanel structure:")
         print(f"  Locations: {df_panel['location_name'].nunique()}")
         print(f"  Time periods: {df_panel['year_month'].nunique()}")
         print(f"  Total observations: {len(df_panel)}")
 
-        # FIX #3: Create lagged variables
-        print("\n--- Creating Temporal Lags ---")
-
-        # Group by location for lag creation
-        df_panel = df_panel.sort_values(['location_name', 'date'])
-
-        # Lag 1 month (price AR term)
-        df_panel['price_lag1'] = df_panel.groupby('location_name')['price'].shift(1)
-
-        # Lag BBM (1 month - transport cost delayed effect)
-        df_panel['bbm_lag1'] = df_panel.groupby('location_name')['bbm_price_idr'].shift(1)
-
-        # Lag rainfall (1, 2, 3 months - growing season effect)
-        df_panel['rain_lag1'] = df_panel.groupby('location_name')['precipitation_mm'].shift(1)
-        df_panel['rain_lag2'] = df_panel.groupby('location_name')['precipitation_mm'].shift(2)
-        df_panel['rain_lag3'] = df_panel.groupby('location_name')['precipitation_mm'].shift(3)
-
-        # Lag temperature (1 month)
-        df_panel['temp_lag1'] = df_panel.groupby('location_name')['temperature_mean_c'].shift(1)
-
-        # Drop rows with missing lags (first 3 months per location)
-        df_panel_clean = df_panel.dropna(subset=['price_lag1', 'bbm_lag1', 'rain_lag3'])
+        # Drop rows with missing lags (first 3 months per location); time fixed
+        # effects are kept as an int8 month code and expanded at estimation
+        df_panel_clean = builder.panel([commodity])
+        n_dummies = df_panel_clean['month'].nunique() - 1
 
         print(f"\nAfter adding lags:")
         print(f"  Observations: {len(df_panel_clean)} (dropped {len(df_panel) - len(df_panel_clean)} with missing lags)")
         print(f"  Time range: {df_panel_clean['date'].min()} to {df_panel_clean['date'].max()}")
 
-        # Create time fixed effects (month dummies for seasonality)
-        df_panel_clean['month'] = df_panel_clean['date'].dt.month
-        month_dummies = pd.get_dummies(df_panel_clean['month'], prefix='month', drop_first=True)
-        df_panel_clean = pd.concat([df_panel_clean, month_dummies], axis=1)
-
-        print(f"\nTime fixed effects: {len(month_dummies.columns)} month dummies created")
-
-        # Save panel data
-        df_panel_clean.to_csv('sdm_results/fase4/4_panel_data_with_lags.csv', index=False)
+        print(f"\nTime fixed effects: {n_dummies} month dummies (month code kept as int8)")
 
         self.data['panel'] = df_panel_clean
 
@@ -272,112 +216,47 @@ class SDMEstimationFixed:
         - True panel structure (not cross-section)
         - Combined geographic + economic weights
         - Temporal lag variables
-        - Time fixed effects
+        - Location fixed effects + month dummies
         """
         print("\n" + "="*80)
         print("FASE 4 FIXED: PANEL SPATIAL DURBIN MODEL ESTIMATION")
         print("="*80)
 
-        df_panel = self.data['panel']
         w = self.weights[w_type]
 
+        # Month dummies capture seasonality; they enter X but are not spatially lagged
+        df_panel, month_cols = with_month_dummies(self.data['panel'])
+
         print(f"\nUsing weights: {w_type}")
         print(f"Panel size: {len(df_panel)} observations")
         print(f"Spatial units: {w.n}")
 
-        # Prepare panel matrices
-        # Need to reshape to (n_locations, n_time_periods) for Panel_FE_Lag
-
-        # Get unique locations and time periods
-        locations = sorted(df_panel['location_name'].unique())
-        time_periods = sorted(df_panel['date'].unique())
-
-        n_locations = len(locations)
-        n_time = len(time_periods)
-
-        print(f"\nPanel dimensions:")
-        print(f"  N (locations): {n_locations}")
-        print(f"  T (time periods): {n_time}")
-        print(f"  N×T: {n_locations * n_time}")
+        # Prepare X (with lags and contemporaneous)
+        X_vars = X_VARS
+        X_vars_all = X_vars + month_cols
 
-        # Create location index
-        location_to_idx = {loc: i for i, loc in enumerate(locations)}
-        df_panel['location_idx'] = df_panel['location_name'].map(location_to_idx)
+        print(f"\nPanel: {df_panel['location_name'].nunique()} locations x "
+              f"{df_panel['date'].nunique()} periods = {len(df_panel)} observations")
+        print(f"X variables: {len(X_vars_all)} ({len(X_vars)} lagged by W + {len(month_cols)} month dummies)")
 
-        # Sort by location_idx then date
-        df_panel = df_panel.sort_values(['location_idx', 'date'])
+        # ML panel SDM with location fixed effects (within transformation,
+        # Lee-Yu correction); I_T ⊗ W is applied implicitly, rows follow the
+        # location index used to build W
+        print("\n--- ESTIMATING PANEL SDM (ML, location fixed effects) ---")
 
-        # Prepare y (price)
-        y = df_panel['price'].values.reshape(-1, 1)
+        sdm_panel = fit_panel_sdm(
+            df_panel, y='price', x=X_vars_all, W=w.sparse,
+            index=self.location_index, time_col='date',
+            durbin=X_vars, effects='individual',
+            name_w=w_type, name_ds='Panel Rice Price Analysis'
+        )
 
-        # Prepare X (with lags and contemporaneous)
-        X_vars = [
-            'price_lag1',           # Autoregressive term
-            'precipitation_mm',      # Current rainfall
-            'rain_lag1', 'rain_lag2', 'rain_lag3',  # Lagged rainfall (early warning)
-            'temperature_mean_c',
-            'temp_lag1',
-            'bbm_price_idr',
-            'bbm_lag1',             # Lagged BBM (transport cost delay)
-            'luas_panen_ha',
-            'avg_distance_km'
-        ]
-
-        # Add month dummies for time fixed effects
-        month_cols = [col for col in df_panel.columns if col.startswith('month_')]
-        X_vars_all = X_vars + month_cols
+        print("\n" + "="*60)
+        print("PANEL SDM ESTIMATION RESULTS (ML)")
+        print("="*60)
+        print(sdm_panel.summary)
 
-        X = df_panel[X_vars_all].values
-
-        print(f"\ny shape: {y.shape}")
-        print(f"X shape: {X.shape}")
-        print(f"X variables: {len(X_vars_all)}")
-
-        # Estimate using GM_Lag with SDM specification
-        # Note: spreg's Panel_FE_Lag may not support slx_lags directly
-        # We'll use GM_Lag on panel data (treating as pooled cross-section with FE manually)
-
-        print("\n--- ESTIMATING PANEL SDM (GM Estimation) ---")
-
-        try:
-            sdm_panel = GM_Lag(
-                y, X, w=w,
-                slx_lags=1,  # Spatial Durbin specification
-                name_y='price',
-                name_x=X_vars_all,
-                name_w=w_type,
-                name_ds='Panel Rice Price Analysis',
-                spat_impacts=['simple', 'full']
-            )
-
-            print("\n" + "="*60)
-            print("PANEL SDM ESTIMATION RESULTS")
-            print("="*60)
-            print(sdm_panel.summary)
-
-            self.models['panel_sdm'] = sdm_panel
-
-        except Exception as e:
-            print(f"\n✗ GM estimation failed: {str(e)}")
-            print("Trying ML estimation...")
-
-            sdm_panel = ML_Lag(
-                y, X, w=w,
-                slx_lags=1,
-                name_y='price',
-                name_x=X_vars_all,
-                name_w=w_type,
-                name_ds='Panel Rice Price Analysis',
-                spat_impacts=['simple', 'full'],
-                spat_diag=True
-            )
-
-            print("\n" + "="*60)
-            print("PANEL SDM ESTIMATION RESULTS (ML)")
-            print("="*60)
-            print(sdm_panel.summary)
-
-            self.models['panel_sdm'] = sdm_panel
+        self.models['panel_sdm'] = sdm_panel
 
         # Save results
         os.makedirs('sdm_results/fase4_fixed', exist_ok=True)
@@ -385,26 +264,7 @@ class SDMEstimationFixed:
         with open('sdm_results/fase4_fixed/4_panel_sdm_summary.txt', 'w') as f:
             f.write(str(sdm_panel.summary))
 
-        # Extract coefficients
-        coef_names = ['Constant'] + X_vars_all + [f'W_{x}' for x in X_vars_all] + ['rho']
-        n_coefs = len(sdm_panel.betas)
-
-        coef_df = pd.DataFrame({
-            'Variable': coef_names[:n_coefs],
-            'Coefficient': sdm_panel.betas.flatten(),
-        })
-
-        if hasattr(sdm_panel, 'std_err'):
-            coef_df['Std_Error'] = sdm_panel.std_err
-        elif hasattr(sdm_panel, 'vm'):
-            coef_df['Std_Error'] = np.sqrt(np.diag(sdm_panel.vm))
-
-        if hasattr(sdm_panel, 'z_stat'):
-            coef_df['Z_stat'] = sdm_panel.z_stat.flatten()
-            coef_df['P_value'] = [2 * (1 - stats.norm.cdf(abs(z))) for z in sdm_panel.z_stat.flatten()]
-            coef_df['Sig'] = coef_df['P_value'].apply(
-                lambda p: '***' if p < 0.001 else ('**' if p < 0.01 else ('*' if p < 0.05 else ''))
-            )
+        coef_df = sdm_panel.coefficient_table()
 
         print("\n--- KEY COEFFICIENTS (with lags) ---")
         key_vars = ['price_lag1', 'bbm_price_idr', 'bbm_lag1',
@@ -416,6 +276,106 @@ class SDMEstimationFixed:
         print("\n✓ FASE 4 FIXED completed: Panel SDM estimated")
         return sdm_panel
 
+    # =========================================================================
+    # FASE 4B: SAME PANEL SDM FOR EVERY COMMODITY
+    # =========================================================================
+
+    def fase4b_estimate_commodities(self, commodities=None, w_type='combined_alpha5', n_workers=None):
+        """
+        FASE 4B: Estimate the FASE 4 panel SDM for many commodities at once
+
+        W, its log-determinant engine and the location index are shared by all
+        commodities observed at the same locations; the fits run in parallel.
+
+        Args:
+            commodities (list, optional): Commodity ids (default: all in the data)
+            w_type (str): Weights key (default: 'combined_alpha5')
+            n_workers (int, optional): Parallel fits (default: CPU count)
+
+        Returns:
+            pd.DataFrame: One row per commodity with rho, betas (x) and thetas (W_x)
+        """
+        print("\n" + "="*80)
+        print("FASE 4B: PANEL SDM PER COMMODITY (BATCHED)")
+        print("="*80)
+
+        df = self.data['merged']
+        if commodities is not None:
+            df = df[df['commodity_id'].isin(commodities)]
+        w = self.weights[w_type]
+
+        builder = MonthlyPanelBuilder.open(MERGED_CSV)
+        builder.update(df)
+        df_panel, month_cols = with_month_dummies(builder.panel(commodities))
+
+        print(f"\nUsing weights: {w_type}")
+        print(f"Commodities: {df_panel['commodity_id'].nunique()}, panel rows: {len(df_panel)}")
+
+        results = fit_panel_sdm_many(
+            df_panel, y='price', x=X_VARS + month_cols, W=w.sparse,
+            index=self.location_index, group_col='commodity_id', time_col='date',
+            durbin=X_VARS, effects='individual', name_w=w_type,
+            name_ds='Panel Rice Price Analysis', n_workers=n_workers
+        )
+        self.models['panel_sdm_commodities'] = results
+
+        summary = commodity_summary(results)
+        print("\n" + summary[['commodity', 'n', 't', 'rho', 'rho_se', 'logll']].to_string(index=False))
+
+        os.makedirs('sdm_results/fase4_fixed', exist_ok=True)
+        summary.to_csv('sdm_results/fase4_fixed/4_commodity_summary.csv', index=False)
+
+        print("\n✓ FASE 4B completed: results in sdm_results/fase4_fixed/4_commodity_summary.csv")
+        return summary
+
+    # =========================================================================
+    # BACKTEST: OUT-OF-SAMPLE FORECAST ACCURACY
+    # =========================================================================
+
+    def backtest_panel_sdm(self, w_type='combined_alpha5', min_train=24, horizon=3, n_workers=None):
+        """
+        Expanding-window backtest of the FASE 4 panel SDM
+
+        Re-estimates the model on every training window (warm-started from the
+        previous window's rho) and forecasts 1..horizon months ahead, feeding
+        the price forecast back into price_lag1.
+
+        Args:
+            w_type (str): Weights key (default: 'combined_alpha5')
+            min_train (int): Months in the first training window (default: 24)
+            horizon (int): Forecast horizon in months (default: 3)
+            n_workers (int, optional): Parallel fold chains (default: CPU count)
+
+        Returns:
+            pd.DataFrame: MAPE / RMSE per location and horizon
+        """
+        print("\n" + "="*80)
+        print("BACKTEST: EXPANDING-WINDOW OUT-OF-SAMPLE FORECASTS")
+        print("="*80)
+
+        df_panel, month_cols = with_month_dummies(self.data['panel'])
+
+        bt = PanelBacktest(df_panel, y='price', x=X_VARS + month_cols, W=self.weights[w_type].sparse,
+                           index=self.location_index, time_col='date', ar_col='price_lag1',
+                           effects='individual', n_workers=n_workers)
+        min_train = min(min_train, bt.t - 1)
+        forecasts = bt.run(min_train=min_train, horizon=horizon, durbin=X_VARS)
+
+        metrics = forecast_metrics(forecasts)
+        overall = forecast_metrics(forecasts, by=['model', 'horizon'])
+        print(f"\nFolds: {len(bt.fits)} (first training window {min_train} months)")
+        print(overall.to_string(index=False))
+
+        os.makedirs('sdm_results/fase4_fixed', exist_ok=True)
+        forecasts.to_csv('sdm_results/fase4_fixed/4_backtest_forecasts.csv', index=False)
+        metrics.to_csv('sdm_results/fase4_fixed/4_backtest_metrics.csv', index=False)
+        bt.fits.to_csv('sdm_results/fase4_fixed/4_backtest_folds.csv', index=False)
+
+        self.results['backtest'] = {'forecasts': forecasts, 'metrics': metrics, 'overall': overall}
+
+        print("\n✓ Backtest completed: results in sdm_results/fase4_fixed/4_backtest_*.csv")
+        return metrics
+
     # =========================================================================
     # INTERPRETATION: LAG EFFECTS
     # =========================================================================
@@ -521,6 +481,9 @@ class SDMEstimationFixed:
         # Interpret lag structure
         self.interpret_lag_structure()
 
+        # Out-of-sample accuracy
+        self.backtest_panel_sdm(w_type='combined_alpha5')
+
         print("\n" + "="*80)
         print("FIXED SDM ANALYSIS COMPLETED!")
         print("="*80)
@@ -548,6 +511,7 @@ if __name__ == "__main__":
         print("  - sdm_results/fase4_fixed/4_panel_sdm_summary.txt")
         print("  - sdm_results/fase4_fixed/4_panel_coefficients.csv")
         print("  - sdm_results/fase4_fixed/4_early_warning_interpretation.txt")
+        print("  - sdm_results/fase4_fixed/4_backtest_metrics.csv")
 
     except Exception as e:
         print(f"\n✗ Error: {str(e)}")
@@ -7,8 +7,8 @@ import seaborn as sns
 import geopandas as gpd
 from shapely.geometry import Point
 import os
-import glob
 import warnings
+from yelp_bi.facility_catalog import load_facilities
 
 # Suppress warnings
 warnings.filterwarnings('ignore')
@@ -61,9 +61,7 @@ df_subset['mapped_loc'] = df_subset['location_name'].map(loc_map)
 avg_price = df_subset.groupby('mapped_loc')['price'].mean().reset_index()
 
 # Load Supply Chain Distances
-list_of_files = glob.glob('supply_chain_spatial_fast/supply_chain_facilities_*.csv')
-latest_file = max(list_of_files, key=os.path.getctime)
-df_facilities = pd.read_csv(latest_file)
+df_facilities = load_facilities(columns=['facility_type', 'search_location', 'distance_to_location_km'])
 
 # Filter for Production
 prod_facilities = df_facilities[df_facilities['facility_type'] == 'production']
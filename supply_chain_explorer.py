@@ -33,9 +33,10 @@ import logging
 from multiprocessing import Pool, cpu_count
 from tqdm import tqdm
 import time
-import math
 import random
 
+from yelp_bi.geodesic import haversine, one_to_many
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -257,23 +258,6 @@ SUPPLY_CHAIN_TAGS = {
 # HELPER FUNCTIONS
 # ============================================================================
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """
-    Calculate distance between two coordinates in kilometers using Haversine formula
-    """
-    R = 6371  # Earth radius in km
-
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-
-    a = (math.sin(dlat / 2) ** 2 +
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-         math.sin(dlon / 2) ** 2)
-    c = 2 * math.asin(math.sqrt(a))
-
-    return R * c
-
-
 def build_optimized_batched_query(lat: float, lon: float, radius: int, commodity_dict: Dict) -> str:
     """
     Build SATU query besar yang mencakup SEMUA fasilitas untuk satu lokasi.
@@ -474,7 +458,7 @@ def main():
             name = tags.get('name', 'Unnamed')
             
             # Calculate distance to search location
-            distance_km = haversine_distance(loc_lat, loc_lon, el_lat, el_lon)
+            distance_km = haversine(loc_lat, loc_lon, el_lat, el_lon)
             
             # Satu facility bisa match ke multiple commodities
             for match in matched_categories:
@@ -598,10 +582,8 @@ def main():
                 # Distance to nearest production facility
                 production_facilities = commodity_facilities[commodity_facilities['facility_type'] == 'production']
                 if len(production_facilities) > 0:
-                    distances = production_facilities.apply(
-                        lambda row: haversine_distance(location_lat, location_lon, row['latitude'], row['longitude']),
-                        axis=1
-                    )
+                    distances = one_to_many((location_lon, location_lat),
+                                            production_facilities[['longitude', 'latitude']].values)
                     nearest_production_km = distances.min()
                     avg_production_distance_km = distances.mean()
                 else:
@@ -611,10 +593,8 @@ def main():
                 # Distance to nearest distribution
                 distribution_facilities = commodity_facilities[commodity_facilities['facility_type'] == 'distribution']
                 if len(distribution_facilities) > 0:
-                    distances = distribution_facilities.apply(
-                        lambda row: haversine_distance(location_lat, location_lon, row['latitude'], row['longitude']),
-                        axis=1
-                    )
+                    distances = one_to_many((location_lon, location_lat),
+                                            distribution_facilities[['longitude', 'latitude']].values)
                     nearest_distribution_km = distances.min()
                     avg_distribution_distance_km = distances.mean()
                 else:
@@ -624,10 +604,8 @@ def main():
                 # Distance to nearest retail
                 retail_facilities = commodity_facilities[commodity_facilities['facility_type'] == 'retail']
                 if len(retail_facilities) > 0:
-                    distances = retail_facilities.apply(
-                        lambda row: haversine_distance(location_lat, location_lon, row['latitude'], row['longitude']),
-                        axis=1
-                    )
+                    distances = one_to_many((location_lon, location_lat),
+                                            retail_facilities[['longitude', 'latitude']].values)
                     nearest_retail_km = distances.min()
                 else:
                     nearest_retail_km = None
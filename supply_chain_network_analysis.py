@@ -1,16 +1,15 @@
-import pandas as pd
 import numpy as np
 import networkx as nx
 import matplotlib
 matplotlib.use('Agg') # Non-interactive backend
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy.spatial import cKDTree
 import geopandas as gpd
 from shapely.geometry import Point, LineString
 import os
-import glob
 import warnings
+from yelp_bi.facility_catalog import load_facilities
+from yelp_bi.geodesic import nearest
 
 # Suppress warnings
 warnings.filterwarnings('ignore')
@@ -26,12 +25,10 @@ print("="*80)
 
 # 1. LOAD DATA
 print("\n[1/5] Loading Supply Chain Data...")
-list_of_files = glob.glob('supply_chain_spatial_fast/supply_chain_facilities_*.csv')
-latest_file = max(list_of_files, key=os.path.getctime)
-df = pd.read_csv(latest_file)
+df = load_facilities(columns=['name', 'latitude', 'longitude', 'facility_type', 'search_location'])
 
-# Filter columns and drop invalid coords
-df = df[['name', 'latitude', 'longitude', 'facility_type', 'search_location']].dropna(subset=['latitude', 'longitude'])
+# Drop invalid coords
+df = df.dropna(subset=['latitude', 'longitude'])
 print(f"   Loaded {len(df)} facilities.")
 
 # 2. BUILD NETWORK (DIGITAL TWIN)
@@ -56,16 +53,11 @@ def add_spatial_edges(source_df, target_df, graph, radius_km=20, max_neighbors=3
     if source_df.empty or target_df.empty:
         return 0
     
-    source_coords = source_df[['latitude', 'longitude']].values
-    target_coords = target_df[['latitude', 'longitude']].values
+    source_coords = source_df[['longitude', 'latitude']].values
+    target_coords = target_df[['longitude', 'latitude']].values
     
-    # Use KDTree for fast nearest neighbor search
-    # Note: KDTree uses Euclidean distance, so we approximate degrees to km
-    # 1 degree lat approx 111 km. So radius_deg = radius_km / 111
-    radius_deg = radius_km / 111.0
-    
-    tree = cKDTree(target_coords)
-    distances, indices = tree.query(source_coords, k=max_neighbors, distance_upper_bound=radius_deg)
+    # KD-tree nearest neighbors by great-circle distance (km) within the radius
+    distances, indices = nearest(source_coords, target_coords, k=max_neighbors, max_distance_km=radius_km)
     
     edge_count = 0
     for i, (dists, idxs) in enumerate(zip(distances, indices)):
@@ -83,7 +75,7 @@ def add_spatial_edges(source_df, target_df, graph, radius_km=20, max_neighbors=3
             
             # Add edge: Source -> Target
             # Weight = Distance (inverse weight for centrality usually, but here we just store it)
-            graph.add_edge(source_node, target_node, weight=d*111) # dist in km
+            graph.add_edge(source_node, target_node, weight=d) # dist in km
             edge_count += 1
             
     return edge_count
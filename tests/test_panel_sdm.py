@@ -0,0 +1,50 @@
+"""Panel SDM with a regressor that is the same in every location (national series)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+libpysal = pytest.importorskip('libpysal')
+
+from yelp_bi.sdm.location_index import LocationIndex  # noqa: E402
+from yelp_bi.sdm.panel_sdm import fit_panel_sdm  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def national_panel():
+    """6x6 rook lattice, 24 months; `local` varies by location, `national` only over time"""
+    rng = np.random.default_rng(0)
+    w = libpysal.weights.lat2W(6, 6)
+    w.transform = 'r'
+    W = w.sparse.toarray()
+    n, t = w.n, 24
+    names = [f'L{i}' for i in range(n)]
+    index = LocationIndex(names, rng.normal(size=(n, 2)))
+
+    local = rng.normal(size=(n, t))
+    national = np.tile(rng.normal(size=t), (n, 1))
+    mu = rng.normal(size=(n, 1))
+    A = np.linalg.inv(np.eye(n) - 0.3 * W)
+    y = A @ (mu + 1.0 * local + 0.5 * national + 0.4 * W @ local + rng.normal(scale=0.3, size=(n, t)))
+
+    df = pd.DataFrame({
+        'location_name': np.repeat(names, t),
+        'date': np.tile(pd.date_range('2020-01-01', periods=t, freq='MS'), n),
+        'price': y.ravel(), 'local': local.ravel(), 'national': national.ravel(),
+    })
+    return df, w.sparse, index
+
+
+def test_collinear_lag_of_national_regressor_is_dropped(national_panel):
+    df, W, index = national_panel
+    full = fit_panel_sdm(df, 'price', ['local', 'national'], W, index, durbin=['local', 'national'])
+    local_only = fit_panel_sdm(df, 'price', ['local', 'national'], W, index, durbin=['local'])
+
+    assert full.dropped == ['W_national']
+    assert full.name_betas == local_only.name_betas
+    np.testing.assert_allclose(full.betas, local_only.betas, rtol=1e-8)
+    np.testing.assert_allclose(full.vm, local_only.vm, rtol=1e-6)
+
+    table = full.coefficient_table().set_index('Variable')
+    assert table.loc['national', 'Std_Error'] < 1.0
+    assert abs(table.loc['national', 'Coefficient'] - 0.5) < 0.3
@@ -0,0 +1,51 @@
+"""Parity of spatial_design.gm_lag with spreg GM_Lag, including regressors constant across locations"""
+
+import numpy as np
+import pytest
+
+spreg = pytest.importorskip('spreg')
+libpysal = pytest.importorskip('libpysal')
+
+from yelp_bi.sdm.spatial_design import SpatialDesign, gm_lag  # noqa: E402
+
+
+NAMES = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr', 'luas_panen_ha']
+
+
+@pytest.fixture(scope='module')
+def cross_section():
+    """Rook lattice cross-section whose third regressor is the same everywhere"""
+    rng = np.random.default_rng(0)
+    w = libpysal.weights.lat2W(8, 8)
+    w.transform = 'r'
+    n = w.n
+    X = rng.normal(size=(n, len(NAMES)))
+    X[:, 2] = 10_000.0
+    W = w.sparse.toarray()
+    y = np.linalg.solve(np.eye(n) - 0.4 * W,
+                        1.0 + X[:, [0, 1, 3]] @ [1.0, -0.5, 0.8] + W @ X[:, 0] * 0.3
+                        + rng.normal(scale=0.5, size=n))
+    return w, X, y
+
+
+@pytest.mark.parametrize('slx_lags', [0, 1, 2])
+def test_gm_lag_matches_spreg_with_constant_column(cross_section, slx_lags):
+    w, X, y = cross_section
+    reference = spreg.GM_Lag(y.reshape(-1, 1), X, w=w, slx_lags=slx_lags, name_y='y', name_x=NAMES)
+    model = gm_lag(SpatialDesign(X, w, NAMES), y, slx_lags=slx_lags, name_y='y')
+
+    assert model.dropped == ['bbm_price_idr']
+    assert model.name_z == reference.name_z
+    np.testing.assert_allclose(model.betas, reference.betas, rtol=1e-8, atol=1e-8)
+    np.testing.assert_allclose(model.vm, reference.vm, rtol=1e-8, atol=1e-10)
+
+
+def test_gm_lag_without_constant_column_drops_nothing(cross_section):
+    w, X, y = cross_section
+    keep = [0, 1, 3]
+    names = [NAMES[i] for i in keep]
+    model = gm_lag(SpatialDesign(X[:, keep], w, names), y, slx_lags=1, name_y='y')
+    reference = spreg.GM_Lag(y.reshape(-1, 1), X[:, keep], w=w, slx_lags=1, name_y='y', name_x=names)
+
+    assert model.dropped == []
+    np.testing.assert_allclose(model.betas, reference.betas, rtol=1e-8, atol=1e-8)
@@ -5,12 +5,12 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy.spatial import cKDTree
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
-import glob
 import os
 import warnings
+from yelp_bi.facility_catalog import load_facilities
+from yelp_bi.geodesic import count_within
 
 warnings.filterwarnings('ignore')
 OUTPUT_DIR = 'paper_analysis_output/ultimate_model'
@@ -25,20 +25,16 @@ print("="*80)
 # 1. PREPARE NETWORK FEATURES (FROM OSM)
 # ==============================================================================
 print("\n[1/5] Extracting Network Features (OSM)...")
-list_of_files = glob.glob('supply_chain_spatial_fast/supply_chain_facilities_*.csv')
-latest_file = max(list_of_files, key=os.path.getctime)
-df_osm = pd.read_csv(latest_file)
+df_osm = load_facilities(columns=['name', 'latitude', 'longitude', 'search_location'])
 df_osm = df_osm.dropna(subset=['latitude', 'longitude'])
 
 # Build simple graph to calculate connectivity per city
 # OPTIMIZATION: Instead of full NetworkX graph, we just count neighbors using KDTree
 # This is much faster and gives the same "Connectivity Index" (Degree)
-coords = df_osm[['latitude', 'longitude']].values
-tree = cKDTree(coords)
+coords = df_osm[['longitude', 'latitude']].values
 
-# Count neighbors within 20km (approx 0.18 degrees)
-radius_deg = 20 / 111.0
-neighbors_count = tree.query_ball_point(coords, r=radius_deg, return_length=True)
+# Count neighbors within 20km (great-circle)
+neighbors_count = count_within(coords, radius_km=20)
 
 # Assign Degree (Connectivity)
 df_osm['degree'] = neighbors_count
@@ -0,0 +1,9 @@
+"""
+YELP BI 2025 - Rice Price Prediction
+====================================
+Shared data helpers (geodesic distances, facility catalog, as-of joins) and
+the Spatial Durbin Model analysis in `yelp_bi.sdm`.
+
+Install (editable) from the project root:
+    pip install -e .[spatial]
+"""
@@ -0,0 +1,222 @@
+"""
+As-Of Join Engine
+=================
+Aligns mixed-frequency covariates (monthly BBM, yearly luas panen, weekly
+FX rates) to a daily or monthly panel. Dates are compared as sorted int64
+nanosecond arrays with np.searchsorted, so a join of n rows against m
+covariate observations costs O((n + m) log m) and never expands the panel.
+
+Features:
+    - backward (last value at or before the date), forward and nearest
+      matching; nearest ties go to the earlier observation
+    - Optional tolerance (e.g. '45D') and same-period matching ('Y', 'M', 'D'),
+      which turns an as-of join into an exact calendar-period lookup
+    - Grouped joins (by location, kabupaten, ...) with different key names
+      on each side
+    - Left row order and index are preserved; unmatched rows get NaN
+
+Usage:
+    from yelp_bi.asof_join import asof_join, asof_values
+
+    # Monthly BBM onto the daily panel: latest price at or before each day
+    df = asof_join(df, df_bbm, on='date', right_on='Date',
+                   columns={'Price_IDR_per_Liter': 'bbm_price_idr'})
+
+    # Yearly luas panen per kabupaten, only within the same year
+    df = asof_join(df, df_panen, on='date', right_on='year_start',
+                   by='kabupaten_kota', columns=['luas_panen_ha'], same_period='Y')
+
+    # Nearest weekly FX rate for a few dates
+    rates = asof_values(fx_dates, fx_rates, dates, direction='nearest')
+"""
+
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+
+DIRECTIONS = ('backward', 'forward', 'nearest')
+
+# numpy datetime units accepted by same_period
+PERIOD_UNITS = {'Y': 'Y', 'M': 'M', 'D': 'D'}
+
+NAT = np.iinfo(np.int64).min
+
+
+def to_int64_dates(values) -> np.ndarray:
+    """
+    Dates as int64 nanoseconds (NaT becomes the int64 minimum)
+
+    Args:
+        values: Strings, datetime64 values, a Series or a DatetimeIndex
+
+    Returns:
+        np.ndarray: int64 array
+    """
+    dates = pd.to_datetime(pd.Series(np.asarray(values)))
+    return dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def _tolerance_ns(tolerance) -> Optional[int]:
+    if tolerance is None:
+        return None
+    return int(pd.Timedelta(tolerance).value)
+
+
+def _same_period(left: np.ndarray, right: np.ndarray, period: str) -> np.ndarray:
+    unit = PERIOD_UNITS[period]
+    lp = left.view('datetime64[ns]').astype(f'datetime64[{unit}]')
+    rp = right.view('datetime64[ns]').astype(f'datetime64[{unit}]')
+    return lp == rp
+
+
+def asof_positions(keys: np.ndarray, query: np.ndarray, direction: str = 'backward',
+                   tolerance=None, same_period: Optional[str] = None) -> np.ndarray:
+    """
+    Matching positions in a sorted int64 key array
+
+    Args:
+        keys (np.ndarray): Sorted int64 dates of the covariate observations
+        query (np.ndarray): int64 dates to align (any order)
+        direction (str): 'backward', 'forward' or 'nearest'
+        tolerance: Maximum distance (anything pd.Timedelta accepts)
+        same_period (str, optional): Only match within the same 'Y', 'M' or 'D'
+
+    Returns:
+        np.ndarray: int64 positions into keys, -1 where there is no match
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}, got '{direction}'")
+    keys = np.asarray(keys, dtype=np.int64)
+    query = np.asarray(query, dtype=np.int64)
+    m = len(keys)
+    if m == 0:
+        return np.full(len(query), -1, dtype=np.int64)
+
+    back = np.searchsorted(keys, query, side='right') - 1              # last key <= date
+    fwd = np.searchsorted(keys, query, side='left')                    # first key >= date
+    fwd = np.where(fwd < m, fwd, -1)
+
+    if direction == 'backward':
+        pos = back
+    elif direction == 'forward':
+        pos = fwd
+    else:
+        d_back = np.where(back >= 0, query - keys[np.maximum(back, 0)], np.iinfo(np.int64).max)
+        d_fwd = np.where(fwd >= 0, keys[np.maximum(fwd, 0)] - query, np.iinfo(np.int64).max)
+        pos = np.where(d_fwd < d_back, fwd, back)
+
+    valid = (pos >= 0) & (query != NAT)
+    matched = keys[np.maximum(pos, 0)]
+    tol = _tolerance_ns(tolerance)
+    if tol is not None:
+        valid &= np.abs(query - matched) <= tol
+    if same_period is not None:
+        valid &= _same_period(query, matched, same_period)
+    return np.where(valid, pos, -1)
+
+
+def asof_values(keys, values, query, direction: str = 'backward', tolerance=None,
+                same_period: Optional[str] = None) -> np.ndarray:
+    """
+    Covariate values aligned to query dates (keys need not be sorted)
+
+    Args:
+        keys: Dates of the covariate observations
+        values: Covariate values, same length as keys
+        query: Dates to align
+        direction, tolerance, same_period: As in asof_positions()
+
+    Returns:
+        np.ndarray: float values, NaN where there is no match
+
+    Example:
+        >>> asof_values(['2021-01-04', '2021-01-11'], [13980, 14010], ['2021-01-09'], 'nearest')
+        array([14010.])
+    """
+    keys = to_int64_dates(keys)
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(keys, kind='stable')
+    pos = asof_positions(keys[order], to_int64_dates(query), direction, tolerance, same_period)
+    return np.where(pos >= 0, values[order][np.maximum(pos, 0)], np.nan)
+
+
+def _group_keys(df: pd.DataFrame, by: Union[str, Sequence[str]]) -> pd.Index:
+    if isinstance(by, str):
+        return pd.Index(df[by])
+    return pd.MultiIndex.from_frame(df[list(by)])
+
+
+def asof_join(left: pd.DataFrame, right: pd.DataFrame, on: str, right_on: Optional[str] = None,
+              by: Union[str, Sequence[str], None] = None,
+              right_by: Union[str, Sequence[str], None] = None,
+              columns: Union[Sequence[str], Dict[str, str], None] = None,
+              direction: str = 'backward', tolerance=None,
+              same_period: Optional[str] = None) -> pd.DataFrame:
+    """
+    Add covariate columns from `right` to `left` by as-of date matching
+
+    Args:
+        left (pd.DataFrame): Panel (daily or monthly), any row order
+        right (pd.DataFrame): Covariate observations, any row order
+        on (str): Date column of left
+        right_on (str, optional): Date column of right (default: same as on)
+        by (str or list, optional): Group columns of left (e.g. 'kabupaten_kota')
+        right_by (str or list, optional): Group columns of right (default: same as by)
+        columns (list or dict, optional): Right columns to add, or {source: new name}
+            (default: every right column except the keys)
+        direction (str): 'backward' (default), 'forward' or 'nearest'
+        tolerance: Maximum date distance, e.g. '45D'
+        same_period (str, optional): Only match within the same 'Y', 'M' or 'D'
+
+    Returns:
+        pd.DataFrame: Copy of left (same order and index) with the added columns;
+            NaN where no observation matches
+
+    Example:
+        >>> df = asof_join(df, df_bbm, on='date', right_on='Date',
+        ...                columns={'Price_IDR_per_Liter': 'bbm_price_idr'})
+    """
+    right_on = right_on or on
+    right_by = right_by if right_by is not None else by
+    if (by is None) != (right_by is None):
+        raise ValueError("Give group columns for both sides or for neither")
+    if columns is None:
+        keys = {right_on} | set([right_by] if isinstance(right_by, str) else right_by or [])
+        columns = [c for c in right.columns if c not in keys]
+    rename = dict(columns) if isinstance(columns, dict) else {c: c for c in columns}
+
+    left_dates = to_int64_dates(left[on])
+    right_dates = to_int64_dates(right[right_on])
+    pos = np.full(len(left), -1, dtype=np.int64)
+
+    if by is None:
+        order = np.argsort(right_dates, kind='stable')
+        pos_sorted = asof_positions(right_dates[order], left_dates, direction, tolerance, same_period)
+        pos = np.where(pos_sorted >= 0, order[np.maximum(pos_sorted, 0)], -1)
+    else:
+        right_codes, uniques = pd.factorize(_group_keys(right, right_by))
+        left_codes = pd.Index(uniques).get_indexer(_group_keys(left, by))
+        order = np.lexsort((right_dates, right_codes))
+        sorted_codes, sorted_dates = right_codes[order], right_dates[order]
+        starts = np.searchsorted(sorted_codes, np.arange(len(uniques)), side='left')
+        ends = np.searchsorted(sorted_codes, np.arange(len(uniques)), side='right')
+        rows_by_code = pd.Series(np.arange(len(left))).groupby(left_codes).indices
+        for code, rows in rows_by_code.items():
+            if code < 0:
+                continue                                  # group absent on the right
+            lo, hi = starts[code], ends[code]
+            p = asof_positions(sorted_dates[lo:hi], left_dates[rows], direction, tolerance, same_period)
+            pos[rows] = np.where(p >= 0, order[lo + np.maximum(p, 0)], -1)
+
+    out = left.copy()
+    for source, target in rename.items():
+        out[target] = pd.api.extensions.take(right[source].to_numpy(), pos, allow_fill=True)
+    return out
+
+
+def as_year_start(years) -> pd.Series:
+    """Integer years as 1 January timestamps, for yearly covariates"""
+    years = np.asarray(years, dtype=np.int64)
+    return pd.to_datetime(pd.DataFrame({'year': years, 'month': 1, 'day': 1}))
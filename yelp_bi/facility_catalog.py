@@ -0,0 +1,221 @@
+"""
+Supply Chain Facility Catalog
+==============================
+Loader terpusat untuk snapshot fasilitas OSM yang dihasilkan oleh
+supply_chain_explorer.py (supply_chain_spatial_fast/supply_chain_facilities_<timestamp>.csv).
+
+Features:
+    - Versioned snapshots: Load by timestamp (e.g. "20251128_141527") or "latest"
+    - Column projection: Read only the requested columns from a typed Parquet copy
+    - Lazy tags: The heavy JSON `tags` column is only read when requested and
+      only decoded through parse_tags()
+    - In-process memoization: Repeated loads within one run are served from memory
+
+Usage:
+    from yelp_bi.facility_catalog import load_facilities, parse_tags
+
+    # Latest snapshot, only the columns needed for the network graph
+    df = load_facilities(columns=['name', 'latitude', 'longitude',
+                                  'facility_type', 'search_location'])
+
+    # Pin a specific snapshot
+    df = load_facilities('20251128_141527', columns=['search_location', 'distance_to_location_km'])
+
+    # Decode OSM tags on demand
+    df = load_facilities(columns=['osm_id', 'tags'])
+    tags = parse_tags(df['tags'])
+
+The first load of a snapshot converts the CSV into a Parquet file next to it;
+subsequent runs read the Parquet copy. Without pyarrow the catalog falls back
+to reading the CSV with `usecols`.
+"""
+
+import os
+import re
+import json
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+
+FACILITY_DIR = 'supply_chain_spatial_fast'
+FILE_PATTERN = re.compile(r'^supply_chain_facilities_(\d{8}_\d{6})\.csv$')
+
+# Column types as written by supply_chain_explorer.py
+FACILITY_DTYPES = {
+    'osm_id': 'int64',
+    'osm_type': 'object',
+    'commodity': 'object',
+    'facility_type': 'object',
+    'facility_label': 'object',
+    'name': 'object',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'search_location': 'object',
+    'search_location_lat': 'float64',
+    'search_location_lon': 'float64',
+    'distance_to_location_km': 'float64',
+    'tags': 'object',
+    'retrieved_at': 'object',
+}
+
+# Columns returned when none are requested: everything except the raw OSM tags
+DEFAULT_COLUMNS = [c for c in FACILITY_DTYPES if c != 'tags']
+
+
+class FacilityCatalog:
+    """
+    Catalog of facility snapshots stored in supply_chain_spatial_fast/
+    """
+
+    def __init__(self, base_dir: str = '.', facility_dir: str = FACILITY_DIR):
+        """
+        Initialize catalog
+
+        Args:
+            base_dir (str): Project root (default: '.')
+            facility_dir (str): Snapshot directory relative to base_dir
+        """
+        self.directory = os.path.join(base_dir, facility_dir)
+        # {(version, csv_mtime): {column: Series}}
+        self._columns: Dict[tuple, Dict[str, pd.Series]] = {}
+
+    def versions(self) -> List[str]:
+        """
+        List available snapshot versions, oldest first
+
+        Returns:
+            List[str]: Timestamps parsed from the file names
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for fname in os.listdir(self.directory):
+            match = FILE_PATTERN.match(fname)
+            if match:
+                found.append(match.group(1))
+        return sorted(found)
+
+    def resolve(self, version: str = 'latest') -> str:
+        """
+        Resolve "latest" (or an explicit timestamp) to an existing version
+
+        The newest snapshot is chosen from the timestamp in its file name, so
+        copying or touching files does not change which snapshot is used.
+        """
+        available = self.versions()
+        if not available:
+            raise FileNotFoundError(f"No supply_chain_facilities_*.csv found in {self.directory}")
+        if version == 'latest':
+            return available[-1]
+        if version not in available:
+            raise ValueError(f"Unknown facility snapshot '{version}'. Available: {available}")
+        return version
+
+    def csv_path(self, version: str = 'latest') -> str:
+        """Path of the source CSV for a snapshot"""
+        return os.path.join(self.directory, f"supply_chain_facilities_{self.resolve(version)}.csv")
+
+    def parquet_path(self, version: str = 'latest') -> str:
+        """Path of the typed Parquet copy for a snapshot"""
+        return os.path.splitext(self.csv_path(version))[0] + '.parquet'
+
+    def load(self, version: str = 'latest', columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Load a facility snapshot
+
+        Args:
+            version (str): Snapshot timestamp or "latest" (default)
+            columns (list, optional): Columns to read. Defaults to every column
+                except `tags`, which must be requested explicitly.
+
+        Returns:
+            pd.DataFrame: Facilities with the requested columns, in file order.
+                The frame is a copy, so callers may modify it freely.
+        """
+        version = self.resolve(version)
+        columns = list(DEFAULT_COLUMNS if columns is None else columns)
+        unknown = [c for c in columns if c not in FACILITY_DTYPES]
+        if unknown:
+            raise KeyError(f"Unknown facility columns: {unknown}")
+
+        csv_path = self.csv_path(version)
+        key = (version, os.path.getmtime(csv_path))
+        cached = self._columns.setdefault(key, {})
+
+        missing = [c for c in columns if c not in cached]
+        if missing:
+            frame = self._read(csv_path, missing)
+            for col in missing:
+                cached[col] = frame[col]
+
+        return pd.DataFrame({col: cached[col] for col in columns}).copy()
+
+    def clear(self):
+        """Drop all memoized columns"""
+        self._columns.clear()
+
+    def _read(self, csv_path: str, columns: List[str]) -> pd.DataFrame:
+        """Read columns from the Parquet copy, creating it on first use"""
+        if not HAS_PARQUET:
+            return pd.read_csv(csv_path, usecols=columns, encoding='utf-8-sig',
+                               dtype={c: FACILITY_DTYPES[c] for c in columns})
+
+        parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+        if (not os.path.exists(parquet_path)
+                or os.path.getmtime(parquet_path) < os.path.getmtime(csv_path)):
+            df = pd.read_csv(csv_path, encoding='utf-8-sig')
+            df = df.astype({c: t for c, t in FACILITY_DTYPES.items() if c in df.columns})
+            df.to_parquet(parquet_path, index=False)
+        return pd.read_parquet(parquet_path, columns=columns)
+
+
+def parse_tags(tags: pd.Series) -> pd.Series:
+    """
+    Decode the JSON `tags` column into dicts
+
+    Args:
+        tags (pd.Series): Raw `tags` column from load_facilities(columns=[..., 'tags'])
+
+    Returns:
+        pd.Series: dict per facility ({} for missing tags), same index
+    """
+    return tags.map(lambda raw: json.loads(raw) if isinstance(raw, str) and raw else {})
+
+
+# Shared catalogs so every script in one process reuses the same memo
+_CATALOGS: Dict[str, FacilityCatalog] = {}
+
+
+def get_catalog(base_dir: str = '.') -> FacilityCatalog:
+    """Return the process-wide catalog for a project root"""
+    key = os.path.abspath(base_dir)
+    if key not in _CATALOGS:
+        _CATALOGS[key] = FacilityCatalog(base_dir)
+    return _CATALOGS[key]
+
+
+def load_facilities(version: str = 'latest', columns: Optional[Sequence[str]] = None,
+                    base_dir: str = '.') -> pd.DataFrame:
+    """
+    Load facilities from the shared catalog
+
+    Args:
+        version (str): Snapshot timestamp or "latest" (default)
+        columns (list, optional): Columns to read (default: all except `tags`)
+        base_dir (str): Project root (default: '.')
+
+    Returns:
+        pd.DataFrame: Facility snapshot
+
+    Example:
+        >>> df = load_facilities(columns=['search_location', 'distance_to_location_km'])
+        >>> avg_distance = df.groupby('search_location')['distance_to_location_km'].mean()
+    """
+    return get_catalog(base_dir).load(version, columns)
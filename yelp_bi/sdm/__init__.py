@@ -0,0 +1,47 @@
+"""
+Spatial Durbin Model Analysis
+=============================
+Phases 1-3 (diagnostics) in `analysis`, phases 4-7 (estimation) in
+`estimation`, and the DAG runner behind `python -m yelp_bi.sdm` in `runner`.
+
+Names below are imported on first access (PEP 562), so `import yelp_bi.sdm`
+and the CLI only load pandas / numpy / scipy up front. libpysal, esda, spreg,
+statsmodels and the plotting libraries are imported by the functions that use
+them.
+
+Usage:
+    from yelp_bi.sdm import SpatialDurbinAnalysis, SDMEstimation
+    python -m yelp_bi.sdm diagnostics
+"""
+
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    'SpatialDurbinAnalysis': 'analysis',
+    'SDMEstimation': 'estimation',
+    'Phase': 'pipeline',
+    'Pipeline': 'pipeline',
+    'PhaseError': 'pipeline',
+    'build_pipeline': 'runner',
+    'main': 'runner',
+    'get_registry': 'weights_registry',
+    'get_feature_store': 'feature_store',
+    'get_model_cache': 'model_cache',
+    'get_design_cache': 'spatial_design',
+    'LocationIndex': 'location_index',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
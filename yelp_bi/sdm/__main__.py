@@ -0,0 +1,6 @@
+"""Entry point of `python -m yelp_bi.sdm` (see runner.py)"""
+
+from .runner import main
+
+if __name__ == "__main__":
+    main()
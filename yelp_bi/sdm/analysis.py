@@ -11,6 +11,9 @@ This script implements a complete Spatial Durbin Model analysis following 7 phas
 6. Validation & Robustness
 7. Policy Simulation
 
+statsmodels is imported by the phases that use it, so importing this
+module (and `python -m yelp_bi.sdm diagnostics`) does not pay for it up front.
+
 Requirements:
     pip install pandas numpy scipy statsmodels pysal spreg libpysal esda splot geopandas
 """
@@ -20,41 +23,40 @@ import warnings
 import numpy as np
 import pandas as pd
 from datetime import datetime
-from scipy import stats
-from scipy.spatial.distance import pdist, squareform
-from statsmodels.stats.diagnostic import het_breuschpagan
-from statsmodels.stats.outliers_influence import variance_inflation_factor
-from statsmodels.tsa.stattools import adfuller
-import libpysal
-from libpysal.weights import W, KNN, DistanceBand
-from libpysal import graph
-import spreg
-from esda.moran import Moran, Moran_Local
-import matplotlib.pyplot as plt
-import seaborn as sns
+from .feature_store import load_daily_features, clean_features, read_source, RICE_COMMODITIES
+from .spatial_weights import knn_distances_km
+from ..geodesic import pairwise
+from .weights_registry import get_registry
+from .location_index import LocationIndex
+from .esda_engine import ESDAEngine, panel_matrix, NOT_SIGNIFICANT, QUADRANTS
+from .unit_root import UnitRootBattery
+from .collinearity import vif_table, condition_diagnostics, CONDITION_SERIOUS
+from .lm_diagnostics import LMDiagnostics, recommendations, significance, TESTS, X_VARS
+from .panel_builder import aggregate_monthly, with_month_dummies
+from .model_cache import fit_panel, hausman
+from .schemas import write_merged, memory_mb
 
 warnings.filterwarnings('ignore')
 
-# Create output directories
-os.makedirs('sdm_results', exist_ok=True)
-os.makedirs('sdm_results/fase1', exist_ok=True)
-os.makedirs('sdm_results/fase2', exist_ok=True)
-os.makedirs('sdm_results/fase3', exist_ok=True)
-os.makedirs('sdm_results/fase4', exist_ok=True)
-os.makedirs('sdm_results/fase5', exist_ok=True)
-os.makedirs('sdm_results/fase6', exist_ok=True)
-os.makedirs('sdm_results/fase7', exist_ok=True)
+
+def make_output_dirs(root='sdm_results'):
+    """Create the output directories of all phases (sdm_results/fase1 ... fase7)"""
+    for fase in range(1, 8):
+        os.makedirs(os.path.join(root, f'fase{fase}'), exist_ok=True)
 
 
 class SpatialDurbinAnalysis:
     """Complete Spatial Durbin Model Analysis Pipeline"""
 
-    def __init__(self, base_dir='.'):
+    def __init__(self, base_dir='.', facility_version='latest'):
         self.base_dir = base_dir
+        self.facility_version = facility_version
         self.results = {}
         self.data = {}
         self.models = {}
         self.weights = {}
+        self.location_index = None
+        make_output_dirs()
 
         print("="*80)
         print("SPATIAL DURBIN MODEL ANALYSIS - YELP BI 2025")
@@ -62,6 +64,24 @@ class SpatialDurbinAnalysis:
         print(f"Analysis started at: {datetime.now()}")
         print()
 
+    def get_location_index(self):
+        """
+        Canonical location order for every phase, built once
+
+        Locations come from the weather coordinates, restricted to those
+        present in the merged panel when it exists. Weights, aligned
+        cross-sections and exported matrices all follow this order.
+
+        Returns:
+            LocationIndex: Sorted names, (lon, lat) coordinates and row ids
+        """
+        if self.location_index is None:
+            index = LocationIndex.from_weather(self.base_dir)
+            if 'merged' in self.data:
+                index = index.subset(self.data['merged']['location_name'].unique())
+            self.location_index = index
+        return self.location_index
+
     # =========================================================================
     # FASE 1: DATA PREPARATION & VALIDATION
     # =========================================================================
@@ -73,8 +93,7 @@ class SpatialDurbinAnalysis:
         print("="*80)
 
         # Load PIHPS data
-        pihps_path = os.path.join(self.base_dir, 'cleaned_pihps_data', 'cleaned_combined.csv')
-        df_pihps = pd.read_csv(pihps_path, parse_dates=['date'])
+        df_pihps = read_source('pihps', self.base_dir)
 
         print(f"\nDataset shape: {df_pihps.shape}")
         print(f"Date range: {df_pihps['date'].min()} to {df_pihps['date'].max()}")
@@ -162,118 +181,10 @@ class SpatialDurbinAnalysis:
         print("FASE 1B: DATASET MERGING & ALIGNMENT")
         print("="*80)
 
-        df_pihps = self.data['pihps']
-
-        # Focus on rice commodities only (com_1 to com_6)
-        rice_commodities = ['com_1', 'com_2', 'com_3', 'com_4', 'com_5', 'com_6']
-        df = df_pihps[df_pihps['commodity_id'].isin(rice_commodities)].copy()
-
-        print(f"\nFiltered to rice commodities only: {df.shape[0]} rows")
-        print(f"Commodities: {df['commodity_id'].unique()}")
-        print(f"Locations: {df['location_name'].nunique()}")
-
-        # 1. Merge with Weather data
-        print("\n--- MERGING WITH WEATHER DATA ---")
-        weather_path = os.path.join(self.base_dir, 'weather_pihps_historical.csv')
-        df_weather = pd.read_csv(weather_path, parse_dates=['date'])
-
-        print(f"Weather data shape: {df_weather.shape}")
-        print(f"Weather locations: {df_weather['location_name'].nunique()}")
-
-        # Merge
-        df = df.merge(
-            df_weather[['date', 'location_name', 'temperature_mean_c',
-                       'precipitation_mm', 'rain_mm', 'precipitation_hours',
-                       'windspeed_max_kmh']],
-            on=['date', 'location_name'],
-            how='left'
-        )
-        print(f"After weather merge: {df.shape}")
-        print(f"Weather missing after merge: {df['precipitation_mm'].isnull().sum()} ({df['precipitation_mm'].isnull().sum()/len(df)*100:.2f}%)")
-
-        # 2. Merge with BBM data (monthly -> daily via forward fill)
-        print("\n--- MERGING WITH BBM DATA ---")
-        bbm_path = os.path.join(self.base_dir, 'indonesia_gasoline_prices_5y.csv')
-        df_bbm = pd.read_csv(bbm_path, parse_dates=['Date'])
-        df_bbm['year_month'] = df_bbm['Date'].dt.to_period('M')
-
-        # Create year_month in main data
-        df['year_month'] = pd.to_datetime(df['date']).dt.to_period('M')
-
-        # Merge on year_month
-        df = df.merge(
-            df_bbm[['year_month', 'Price_IDR_per_Liter']].rename(
-                columns={'Price_IDR_per_Liter': 'bbm_price_idr'}
-            ),
-            on='year_month',
-            how='left'
-        )
-
-        # Forward fill for missing BBM values within each location
-        df = df.sort_values(['location_name', 'commodity_id', 'date'])
-        df['bbm_price_idr'] = df.groupby(['location_name', 'commodity_id'])['bbm_price_idr'].ffill()
-
-        print(f"After BBM merge: {df.shape}")
-        print(f"BBM missing after merge: {df['bbm_price_idr'].isnull().sum()} ({df['bbm_price_idr'].isnull().sum()/len(df)*100:.2f}%)")
-
-        # 3. Merge with Luas Panen (yearly -> daily via constant value per year)
-        print("\n--- MERGING WITH LUAS PANEN DATA ---")
-        panen_path = os.path.join(self.base_dir, 'bps-jakarta-data', 'jawa_barat_rice_production_2020_2024.csv')
-        df_panen = pd.read_csv(panen_path)
-
-        # Create year in main data
-        df['year'] = pd.to_datetime(df['date']).dt.year
-
-        # Standardize location names for matching
-        # Note: Some locations in PIHPS may not match exactly with BPS
-        location_mapping = {
-            'Bandung': 'Bandung',
-            'Bekasi': 'Bekasi',
-            'Bogor': 'Bogor',
-            'Cianjur': 'Cianjur',
-            'Cirebon': 'Cirebon',
-            'Garut': 'Garut',
-            'Indramayu': 'Indramayu',
-            'Karawang': 'Karawang',
-            'Kuningan': 'Kuningan',
-            'Majalengka': 'Majalengka',
-            'Purwakarta': 'Purwakarta',
-            'Subang': 'Subang',
-            'Sukabumi': 'Sukabumi',
-            'Sumedang': 'Sumedang',
-            'Tasikmalaya': 'Tasikmalaya',
-            'DKI Jakarta': None  # Jakarta tidak ada data luas panen
-        }
-
-        df['kabupaten_kota'] = df['location_name'].map(location_mapping)
-
-        # Merge
-        df = df.merge(
-            df_panen[['year', 'kabupaten_kota', 'luas_panen_ha', 'produktivitas_ku_ha', 'produksi_ton']],
-            on=['year', 'kabupaten_kota'],
-            how='left'
-        )
-
-        print(f"After luas panen merge: {df.shape}")
-        print(f"Luas panen missing: {df['luas_panen_ha'].isnull().sum()} ({df['luas_panen_ha'].isnull().sum()/len(df)*100:.2f}%)")
-
-        # 4. Add distance variable (static, from facility data)
-        print("\n--- ADDING DISTANCE VARIABLE ---")
-        facility_path = os.path.join(self.base_dir, 'supply_chain_spatial_fast',
-                                     'supply_chain_facilities_20251128_141527.csv')
-        df_facility = pd.read_csv(facility_path)
-
-        # Calculate average distance per location
-        avg_distance = df_facility.groupby('search_location')['distance_to_location_km'].mean()
-
-        # Map to main data
-        df['avg_distance_km'] = df['location_name'].map(avg_distance)
-
-        # For locations not in facility data, use median distance
-        median_distance = avg_distance.median()
-        df['avg_distance_km'].fillna(median_distance, inplace=True)
-
-        print(f"Distance variable added. Missing: {df['avg_distance_km'].isnull().sum()}")
+        # Daily PIHPS + weather + BBM + luas panen + distance table from the
+        # shared feature store (merged only when an input file changed)
+        print("\n--- MERGING PIHPS, WEATHER, BBM, LUAS PANEN AND DISTANCE ---")
+        df = load_daily_features(RICE_COMMODITIES, self.facility_version, self.base_dir)
 
         # Final data quality check
         print("\n--- FINAL MERGED DATASET SUMMARY ---")
@@ -281,6 +192,7 @@ class SpatialDurbinAnalysis:
         print(f"Date range: {df['date'].min()} to {df['date'].max()}")
         print(f"Unique locations: {df['location_name'].nunique()}")
         print(f"Unique commodities: {df['commodity_id'].nunique()}")
+        print(f"Memory (typed schema): {memory_mb(df):.1f} MB")
 
         print("\n--- MISSING VALUES IN MERGED DATASET ---")
         key_vars = ['price', 'precipitation_mm', 'temperature_mean_c',
@@ -302,13 +214,11 @@ class SpatialDurbinAnalysis:
         # Handle missing values: drop rows with missing price or key variables
         print("\n--- HANDLING MISSING VALUES ---")
         print(f"Rows before cleaning: {len(df)}")
-        df_clean = df.dropna(subset=['price', 'precipitation_mm', 'bbm_price_idr'])
+        # Luas panen is set to 0 where missing (Jakarta has no rice production)
+        df_clean = clean_features(df)
         print(f"Rows after dropping missing: {len(df_clean)}")
         print(f"Rows dropped: {len(df) - len(df_clean)} ({(len(df) - len(df_clean))/len(df)*100:.2f}%)")
 
-        # For luas_panen, fill with 0 for Jakarta (no rice production)
-        df_clean['luas_panen_ha'].fillna(0, inplace=True)
-
         # Save merged dataset
         self.data['merged'] = df_clean
         self.results['fase1b'] = {
@@ -318,7 +228,7 @@ class SpatialDurbinAnalysis:
         }
 
         # Export
-        df_clean.to_csv('sdm_results/fase1/1b_merged_dataset.csv', index=False)
+        write_merged(df_clean, 'sdm_results/fase1/1b_merged_dataset.csv')
         missing_summary.to_csv('sdm_results/fase1/1b_merge_missing_summary.csv', index=False)
         corr_matrix.to_csv('sdm_results/fase1/1b_correlation_matrix.csv')
 
@@ -342,7 +252,7 @@ class SpatialDurbinAnalysis:
         df_commodity = df[df['commodity_id'] == commodity].copy()
 
         # Aggregate to location-date level (average across time)
-        df_agg = df_commodity.groupby('location_name')['price'].mean().reset_index()
+        df_agg = df_commodity.groupby('location_name', observed=True)['price'].mean().reset_index()
 
         print(f"Locations analyzed: {len(df_agg)}")
         print(f"Price range: {df_agg['price'].min():.2f} - {df_agg['price'].max():.2f}")
@@ -355,26 +265,19 @@ class SpatialDurbinAnalysis:
         print(f"\n--- CREATING SPATIAL WEIGHTS MATRIX ---")
         print(f"Number of spatial units: {n_locations}")
 
-        # For now, create a simple queen contiguity or k-NN weights
-        # We'll use distance-based from coordinates if available
-        # Get coordinates from weather data
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-
-        # Merge coordinates
-        df_agg = df_agg.merge(coords_df, on='location_name', how='left')
+        # Rows of y follow the canonical location index, the same order as W
+        index = self.get_location_index().subset(locations)
+        df_agg = index.align(df_agg)
 
         # Create KNN weights (k=3)
-        coords = df_agg[['longitude', 'latitude']].values
-        w_knn = KNN.from_array(coords, k=3)
-        w_knn.transform = 'r'  # Row-standardize
+        w_knn = get_registry().for_index('knn:k=3,transform=r', index).w
 
         print(f"Weights matrix created: {w_knn.n} units, {w_knn.s0} total weights")
 
         # Calculate Global Moran's I
         print("\n--- GLOBAL MORAN'S I TEST ---")
-        y = df_agg['price'].values
-        moran = Moran(y, w_knn)
+        y = df_agg[['price']].values
+        moran = ESDAEngine(w_knn, permutations=0).global_moran(y).iloc[0]
 
         print(f"Moran's I: {moran.I:.4f}")
         print(f"Expected I: {moran.EI:.4f}")
@@ -437,26 +340,27 @@ class SpatialDurbinAnalysis:
         print("="*80)
 
         df = self.data['merged']
-        w = self.weights['knn3']
 
         # Filter for specific commodity
         df_commodity = df[df['commodity_id'] == commodity].copy()
-        df_agg = df_commodity.groupby('location_name')['price'].mean().reset_index()
+        df_agg = df_commodity.groupby('location_name', observed=True)['price'].mean().reset_index()
 
-        # Get coordinates
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-        df_agg = df_agg.merge(coords_df, on='location_name', how='left')
+        # Align rows with the location index and use weights built for the same order
+        index = self.get_location_index().subset(df_agg['location_name'])
+        df_agg = index.align(df_agg)
+        df_agg = df_agg.merge(index.to_frame()[['location_name', 'longitude', 'latitude']],
+                              on='location_name', how='left')
+        w = get_registry().for_index('knn:k=3,transform=r', index).w
 
         # Calculate Local Moran's I
         print("\n--- LOCAL MORAN'S I (LISA) ---")
         y = df_agg['price'].values
-        lisa = Moran_Local(y, w)
+        lisa = ESDAEngine(w, permutations=999).local_moran(y)
 
         # Create results dataframe
-        df_agg['local_I'] = lisa.Is
-        df_agg['p_value'] = lisa.p_sim
-        df_agg['z_score'] = lisa.z_sim
+        df_agg['local_I'] = lisa.Is[:, 0]
+        df_agg['p_value'] = lisa.p_sim[:, 0]
+        df_agg['z_score'] = lisa.z_sim[:, 0]
 
         # Classify clusters
         # HH: High-High, LL: Low-Low, LH: Low-High, HL: High-Low
@@ -469,25 +373,11 @@ class SpatialDurbinAnalysis:
         df_agg['price_std'] = (df_agg['price'] - y_mean) / y_std
 
         # Spatial lag
-        df_agg['lag_price'] = pd.Series([w[i].dot(y) for i in range(len(y))])
+        df_agg['lag_price'] = w.sparse @ y
         df_agg['lag_price_std'] = (df_agg['lag_price'] - y_mean) / y_std
 
-        # Cluster classification
-        def classify_cluster(row):
-            if not row['significant']:
-                return 'Not Significant'
-            if row['price_std'] > 0 and row['lag_price_std'] > 0:
-                return 'HH (High-High)'
-            elif row['price_std'] < 0 and row['lag_price_std'] < 0:
-                return 'LL (Low-Low)'
-            elif row['price_std'] < 0 and row['lag_price_std'] > 0:
-                return 'LH (Low-High)'
-            elif row['price_std'] > 0 and row['lag_price_std'] < 0:
-                return 'HL (High-Low)'
-            else:
-                return 'Not Significant'
-
-        df_agg['cluster_type'] = df_agg.apply(classify_cluster, axis=1)
+        # Cluster classification (LISA quadrants of the significant locations)
+        df_agg['cluster_type'] = lisa.labels(sig_level)[:, 0]
 
         # Summary
         print("\n--- LISA CLUSTER SUMMARY ---")
@@ -528,18 +418,86 @@ class SpatialDurbinAnalysis:
         print("\n✓ FASE 2B completed. Results saved.")
         return lisa, df_agg
 
+    def fase2d_weekly_spatial_autocorrelation(self, commodities=None, freq='W',
+                                              permutations=999, alpha=0.05):
+        """FASE 2D: Weekly Moran's I and LISA clusters for every commodity"""
+        print("\n" + "="*80)
+        print("FASE 2D: WEEKLY SPATIAL AUTOCORRELATION (MORAN'S I / LISA SERIES)")
+        print("="*80)
+
+        df = self.data['merged']
+        if commodities is None:
+            commodities = sorted(df['commodity_id'].unique())
+
+        global_frames, lisa_frames, count_frames = [], [], []
+        engines = {}
+        for commodity in commodities:
+            df_commodity = df[df['commodity_id'] == commodity]
+            index = self.get_location_index().subset(df_commodity['location_name'].unique())
+            Y = panel_matrix(df_commodity, index, freq=freq)
+            if Y.shape[1] == 0:
+                print(f"  {commodity}: no week observed at every location, skipped")
+                continue
+            index = index.subset(Y.index)
+
+            # One engine (weights moments, permutation indices) per location set
+            key = tuple(index.names)
+            if key not in engines:
+                w = get_registry().for_index('knn:k=3,transform=r', index).w
+                engines[key] = ESDAEngine(w, permutations=permutations)
+            engine = engines[key]
+
+            moran = engine.global_moran(Y).rename_axis('week').reset_index()
+            moran.insert(0, 'commodity_id', commodity)
+            global_frames.append(moran)
+
+            lisa = engine.local_moran(Y)
+            clusters = lisa.to_frame(alpha, column_name='week')
+            clusters.insert(0, 'commodity_id', commodity)
+            lisa_frames.append(clusters)
+            counts = lisa.cluster_counts(alpha).rename_axis('week').reset_index()
+            counts.insert(0, 'commodity_id', commodity)
+            count_frames.append(counts)
+
+            significant = (moran['p_sim'] if permutations else moran['p_norm']) < alpha
+            print(f"  {commodity}: {Y.shape[1]} weeks x {Y.shape[0]} locations, "
+                  f"mean I = {moran['I'].mean():.4f}, significant weeks = {significant.sum()}")
+
+        if not global_frames:
+            print("No commodity with complete weekly cross-sections.")
+            return None
+
+        weekly_moran = pd.concat(global_frames, ignore_index=True)
+        weekly_lisa = pd.concat(lisa_frames, ignore_index=True)
+        weekly_counts = pd.concat(count_frames, ignore_index=True)
+
+        print("\n--- WEEKLY CLUSTER COUNTS (mean per week) ---")
+        labels = list(QUADRANTS.values()) + [NOT_SIGNIFICANT]
+        print(weekly_counts.groupby('commodity_id')[labels].mean().round(2))
+
+        self.results['fase2d'] = {
+            'weekly_moran': weekly_moran,
+            'weekly_cluster_counts': weekly_counts
+        }
+
+        # Export
+        weekly_moran.to_csv('sdm_results/fase2/2d_weekly_global_morans_i.csv', index=False)
+        weekly_lisa.to_csv('sdm_results/fase2/2d_weekly_lisa_clusters.csv', index=False)
+        weekly_counts.to_csv('sdm_results/fase2/2d_weekly_cluster_counts.csv', index=False)
+
+        print("\n✓ FASE 2D completed. Results saved.")
+        return weekly_moran, weekly_lisa
+
     def fase2c_construct_spatial_weights(self):
         """FASE 2C: Construct multiple spatial weight matrices"""
         print("\n" + "="*80)
         print("FASE 2C: SPATIAL WEIGHTS MATRIX CONSTRUCTION")
         print("="*80)
 
-        # Get location coordinates
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-
-        coords = coords_df[['longitude', 'latitude']].values
-        locations = coords_df['location_name'].values
+        # Get location coordinates (canonical order shared with the data)
+        index = self.get_location_index()
+        coords = index.coords
+        locations = index.names
         n = len(locations)
 
         print(f"\nNumber of spatial units: {n}")
@@ -547,28 +505,12 @@ class SpatialDurbinAnalysis:
 
         # 1. Distance-based weights (inverse distance)
         print("\n--- 1. DISTANCE-BASED WEIGHTS (Inverse Distance) ---")
-        dist_matrix = squareform(pdist(coords, metric='euclidean'))
-
-        # Convert to km (rough approximation: 1 degree ≈ 111 km)
-        dist_matrix_km = dist_matrix * 111
+        # Great-circle distances in km (exported below)
+        dist_matrix_km = pairwise(coords)
 
-        # Inverse distance (avoid division by zero)
-        w_dist_array = 1.0 / (dist_matrix_km + 0.1)
-        np.fill_diagonal(w_dist_array, 0)
-
-        # Row-standardize
-        row_sums = w_dist_array.sum(axis=1, keepdims=True)
-        w_dist_array = w_dist_array / row_sums
-
-        # Create W object
-        neighbors_dist = {}
-        weights_dist = {}
-        for i in range(n):
-            neighbors_dist[i] = list(range(n))
-            neighbors_dist[i].remove(i)
-            weights_dist[i] = w_dist_array[i, neighbors_dist[i]].tolist()
-
-        w_distance = W(neighbors_dist, weights_dist)
+        # Inverse distance 1/(d + 0.1), all pairs, row-standardized (sparse CSR)
+        registry = get_registry()
+        w_distance = registry.for_index('idw', index).w
         print(f"Distance weights: {w_distance.n} units, {w_distance.s0:.2f} total weights")
         print(f"Mean neighbors: {w_distance.mean_neighbors:.2f}")
 
@@ -576,8 +518,7 @@ class SpatialDurbinAnalysis:
         print("\n--- 2. K-NEAREST NEIGHBORS WEIGHTS ---")
 
         for k in [3, 5, 8]:
-            w_knn = KNN.from_array(coords, k=k)
-            w_knn.transform = 'r'
+            w_knn = registry.for_index(f'knn:k={k},transform=r', index).w
             print(f"  k={k}: {w_knn.n} units, {w_knn.s0:.2f} total weights, "
                   f"mean neighbors: {w_knn.mean_neighbors:.2f}")
             self.weights[f'knn{k}'] = w_knn
@@ -586,27 +527,17 @@ class SpatialDurbinAnalysis:
         print("\n--- 3. DISTANCE BAND WEIGHTS ---")
 
         # Find appropriate threshold (e.g., distance that ensures all units have at least 1 neighbor)
-        max_knn_dist = []
-        for i in range(n):
-            distances = dist_matrix_km[i]
-            distances_sorted = np.sort(distances[distances > 0])
-            max_knn_dist.append(distances_sorted[2])  # 3rd nearest neighbor
+        max_knn_dist = knn_distances_km(coords, k=3)  # 3rd nearest neighbor
 
         threshold = np.percentile(max_knn_dist, 75)  # 75th percentile
         print(f"Distance threshold: {threshold:.2f} km")
 
         # Create distance band weights
-        # Note: DistanceBand requires threshold in coordinate units
-        threshold_deg = threshold / 111
-        w_band = DistanceBand.from_array(coords, threshold=threshold_deg)
-        w_band.transform = 'r'
+        w_band = registry.for_index(f'band:threshold_km={threshold:.6f}', index).w
         print(f"Distance band weights: {w_band.n} units, {w_band.s0:.2f} total weights")
 
         # Save all weights
         self.weights['distance'] = w_distance
-        self.weights['knn3'] = self.weights.get('knn3', KNN.from_array(coords, k=3))
-        self.weights['knn5'] = self.weights['knn5']
-        self.weights['knn8'] = self.weights['knn8']
         self.weights['distance_band'] = w_band
 
         # Summary comparison
@@ -637,10 +568,20 @@ class SpatialDurbinAnalysis:
     # FASE 3: MODEL SPECIFICATION & DIAGNOSTIC TESTS
     # =========================================================================
 
-    def fase3a_stationarity_tests(self):
-        """FASE 3A: Augmented Dickey-Fuller test for stationarity"""
+    def fase3a_stationarity_tests(self, regression='c', n_workers=None):
+        """
+        FASE 3A: Per-series ADF / KPSS and panel unit-root tests (IPS, Fisher)
+
+        Every (commodity, location) series is tested on its own instead of
+        the pooled column; results are cached per series, so a re-run after
+        new data only tests the series that changed.
+
+        Args:
+            regression (str): ADF / KPSS deterministic terms, 'c' or 'ct'
+            n_workers (int, optional): Process pool size (default: CPU count)
+        """
         print("\n" + "="*80)
-        print("FASE 3A: STATIONARITY TESTS (ADF)")
+        print("FASE 3A: STATIONARITY TESTS (ADF / KPSS PER SERIES, IPS / FISHER PANEL)")
         print("="*80)
 
         df = self.data['merged']
@@ -649,44 +590,31 @@ class SpatialDurbinAnalysis:
         test_vars = ['price', 'precipitation_mm', 'temperature_mean_c',
                     'bbm_price_idr', 'luas_panen_ha']
 
-        results_list = []
-
-        for var in test_vars:
-            print(f"\n--- Testing {var} ---")
-
-            # Overall test
-            data = df[var].dropna()
-            adf_result = adfuller(data, autolag='AIC')
-
-            result_dict = {
-                'Variable': var,
-                'ADF_Statistic': adf_result[0],
-                'P_value': adf_result[1],
-                'Lags_Used': adf_result[2],
-                'N_Obs': adf_result[3],
-                'Critical_1%': adf_result[4]['1%'],
-                'Critical_5%': adf_result[4]['5%'],
-                'Critical_10%': adf_result[4]['10%'],
-                'Stationary': adf_result[1] < 0.05
-            }
-
-            results_list.append(result_dict)
-
-            print(f"  ADF Statistic: {adf_result[0]:.4f}")
-            print(f"  P-value: {adf_result[1]:.6f}")
-            print(f"  Critical values: 1%={adf_result[4]['1%']:.4f}, "
-                  f"5%={adf_result[4]['5%']:.4f}, 10%={adf_result[4]['10%']:.4f}")
-            print(f"  Stationary: {'Yes' if adf_result[1] < 0.05 else 'No'}")
-
-        # Summary
-        adf_df = pd.DataFrame(results_list)
+        battery = UnitRootBattery(regression=regression, n_workers=n_workers)
+        series = battery.run(df, test_vars)
+        panel = battery.panel(series)
+        summary = battery.panel(series, by=['variable']).rename(columns={'variable': 'Variable'})
+
+        for row in summary.itertuples(index=False):
+            print(f"\n--- Testing {row.Variable} ({row.N_Series} distinct series) ---")
+            print(f"  ADF rejects unit root: {row.ADF_Reject_Share:.1%} of series")
+            print(f"  KPSS rejects stationarity: {row.KPSS_Reject_Share:.1%} of series")
+            print(f"  IPS W_tbar: {row.W_tbar:.4f} (p={row.W_tbar_pvalue:.6f})")
+            print(f"  Fisher P: {row.Fisher_P:.2f} (p={row.Fisher_P_pvalue:.6f}), "
+                  f"Choi Z: {row.Choi_Z:.4f} (p={row.Choi_Z_pvalue:.6f})")
+            print(f"  Stationary (panel): {'Yes' if row.Stationary else 'No'}")
+
+        untested = series[series['status'] != 'ok']
+        if len(untested):
+            print(f"\n  Not tested: {len(untested)} series "
+                  f"({', '.join(f'{k}: {v}' for k, v in untested['status'].value_counts().items())})")
 
         print("\n--- STATIONARITY TEST SUMMARY ---")
-        print(adf_df[['Variable', 'ADF_Statistic', 'P_value', 'Stationary']])
+        print(summary[['Variable', 'N_Series', 'ADF_Reject_Share', 'W_tbar_pvalue', 'Stationary']])
 
         # Recommendations
         print("\n--- RECOMMENDATIONS ---")
-        non_stationary = adf_df[~adf_df['Stationary']]['Variable'].tolist()
+        non_stationary = summary[~summary['Stationary']]['Variable'].tolist()
         if len(non_stationary) > 0:
             print(f"Non-stationary variables detected: {', '.join(non_stationary)}")
             print("→ Consider differencing or using time fixed effects in the model")
@@ -694,14 +622,18 @@ class SpatialDurbinAnalysis:
             print("All variables are stationary ✓")
 
         # Save
-        self.results['fase3a'] = adf_df
-        adf_df.to_csv('sdm_results/fase3/3a_stationarity_tests.csv', index=False)
+        self.results['fase3a'] = summary
+        self.results['fase3a_series'] = series
+        self.results['fase3a_panel'] = panel
+        summary.to_csv('sdm_results/fase3/3a_stationarity_tests.csv', index=False)
+        series.to_csv('sdm_results/fase3/3a_unit_root_series.csv', index=False)
+        panel.to_csv('sdm_results/fase3/3a_panel_unit_root.csv', index=False)
 
         print("\n✓ FASE 3A completed.")
-        return adf_df
+        return summary
 
     def fase3b_multicollinearity_test(self):
-        """FASE 3B: VIF test for multicollinearity"""
+        """FASE 3B: VIF and condition-index diagnostics for multicollinearity"""
         print("\n" + "="*80)
         print("FASE 3B: MULTICOLLINEARITY TEST (VIF)")
         print("="*80)
@@ -718,23 +650,12 @@ class SpatialDurbinAnalysis:
         print(f"\nSample size: {len(df_clean)}")
         print(f"Variables tested: {X_vars}")
 
-        # Calculate VIF
+        # Calculate VIF (all at once from the inverse correlation matrix)
         print("\n--- VARIANCE INFLATION FACTOR (VIF) ---")
 
-        X = df_clean[X_vars].values
-        vif_data = []
-
-        for i, var in enumerate(X_vars):
-            vif = variance_inflation_factor(X, i)
-            vif_data.append({
-                'Variable': var,
-                'VIF': vif,
-                'Tolerance': 1/vif if vif > 0 else np.inf,
-                'Multicollinearity': 'High' if vif > 10 else ('Moderate' if vif > 5 else 'Low')
-            })
-            print(f"  {var}: VIF = {vif:.2f}")
-
-        vif_df = pd.DataFrame(vif_data)
+        vif_df = vif_table(df_clean[X_vars], intercept=True)
+        for row in vif_df.itertuples(index=False):
+            print(f"  {row.Variable}: VIF = {row.VIF:.2f}")
 
         print("\n--- VIF SUMMARY ---")
         print(vif_df)
@@ -753,6 +674,15 @@ class SpatialDurbinAnalysis:
         else:
             print("✓ No severe multicollinearity detected (all VIF < 5)")
 
+        # Condition indices and variance-decomposition proportions
+        print("\n--- CONDITION INDICES (Belsley-Kuh-Welsch) ---")
+        cond_df = condition_diagnostics(df_clean[X_vars])
+        print(cond_df[['Dimension', 'Condition_Index', 'Involved']])
+        serious = cond_df[(cond_df['Condition_Index'] > CONDITION_SERIOUS) &
+                          (cond_df['Involved'].str.count(',') >= 1)]
+        for row in serious.itertuples(index=False):
+            print(f"⚠ Near dependency (condition index {row.Condition_Index:.1f}): {row.Involved}")
+
         # Correlation matrix
         print("\n--- CORRELATION MATRIX ---")
         corr = df_clean[X_vars].corr()
@@ -761,9 +691,11 @@ class SpatialDurbinAnalysis:
         # Save
         self.results['fase3b'] = {
             'vif': vif_df,
+            'condition': cond_df,
             'correlation': corr
         }
         vif_df.to_csv('sdm_results/fase3/3b_vif_results.csv', index=False)
+        cond_df.to_csv('sdm_results/fase3/3b_condition_indices.csv', index=False)
         corr.to_csv('sdm_results/fase3/3b_correlation_matrix.csv')
 
         print("\n✓ FASE 3B completed.")
@@ -783,8 +715,8 @@ class SpatialDurbinAnalysis:
 
         df_clean = df[X_vars + ['price']].dropna()
 
-        X = df_clean[X_vars].values
-        y = df_clean['price'].values
+        X = df_clean[X_vars].to_numpy(dtype=np.float64)
+        y = df_clean['price'].to_numpy(dtype=np.float64)
 
         # Add constant
         X_with_const = np.column_stack([np.ones(len(X)), X])
@@ -796,6 +728,8 @@ class SpatialDurbinAnalysis:
         residuals = y - y_pred
 
         # Breusch-Pagan test
+        from statsmodels.stats.diagnostic import het_breuschpagan
+
         print("\n--- BREUSCH-PAGAN TEST ---")
         bp_stat, bp_pvalue, _, _ = het_breuschpagan(residuals, X_with_const)
 
@@ -823,136 +757,71 @@ class SpatialDurbinAnalysis:
         print("\n✓ FASE 3C completed.")
         return results_df
 
-    def fase3d_spatial_diagnostics(self, commodity='com_1'):
-        """FASE 3D: Spatial model selection tests (LM-Lag, LM-Error, Robust LM)"""
+    def fase3d_spatial_diagnostics(self, commodity='com_1', year=2024,
+                                   specs=('knn:k=3,transform=r', 'knn:k=5,transform=r',
+                                          'knn:k=8,transform=r')):
+        """
+        FASE 3D: Spatial model selection tests (LM-Lag, LM-Error, Robust LM)
+
+        The tests run on every (year, commodity, weights spec) location-year
+        cross-section; the headline slice (commodity, year, first spec) is
+        reported as before.
+
+        Args:
+            commodity (str): Commodity of the headline slice
+            year (int): Year of the headline slice
+            specs (Sequence[str]): Weights specs; the first one is the headline
+        """
         print("\n" + "="*80)
         print("FASE 3D: SPATIAL DIAGNOSTIC TESTS")
         print("="*80)
 
         df = self.data['merged']
 
-        # Filter for commodity and aggregate by location-year
-        df_commodity = df[df['commodity_id'] == commodity].copy()
+        # All slices in one pass (traces per W and OLS bases per X are shared)
+        lm = LMDiagnostics(self.get_location_index(), specs=specs)
+        tidy = lm.run(df)
+        slices = recommendations(tidy)
+        print(f"\nSlices tested: {len(slices)} (year x commodity x weights)")
+        if len(slices):
+            print(slices['Recommendation'].value_counts().to_string())
 
-        # Aggregate to location-year level for cross-sectional analysis
-        df_agg = df_commodity.groupby(['location_name', 'year']).agg({
-            'price': 'mean',
-            'precipitation_mm': 'mean',
-            'temperature_mean_c': 'mean',
-            'bbm_price_idr': 'mean',
-            'luas_panen_ha': 'first',
-            'avg_distance_km': 'first'
-        }).reset_index()
-
-        # Get one year for cross-sectional test (e.g., 2024)
-        df_cross = df_agg[df_agg['year'] == 2024].copy()
-
-        print(f"\nCross-sectional sample (year=2024): {len(df_cross)} locations")
-
-        # Get coordinates
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-        df_cross = df_cross.merge(coords_df, on='location_name', how='left')
-        df_cross = df_cross.dropna()
-
-        # Prepare matrices
-        y = df_cross['price'].values.reshape(-1, 1)
-        X_vars = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
-                 'luas_panen_ha', 'avg_distance_km']
-        X = df_cross[X_vars].values
-
-        # Spatial weights (use knn3)
-        w = self.weights['knn3']
-
-        print(f"y shape: {y.shape}")
-        print(f"X shape: {X.shape}")
-        print(f"W: {w.n} units")
-
-        # Run OLS first to get diagnostics
-        print("\n--- OLS ESTIMATION (for diagnostics) ---")
-        ols = spreg.OLS(
-            y, X,
-            w=w,
-            spat_diag=True,
-            name_y='price',
-            name_x=X_vars
-        )
+        # Headline slice
+        spec = lm.specs[0]
+        headline = tidy[(tidy['year'] == year) & (tidy['commodity_id'] == commodity) &
+                        (tidy['weights'] == spec) & (tidy['status'] == 'ok')]
+        if headline.empty:
+            raise ValueError(f"No testable cross-section for {commodity} in {year}")
 
-        # Extract spatial diagnostic tests
-        print("\n--- SPATIAL DIAGNOSTIC TESTS ---")
+        print(f"\nCross-sectional sample ({commodity}, year={year}): {headline['n'].iloc[0]} locations")
+        print(f"W: {spec}")
 
-        # LM-Lag
-        print(f"\n1. LM-Lag (Lagrange Multiplier - Spatial Lag)")
-        print(f"   Statistic: {ols.lm_lag[0]:.4f}")
-        print(f"   P-value: {ols.lm_lag[1]:.6f}")
-        print(f"   Significant: {'Yes***' if ols.lm_lag[1] < 0.001 else ('Yes**' if ols.lm_lag[1] < 0.01 else ('Yes*' if ols.lm_lag[1] < 0.05 else 'No'))}")
-
-        # LM-Error
-        print(f"\n2. LM-Error (Lagrange Multiplier - Spatial Error)")
-        print(f"   Statistic: {ols.lm_error[0]:.4f}")
-        print(f"   P-value: {ols.lm_error[1]:.6f}")
-        print(f"   Significant: {'Yes***' if ols.lm_error[1] < 0.001 else ('Yes**' if ols.lm_error[1] < 0.01 else ('Yes*' if ols.lm_error[1] < 0.05 else 'No'))}")
-
-        # Robust LM-Lag
-        print(f"\n3. Robust LM-Lag")
-        print(f"   Statistic: {ols.rlm_lag[0]:.4f}")
-        print(f"   P-value: {ols.rlm_lag[1]:.6f}")
-        print(f"   Significant: {'Yes***' if ols.rlm_lag[1] < 0.001 else ('Yes**' if ols.rlm_lag[1] < 0.01 else ('Yes*' if ols.rlm_lag[1] < 0.05 else 'No'))}")
-
-        # Robust LM-Error
-        print(f"\n4. Robust LM-Error")
-        print(f"   Statistic: {ols.rlm_error[0]:.4f}")
-        print(f"   P-value: {ols.rlm_error[1]:.6f}")
-        print(f"   Significant: {'Yes***' if ols.rlm_error[1] < 0.001 else ('Yes**' if ols.rlm_error[1] < 0.01 else ('Yes*' if ols.rlm_error[1] < 0.05 else 'No'))}")
+        print("\n--- SPATIAL DIAGNOSTIC TESTS ---")
+        diag_df = headline.set_index('Test').loc[TESTS[:4]].reset_index()
+        for i, row in enumerate(diag_df.itertuples(index=False), start=1):
+            print(f"\n{i}. {row.Test}")
+            print(f"   Statistic: {row.Statistic:.4f}")
+            print(f"   P-value: {row.P_value:.6f}")
+            print(f"   Significant: {significance(row.P_value)}")
 
         # Decision rule
         print("\n--- MODEL SELECTION DECISION ---")
-        lm_lag_sig = ols.lm_lag[1] < 0.05
-        lm_error_sig = ols.lm_error[1] < 0.05
-        rlm_lag_sig = ols.rlm_lag[1] < 0.05
-        rlm_error_sig = ols.rlm_error[1] < 0.05
-
-        if rlm_lag_sig and rlm_error_sig:
-            recommendation = "Spatial Durbin Model (SDM) - Both lag and error significant"
-        elif rlm_lag_sig:
-            recommendation = "Spatial Lag Model (SAR) - Only lag significant"
-        elif rlm_error_sig:
-            recommendation = "Spatial Error Model (SEM) - Only error significant"
-        else:
-            recommendation = "OLS sufficient - No spatial dependence"
-
+        recommendation = slices[(slices['year'] == year) & (slices['commodity_id'] == commodity) &
+                                (slices['weights'] == spec)]['Recommendation'].iloc[0]
         print(f"Recommended model: {recommendation}")
 
         # Save results
-        diag_df = pd.DataFrame([{
-            'Test': 'LM-Lag',
-            'Statistic': ols.lm_lag[0],
-            'P_value': ols.lm_lag[1],
-            'Significant': lm_lag_sig
-        }, {
-            'Test': 'LM-Error',
-            'Statistic': ols.lm_error[0],
-            'P_value': ols.lm_error[1],
-            'Significant': lm_error_sig
-        }, {
-            'Test': 'Robust LM-Lag',
-            'Statistic': ols.rlm_lag[0],
-            'P_value': ols.rlm_lag[1],
-            'Significant': rlm_lag_sig
-        }, {
-            'Test': 'Robust LM-Error',
-            'Statistic': ols.rlm_error[0],
-            'P_value': ols.rlm_error[1],
-            'Significant': rlm_error_sig
-        }])
-
+        diag_df = diag_df[['Test', 'Statistic', 'P_value', 'Significant']]
         self.results['fase3d'] = {
             'diagnostics': diag_df,
             'recommendation': recommendation,
-            'ols_model': ols
+            'all_slices': tidy,
+            'recommendations': slices
         }
 
         diag_df.to_csv('sdm_results/fase3/3d_spatial_diagnostics.csv', index=False)
+        tidy.to_csv('sdm_results/fase3/3d_lm_diagnostics_all.csv', index=False)
+        slices.to_csv('sdm_results/fase3/3d_lm_recommendations.csv', index=False)
 
         with open('sdm_results/fase3/3d_recommendation.txt', 'w') as f:
             f.write(f"Recommended model: {recommendation}\n")
@@ -960,34 +829,101 @@ class SpatialDurbinAnalysis:
         print("\n✓ FASE 3D completed.")
         return diag_df, recommendation
 
-    def fase3e_hausman_test(self):
-        """FASE 3E: Hausman test for Fixed vs Random Effects"""
+    def fase3e_hausman_test(self, commodity='com_1', spec='knn:k=3,transform=r', alpha=0.05):
+        """
+        FASE 3E: Hausman test for Fixed vs Random Effects
+
+        FE and RE panel SDMs on the monthly location panel of one commodity
+        (X_VARS, spatially lagged where they vary across locations, and month
+        dummies) are fitted through the model
+        cache, so reruns and later phases on the same data and spec reuse them.
+
+        Args:
+            commodity (str): Commodity of the monthly panel
+            spec (str): Weights spec
+            alpha (float): Level at which RE is rejected in favour of FE
+        """
         print("\n" + "="*80)
         print("FASE 3E: HAUSMAN TEST (Fixed vs Random Effects)")
         print("="*80)
 
-        print("\nNote: Hausman test requires panel data estimation.")
-        print("For Spatial Durbin Model with panel data:")
-        print("- Fixed Effects (FE): Controls for unobserved heterogeneity per location")
-        print("- Random Effects (RE): More efficient but stricter assumptions")
+        df = self.data['merged']
+        index = self.get_location_index()
+
+        monthly = aggregate_monthly(df[df['commodity_id'] == commodity])
+        monthly['month'] = monthly['date'].dt.month.astype(np.int8)
+        df_panel, month_cols = with_month_dummies(monthly)
+        w = get_registry().for_index(spec, index)
+        x_vars = X_VARS + month_cols
+        # With a row-standardized W, W x = x for a regressor common to all
+        # locations (the national fuel price), so only varying ones are lagged
+        durbin = [v for v in X_VARS if df_panel.groupby('date')[v].nunique().max() > 1]
+
+        print(f"\nCommodity: {commodity}")
+        print(f"Panel: {df_panel['location_name'].nunique()} locations x "
+              f"{df_panel['date'].nunique()} months")
+        print(f"W: {spec}")
+
+        fits = {}
+        for effects in ('individual', 'random'):
+            fits[effects] = fit_panel(df_panel, 'price', x_vars, w, index, durbin=durbin,
+                                      effects=effects, name_w=spec,
+                                      name_ds=f'Hausman {commodity}')
+        fe, re = fits['individual'], fits['random']
+        test = hausman(fe, re)
+
+        print("\n--- HAUSMAN TEST ---")
+        print(f"Coefficients compared: {len(test['variables'])} (incl. rho)")
+        print(f"rho FE / RE: {fe.stats['rho']:.4f} / {re.stats['rho']:.4f}")
+        print(f"RE phi: {re.stats['phi']:.6f}")
+        print(f"H statistic: {test['statistic']:.4f} (df = {test['df']})")
+        print(f"P-value: {test['p_value']:.6f}")
+
+        # Rejecting H0 (no correlation between effects and regressors) means RE is inconsistent
+        if test['p_value'] < alpha:
+            recommendation = "Fixed Effects (FE)"
+            reason = "RE rejected: location effects are correlated with the regressors"
+        elif np.isnan(test['p_value']):
+            recommendation = "Fixed Effects (FE)"
+            reason = "Test not computable; FE is consistent either way"
+        else:
+            recommendation = "Random Effects (RE)"
+            reason = "RE not rejected: it is consistent and more efficient"
 
-        print("\nRecommendation for this analysis:")
-        print("→ Use Fixed Effects (FE) for robustness")
-        print("  - Controls for location-specific characteristics")
-        print("  - More appropriate for non-random sample of locations")
-        print("  - Standard in spatial panel econometrics")
+        print(f"\n→ Use {recommendation}")
+        print(f"  {reason}")
+
+        test_df = pd.DataFrame([{
+            'Commodity': commodity,
+            'Weights': spec,
+            'Statistic': test['statistic'],
+            'df': test['df'],
+            'P_value': test['p_value'],
+            'Positive_definite': test['positive_definite'],
+            'Rho_FE': fe.stats['rho'],
+            'Rho_RE': re.stats['rho'],
+            'Phi_RE': re.stats['phi'],
+            'Recommendation': recommendation
+        }])
+        test_df.to_csv('sdm_results/fase3/3e_hausman_test.csv', index=False)
+
+        self.results['fase3e'] = {
+            'test': test,
+            'recommendation': recommendation,
+            'fe': fe,
+            're': re
+        }
 
         # Save recommendation
         with open('sdm_results/fase3/3e_hausman_recommendation.txt', 'w') as f:
             f.write("Hausman Test Recommendation:\n")
-            f.write("Use Fixed Effects (FE) for Spatial Durbin Model\n\n")
-            f.write("Reasoning:\n")
-            f.write("1. Controls for location-specific unobserved heterogeneity\n")
-            f.write("2. Locations are not randomly sampled (specific Java Barat regions)\n")
-            f.write("3. More robust specification for spatial panel econometrics\n")
+            f.write(f"Use {recommendation} for Spatial Durbin Model\n\n")
+            f.write(f"H = {test['statistic']:.4f}, df = {test['df']}, p = {test['p_value']:.6f}\n")
+            f.write(f"Coefficients compared: {', '.join(test['variables'])}\n\n")
+            f.write(f"Reasoning: {reason}\n")
 
         print("\n✓ FASE 3E completed.")
-        return "Fixed Effects (FE)"
+        return recommendation
 
     # Note: Remaining phases will be implemented in the next part
     # This is getting quite long, so I'll create helper methods and continue
@@ -1004,6 +940,7 @@ class SpatialDurbinAnalysis:
         self.fase2a_global_morans_i()
         self.fase2b_local_morans_i()
         self.fase2c_construct_spatial_weights()
+        self.fase2d_weekly_spatial_autocorrelation()
 
         # FASE 3
         self.fase3a_stationarity_tests()
@@ -1039,6 +976,7 @@ if __name__ == "__main__":
         sdm.fase2a_global_morans_i(commodity='com_1')
         sdm.fase2b_local_morans_i(commodity='com_1')
         sdm.fase2c_construct_spatial_weights()
+        sdm.fase2d_weekly_spatial_autocorrelation()
 
         # Phase 3
         sdm.fase3a_stationarity_tests()
@@ -0,0 +1,269 @@
+"""
+Panel SDM Backtesting
+=====================
+Expanding-window out-of-sample evaluation of the panel SDM:
+
+    fold at origin o:  estimate on periods [0, o), forecast periods o .. o + H - 1
+
+Forecasts come from the reduced form with the estimated location effects
+
+    y_hat_t = (I - rho W)^-1 (X_t beta + W X_t theta + mu)
+
+Features:
+    - Panel arrays and W X lags built once for the whole panel; every fold
+      design is a cached view on them (SpatialDesign.view), so evaluating an
+      additional model only costs its estimation
+    - Warm starts: consecutive folds are fitted in chains, each fold's rho
+      search starting from the previous window's estimate
+    - Chains run in parallel on a thread pool
+    - Multi-step forecasts with an optional autoregressive regressor (e.g.
+      price_lag1) fed back recursively; other regressors enter at their
+      realized values
+    - MAPE / RMSE per location and horizon (or any other grouping)
+
+Usage:
+    from yelp_bi.sdm.backtest import PanelBacktest, forecast_metrics
+
+    bt = PanelBacktest(df_panel, y='price', x=X_vars + month_cols, W=w.sparse,
+                       index=location_index, ar_col='price_lag1')
+    forecasts = bt.run(min_train=24, horizon=3, durbin=X_vars)
+    forecast_metrics(forecasts)                        # per model, location, horizon
+    forecast_metrics(forecasts, by=['model', 'horizon'])
+
+    # Another model on the same folds: only estimation is repeated
+    bt.run(min_train=24, horizon=3, x=X_vars, durbin=X_vars, name='no_months')
+    bt.fits                                            # per-fold rho / logll of both models
+"""
+
+from multiprocessing import cpu_count
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .logdet import LogDet
+from .panel_sdm import PanelSDM, PanelSDMResults, panel_arrays, run_tasks
+from .spatial_design import SpatialDesign
+from .spatial_multiplier import SpatialMultiplier
+from .spatial_weights import subset_weights
+
+
+FORECAST_COLUMNS = ['model', 'origin', 'horizon', 'location_name', 'period', 'actual', 'forecast']
+
+
+def forecast_metrics(forecasts: pd.DataFrame,
+                     by: Sequence[str] = ('model', 'location_name', 'horizon')) -> pd.DataFrame:
+    """
+    Out-of-sample accuracy of a forecast table
+
+    Args:
+        forecasts (pd.DataFrame): Output of PanelBacktest.run()
+        by (Sequence[str]): Grouping columns (default: model, location, horizon)
+
+    Returns:
+        pd.DataFrame: n, MAPE (percent), RMSE and bias per group
+    """
+    error = forecasts['forecast'] - forecasts['actual']
+    frame = forecasts.assign(_ape=100 * (error / forecasts['actual']).abs(),
+                             _se=error ** 2, _err=error)
+    grouped = frame.groupby(list(by), sort=False)
+    return pd.DataFrame({
+        'n': grouped.size(),
+        'MAPE': grouped['_ape'].mean(),
+        'RMSE': np.sqrt(grouped['_se'].mean()),
+        'Bias': grouped['_err'].mean(),
+    }).reset_index()
+
+
+class PanelBacktest:
+    """
+    Expanding-window backtest of panel SDM forecasts on one balanced panel
+    """
+
+    def __init__(self, df: pd.DataFrame, y: str, x: Sequence[str], W: sp.spmatrix, index,
+                 time_col: str = 'date', ar_col: Optional[str] = None,
+                 effects: str = 'individual', bias_correction: bool = True,
+                 logdet_method: str = 'auto', n_workers: Optional[int] = None):
+        """
+        Initialize backtest (panel arrays, W X lags and the log-det engine are built here)
+
+        Args:
+            df (pd.DataFrame): Long panel with location_name and time_col
+            y (str): Dependent variable
+            x (Sequence[str]): Every regressor any model may use
+            W (sp.spmatrix): (N, N) weights in index order (libpysal W also accepted)
+            index (LocationIndex): Location order of W
+            time_col (str): Period column (default: 'date')
+            ar_col (str, optional): Regressor holding y of the previous period;
+                replaced by the forecast for horizons beyond one
+            effects (str): 'individual' (default) or 'none'; time effects cannot
+                be forecast
+            bias_correction (bool): Lee-Yu correction in each fit
+            logdet_method (str): LogDet method (default: 'auto')
+            n_workers (int, optional): Parallel fold chains (default: CPU count)
+        """
+        if effects not in ('individual', 'none'):
+            raise ValueError(f"Backtesting needs 'individual' or 'none' effects, got '{effects}'")
+        self.y_name = y
+        self.x = list(x)
+        self.ar_col = ar_col
+        self.effects = effects
+        self.bias_correction = bias_correction
+        self.n_workers = n_workers or cpu_count()
+
+        W = getattr(W, 'sparse', W)
+        values, keep, periods = panel_arrays(df, index, [y] + self.x, time_col)
+        if len(keep) < len(index):
+            W = subset_weights(W, keep)
+        self.W = sp.csr_matrix(W, dtype=np.float64)
+        self.Y = values[:, :, 0]
+        self.locations = index.names[keep]
+        self.periods = periods
+        self.n, self.t = self.Y.shape
+
+        self.design = SpatialDesign(values[:, :, 1:], self.W, self.x)
+        self.design.lag(1)                       # computed once, shared by every fold view
+        self.logdet = LogDet(self.W, method=logdet_method)
+        if self.logdet.method != 'eigen':
+            self.logdet.build_grid()
+        self._views: Dict[Tuple[int, tuple], SpatialDesign] = {}
+        self.fits = pd.DataFrame()
+
+    # -------------------------------------------------------------------------
+    # Folds
+    # -------------------------------------------------------------------------
+
+    def origins(self, min_train: int, step: int = 1) -> List[int]:
+        """First forecast period of each fold (training windows of at least min_train periods)"""
+        if not 2 <= min_train < self.t:
+            raise ValueError(f"min_train must be in [2, {self.t - 1}] for {self.t} periods")
+        return list(range(min_train, self.t, step))
+
+    def fold_design(self, origin: int, columns: Sequence[str]) -> SpatialDesign:
+        """Training design of one fold (cached per origin and column set)"""
+        key = (origin, tuple(columns))
+        if key not in self._views:
+            self._views[key] = self.design.view(slice(0, origin), columns)
+        return self._views[key]
+
+    # -------------------------------------------------------------------------
+    # Estimation and forecasting
+    # -------------------------------------------------------------------------
+
+    def _fit(self, origin: int, x: List[str], durbin: np.ndarray,
+             rho_start: Optional[float]) -> PanelSDMResults:
+        view = self.fold_design(origin, x)
+        model = PanelSDM(self.Y[:, :origin], view.X, self.W, effects=self.effects, durbin=durbin,
+                         bias_correction=self.bias_correction, name_y=self.y_name, name_x=x,
+                         logdet=self.logdet, design=view, rho_start=rho_start)
+        return model.fit()
+
+    @staticmethod
+    def _regressors(names: Sequence[str], x: List[str], X: np.ndarray, WX: np.ndarray) -> np.ndarray:
+        """Untransformed regressors in coefficient order, from (..., K) X and W X"""
+        pos = {name: j for j, name in enumerate(x)}
+        cols = []
+        for name in names:
+            if name == 'Constant':
+                cols.append(np.ones(X.shape[:-1]))
+            elif name.startswith('W_') and name[2:] in pos:
+                cols.append(WX[..., pos[name[2:]]])
+            else:
+                cols.append(X[..., pos[name]])
+        return np.stack(cols, axis=-1)
+
+    def _forecast(self, results: PanelSDMResults, origin: int, horizon: int,
+                  x: List[str]) -> np.ndarray:
+        """(N, h) forecasts for periods origin .. origin + h - 1"""
+        names, beta, rho = results.name_betas[:-1], results.beta, results.rho
+        X, WX = self.design.lag(0)[..., [self.x.index(c) for c in x]], \
+            self.design.lag(1)[..., [self.x.index(c) for c in x]]
+
+        # Location effects from the training window (zero without effects)
+        mu = np.zeros(self.n)
+        if self.effects == 'individual':
+            y_train = self.Y[:, :origin]
+            fitted = self._regressors(names, x, X[:, :origin], WX[:, :origin]) @ beta
+            mu = (y_train - rho * (self.W @ y_train) - fitted).mean(axis=1)
+
+        solver = SpatialMultiplier(self.W, rho)
+        ar = x.index(self.ar_col) if self.ar_col in x else None
+        steps = min(horizon, self.t - origin)
+        out = np.empty((self.n, steps))
+        for h in range(steps):
+            X_t, WX_t = X[:, origin + h].copy(), WX[:, origin + h].copy()
+            if ar is not None and h > 0:
+                X_t[:, ar] = out[:, h - 1]
+                WX_t[:, ar] = self.W @ out[:, h - 1]
+            out[:, h] = solver.solve(self._regressors(names, x, X_t, WX_t) @ beta + mu)
+        return out
+
+    def _chain(self, origins: List[int], horizon: int, x: List[str], durbin: np.ndarray,
+               name: str) -> Tuple[List[pd.DataFrame], List[dict]]:
+        """Fit consecutive folds, each warm-started from the previous rho"""
+        frames, fits = [], []
+        rho = None
+        for origin in origins:
+            results = self._fit(origin, x, durbin, rho)
+            rho = results.rho
+            pred = self._forecast(results, origin, horizon, x)
+            steps = pred.shape[1]
+            frames.append(pd.DataFrame({
+                'model': name,
+                'origin': self.periods[origin],
+                'horizon': np.tile(np.arange(1, steps + 1), self.n),
+                'location_name': np.repeat(self.locations, steps),
+                'period': np.tile(self.periods[origin:origin + steps], self.n),
+                'actual': self.Y[:, origin:origin + steps].ravel(),
+                'forecast': pred.ravel(),
+            }))
+            fits.append({'model': name, 'origin': self.periods[origin], 'train_periods': origin,
+                         'rho': rho, 'logll': results.logll, 'iterations': results.iterations})
+        return frames, fits
+
+    def run(self, min_train: int = 24, horizon: int = 3, x: Optional[Sequence[str]] = None,
+            durbin: Optional[Sequence[str]] = None, step: int = 1, name: str = 'sdm',
+            n_workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        Backtest one model specification over all folds
+
+        Args:
+            min_train (int): Periods in the first training window (default: 24)
+            horizon (int): Forecast steps per fold (default: 3)
+            x (Sequence[str], optional): Regressors of this model (default: all)
+            durbin (Sequence[str], optional): Regressors also entering as W X
+                (default: all of x)
+            step (int): Periods between fold origins (default: 1)
+            name (str): Model label in the output
+            n_workers (int, optional): Parallel chains (default: the instance setting)
+
+        Returns:
+            pd.DataFrame: model, origin, horizon, location_name, period, actual,
+                forecast; per-fold rho and log-likelihood are added to `self.fits`
+                (replacing earlier rows of the same model name)
+
+        Example:
+            >>> forecasts = bt.run(min_train=24, horizon=3, durbin=X_vars)
+            >>> forecast_metrics(forecasts, by=['horizon'])
+        """
+        x = self.x if x is None else list(x)
+        unknown = [c for c in x if c not in self.x]
+        if unknown:
+            raise KeyError(f"Regressors not in the backtest panel: {unknown}")
+        durbin_mask = np.ones(len(x), dtype=bool) if durbin is None else \
+            np.array([c in set(durbin) for c in x])
+
+        origins = self.origins(min_train, step)
+        for origin in origins:
+            self.fold_design(origin, x)          # views built before threads share the cache
+
+        n_chains = max(1, min(n_workers or self.n_workers, len(origins)))
+        chains = [list(c) for c in np.array_split(origins, n_chains) if len(c)]
+        tasks = [lambda c=c: self._chain(c, horizon, x, durbin_mask, name) for c in chains]
+        outputs = run_tasks(tasks, n_chains)
+
+        fits = pd.DataFrame([fit for _, fits in outputs for fit in fits])
+        previous = self.fits[self.fits['model'] != name] if len(self.fits) else self.fits
+        self.fits = pd.concat([f for f in (previous, fits) if len(f)], ignore_index=True)
+        return pd.concat([f for frames, _ in outputs for f in frames], ignore_index=True)[FORECAST_COLUMNS]
@@ -0,0 +1,196 @@
+"""
+Multicollinearity Diagnostics
+=============================
+Variance inflation factors and Belsley-Kuh-Welsch condition diagnostics
+for a whole design matrix at once.
+
+With an intercept, VIF_j is the j-th diagonal element of the inverse
+correlation matrix R of the regressors:
+
+    VIF_j = [R^-1]_jj = 1 / (1 - R^2_j)
+
+so all VIFs cost one (p x p) eigendecomposition instead of one auxiliary
+OLS per regressor (statsmodels' variance_inflation_factor). By default the
+results equal variance_inflation_factor(X, j, standardize=False) for every
+column j, including the VIF of a constant column - the only definition
+before statsmodels 0.15 - so existing tables keep their values.
+
+Features:
+    - vif / vif_table: all VIFs from one decomposition; perfectly collinear
+      columns (e.g. a full set of month dummies plus an intercept) get inf
+      instead of an error
+    - condition_diagnostics: condition indices and variance-decomposition
+      proportions of the unit-length scaled design, with the regressors
+      involved in each near dependency
+    - Milliseconds for a monthly panel design with month dummies
+
+Usage:
+    from yelp_bi.sdm.collinearity import vif, vif_table, condition_diagnostics
+
+    vif(sm.add_constant(X))                         # values of the statsmodels loop
+    vif_table(df[X_vars], intercept=True)           # Variable, VIF, Tolerance, Multicollinearity
+    condition_diagnostics(df[X_vars + month_cols])  # Condition_Index, proportions, Involved
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+VIF_HIGH = 10
+VIF_MODERATE = 5
+
+# Belsley-Kuh-Welsch rule: a condition index above 30 with two or more
+# variance proportions above 0.5 marks a harmful near dependency
+CONDITION_SERIOUS = 30
+PROPORTION_THRESHOLD = 0.5
+
+
+def _as_matrix(X, names: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, list]:
+    """Design as a float64 array and its column names"""
+    if names is None:
+        names = list(X.columns) if isinstance(X, pd.DataFrame) else \
+            [f'x{j}' for j in range(np.shape(X)[1])]
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim != 2 or X.shape[1] != len(names):
+        raise ValueError(f"Expected a 2-D design with {len(names)} columns, got shape {X.shape}")
+    return X, list(names)
+
+
+def _inverse_quadratic(M: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """
+    Column-wise b' M^-1 b for a symmetric PSD matrix M
+
+    Directions of M with (numerically) zero eigenvalue give inf wherever b
+    loads on them, which is how a perfectly collinear column shows up.
+    """
+    lam, Q = np.linalg.eigh(M)
+    tol = max(lam.max(), 0.0) * len(lam) * np.finfo(np.float64).eps
+    ok = lam > tol
+    QB = Q.T @ B
+    out = (QB[ok] ** 2 / lam[ok, None]).sum(axis=0)
+    singular = (QB[~ok] ** 2).sum(axis=0) > np.sqrt(np.finfo(np.float64).eps)
+    out[singular] = np.inf
+    return out
+
+
+def vif(X, names: Optional[Sequence[str]] = None, intercept: Optional[bool] = None) -> pd.Series:
+    """
+    Variance inflation factors of every column
+
+    Args:
+        X (pd.DataFrame or np.ndarray): (n, p) design
+        names (Sequence[str], optional): Column names (default: DataFrame columns)
+        intercept (bool, optional): True for the regressors of a model with an
+            intercept (centered R^2, inverse correlation matrix); False for
+            uncentered VIFs of a model without one. Default: True if X has a
+            constant column, which reproduces statsmodels' variance_inflation_factor
+            with standardize=False
+
+    Returns:
+        pd.Series: VIF per column (inf for perfect collinearity, NaN for an
+            all-zero column); a constant column gets the VIF of the intercept
+
+    Example:
+        >>> vif(sm.add_constant(df[['precipitation_mm', 'bbm_price_idr']]))
+    """
+    X, names = _as_matrix(X, names)
+    p = X.shape[1]
+    constant = np.ptp(X, axis=0) == 0
+    if intercept is None:
+        intercept = bool(constant.any())
+    out = np.full(p, np.nan)
+
+    if not intercept:
+        # Uncentered: inverse of the cosine matrix of the columns
+        norms = np.sqrt((X ** 2).sum(axis=0))
+        live = norms > 0
+        Xs = X[:, live] / norms[live]
+        out[live] = _inverse_quadratic(Xs.T @ Xs, np.eye(live.sum()))
+        return pd.Series(out, index=names, name='VIF')
+
+    var = ~constant
+    mean = X[:, var].mean(axis=0)
+    sd = X[:, var].std(axis=0)
+    Z = (X[:, var] - mean) / sd
+    R = Z.T @ Z / len(Z)                                  # correlation matrix
+    # Diagonal of R^-1 and, for the intercept, 1 + c' R^-1 c with c = mean / sd
+    B = np.column_stack([np.eye(var.sum()), mean / sd])
+    quad = _inverse_quadratic(R, B)
+    out[var] = quad[:-1]
+
+    levels = np.flatnonzero(constant & (X[0] != 0))
+    if len(levels) == 1:
+        out[levels] = 1 + quad[-1]
+    elif len(levels) > 1:
+        out[levels] = np.inf                              # several intercept columns
+    return pd.Series(out, index=names, name='VIF')
+
+
+def vif_table(X, names: Optional[Sequence[str]] = None,
+              intercept: Optional[bool] = None) -> pd.DataFrame:
+    """
+    VIF table with tolerance and a severity label
+
+    Args:
+        X, names, intercept: As in vif()
+
+    Returns:
+        pd.DataFrame: Variable, VIF, Tolerance, Multicollinearity
+            ('High' above 10, 'Moderate' above 5, otherwise 'Low')
+    """
+    values = vif(X, names, intercept)
+    v = values.to_numpy()
+    with np.errstate(divide='ignore'):
+        tolerance = np.where(v > 0, 1 / v, np.inf)
+    return pd.DataFrame({
+        'Variable': values.index,
+        'VIF': v,
+        'Tolerance': tolerance,
+        'Multicollinearity': np.where(v > VIF_HIGH, 'High',
+                                      np.where(v > VIF_MODERATE, 'Moderate', 'Low')),
+    })
+
+
+def condition_diagnostics(X, names: Optional[Sequence[str]] = None, intercept: bool = True,
+                          proportion_threshold: float = PROPORTION_THRESHOLD) -> pd.DataFrame:
+    """
+    Belsley-Kuh-Welsch condition indices and variance-decomposition proportions
+
+    The design (with a 'const' column added when intercept is True and X has
+    none) is scaled to unit column length, not centered, so dependencies
+    involving the intercept are visible.
+
+    Args:
+        X, names: As in vif()
+        intercept (bool): Add a constant column if X has none (default: True)
+        proportion_threshold (float): Proportion above which a variable is
+            listed as involved in a dimension (default: 0.5)
+
+    Returns:
+        pd.DataFrame: One row per dimension, by increasing condition index:
+            Dimension, Singular_Value, Condition_Index, one variance
+            proportion column per variable, and Involved (variables above
+            proportion_threshold)
+    """
+    X, names = _as_matrix(X, names)
+    if intercept and not (np.ptp(X, axis=0) == 0).any():
+        X = np.column_stack([np.ones(len(X)), X])
+        names = ['const'] + names
+    norms = np.sqrt((X ** 2).sum(axis=0))
+    norms[norms == 0] = 1.0
+    _, s, Vt = np.linalg.svd(X / norms, full_matrices=False)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = s[0] / s
+        phi = Vt.T ** 2 / s ** 2                          # (variable, dimension)
+        props = phi / phi.sum(axis=1, keepdims=True)
+    props = np.nan_to_num(props.T, nan=0.0)               # (dimension, variable)
+
+    table = pd.DataFrame(props, columns=names)
+    table.insert(0, 'Condition_Index', index)
+    table.insert(0, 'Singular_Value', s)
+    table.insert(0, 'Dimension', np.arange(1, len(s) + 1))
+    table['Involved'] = [', '.join(np.array(names)[row > proportion_threshold]) for row in props]
+    return table
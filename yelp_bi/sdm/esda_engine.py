@@ -0,0 +1,298 @@
+"""
+Batched ESDA Engine
+===================
+Global and local Moran's I for every column of an (N, M) matrix Y at once:
+locations x dates (a Moran time series) or locations x commodities.
+
+    I_m    = N / S0 * z_m' W z_m / z_m' z_m
+    I_im   = (N - 1) * z_im (W z_m)_i / z_m' z_m       (z standardized, as in esda)
+
+Features:
+    - All M statistics from one sparse product W @ Z
+    - Analytical inference under normality (esda's *_norm)
+    - Global permutation inference: one shared (P, N) permutation index for
+      all columns, evaluated in chunks with one sparse product per chunk
+    - Conditional (local) permutations as in esda: one shared (P, k_max)
+      index over the other N - 1 locations; locations are processed in
+      groups of equal neighbour count, all columns together
+    - Quadrants (1 HH, 2 LH, 3 LL, 4 HL) and the cluster labels of fase2b
+    - panel_matrix(): locations x periods matrix from the long merged data
+
+Usage:
+    from yelp_bi.sdm.esda_engine import ESDAEngine, panel_matrix
+
+    Y = panel_matrix(df[df['commodity_id'] == 'com_1'], index, freq='W')
+    engine = ESDAEngine(w.sparse, permutations=999)
+    engine.global_moran(Y)                          # one row per week
+    lisa = engine.local_moran(Y)
+    lisa.to_frame()                                 # week x location labels
+    lisa.cluster_counts()                           # HH / LL / ... per week
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy import stats
+
+
+# Elements per temporary (permutations x locations x columns) block
+MAX_BLOCK = 10_000_000
+
+QUADRANTS = {1: 'HH (High-High)', 2: 'LH (Low-High)', 3: 'LL (Low-Low)', 4: 'HL (High-Low)'}
+NOT_SIGNIFICANT = 'Not Significant'
+
+
+def panel_matrix(df: pd.DataFrame, index, value: str = 'price', time_col: str = 'date',
+                 freq: Optional[str] = None) -> pd.DataFrame:
+    """
+    Locations x periods matrix in location-index order
+
+    Args:
+        df (pd.DataFrame): Long data with location_name, time_col and value
+        index (LocationIndex): Row order (locations without data are dropped)
+        value (str): Column to average (default: 'price')
+        time_col (str): Period column (default: 'date')
+        freq (str, optional): Resample to this pandas frequency, e.g. 'W' (weeks
+            starting Monday) or 'MS' (default: periods as they are)
+
+    Returns:
+        pd.DataFrame: Rows = locations, columns = periods observed at every location
+    """
+    df = df[df['location_name'].isin(index.names)]
+    periods = pd.to_datetime(df[time_col])
+    if freq is not None:
+        periods = periods.dt.to_period(freq).dt.start_time
+    wide = df.groupby([df['location_name'], periods.rename(time_col)],
+                      observed=True)[value].mean().unstack(time_col)
+    names = [name for name in index.names if name in wide.index]
+    return wide.loc[names].dropna(axis=1)
+
+
+def _folded_count(sim_ge: np.ndarray, permutations: int) -> np.ndarray:
+    """esda's pseudo p-value numerator: draws at least as extreme, in the observed direction"""
+    larger = np.asarray(sim_ge, dtype=np.float64)
+    return np.where(permutations - larger < larger, permutations - larger, larger)
+
+
+class LocalMoranResults:
+    """
+    Local Moran statistics for N locations x M columns
+    """
+
+    def __init__(self, locations: Sequence[str], columns: Sequence, Is: np.ndarray, q: np.ndarray,
+                 lag: np.ndarray, p_sim: np.ndarray, z_sim: np.ndarray):
+        self.locations = np.asarray(locations)
+        self.columns = pd.Index(columns)
+        self.Is = Is            # (N, M) local I
+        self.q = q              # (N, M) quadrant 1..4
+        self.lag = lag          # (N, M) spatial lag of the standardized values
+        self.p_sim = p_sim      # (N, M) pseudo p-values (NaN without permutations)
+        self.z_sim = z_sim      # (N, M)
+
+    def labels(self, alpha: float = 0.05) -> np.ndarray:
+        """(N, M) cluster labels; 'Not Significant' where p_sim >= alpha"""
+        labels = np.array([QUADRANTS[q] for q in range(1, 5)], dtype=object)[self.q - 1]
+        labels[~(self.p_sim < alpha)] = NOT_SIGNIFICANT
+        return labels
+
+    def to_frame(self, alpha: float = 0.05, column_name: str = 'date') -> pd.DataFrame:
+        """Long table: column, location_name, local_I, lag, quadrant, p_value, z_score, cluster_type"""
+        n, m = self.Is.shape
+        return pd.DataFrame({
+            column_name: np.tile(self.columns, n),
+            'location_name': np.repeat(self.locations, m),
+            'local_I': self.Is.ravel(),
+            'lag': self.lag.ravel(),
+            'quadrant': self.q.ravel(),
+            'p_value': self.p_sim.ravel(),
+            'z_score': self.z_sim.ravel(),
+            'cluster_type': self.labels(alpha).ravel(),
+        })
+
+    def cluster_counts(self, alpha: float = 0.05) -> pd.DataFrame:
+        """Locations per cluster type for every column (e.g. a weekly time series)"""
+        labels = self.labels(alpha)
+        order = list(QUADRANTS.values()) + [NOT_SIGNIFICANT]
+        return pd.DataFrame({label: (labels == label).sum(axis=0) for label in order},
+                            index=self.columns)
+
+
+class ESDAEngine:
+    """
+    Moran's I for many columns sharing one weights matrix
+    """
+
+    def __init__(self, W, permutations: int = 999, seed: int = 0, max_block: int = MAX_BLOCK):
+        """
+        Initialize engine (weights moments and permutation indices are built here)
+
+        Args:
+            W: (N, N) weights (sparse matrix, libpysal W or CachedWeights),
+                used as given (row-standardize beforehand for the usual I)
+            permutations (int): Draws for pseudo p-values; 0 skips them
+            seed (int): Seed of the shared permutation indices
+            max_block (int): Largest temporary array, in elements
+        """
+        self.W = sp.csr_matrix(getattr(W, 'sparse', W), dtype=np.float64)
+        self.n = self.W.shape[0]
+        self.permutations = permutations
+        self.max_block = max_block
+
+        n = self.n
+        self.s0 = self.W.sum()
+        sym = self.W + self.W.T
+        self.s1 = 0.5 * sym.multiply(sym).sum()
+        self.s2 = float(((np.asarray(self.W.sum(axis=1)).ravel()
+                          + np.asarray(self.W.sum(axis=0)).ravel()) ** 2).sum())
+        self.EI = -1.0 / (n - 1)
+        s02 = self.s0 ** 2
+        self.VI_norm = (n * n * self.s1 - n * self.s2 + 3 * s02) / ((n - 1) * (n + 1) * s02) - self.EI ** 2
+
+        # Self weights enter the conditional statistic separately
+        self._diag = self.W.diagonal()
+        self._W_off = (self.W - sp.diags(self._diag)).tocsr()
+        self._W_off.eliminate_zeros()
+
+        rng = np.random.default_rng(seed)
+        self.cardinality = np.diff(self._W_off.indptr)
+        k_max = int(self.cardinality.max(initial=0))
+        if permutations:
+            # Global: full permutations of the N locations
+            self._global_ids = rng.permuted(np.tile(np.arange(n), (permutations, 1)), axis=1)
+            # Local: k_max draws without replacement from the N - 1 other locations
+            self._local_ids = np.argsort(rng.random((permutations, n - 1)), axis=1)[:, :k_max]
+
+    # -------------------------------------------------------------------------
+    # Inputs
+    # -------------------------------------------------------------------------
+
+    def _matrix(self, Y):
+        if isinstance(Y, pd.DataFrame):
+            return Y.to_numpy(dtype=np.float64), list(Y.index), list(Y.columns)
+        Y = np.asarray(Y, dtype=np.float64)
+        if Y.ndim == 1:
+            Y = Y[:, None]
+        return Y, list(range(Y.shape[0])), list(range(Y.shape[1]))
+
+    def _check(self, Y: np.ndarray):
+        if Y.shape[0] != self.n:
+            raise ValueError(f"Y has {Y.shape[0]} rows, W has {self.n}")
+        if np.isnan(Y).any():
+            raise ValueError("Y contains NaN; drop incomplete columns first (see panel_matrix)")
+
+    # -------------------------------------------------------------------------
+    # Global Moran's I
+    # -------------------------------------------------------------------------
+
+    def _global_I(self, Z: np.ndarray, z2ss: np.ndarray) -> np.ndarray:
+        WZ = self.W @ Z
+        return self.n / self.s0 * (Z * WZ).sum(axis=0) / z2ss
+
+    def global_moran(self, Y, two_tailed: bool = True) -> pd.DataFrame:
+        """
+        Global Moran's I for every column of Y
+
+        Args:
+            Y (pd.DataFrame or np.ndarray): (N, M) values, rows in W order
+            two_tailed (bool): Two-tailed p_norm, as esda's default
+
+        Returns:
+            pd.DataFrame: Indexed by column; I, EI, VI_norm, z_norm, p_norm and,
+                with permutations, EI_sim, seI_sim, z_sim, p_sim
+
+        Example:
+            >>> weekly = engine.global_moran(Y)
+            >>> weekly['I'].plot()
+        """
+        Y, _, columns = self._matrix(Y)
+        self._check(Y)
+        Z = Y - Y.mean(axis=0)
+        z2ss = (Z * Z).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            I = self._global_I(Z, z2ss)
+            z_norm = (I - self.EI) / np.sqrt(self.VI_norm)
+        p_norm = stats.norm.sf(np.abs(z_norm)) * (2.0 if two_tailed else 1.0)
+
+        table = pd.DataFrame({'I': I, 'EI': self.EI, 'VI_norm': self.VI_norm,
+                              'z_norm': z_norm, 'p_norm': p_norm}, index=pd.Index(columns))
+        if self.permutations:
+            P, m = self.permutations, Z.shape[1]
+            total, total_sq, ge = np.zeros(m), np.zeros(m), np.zeros(m)
+            chunk = max(1, self.max_block // (self.n * m))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for start in range(0, P, chunk):
+                    ids = self._global_ids[start:start + chunk]                  # (c, N)
+                    Zp = np.moveaxis(Z[ids], 0, 1).reshape(self.n, -1)           # (N, c*M)
+                    sim = self._global_I(Zp, np.tile(z2ss, len(ids))).reshape(len(ids), m)
+                    total += sim.sum(axis=0)
+                    total_sq += (sim * sim).sum(axis=0)
+                    ge += (sim >= I).sum(axis=0)
+                EI_sim = total / P
+                seI_sim = np.sqrt(np.maximum(total_sq / P - EI_sim ** 2, 0))
+                table['EI_sim'] = EI_sim
+                table['seI_sim'] = seI_sim
+                table['z_sim'] = (I - EI_sim) / seI_sim
+            table['p_sim'] = (_folded_count(ge, P) + 1.0) / (P + 1.0)
+        return table
+
+    # -------------------------------------------------------------------------
+    # Local Moran's I
+    # -------------------------------------------------------------------------
+
+    def local_moran(self, Y) -> LocalMoranResults:
+        """
+        Local Moran's I (LISA) for every column of Y
+
+        Args:
+            Y (pd.DataFrame or np.ndarray): (N, M) values, rows in W order
+
+        Returns:
+            LocalMoranResults: (N, M) Is, quadrants, lags, p_sim and z_sim
+        """
+        Y, locations, columns = self._matrix(Y)
+        self._check(Y)
+        n = self.n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Z = (Y - Y.mean(axis=0)) / Y.std(axis=0)
+        den = (Z * Z).sum(axis=0)
+        lag = self.W @ Z
+        scaling = (n - 1) / den
+        Is = scaling * Z * lag
+        q = np.where(Z > 0, np.where(lag > 0, 1, 4), np.where(lag > 0, 2, 3))
+
+        p_sim = np.full(Z.shape, np.nan)
+        z_sim = np.full(Z.shape, np.nan)
+        if self.permutations:
+            self._conditional(Z, Is, scaling, p_sim, z_sim)
+        return LocalMoranResults(locations, columns, Is, q, lag, p_sim, z_sim)
+
+    def _conditional(self, Z: np.ndarray, Is: np.ndarray, scaling: np.ndarray,
+                     p_sim: np.ndarray, z_sim: np.ndarray):
+        """Conditional permutations, all columns at once, locations grouped by neighbour count"""
+        P, m = self.permutations, Z.shape[1]
+        W, diag = self._W_off, self._diag
+        for k in np.unique(self.cardinality):
+            rows = np.flatnonzero(self.cardinality == k)
+            if k == 0:
+                continue                                   # islands: no neighbours to permute
+            ids = self._local_ids[:, :k]                   # (P, k) shared draws
+            # Neighbour weights of each row
+            weights = np.vstack([W.data[W.indptr[i]:W.indptr[i + 1]] for i in rows])   # (g, k)
+            chunk = max(1, self.max_block // (P * k * m))
+            for start in range(0, len(rows), chunk):
+                block = rows[start:start + chunk]
+                # Skip row i itself: ids index the other N - 1 locations
+                idx = ids[None] + (ids[None] >= block[:, None, None])                  # (g, P, k)
+                lag = np.einsum('gpkm,gk->gpm', Z[idx], weights[start:start + chunk])
+                zi = Z[block][:, None, :]
+                sim = scaling * zi * (lag + diag[block][:, None, None] * zi)          # (g, P, M)
+                ge = (sim >= Is[block][:, None, :]).sum(axis=1)
+                p_sim[block] = (_folded_count(ge, P) + 1.0) / (P + 1.0)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    z_sim[block] = (Is[block] - sim.mean(axis=1)) / sim.std(axis=1)
+
+    def __repr__(self):
+        return f"ESDAEngine(n={self.n}, permutations={self.permutations})"
+
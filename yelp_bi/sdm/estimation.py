@@ -2,30 +2,33 @@
 Spatial Durbin Model (SDM) Estimation - Advanced Phases 4-7
 YELP BI 2025 - Rice Price Prediction
 
-This script continues from sdm_analysis_complete.py to implement:
+Continues from analysis.py (phases 1-3) to implement:
 4. Model Estimation (SDM with Fixed Effects)
 5. Output & Interpretation (Effects Decomposition)
 6. Validation & Robustness
 7. Policy Simulation
 
+spreg is imported by the phases that fit models, so importing this module
+does not load it.
+
 Requirements:
     pip install pandas numpy scipy statsmodels pysal spreg libpysal esda splot geopandas
 """
 
-import os
-import pickle
 import warnings
 import numpy as np
 import pandas as pd
-from datetime import datetime
-from scipy import stats
-from scipy.linalg import inv
-import libpysal
-from libpysal.weights import W, KNN
-import spreg
-from spreg import Panel_FE_Lag, GM_Lag, ML_Lag
-import matplotlib.pyplot as plt
-import seaborn as sns
+from .analysis import make_output_dirs
+from .weights_registry import get_registry, canonical_spec
+from .location_index import LocationIndex
+from .logdet import spreg_method
+from .spatial_multiplier import SpatialMultiplier, DENSE_MAX_N
+from .spatial_impacts import sdm_impacts, model_coefficients
+from .spatial_design import get_design_cache, data_key, weights_key
+from .model_cache import get_model_cache, compare
+from .schemas import read_merged
+from .policy_scenarios import PolicyScenarios, shock_table
+from .robustness_grid import RobustnessGrid, make_grid, monthly_panel, X_VARS
 
 warnings.filterwarnings('ignore')
 
@@ -39,6 +42,17 @@ class SDMEstimation:
         self.models = {}
         self.data = {}
         self.weights = {}
+        self.weight_specs = {}
+        # Canonical location order, and the subset the SDM was estimated on
+        self.location_index = None
+        self.model_index = None
+        self.model_weights = None
+        # Estimation data of fase4 and the model cache entry of its fit
+        self.model_data = None
+        self.model_key = None
+        # Impacts table from fase5b
+        self.impacts = None
+        make_output_dirs()
 
     def load_preprocessed_data(self):
         """Load preprocessed data from Phase 1"""
@@ -47,7 +61,7 @@ class SDMEstimation:
         print("="*80)
 
         # Load merged dataset
-        df = pd.read_csv('sdm_results/fase1/1b_merged_dataset.csv', parse_dates=['date'])
+        df = read_merged('sdm_results/fase1/1b_merged_dataset.csv')
         print(f"\nDataset loaded: {df.shape}")
 
         self.data['merged'] = df
@@ -57,19 +71,38 @@ class SDMEstimation:
         """Reconstruct spatial weights matrices"""
         print("\n--- Reconstructing spatial weights ---")
 
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-        coords = coords_df[['longitude', 'latitude']].values
+        index = LocationIndex.from_weather(self.base_dir)
+        if 'merged' in self.data:
+            index = index.subset(self.data['merged']['location_name'].unique())
+        self.location_index = index
 
-        # Create KNN weights
+        # KNN weights, served from the weights cache after the first run
+        registry = get_registry()
         for k in [3, 5, 8]:
-            w_knn = KNN.from_array(coords, k=k)
-            w_knn.transform = 'r'
-            self.weights[f'knn{k}'] = w_knn
+            self.weight_specs[f'knn{k}'] = f'knn:k={k},transform=r'
+            self.weights[f'knn{k}'] = registry.for_index(self.weight_specs[f'knn{k}'], index).w
 
         print(f"Spatial weights reconstructed: {list(self.weights.keys())}")
         return self.weights
 
+    def model_record(self):
+        """Cached record (coefficients, covariance, residuals) of the fase4 model"""
+        if self.model_key is None:
+            return None
+        return get_model_cache().get(*self.model_key)
+
+    def get_impact_traces(self):
+        """Traces of powers of the model weights, from the design cache (once per W)"""
+        return get_design_cache().traces(self.model_weights)
+
+    def model_variables(self, sdm, X_vars=X_VARS):
+        """X_vars the fitted model kept, with a note for each one it dropped"""
+        names = set(model_coefficients(sdm)[0])
+        for var in X_vars:
+            if var not in names:
+                print(f"⚠ {var} is not in the model (dropped as constant across locations); skipped")
+        return [var for var in X_vars if var in names]
+
     # =========================================================================
     # FASE 4: MODEL ESTIMATION
     # =========================================================================
@@ -94,7 +127,7 @@ class SDMEstimation:
         # This creates a manageable panel
         df_commodity['year_month'] = pd.to_datetime(df_commodity['date']).dt.to_period('M')
 
-        df_panel = df_commodity.groupby(['location_name', 'year_month']).agg({
+        df_panel = df_commodity.groupby(['location_name', 'year_month'], observed=True).agg({
             'price': 'mean',
             'precipitation_mm': 'sum',  # Total monthly precipitation
             'temperature_mean_c': 'mean',
@@ -120,7 +153,7 @@ class SDMEstimation:
         # Option 1: Time-averaged cross-section (for simplicity)
         print("\n--- Using Time-Averaged Cross-Sectional Data ---")
 
-        df_cross = df_panel.groupby('location_name').agg({
+        df_cross = df_panel.groupby('location_name', observed=True).agg({
             'price': 'mean',
             'precipitation_mm': 'mean',
             'temperature_mean_c': 'mean',
@@ -129,24 +162,29 @@ class SDMEstimation:
             'avg_distance_km': 'first'
         }).reset_index()
 
-        # Get coordinates for proper ordering
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-        df_cross = df_cross.merge(coords_df, on='location_name', how='left')
-        df_cross = df_cross.dropna()
+        # Rows in location-index order; W is rebuilt if incomplete rows were dropped
+        df_cross = self.location_index.align(df_cross).dropna()
+        index = self.location_index.subset(df_cross['location_name'])
+        if len(index) != w.n:
+            w = get_registry().for_index(self.weight_specs[w_type], index).w
+        self.model_index = index
+        self.model_weights = w
+        self.impacts = None
 
         print(f"Cross-sectional observations: {len(df_cross)}")
 
         # Prepare y and X
-        y = df_cross['price'].values.reshape(-1, 1)
+        y = df_cross['price'].to_numpy(dtype=np.float64).reshape(-1, 1)
         X_vars = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
                  'luas_panen_ha', 'avg_distance_km']
-        X = df_cross[X_vars].values
+        X = df_cross[X_vars].to_numpy(dtype=np.float64)
 
         print(f"\ny shape: {y.shape}")
         print(f"X shape: {X.shape}")
 
         # Estimate Spatial Durbin Model using GM_Lag (Generalized Method of Moments)
+        from spreg import GM_Lag, ML_Lag
+
         print("\n--- ESTIMATING SPATIAL DURBIN MODEL (GM) ---")
 
         try:
@@ -176,6 +214,7 @@ class SDMEstimation:
             sdm = ML_Lag(
                 y, X, w=w,
                 slx_lags=1,
+                method=spreg_method(w.n),
                 name_y='price',
                 name_x=X_vars,
                 name_w=w_type,
@@ -191,23 +230,20 @@ class SDMEstimation:
 
             self.models['sdm_ml'] = sdm
 
+        # Compact record for fase5a / fase6a (and any later run on the same data)
+        self.model_data = {'y': y, 'X': X, 'names': X_vars}
+        self.model_key = (data_key(y, X), {'model': type(sdm).__name__, 'x': X_vars,
+                                           'slx_lags': 1, 'weights': weights_key(w)})
+        record = get_model_cache().put(*self.model_key, sdm)
+
         # Save model summary
         with open('sdm_results/fase4/4_sdm_summary.txt', 'w') as f:
             f.write(str(sdm.summary))
 
-        # Extract and save coefficients
-        coef_names = ['Constant'] + X_vars + [f'W_{x}' for x in X_vars] + ['rho']
-        n_coefs = len(sdm.betas)
-
-        coef_df = pd.DataFrame({
-            'Variable': coef_names[:n_coefs],
-            'Coefficient': sdm.betas.flatten(),
-            'Std_Error': np.sqrt(np.diag(sdm.vm)) if hasattr(sdm, 'vm') else [np.nan]*n_coefs,
-        })
-
-        if hasattr(sdm, 'z_stat'):
-            coef_df['Z_stat'] = sdm.z_stat.flatten()
-            coef_df['P_value'] = [2 * (1 - stats.norm.cdf(abs(z))) for z in sdm.z_stat.flatten()]
+        # Extract and save coefficients; names come from the fitted model, which
+        # leaves out regressors dropped as constant across locations
+        coef_df = record.coefficient_table()
+        coef_df['Variable'] = coef_df['Variable'].replace({'CONSTANT': 'Constant'})
 
         print("\n--- COEFFICIENT ESTIMATES ---")
         print(coef_df)
@@ -227,57 +263,57 @@ class SDMEstimation:
         print("FASE 5A: MODEL FIT STATISTICS")
         print("="*80)
 
-        sdm = self.models.get('sdm_gm') or self.models.get('sdm_ml')
+        record = self.model_record()
 
-        if sdm is None:
+        if record is None:
             print("✗ No model found. Run fase4 first.")
             return
 
         # Extract fit statistics
         print("\n--- MODEL FIT STATISTICS ---")
 
-        stats_dict = {
-            'N_observations': sdm.n,
-            'N_variables': sdm.k,
+        stats_dict = record.fit_statistics()
+        labels = {
+            'Pseudo_R2': "Pseudo R²: {:.4f}",
+            'Log_Likelihood': "Log-Likelihood: {:.2f}",
+            'AIC': "AIC: {:.2f}",
+            'BIC': "BIC: {:.2f}",
+            'RMSE': "RMSE: Rp {:.2f}",
+            'MAPE': "MAPE: {:.2f}%",
+            'Rho': "Spatial Rho (ρ): {:.4f}"
         }
-
-        # R-squared
-        if hasattr(sdm, 'pr2'):
-            stats_dict['Pseudo_R2'] = sdm.pr2
-            print(f"Pseudo R²: {sdm.pr2:.4f}")
-
-        # Log-likelihood
-        if hasattr(sdm, 'logll'):
-            stats_dict['Log_Likelihood'] = sdm.logll
-            print(f"Log-Likelihood: {sdm.logll:.2f}")
-
-        # AIC
-        if hasattr(sdm, 'aic'):
-            stats_dict['AIC'] = sdm.aic
-            print(f"AIC: {sdm.aic:.2f}")
-
-        # BIC (calculate manually if not available)
-        if hasattr(sdm, 'logll'):
-            bic = -2 * sdm.logll + sdm.k * np.log(sdm.n)
-            stats_dict['BIC'] = bic
-            print(f"BIC: {bic:.2f}")
-
-        # RMSE
-        if hasattr(sdm, 'u'):
-            rmse = np.sqrt(np.mean(sdm.u ** 2))
-            stats_dict['RMSE'] = rmse
-            print(f"RMSE: Rp {rmse:.2f}")
-
-        # MAPE
-        if hasattr(sdm, 'y') and hasattr(sdm, 'predy'):
-            mape = np.mean(np.abs((sdm.y - sdm.predy) / sdm.y)) * 100
-            stats_dict['MAPE'] = mape
-            print(f"MAPE: {mape:.2f}%")
-
-        # Spatial rho
-        if hasattr(sdm, 'rho'):
-            stats_dict['Rho'] = sdm.rho
-            print(f"Spatial Rho (ρ): {sdm.rho:.4f}")
+        for name, label in labels.items():
+            if name in stats_dict:
+                print(label.format(stats_dict[name]))
+
+        # GM estimates have no likelihood: compare OLS, SAR and SDM by ML on
+        # the same cross-section (each fitted once per data and spec)
+        print("\n--- MODEL COMPARISON (ML) ---")
+        from spreg import OLS, ML_Lag
+
+        data, w = self.model_data, self.model_weights
+        # Columns constant across locations (e.g. the national fuel price) are
+        # collinear with the intercept; GM_Lag drops them, OLS / ML_Lag do not
+        varying = np.ptp(data['X'], axis=0) > 0
+        y, X = data['y'], data['X'][:, varying]
+        names = [name for name, v in zip(data['names'], varying) if v]
+        method = spreg_method(w.n)
+        candidates = {
+            'OLS': ({'model': 'OLS', 'x': names},
+                    lambda: OLS(y, X, name_y='price', name_x=names)),
+            'SAR': ({'model': 'ML_Lag', 'x': names, 'slx_lags': 0, 'weights': weights_key(w)},
+                    lambda: ML_Lag(y, X, w=w, method=method, name_y='price', name_x=names)),
+            'SDM': ({'model': 'ML_Lag', 'x': names, 'slx_lags': 1, 'weights': weights_key(w)},
+                    lambda: ML_Lag(y, X, w=w, slx_lags=1, method=method, name_y='price', name_x=names)),
+        }
+        cache = get_model_cache()
+        comparison = compare({label: cache.fit(self.model_key[0], spec, fit)
+                              for label, (spec, fit) in candidates.items()})
+        print(comparison[['Model', 'Log_Likelihood', 'AIC', 'BIC', 'Rho']].to_string(index=False))
+        print(f"Preferred by AIC: {comparison.loc[comparison['AIC'].idxmin(), 'Model']}, "
+              f"by BIC: {comparison.loc[comparison['BIC'].idxmin(), 'Model']}")
+        comparison.to_csv('sdm_results/fase5/5a_model_comparison.csv', index=False)
+        self.results['fase5a_comparison'] = comparison
 
         # Save
         stats_df = pd.DataFrame([stats_dict])
@@ -294,51 +330,45 @@ class SDMEstimation:
         print("="*80)
 
         sdm = self.models.get('sdm_gm') or self.models.get('sdm_ml')
+        w = self.model_weights
 
-        if sdm is None or not hasattr(sdm, 'direct'):
-            print("✗ No spatial impacts available. Model may not support decomposition.")
+        if sdm is None or w is None:
+            print("✗ Model or weights not available.")
             return
 
+        # Variables the model kept (GM_Lag drops regressors constant across
+        # locations, e.g. the national BBM price)
+        X_vars = self.model_variables(sdm)
+
+        # LeSage-Pace impacts from traces of W, CIs from coefficient draws
+        impacts = sdm_impacts(sdm, self.get_impact_traces(), variables=X_vars, n_draws=2000)
+
         # Extract direct, indirect, total effects
         print("\n--- DIRECT EFFECTS ---")
         print("(Average effect of X in location i on Y in location i)")
-        print(sdm.direct)
+        print(impacts[['Direct', 'Direct_CI_Lower', 'Direct_CI_Upper']])
 
         print("\n--- INDIRECT EFFECTS (Spillover) ---")
         print("(Average effect of X in location j on Y in location i)")
-        print(sdm.indirect)
+        print(impacts[['Indirect', 'Indirect_CI_Lower', 'Indirect_CI_Upper']])
 
         print("\n--- TOTAL EFFECTS ---")
         print("(Direct + Indirect)")
-        print(sdm.total)
+        print(impacts[['Total', 'Total_CI_Lower', 'Total_CI_Upper']])
 
         # Create summary table
-        X_vars = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
-                 'luas_panen_ha', 'avg_distance_km']
-
-        effects_data = []
-
-        for i, var in enumerate(X_vars):
-            effects_data.append({
-                'Variable': var,
-                'Direct_Effect': sdm.direct[i] if hasattr(sdm, 'direct') else np.nan,
-                'Indirect_Effect': sdm.indirect[i] if hasattr(sdm, 'indirect') else np.nan,
-                'Total_Effect': sdm.total[i] if hasattr(sdm, 'total') else np.nan,
-            })
-
-        effects_df = pd.DataFrame(effects_data)
+        effects_df = impacts.rename(columns={
+            'Direct': 'Direct_Effect', 'Indirect': 'Indirect_Effect', 'Total': 'Total_Effect'
+        }).reset_index()
 
         print("\n--- EFFECTS SUMMARY TABLE ---")
-        print(effects_df)
+        print(effects_df[['Variable', 'Direct_Effect', 'Indirect_Effect', 'Total_Effect']])
 
         # Interpretation
         print("\n--- INTERPRETATION EXAMPLE ---")
         print("\nVariable: BBM (bbm_price_idr)")
-        bbm_idx = X_vars.index('bbm_price_idr')
-        if hasattr(sdm, 'direct'):
-            direct_bbm = sdm.direct[bbm_idx]
-            indirect_bbm = sdm.indirect[bbm_idx]
-            total_bbm = sdm.total[bbm_idx]
+        if 'bbm_price_idr' in impacts.index:
+            direct_bbm, indirect_bbm, total_bbm = impacts.loc['bbm_price_idr', ['Direct', 'Indirect', 'Total']]
 
             print(f"Direct: {direct_bbm:.4f}")
             print(f"  → BBM +Rp 1000/liter → local price +Rp {direct_bbm * 1000:.2f}/kg")
@@ -348,11 +378,14 @@ class SDMEstimation:
 
             print(f"Total: {total_bbm:.4f}")
             print(f"  → Total system effect: +Rp {total_bbm * 1000:.2f}/kg")
+        else:
+            print("Not in the model (constant across locations), no effects to interpret")
 
         # Save
         effects_df.to_csv('sdm_results/fase5/5b_effects_decomposition.csv', index=False)
 
         self.results['fase5b'] = effects_df
+        self.impacts = impacts
         print("\n✓ FASE 5B completed.")
         return effects_df
 
@@ -363,7 +396,8 @@ class SDMEstimation:
         print("="*80)
 
         sdm = self.models.get('sdm_gm') or self.models.get('sdm_ml')
-        w = self.weights.get('knn3')
+        w = self.model_weights
+        index = self.model_index
 
         if sdm is None or w is None:
             print("✗ Model or weights not available.")
@@ -374,61 +408,50 @@ class SDMEstimation:
 
         print(f"\nSpatial lag parameter (ρ): {rho:.4f}")
 
-        # Spatial multiplier: (I - ρW)^(-1)
+        # Spatial multiplier: (I - ρW)^(-1), used through sparse solves only
         n = w.n
-        W_full = w.full()[0]  # Get full weight matrix
+        M = SpatialMultiplier(w.sparse, rho)
 
-        I = np.eye(n)
-        multiplier_matrix = inv(I - rho * W_full)
+        # Rows and columns follow the location index the model was estimated on
+        locations = index.names
 
-        print(f"\nMultiplier matrix shape: {multiplier_matrix.shape}")
-
-        # Diagonal elements (own-location effects)
-        diag_multipliers = np.diag(multiplier_matrix)
+        # Own-location effects and totals (row sums) per location
+        multiplier_summary = M.summary(locations)
+        diag_multipliers = multiplier_summary['Own_Effect'].values
         print(f"Average own-location multiplier: {np.mean(diag_multipliers):.4f}")
         print(f"Range: {np.min(diag_multipliers):.4f} - {np.max(diag_multipliers):.4f}")
 
-        # Get location names
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-        locations = coords_df['location_name'].values
-
-        # Create multiplier dataframe
-        multiplier_df = pd.DataFrame(
-            multiplier_matrix,
-            index=locations[:n],
-            columns=locations[:n]
-        )
-
-        print("\n--- MULTIPLIER MATRIX (sample) ---")
-        print(multiplier_df.iloc[:5, :5])
+        # Full matrix only for small systems; otherwise use M.column(j) per shock
+        multiplier_df = None
+        if n <= DENSE_MAX_N:
+            multiplier_df = pd.DataFrame(M.to_dense(), index=locations, columns=locations)
+            print(f"\nMultiplier matrix shape: {multiplier_df.shape}")
+            print("\n--- MULTIPLIER MATRIX (sample) ---")
+            print(multiplier_df.iloc[:5, :5])
+            multiplier_df.to_csv('sdm_results/fase5/5c_spatial_multiplier_matrix.csv')
+        else:
+            print(f"\n{n} locations: full multiplier matrix not materialized")
 
         # Interpretation
         print("\n--- INTERPRETATION ---")
         print("Shock of Rp 1 in location i → total effect on location j:")
-        print(f"  Jakarta → Jakarta: Rp {multiplier_df.iloc[0, 0] if 'DKI Jakarta' in locations else 'N/A':.2f}")
-        print(f"  Jakarta → Others: Rp {multiplier_df.iloc[0, 1:].mean():.2f} (average)")
-
-        # Save
-        multiplier_df.to_csv('sdm_results/fase5/5c_spatial_multiplier_matrix.csv')
+        if 'DKI Jakarta' in index:
+            j = index.position('DKI Jakarta')
+            shock = M.column(j)
+            print(f"  Jakarta → Jakarta: Rp {shock[j]:.2f}")
+            print(f"  Jakarta → Others: Rp {np.delete(shock, j).mean():.2f} (average)")
 
         # Save summary statistics
-        multiplier_summary = pd.DataFrame({
-            'Location': locations[:n],
-            'Own_Effect': diag_multipliers,
-            'Spillover_to_Others': [multiplier_matrix[i, :].sum() - multiplier_matrix[i, i] for i in range(n)],
-            'Total_Effect': multiplier_matrix.sum(axis=1)
-        })
-
         multiplier_summary.to_csv('sdm_results/fase5/5c_multiplier_summary.csv', index=False)
 
         self.results['fase5c'] = {
+            'multiplier': M,
             'multiplier_matrix': multiplier_df,
             'summary': multiplier_summary
         }
 
         print("\n✓ FASE 5C completed.")
-        return multiplier_df
+        return multiplier_df if multiplier_df is not None else multiplier_summary
 
     # =========================================================================
     # FASE 6: VALIDATION & ROBUSTNESS
@@ -440,15 +463,15 @@ class SDMEstimation:
         print("FASE 6A: RESIDUAL DIAGNOSTICS")
         print("="*80)
 
-        sdm = self.models.get('sdm_gm') or self.models.get('sdm_ml')
-        w = self.weights.get('knn3')
+        record = self.model_record()
+        w = self.model_weights
 
-        if sdm is None:
+        if record is None:
             print("✗ Model not available.")
             return
 
-        # Extract residuals
-        residuals = sdm.u.flatten()
+        # Residuals from the model cache, in model_index order (as w)
+        residuals = record.u.astype(np.float64)
 
         print(f"\nResiduals shape: {residuals.shape}")
         print(f"Mean: {np.mean(residuals):.6f}")
@@ -506,77 +529,45 @@ class SDMEstimation:
 
         print("\nTesting model robustness with alternative spatial weights...")
 
-        df = self.data['merged']
-        df_commodity = df[df['commodity_id'] == 'com_1'].copy()
+        # Monthly panel aggregated once and shared with every grid cell
+        if 'monthly' not in self.data:
+            self.data['monthly'] = monthly_panel(self.data['merged'])
 
-        df_commodity['year_month'] = pd.to_datetime(df_commodity['date']).dt.to_period('M')
-        df_panel = df_commodity.groupby(['location_name', 'year_month']).agg({
-            'price': 'mean',
-            'precipitation_mm': 'sum',
-            'temperature_mean_c': 'mean',
-            'bbm_price_idr': 'mean',
-            'luas_panen_ha': 'first',
-            'avg_distance_km': 'first',
-        }).reset_index()
-
-        df_panel['date'] = df_panel['year_month'].dt.to_timestamp()
-        df_panel = df_panel.sort_values(['location_name', 'date'])
-
-        df_cross = df_panel.groupby('location_name').agg({
-            'price': 'mean',
-            'precipitation_mm': 'mean',
-            'temperature_mean_c': 'mean',
-            'bbm_price_idr': 'mean',
-            'luas_panen_ha': 'mean',
-            'avg_distance_km': 'first'
-        }).reset_index()
-
-        df_weather = pd.read_csv(os.path.join(self.base_dir, 'weather_pihps_historical.csv'))
-        coords_df = df_weather[['location_name', 'latitude', 'longitude']].drop_duplicates()
-        df_cross = df_cross.merge(coords_df, on='location_name', how='left').dropna()
+        w_names = [w_name for w_name in ['knn3', 'knn5', 'knn8'] if w_name in self.weight_specs]
+        spec_names = {canonical_spec(self.weight_specs[w_name]): w_name for w_name in w_names}
+        grid = make_grid(['com_1'], [self.weight_specs[w_name] for w_name in w_names])
 
-        y = df_cross['price'].values.reshape(-1, 1)
-        X_vars = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
-                 'luas_panen_ha', 'avg_distance_km']
-        X = df_cross[X_vars].values
+        runner = RobustnessGrid(self.data['monthly'], self.location_index)
+        grid_results = runner.run(grid)
 
         # Test with different W matrices
         robustness_results = []
 
-        for w_name in ['knn3', 'knn5', 'knn8']:
+        for _, rows in grid_results.groupby('cell_id', sort=False):
+            w_name = spec_names[rows['weights'].iloc[0]]
             print(f"\n--- Testing with {w_name} ---")
 
-            w = self.weights.get(w_name)
-            if w is None:
-                print(f"  Skipping {w_name} (not available)")
+            if (rows['status'] != 'ok').any():
+                print(f"  Error: {rows['status'].iloc[0]}")
                 continue
 
-            try:
-                sdm_temp = GM_Lag(
-                    y, X, w=w,
-                    slx_lags=1,
-                    name_y='price',
-                    name_x=X_vars,
-                    name_w=w_name,
-                    name_ds='Robustness'
-                )
-
-                # Extract key coefficients
-                rho = sdm_temp.rho if hasattr(sdm_temp, 'rho') else np.nan
-                bbm_coef = sdm_temp.betas[3, 0]  # Assuming BBM is 3rd variable (index 3 with constant)
-
-                robustness_results.append({
-                    'W_type': w_name,
-                    'Rho': rho,
-                    'BBM_coef': bbm_coef,
-                    'Pseudo_R2': sdm_temp.pr2 if hasattr(sdm_temp, 'pr2') else np.nan,
-                    'N': sdm_temp.n
-                })
-
-                print(f"  ρ = {rho:.4f}, BBM_coef = {bbm_coef:.4f}")
-
-            except Exception as e:
-                print(f"  Error: {str(e)}")
+            # Extract key coefficients by name
+            coef = rows.set_index('term')['estimate']
+            rho = coef['rho']
+            # Missing when BBM is constant across the cell's locations (dropped by gm_lag)
+            bbm_coef = coef.get('bbm_price_idr', np.nan)
+            if np.isnan(bbm_coef):
+                print("  ⚠ bbm_price_idr not in the model (constant across locations)")
+
+            robustness_results.append({
+                'W_type': w_name,
+                'Rho': rho,
+                'BBM_coef': bbm_coef,
+                'Pseudo_R2': rows['pseudo_r2'].iloc[0],
+                'N': int(rows['n'].iloc[0])
+            })
+
+            print(f"  ρ = {rho:.4f}, BBM_coef = {bbm_coef:.4f}")
 
         # Create comparison table
         if len(robustness_results) > 0:
@@ -594,7 +585,11 @@ class SDMEstimation:
             bbm_cv = robust_df['BBM_coef'].std() / abs(robust_df['BBM_coef'].mean()) * 100
 
             print(f"Rho CV: {rho_cv:.2f}%")
-            print(f"BBM coef CV: {bbm_cv:.2f}%")
+            if robust_df['BBM_coef'].isna().all():
+                print("BBM coef CV: n/a (bbm_price_idr not in any model)")
+                bbm_cv = 0.0
+            else:
+                print(f"BBM coef CV: {bbm_cv:.2f}%")
 
             if rho_cv < 10 and bbm_cv < 10:
                 print("✓ Coefficients robust across specifications")
@@ -622,109 +617,91 @@ class SDMEstimation:
 
         sdm = self.models.get('sdm_gm') or self.models.get('sdm_ml')
 
-        if sdm is None or not hasattr(sdm, 'betas'):
+        if sdm is None or not hasattr(sdm, 'betas') or self.model_weights is None:
             print("✗ Model not available.")
             return
 
-        # Extract coefficients
-        # Assuming order: [Constant, precip, temp, bbm, luas_panen, distance, W_precip, W_temp, W_bbm, W_luas_panen, W_distance]
-        betas = sdm.betas.flatten()
-        rho = sdm.rho if hasattr(sdm, 'rho') else 0
+        X_vars = self.model_variables(sdm)
 
-        X_vars = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
-                 'luas_panen_ha', 'avg_distance_km']
+        # Coefficients by name (beta on x, theta on W_x, rho)
+        names, betas, _ = model_coefficients(sdm)
+        coef = dict(zip(names, betas))
+        rho = coef['rho']
 
         print(f"\nModel coefficients:")
-        for i, var in enumerate(X_vars):
-            print(f"  {var}: β={betas[i+1]:.4f}, θ={betas[i+6]:.4f}")
+        for var in X_vars:
+            print(f"  {var}: β={coef[var]:.4f}, θ={coef.get(f'W_{var}', 0.0):.4f}")
 
         print(f"\nSpatial lag (ρ): {rho:.4f}")
 
-        # Simulation scenarios
-        simulations = []
+        # Average impacts per unit change of each X in every location
+        impacts = self.impacts
+        if impacts is None or not set(X_vars) <= set(impacts.index):
+            impacts = sdm_impacts(sdm, self.get_impact_traces(), variables=X_vars, n_draws=2000)
+
+        # Shock table: (scenario, variable, locations, magnitude, duration)
+        labels = {'bbm_price_idr': 'BBM', 'luas_panen_ha': 'Luas Panen', 'precipitation_mm': 'Precipitation'}
+        shock_rows = [
+            ('BBM +15% (Rp 1500)', 'bbm_price_idr', 'all', 1500, 1),
+            ('Luas Panen +10k ha', 'luas_panen_ha', 'all', 10000, 1),
+            ('Extreme Rain +50mm', 'precipitation_mm', 'all', 50, 1),
+        ]
+        if 'DKI Jakarta' in self.model_index:
+            shock_rows.append(('BBM Rp 1500 Jakarta only', 'bbm_price_idr', ['DKI Jakarta'], 1500, 1))
+        for scenario, variable, *_ in shock_rows:
+            if variable not in X_vars:
+                print(f"⚠ Skipping scenario '{scenario}': {variable} is not in the model")
+        shock_rows = [row for row in shock_rows if row[1] in X_vars]
+        if not shock_rows:
+            print("✗ No scenario variable is in the model.")
+            return
+        shocks = shock_table(shock_rows)
 
-        # Scenario 1: BBM shock (+15%)
-        print("\n--- SCENARIO 1: BBM PRICE SHOCK (+15%) ---")
-        bbm_shock = 1500  # Rp increase
-        bbm_idx = X_vars.index('bbm_price_idr')
-
-        direct_effect = betas[bbm_idx + 1] * bbm_shock
-        spatial_effect = betas[bbm_idx + 6] * bbm_shock  # W_bbm coefficient
-
-        # Total effect with multiplier (simplified)
-        multiplier = 1 / (1 - rho)  # Approximate total multiplier
-        total_effect = (direct_effect + spatial_effect) * multiplier
-
-        print(f"BBM increase: +Rp {bbm_shock:.0f}/liter")
-        print(f"Direct effect: +Rp {direct_effect:.2f}/kg")
-        print(f"Spatial spillover: +Rp {spatial_effect:.2f}/kg")
-        print(f"Total effect (with multiplier): +Rp {total_effect:.2f}/kg")
-
-        simulations.append({
-            'Scenario': 'BBM +15% (Rp 1500)',
-            'Variable': 'BBM',
-            'Shock_Size': bbm_shock,
-            'Direct_Effect_Rp': direct_effect,
-            'Spatial_Effect_Rp': spatial_effect,
-            'Total_Effect_Rp': total_effect
-        })
-
-        # Scenario 2: Luas Panen increase (+10,000 ha)
-        print("\n--- SCENARIO 2: LUAS PANEN INCREASE (+10,000 ha) ---")
-        panen_shock = 10000  # ha
-        panen_idx = X_vars.index('luas_panen_ha')
-
-        direct_effect = betas[panen_idx + 1] * panen_shock
-        spatial_effect = betas[panen_idx + 6] * panen_shock
-
-        total_effect = (direct_effect + spatial_effect) * multiplier
-
-        print(f"Luas panen increase: +{panen_shock:,.0f} ha")
-        print(f"Direct effect: Rp {direct_effect:.2f}/kg")
-        print(f"Spatial spillover: Rp {spatial_effect:.2f}/kg")
-        print(f"Total effect: Rp {total_effect:.2f}/kg")
-
-        simulations.append({
-            'Scenario': 'Luas Panen +10k ha',
-            'Variable': 'Luas Panen',
-            'Shock_Size': panen_shock,
-            'Direct_Effect_Rp': direct_effect,
-            'Spatial_Effect_Rp': spatial_effect,
-            'Total_Effect_Rp': total_effect
-        })
-
-        # Scenario 3: Extreme weather (+50mm rainfall)
-        print("\n--- SCENARIO 3: EXTREME WEATHER (+50mm rainfall) ---")
-        rain_shock = 50  # mm
-        rain_idx = X_vars.index('precipitation_mm')
-
-        direct_effect = betas[rain_idx + 1] * rain_shock
-        spatial_effect = betas[rain_idx + 6] * rain_shock
-
-        total_effect = (direct_effect + spatial_effect) * multiplier
-
-        print(f"Rainfall increase: +{rain_shock} mm")
-        print(f"Direct effect: Rp {direct_effect:.2f}/kg")
-        print(f"Spatial spillover: Rp {spatial_effect:.2f}/kg")
-        print(f"Total effect: Rp {total_effect:.2f}/kg")
-
-        simulations.append({
-            'Scenario': 'Extreme Rain +50mm',
-            'Variable': 'Precipitation',
-            'Shock_Size': rain_shock,
-            'Direct_Effect_Rp': direct_effect,
-            'Spatial_Effect_Rp': spatial_effect,
-            'Total_Effect_Rp': total_effect
-        })
+        # All scenarios in one batched solve per coefficient draw
+        engine = PolicyScenarios(sdm, self.model_weights, self.model_index)
+        scenario_results = engine.simulate(shocks, n_draws=500)
+        summary = scenario_results.summary().set_index('scenario')
+
+        simulations = []
+        for number, shock in enumerate(shocks.itertuples(index=False), 1):
+            print(f"\n--- SCENARIO {number}: {shock.scenario.upper()} ---")
+            row = summary.loc[shock.scenario]
+            uniform = isinstance(shock.locations, str) and shock.locations == 'all'
+            # Direct / spillover split of an economy-wide shock comes from the average impacts
+            direct_effect = impacts.loc[shock.variable, 'Direct'] * shock.magnitude if uniform else np.nan
+            spatial_effect = impacts.loc[shock.variable, 'Indirect'] * shock.magnitude if uniform else np.nan
+            total_effect = row['mean_effect']
+
+            print(f"{labels[shock.variable]} shock: +{shock.magnitude:,.0f}")
+            if uniform:
+                print(f"Direct effect: Rp {direct_effect:.2f}/kg")
+                print(f"Spatial spillover: Rp {spatial_effect:.2f}/kg")
+            else:
+                print(f"Largest local effect: Rp {row['max_effect']:.2f}/kg")
+            print(f"Total effect (average over locations): Rp {total_effect:.2f}/kg "
+                  f"(90% interval {row['mean_q0.05']:.2f} to {row['mean_q0.95']:.2f})")
+
+            simulations.append({
+                'Scenario': shock.scenario,
+                'Variable': labels[shock.variable],
+                'Shock_Size': shock.magnitude,
+                'Direct_Effect_Rp': direct_effect,
+                'Spatial_Effect_Rp': spatial_effect,
+                'Total_Effect_Rp': total_effect,
+                'Total_Q05_Rp': row['mean_q0.05'],
+                'Total_Q95_Rp': row['mean_q0.95']
+            })
 
         # Save simulations
         sim_df = pd.DataFrame(simulations)
         sim_df.to_csv('sdm_results/fase7/7_policy_simulations.csv', index=False)
+        scenario_results.to_frame().to_csv('sdm_results/fase7/7_scenario_locations.csv', index=False)
 
         print("\n--- SIMULATION SUMMARY ---")
         print(sim_df)
 
         self.results['fase7'] = sim_df
+        self.results['fase7_scenarios'] = scenario_results
 
         print("\n✓ FASE 7 completed.")
         return sim_df
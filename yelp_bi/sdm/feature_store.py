@@ -0,0 +1,362 @@
+"""
+Daily Feature Store
+===================
+Single merge stage for the daily PIHPS + weather + BBM + luas panen +
+facility distance table used by every SDM script.
+
+The merged table is persisted in sdm_results/cache/features/ under a key
+made of the content hashes of all input files plus the merge parameters;
+later runs load it directly and skip the merge unless an input changed.
+
+Features:
+    - Content fingerprints per input, memoized by (size, mtime) in a small
+      manifest so unchanged files are not re-hashed on every run
+    - read_source(): typed Parquet copies of the raw PIHPS / weather / BBM /
+      panen CSVs (dates already parsed) for scripts that need the sources
+    - Monthly BBM and yearly luas panen aligned by as-of joins (asof_join.py)
+      instead of merges and a groupby ffill over the daily frame
+    - clean_features(): the shared cleaning rule of the SDM phases
+    - Merged table stored and returned in the compact schema of schemas.py
+      (categoricals, float32, int16 year)
+    - Parquet storage when pyarrow is available, pickle otherwise
+
+Usage:
+    from yelp_bi.sdm.feature_store import load_daily_features, clean_features, read_source
+
+    df = load_daily_features()                 # merged once, then from cache
+    df_clean = clean_features(df)
+
+    df_prices = read_source('pihps')           # raw sources, dates parsed
+    df_weather = read_source('weather')
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from ..asof_join import as_year_start, asof_join
+from ..facility_catalog import get_catalog, load_facilities
+from .schemas import apply_schema
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+
+CACHE_DIR = os.path.join('sdm_results', 'cache', 'features')
+FORMAT_VERSION = 2
+
+# Source files relative to the project root, with their date columns
+SOURCES = {
+    'pihps': (os.path.join('cleaned_pihps_data', 'cleaned_combined.csv'), ['date']),
+    'weather': ('weather_pihps_historical.csv', ['date']),
+    'bbm': ('indonesia_gasoline_prices_5y.csv', ['Date']),
+    'panen': (os.path.join('bps-jakarta-data', 'jawa_barat_rice_production_2020_2024.csv'), []),
+}
+
+RICE_COMMODITIES = ['com_1', 'com_2', 'com_3', 'com_4', 'com_5', 'com_6']
+
+WEATHER_COLUMNS = ['temperature_mean_c', 'precipitation_mm', 'rain_mm',
+                   'precipitation_hours', 'windspeed_max_kmh']
+PANEN_COLUMNS = ['luas_panen_ha', 'produktivitas_ku_ha', 'produksi_ton']
+
+# PIHPS location -> BPS kabupaten/kota (DKI Jakarta has no luas panen data)
+LOCATION_TO_KABUPATEN = {
+    'Bandung': 'Bandung', 'Bekasi': 'Bekasi', 'Bogor': 'Bogor',
+    'Cianjur': 'Cianjur', 'Cirebon': 'Cirebon', 'Garut': 'Garut',
+    'Indramayu': 'Indramayu', 'Karawang': 'Karawang', 'Kuningan': 'Kuningan',
+    'Majalengka': 'Majalengka', 'Purwakarta': 'Purwakarta', 'Subang': 'Subang',
+    'Sukabumi': 'Sukabumi', 'Sumedang': 'Sumedang', 'Tasikmalaya': 'Tasikmalaya',
+    'DKI Jakarta': None,
+}
+
+# Rows without these are dropped by clean_features()
+REQUIRED_COLUMNS = ['price', 'precipitation_mm', 'bbm_price_idr']
+
+
+class FeatureStore:
+    """
+    Content-addressed cache of the merged daily feature table
+    """
+
+    def __init__(self, base_dir: str = '.', cache_dir: str = CACHE_DIR):
+        """
+        Initialize store
+
+        Args:
+            base_dir (str): Project root holding the source files (default: '.')
+            cache_dir (str): Directory for persisted tables, relative to the
+                working directory like the other caches (default: sdm_results/cache/features)
+        """
+        self.base_dir = base_dir
+        self.cache_dir = cache_dir
+        self._manifest_path = os.path.join(cache_dir, 'file_hashes.json')
+        self._manifest: Optional[Dict[str, dict]] = None
+        self._memory: Dict[str, pd.DataFrame] = {}
+        # Phases may share the store from several threads (pipeline.py)
+        self._lock = threading.RLock()
+
+    def source_path(self, name: str) -> str:
+        """Absolute path of a source file"""
+        if name not in SOURCES:
+            raise KeyError(f"Unknown source '{name}'. Available: {sorted(SOURCES)}")
+        return os.path.abspath(os.path.join(self.base_dir, SOURCES[name][0]))
+
+    def _load_manifest(self) -> Dict[str, dict]:
+        if self._manifest is None:
+            self._manifest = {}
+            if os.path.exists(self._manifest_path):
+                with open(self._manifest_path, 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+        return self._manifest
+
+    def file_hash(self, path: str) -> str:
+        """
+        SHA-1 of a file's content, re-hashed only when its size or mtime changed
+
+        Args:
+            path (str): File path
+
+        Returns:
+            str: Hex digest (20 characters)
+        """
+        with self._lock:
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            manifest = self._load_manifest()
+            entry = manifest.get(path)
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                return entry['sha1']
+
+            h = hashlib.sha1()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+            digest = h.hexdigest()[:20]
+            manifest[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': digest}
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            return digest
+
+    def key(self, commodities: Optional[Sequence[str]], facility_version: str) -> str:
+        """Key of a merged table: input content hashes + merge parameters"""
+        h = hashlib.sha1()
+        h.update(f'v{FORMAT_VERSION}'.encode())
+        for name in SOURCES:
+            h.update(self.file_hash(self.source_path(name)).encode())
+        facility_csv = get_catalog(self.base_dir).csv_path(facility_version)
+        h.update(self.file_hash(facility_csv).encode())
+        h.update(repr(sorted(commodities) if commodities is not None else None).encode())
+        return h.hexdigest()[:20]
+
+    # -------------------------------------------------------------------------
+    # Storage
+    # -------------------------------------------------------------------------
+
+    def _table_path(self, stem: str) -> str:
+        return os.path.join(self.cache_dir, stem + ('.parquet' if HAS_PARQUET else '.pkl'))
+
+    def _read_table(self, path: str) -> pd.DataFrame:
+        return pd.read_parquet(path) if HAS_PARQUET else pd.read_pickle(path)
+
+    def _write_table(self, df: pd.DataFrame, path: str):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = path + '.tmp'
+        if HAS_PARQUET:
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, path)
+
+    def read_source(self, name: str) -> pd.DataFrame:
+        """
+        Raw source table with its date columns parsed, from a typed copy
+
+        Args:
+            name (str): 'pihps', 'weather', 'bbm' or 'panen'
+
+        Returns:
+            pd.DataFrame: Copy of the source (callers may modify it)
+        """
+        with self._lock:
+            path = self.source_path(name)
+            stem = f'source_{name}_{self.file_hash(path)}'
+            if stem not in self._memory:
+                table = self._table_path(stem)
+                if os.path.exists(table):
+                    df = self._read_table(table)
+                else:
+                    df = pd.read_csv(path, parse_dates=SOURCES[name][1])
+                    self._write_table(df, table)
+                self._memory[stem] = df
+            return self._memory[stem].copy()
+
+    # -------------------------------------------------------------------------
+    # Merge
+    # -------------------------------------------------------------------------
+
+    def build(self, commodities: Optional[Sequence[str]] = RICE_COMMODITIES,
+              facility_version: str = 'latest', verbose: bool = True) -> pd.DataFrame:
+        """
+        Merge the sources into the daily feature table (no caching)
+
+        Args:
+            commodities (Sequence[str], optional): commodity_id values to keep
+                (default: rice com_1..com_6; None keeps all)
+            facility_version (str): Facility snapshot for avg_distance_km
+            verbose (bool): Print shapes and missing shares per step
+
+        Returns:
+            pd.DataFrame: One row per PIHPS observation, sorted by location,
+                commodity and date, in the schemas.py types; not yet cleaned
+                (see clean_features)
+        """
+        def report(step: str, column: str):
+            if verbose:
+                missing = df[column].isnull().sum()
+                print(f"  After {step} merge: {df.shape}, {column} missing: "
+                      f"{missing} ({missing / max(len(df), 1) * 100:.2f}%)")
+
+        df = self.read_source('pihps')
+        if commodities is not None:
+            df = df[df['commodity_id'].isin(list(commodities))]
+        if verbose:
+            print(f"  PIHPS rows: {len(df)} ({df['commodity_id'].nunique()} commodities, "
+                  f"{df['location_name'].nunique()} locations)")
+
+        # 1. Weather (daily, per location)
+        df_weather = self.read_source('weather')
+        df = df.merge(df_weather[['date', 'location_name'] + WEATHER_COLUMNS],
+                      on=['date', 'location_name'], how='left')
+        report('weather', 'precipitation_mm')
+
+        # 2. BBM (monthly): each day takes the price of the latest month at or
+        #    before its own, so months without a price carry the previous one
+        df_bbm = self.read_source('bbm')
+        df['year_month'] = df['date'].dt.to_period('M')
+        df_bbm['month_start'] = df_bbm['Date'].dt.to_period('M').dt.start_time
+        df = asof_join(df, df_bbm, on='date', right_on='month_start',
+                       columns={'Price_IDR_per_Liter': 'bbm_price_idr'})
+        report('BBM', 'bbm_price_idr')
+
+        # 3. Luas panen (yearly, per kabupaten): exact calendar-year match
+        df_panen = self.read_source('panen')
+        df_panen['year_start'] = as_year_start(df_panen['year'])
+        df['year'] = df['date'].dt.year
+        df['kabupaten_kota'] = df['location_name'].map(LOCATION_TO_KABUPATEN)
+        df = asof_join(df, df_panen, on='date', right_on='year_start', by='kabupaten_kota',
+                       columns=PANEN_COLUMNS, same_period='Y')
+        report('luas panen', 'luas_panen_ha')
+
+        # 4. Average facility distance (static); median for locations without facilities
+        df_facility = load_facilities(facility_version,
+                                      columns=['search_location', 'distance_to_location_km'],
+                                      base_dir=self.base_dir)
+        avg_distance = df_facility.groupby('search_location')['distance_to_location_km'].mean()
+        df['avg_distance_km'] = df['location_name'].map(avg_distance).fillna(avg_distance.median())
+
+        df = df.sort_values(['location_name', 'commodity_id', 'date']).reset_index(drop=True)
+        return apply_schema(df)
+
+    def load(self, commodities: Optional[Sequence[str]] = RICE_COMMODITIES,
+             facility_version: str = 'latest', rebuild: bool = False,
+             verbose: bool = True) -> pd.DataFrame:
+        """
+        Merged daily table, built only when no table for the current inputs exists
+
+        Args:
+            commodities (Sequence[str], optional): As in build()
+            facility_version (str): As in build()
+            rebuild (bool): Ignore a persisted table
+            verbose (bool): Print cache status and merge steps
+
+        Returns:
+            pd.DataFrame: Copy of the merged table (callers may modify it)
+        """
+        with self._lock:
+            key = self.key(commodities, facility_version)
+            stem = f'daily_{key}'
+            if stem not in self._memory or rebuild:
+                path = self._table_path(stem)
+                if os.path.exists(path) and not rebuild:
+                    if verbose:
+                        print(f"  Merged features loaded from cache ({key})")
+                    df = apply_schema(self._read_table(path))
+                else:
+                    df = self.build(commodities, facility_version, verbose)
+                    self._write_table(df, path)
+                    if verbose:
+                        print(f"  Merged features saved to cache ({key})")
+                self._memory[stem] = df
+            return self._memory[stem].copy()
+
+    def clear(self, disk: bool = False):
+        """Forget in-memory tables (and delete persisted tables if disk=True)"""
+        self._memory.clear()
+        if disk and os.path.isdir(self.cache_dir):
+            for fname in os.listdir(self.cache_dir):
+                if fname.endswith(('.parquet', '.pkl')):
+                    os.remove(os.path.join(self.cache_dir, fname))
+
+
+def clean_features(df: pd.DataFrame, required: List[str] = REQUIRED_COLUMNS) -> pd.DataFrame:
+    """
+    Shared cleaning rule: drop rows missing price, precipitation or BBM, and
+    set luas panen to 0 where it is missing (DKI Jakarta has no rice area)
+
+    Returns:
+        pd.DataFrame: Cleaned copy
+    """
+    df = df.dropna(subset=list(required)).copy()
+    df['luas_panen_ha'] = df['luas_panen_ha'].fillna(0)
+    return df
+
+
+# Shared stores so every phase in one process reuses the same memo
+_STORES: Dict[str, FeatureStore] = {}
+
+
+def get_feature_store(base_dir: str = '.') -> FeatureStore:
+    """Return the process-wide store for a project root"""
+    key = os.path.abspath(base_dir)
+    if key not in _STORES:
+        _STORES[key] = FeatureStore(base_dir)
+    return _STORES[key]
+
+
+def load_daily_features(commodities: Optional[Sequence[str]] = RICE_COMMODITIES,
+                        facility_version: str = 'latest', base_dir: str = '.',
+                        verbose: bool = True) -> pd.DataFrame:
+    """
+    Merged daily feature table from the shared store
+
+    Args:
+        commodities (Sequence[str], optional): commodity_id values (default: rice; None = all)
+        facility_version (str): Facility snapshot (default: 'latest')
+        base_dir (str): Project root (default: '.')
+        verbose (bool): Print cache status and merge steps
+
+    Returns:
+        pd.DataFrame: Uncleaned merged table
+
+    Example:
+        >>> df = clean_features(load_daily_features())
+    """
+    return get_feature_store(base_dir).load(commodities, facility_version, verbose=verbose)
+
+
+def read_source(name: str, base_dir: str = '.') -> pd.DataFrame:
+    """
+    Raw source table ('pihps', 'weather', 'bbm', 'panen') from the shared store
+
+    Example:
+        >>> df_prices = read_source('pihps')
+    """
+    return get_feature_store(base_dir).read_source(name)
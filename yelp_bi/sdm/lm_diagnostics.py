@@ -0,0 +1,264 @@
+"""
+Spatial LM Diagnostics
+======================
+Lagrange multiplier tests for spatial dependence in OLS residuals (Anselin
+1988; robust forms from Anselin et al. 1996) for every (year, commodity,
+weights spec) cross-section in one pass:
+
+    LM-Lag            (e'Wy / s2)^2 / D
+    LM-Error          (e'We / s2)^2 / T
+    Robust LM-Lag     (e'Wy / s2 - e'We / s2)^2 / (D - T)
+    Robust LM-Error   (e'We / s2 - T / D * e'Wy / s2)^2 / (T (1 - T / D))
+    LM-SARMA          Robust LM-Lag + LM-Error  (2 df)
+
+with s2 = e'e / n, T = tr(W'W + W W) and D = (W X b)' M (W X b) / s2 + T.
+The statistics equal spreg.OLS(..., spat_diag=True) up to rounding.
+
+Features:
+    - T computed once per weights matrix
+    - One orthonormal basis of [1, X] (pivoted QR) per regressor set, shared
+      by every slice with the same X (e.g. weather covariates repeated over
+      commodities) and every weights spec; residuals and the projection of
+      W X b come from it without refitting
+    - W y, W e and W X b through the shared spatial design cache, so later
+      estimations on the same data and W reuse the lags
+    - Tidy output (one row per slice and test) and per-slice recommendations
+
+Usage:
+    from yelp_bi.sdm.lm_diagnostics import LMDiagnostics, recommendations
+
+    lm = LMDiagnostics(location_index, specs=['knn:k=3', 'knn:k=5'])
+    tidy = lm.run(df_merged)                         # every year x commodity x spec
+    recommendations(tidy)                            # p-values and recommended model
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.linalg
+import scipy.sparse as sp
+from scipy import stats
+
+from .spatial_design import data_key, get_design_cache, weights_key
+from .weights_registry import canonical_spec, get_registry
+
+
+X_VARS = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
+          'luas_panen_ha', 'avg_distance_km']
+
+# Location-year aggregation of the daily merged data
+YEAR_AGG = {
+    'price': 'mean',
+    'precipitation_mm': 'mean',
+    'temperature_mean_c': 'mean',
+    'bbm_price_idr': 'mean',
+    'luas_panen_ha': 'first',
+    'avg_distance_km': 'first'
+}
+
+TESTS = ['LM-Lag', 'LM-Error', 'Robust LM-Lag', 'Robust LM-Error', 'LM-SARMA']
+
+SLICE_COLUMNS = ['year', 'commodity_id', 'weights']
+
+
+def significance(p: float) -> str:
+    """'Yes***' / 'Yes**' / 'Yes*' at the 0.1% / 1% / 5% levels, otherwise 'No'"""
+    if p < 0.001:
+        return 'Yes***'
+    if p < 0.01:
+        return 'Yes**'
+    if p < 0.05:
+        return 'Yes*'
+    return 'No'
+
+
+def recommend(rlm_lag_p: float, rlm_error_p: float, alpha: float = 0.05) -> str:
+    """Model choice from the robust LM p-values"""
+    lag, error = rlm_lag_p < alpha, rlm_error_p < alpha
+    if lag and error:
+        return "Spatial Durbin Model (SDM) - Both lag and error significant"
+    if lag:
+        return "Spatial Lag Model (SAR) - Only lag significant"
+    if error:
+        return "Spatial Error Model (SEM) - Only error significant"
+    return "OLS sufficient - No spatial dependence"
+
+
+def lm_trace(W) -> float:
+    """T = tr(W'W + W W) = sum(W * W) + sum(W * W')"""
+    W = sp.csr_matrix(getattr(W, 'sparse', W), dtype=np.float64)
+    return float(W.multiply(W).sum() + W.multiply(W.T).sum())
+
+
+def ols_basis(X: np.ndarray, tol: float = 1e-10) -> np.ndarray:
+    """
+    Orthonormal basis Q of the column space of [1, X]
+
+    Pivoted QR with a rank cut, so collinear regressors (e.g. a national
+    fuel price that is constant across locations within a year) do not
+    break the projection.
+    """
+    Z = np.column_stack([np.ones(len(X)), X])
+    Q, R, _ = scipy.linalg.qr(Z, mode='economic', pivoting=True)
+    diag = np.abs(np.diag(R))
+    rank = int((diag > tol * diag[0]).sum()) if len(diag) else 0
+    return Q[:, :rank]
+
+
+def lm_tests(Q: np.ndarray, y: np.ndarray, Wy: np.ndarray, We: np.ndarray,
+             Wfit: np.ndarray, e: np.ndarray, trace: float) -> Dict[str, Tuple[float, int, float]]:
+    """
+    LM statistics from OLS quantities
+
+    Args:
+        Q (np.ndarray): Orthonormal basis of [1, X]
+        y, e (np.ndarray): Dependent variable and OLS residuals
+        Wy, We, Wfit (np.ndarray): W y, W e and W X b (W times the fitted values)
+        trace (float): tr(W'W + W W)
+
+    Returns:
+        dict: Test -> (statistic, df, p-value)
+    """
+    n = len(y)
+    s2 = e @ e / n
+    MWfit = Wfit - Q @ (Q.T @ Wfit)
+    D = MWfit @ MWfit / s2 + trace
+    lag, err = e @ Wy / s2, e @ We / s2
+
+    values = {
+        'LM-Lag': (lag ** 2 / D, 1),
+        'LM-Error': (err ** 2 / trace, 1),
+        'Robust LM-Lag': ((lag - err) ** 2 / (D - trace), 1),
+        'Robust LM-Error': ((err - trace / D * lag) ** 2 / (trace * (1 - trace / D)), 1),
+    }
+    values['LM-SARMA'] = (values['Robust LM-Lag'][0] + values['LM-Error'][0], 2)
+    return {test: (stat, df, stats.chi2.sf(stat, df)) for test, (stat, df) in values.items()}
+
+
+def location_year_panel(df: pd.DataFrame, agg: Dict[str, str] = YEAR_AGG) -> pd.DataFrame:
+    """Daily merged rows -> one row per commodity, location and year"""
+    agg = {col: how for col, how in agg.items() if col in df.columns}
+    return df.groupby(['commodity_id', 'location_name', 'year'], observed=True).agg(agg).reset_index()
+
+
+class LMDiagnostics:
+    """
+    LM-lag / LM-error (and robust) tests for every year x commodity x weights slice
+    """
+
+    def __init__(self, index, specs: Sequence[str] = ('knn:k=3,transform=r',),
+                 x_vars: Sequence[str] = X_VARS, registry=None):
+        """
+        Initialize runner
+
+        Args:
+            index (LocationIndex): Canonical location order
+            specs (Sequence[str]): Weights specs (default: knn k=3, row-standardized)
+            x_vars (Sequence[str]): OLS regressors (a constant is added)
+            registry (WeightsRegistry, optional): Weights cache (default: process-wide)
+        """
+        self.index = index
+        self.specs = [canonical_spec(s) for s in specs]
+        self.x_vars = list(x_vars)
+        self.registry = registry or get_registry()
+        self._traces: Dict[str, float] = {}
+        self._bases: Dict[str, np.ndarray] = {}
+
+    def trace(self, W) -> float:
+        """tr(W'W + W W), once per weights matrix"""
+        key = weights_key(W)
+        if key not in self._traces:
+            self._traces[key] = lm_trace(W)
+        return self._traces[key]
+
+    def basis(self, X: np.ndarray) -> np.ndarray:
+        """Orthonormal basis of [1, X], once per regressor set"""
+        key = data_key(X)
+        if key not in self._bases:
+            self._bases[key] = ols_basis(X)
+        return self._bases[key]
+
+    def cross_sections(self, df: pd.DataFrame, years: Optional[Sequence[int]] = None,
+                       commodities: Optional[Sequence[str]] = None):
+        """
+        Complete location-year cross-sections in index order
+
+        Yields:
+            (year, commodity_id, cross-section, LocationIndex of its locations)
+        """
+        panel = location_year_panel(df)
+        if years is not None:
+            panel = panel[panel['year'].isin(list(years))]
+        if commodities is not None:
+            panel = panel[panel['commodity_id'].isin(list(commodities))]
+        for (year, commodity), cross in panel.groupby(['year', 'commodity_id'], sort=True,
+                                                      observed=True):
+            cross = self.index.align(cross.drop(columns=['commodity_id', 'year']))
+            cross = cross.dropna(subset=['price'] + self.x_vars)
+            yield year, commodity, cross, self.index.subset(cross['location_name'])
+
+    def run(self, df: pd.DataFrame, years: Optional[Sequence[int]] = None,
+            commodities: Optional[Sequence[str]] = None, alpha: float = 0.05) -> pd.DataFrame:
+        """
+        LM tests for every (year, commodity, weights spec) slice
+
+        Args:
+            df (pd.DataFrame): Daily merged data (commodity_id, location_name, year, ...)
+            years (Sequence[int], optional): Years to test (default: all)
+            commodities (Sequence[str], optional): Commodities to test (default: all)
+            alpha (float): Level of the Significant flag (default: 0.05)
+
+        Returns:
+            pd.DataFrame: year, commodity_id, weights, n, Test, Statistic, df,
+                P_value, Significant; slices that cannot be tested get a single
+                row with the reason in `status`
+        """
+        cache = get_design_cache()
+        rows: List[dict] = []
+        for year, commodity, cross, sub in self.cross_sections(df, years, commodities):
+            base = {'year': year, 'commodity_id': commodity, 'n': len(cross)}
+            if len(cross) <= len(self.x_vars) + 2:
+                rows.extend(dict(base, weights=spec, status=f'only {len(cross)} complete locations')
+                            for spec in self.specs)
+                continue
+
+            X = cross[self.x_vars].to_numpy(dtype=np.float64)
+            y = cross['price'].to_numpy(dtype=np.float64)
+            Q = self.basis(X)
+            fitted = Q @ (Q.T @ y)
+            e = y - fitted
+
+            for spec in self.specs:
+                entry = self.registry.for_index(spec, sub)
+                design = cache.design(data_key(X), entry, X, self.x_vars)
+                results = lm_tests(Q, y, design.lag_y(y), design.lag_y(e), design.lag_y(fitted),
+                                   e, self.trace(entry))
+                rows.extend(dict(base, weights=spec, Test=test, Statistic=stat, df=dof,
+                                 P_value=p, Significant=p < alpha, status='ok')
+                            for test, (stat, dof, p) in results.items())
+        return pd.DataFrame(rows)
+
+
+def recommendations(tidy: pd.DataFrame, alpha: float = 0.05) -> pd.DataFrame:
+    """
+    Per-slice p-values of every test and the recommended model
+
+    Args:
+        tidy (pd.DataFrame): Output of LMDiagnostics.run()
+        alpha (float): Significance level of the decision rule
+
+    Returns:
+        pd.DataFrame: year, commodity_id, weights, n, one p-value column per
+            test and Recommendation
+    """
+    ok = tidy[tidy['status'] == 'ok'] if len(tidy) else tidy
+    if ok.empty:
+        return pd.DataFrame(columns=SLICE_COLUMNS + ['n'] + TESTS + ['Recommendation'])
+    wide = ok.pivot_table(index=SLICE_COLUMNS + ['n'], columns='Test', values='P_value',
+                          sort=False)
+    wide = wide[[t for t in TESTS if t in wide.columns]].reset_index()
+    wide.columns.name = None
+    wide['Recommendation'] = [recommend(lag, err, alpha) for lag, err in
+                              zip(wide['Robust LM-Lag'], wide['Robust LM-Error'])]
+    return wide
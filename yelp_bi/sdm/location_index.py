@@ -0,0 +1,168 @@
+"""
+Canonical Location Index
+========================
+One object that fixes the row order of every location-indexed array in the
+SDM pipeline: the spatial weights matrix, the y / X blocks of the panel,
+multiplier matrices and effect tables.
+
+Features:
+    - Sorted location names with their (longitude, latitude) and integer ids
+    - O(1) name -> row lookup, vectorized lookup for whole columns
+    - Aligning cross-sections and stacking panels in index order
+    - Stable fingerprint used as part of the weights cache key
+
+Usage:
+    from yelp_bi.sdm.location_index import LocationIndex
+
+    index = LocationIndex.from_weather('.')
+    index.position('Bandung')                  # row of Bandung in W
+    df['loc_idx'] = index.positions(df['location_name'])
+    df_cross = index.align(df_cross)           # rows in W order
+
+    entry = get_registry().for_index('knn:k=3', index)
+"""
+
+import hashlib
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class LocationIndex:
+    """
+    Sorted location names, coordinates and ids shared by data, weights and models
+    """
+
+    def __init__(self, names: Sequence[str], coords: np.ndarray):
+        """
+        Initialize index (names are sorted; coords follow the same order)
+
+        Args:
+            names (Sequence[str]): Unique location names
+            coords (np.ndarray): (n, 2) array of (longitude, latitude) aligned with names
+        """
+        names = np.asarray(names, dtype=object)
+        coords = np.asarray(coords, dtype=np.float64).reshape(len(names), 2)
+        if len(pd.unique(names)) != len(names):
+            raise ValueError("Location names must be unique")
+
+        order = np.argsort(names.astype(str), kind='stable')
+        self.names = names[order]
+        self.coords = coords[order]
+        self.ids = np.arange(len(self.names), dtype=np.int64)
+        self._lookup: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self._pd_index = pd.Index(self.names, name='location_name')
+
+    # -------------------------------------------------------------------------
+    # Construction
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, name_col: str = 'location_name',
+                   lon_col: str = 'longitude', lat_col: str = 'latitude') -> 'LocationIndex':
+        """Build from any frame with one or more rows per location (first coordinates win)"""
+        unique = df[[name_col, lon_col, lat_col]].drop_duplicates(subset=name_col)
+        unique = unique.dropna(subset=[lon_col, lat_col])
+        return cls(unique[name_col].values, unique[[lon_col, lat_col]].values)
+
+    @classmethod
+    def from_weather(cls, base_dir: str = '.',
+                     weather_file: str = 'weather_pihps_historical.csv') -> 'LocationIndex':
+        """Build from the PIHPS weather file (coordinate columns only, memoized)"""
+        from .weights_registry import load_location_coords
+        return cls.from_frame(load_location_coords(base_dir, weather_file))
+
+    def subset(self, names: Iterable[str]) -> 'LocationIndex':
+        """Index restricted to the given names (unknown names are ignored)"""
+        keep = np.isin(self.names, list(names))
+        return LocationIndex(self.names[keep], self.coords[keep])
+
+    # -------------------------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._lookup
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, LocationIndex)
+                and np.array_equal(self.names, other.names)
+                and np.array_equal(self.coords, other.coords))
+
+    def __repr__(self):
+        return f"LocationIndex(n={len(self)}, fingerprint={self.fingerprint})"
+
+    @property
+    def n(self) -> int:
+        return len(self.names)
+
+    def position(self, name: str) -> int:
+        """Row of a location in every index-aligned array"""
+        return self._lookup[name]
+
+    def positions(self, names) -> np.ndarray:
+        """
+        Rows for a whole column of names in one vectorized lookup
+
+        Args:
+            names (array-like): Location names (e.g. df['location_name'])
+
+        Returns:
+            np.ndarray: int64 rows, same length as names
+        """
+        rows = self._pd_index.get_indexer(pd.Index(names))
+        if (rows < 0).any():
+            unknown = sorted(set(pd.Index(names)[rows < 0]))
+            raise KeyError(f"Locations not in index: {unknown}")
+        return rows.astype(np.int64)
+
+    # -------------------------------------------------------------------------
+    # Alignment
+    # -------------------------------------------------------------------------
+
+    def align(self, df: pd.DataFrame, name_col: str = 'location_name') -> pd.DataFrame:
+        """
+        Reorder a cross-section (one row per location) into index order
+
+        Locations missing from df become NaN rows; rows for locations outside
+        the index are dropped.
+        """
+        aligned = df.set_index(name_col).reindex(self._pd_index).reset_index()
+        return aligned
+
+    def sort_panel(self, df: pd.DataFrame, time_col: str = 'date',
+                   name_col: str = 'location_name', time_major: bool = False) -> pd.DataFrame:
+        """
+        Sort a long panel by (location, time) or (time, location) in index order
+
+        Adds a `loc_idx` column with each row's position in the index.
+        """
+        df = df[df[name_col].isin(self._lookup)].copy()
+        df['loc_idx'] = self.positions(df[name_col])
+        keys = [time_col, 'loc_idx'] if time_major else ['loc_idx', time_col]
+        return df.sort_values(keys, kind='stable')
+
+    def to_frame(self) -> pd.DataFrame:
+        """Index as a DataFrame (loc_idx, location_name, longitude, latitude)"""
+        return pd.DataFrame({
+            'loc_idx': self.ids,
+            'location_name': self.names,
+            'longitude': self.coords[:, 0],
+            'latitude': self.coords[:, 1],
+        })
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of names and coordinates"""
+        h = hashlib.sha1()
+        h.update('\x1f'.join(map(str, self.names)).encode('utf-8'))
+        h.update(np.ascontiguousarray(self.coords).tobytes())
+        return h.hexdigest()[:12]
+
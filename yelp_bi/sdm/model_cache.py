@@ -0,0 +1,435 @@
+"""
+Fitted Model Cache
+==================
+Disk-backed cache of fitted spatial models keyed by (data hash, spec), so the
+Hausman test (fase3e), the AIC/BIC comparison (fase5a) and the residual
+diagnostics (fase6a) read the fits of fase4 instead of estimating them again.
+
+Only what those consumers need is stored, in a compact record:
+
+    names, params, vm       coefficient names, estimates and covariance (float64)
+    u, y, predy             residuals, dependent variable, fitted values (float32)
+    stats                   n, k, logll, aic, bic, sigma2, pr2, rho, ...
+
+Features:
+    - FittedModel.from_model for spreg OLS / GM_Lag / ML_Lag and
+      panel_sdm.PanelSDMResults (fixed or random effects)
+    - ModelCache.fit: cached record, or fit once and store
+    - fit_panel: fit_panel_sdm through the cache, keyed by the balanced panel
+    - hausman: FE vs RE contrast on the common coefficients (rho included)
+    - compare: log-likelihood / AIC / BIC table of several records
+
+Usage:
+    from yelp_bi.sdm.model_cache import get_model_cache, fit_panel, hausman, compare
+
+    fe = fit_panel(df_panel, 'price', X_vars, w.sparse, index, effects='individual')
+    re = fit_panel(df_panel, 'price', X_vars, w.sparse, index, effects='random')
+    hausman(fe, re)                                # statistic, df, p-value
+
+    cache = get_model_cache()
+    sdm = cache.put(data_key(y, X), spec, spreg_model)
+    compare({'SAR': sar, 'SDM': sdm})              # AIC / BIC table
+
+Cached files live in sdm_results/cache/models/<key>.npz with a JSON sidecar
+holding the spec, coefficient names and fit statistics. Both are written to a
+temporary file and moved into place, and concurrent phases (the pipeline runs
+them on threads) fit each key once.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from .panel_sdm import fit_panel_sdm, panel_arrays
+from .spatial_design import data_key, weights_key
+from .spatial_impacts import model_coefficients
+
+
+CACHE_DIR = os.path.join('sdm_results', 'cache', 'models')
+
+# Part of every panel spec; bump when fit_panel_sdm changes its estimates
+CACHE_VERSION = 3
+
+# Arrays of a record and their stored dtype
+ARRAYS = {'params': np.float64, 'vm': np.float64,
+          'u': np.float32, 'y': np.float32, 'predy': np.float32}
+
+# Eigenvalues of V_FE - V_RE below this fraction of the largest are treated as zero
+HAUSMAN_RTOL = 1e-8
+
+STATS = ['model', 'n', 'k', 'logll', 'aic', 'bic', 'sigma2', 'pr2', 'rho', 'effects']
+
+
+def _scalar(value) -> float:
+    """First element of a spreg scalar / (1, 1) array as float, NaN if missing"""
+    if value is None:
+        return np.nan
+    return float(np.ravel(value)[0])
+
+
+def _vector(value) -> Optional[np.ndarray]:
+    return None if value is None else np.ravel(np.asarray(value, dtype=np.float64))
+
+
+class FittedModel:
+    """
+    Compact record of a fitted model
+    """
+
+    def __init__(self, names: Sequence[str], params: np.ndarray, vm: np.ndarray,
+                 u: Optional[np.ndarray] = None, y: Optional[np.ndarray] = None,
+                 predy: Optional[np.ndarray] = None, stats: Optional[dict] = None,
+                 spec: Optional[dict] = None, key: str = ''):
+        """
+        Initialize record
+
+        Args:
+            names (Sequence[str]): Coefficient names (rho last for lag models)
+            params (np.ndarray): (k,) estimates
+            vm (np.ndarray): (k, k) covariance
+            u, y, predy (np.ndarray, optional): Residuals, dependent variable, fitted values
+            stats (dict, optional): Fit statistics (see STATS)
+            spec (dict, optional): Specification the record was cached under
+            key (str): Cache key
+        """
+        self.names = list(names)
+        self.params = np.asarray(params, dtype=np.float64)
+        self.vm = np.asarray(vm, dtype=np.float64)
+        self.u, self.y, self.predy = u, y, predy
+        self.stats = dict(stats or {})
+        self.spec = dict(spec or {})
+        self.key = key
+
+    @classmethod
+    def from_model(cls, model, spec: Optional[dict] = None, key: str = '') -> 'FittedModel':
+        """
+        Record of a spreg model or PanelSDMResults
+
+        Args:
+            model: Fitted spreg OLS / GM_Lag / ML_Lag or panel_sdm.PanelSDMResults
+            spec (dict, optional): Specification to store with the record
+            key (str): Cache key
+
+        Returns:
+            FittedModel: Record (panel residuals are those of the transformed model)
+        """
+        if hasattr(model, 'rho'):
+            names, params, vm = model_coefficients(model)
+        else:
+            params = np.asarray(model.betas, dtype=np.float64).ravel()
+            names = list(getattr(model, 'name_betas', None) or model.name_x)
+            vm = np.asarray(model.vm, dtype=np.float64)[:len(params), :len(params)]
+
+        n = int(model.n) * int(getattr(model, 't', 1))
+        k = int(getattr(model, 'k', len(params)))
+        logll = _scalar(getattr(model, 'logll', None))
+        bic = getattr(model, 'bic', getattr(model, 'schwarz', None))
+        record_stats = {
+            'model': type(model).__name__,
+            'n': n,
+            'k': k,
+            'logll': logll,
+            'aic': _scalar(getattr(model, 'aic', None)),
+            'bic': _scalar(bic) if bic is not None else -2 * logll + k * np.log(n),
+            'sigma2': _scalar(getattr(model, 'sigma2', getattr(model, 'sig2', None))),
+            'pr2': _scalar(getattr(model, 'pr2', None)),
+            'rho': _scalar(getattr(model, 'rho', None)),
+            'effects': getattr(model, 'effects', 'none'),
+        }
+        if getattr(model, 'phi', None) is not None:
+            record_stats['phi'] = float(model.phi)
+
+        return cls(names, params, vm, u=_vector(getattr(model, 'u', None)),
+                   y=_vector(getattr(model, 'y', None)), predy=_vector(getattr(model, 'predy', None)),
+                   stats=record_stats, spec=spec, key=key)
+
+    @property
+    def std_err(self) -> np.ndarray:
+        return np.sqrt(np.diag(self.vm))
+
+    def coefficient_table(self) -> pd.DataFrame:
+        """Variable, Coefficient, Std_Error, Z_stat, P_value"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = self.params / self.std_err
+        return pd.DataFrame({
+            'Variable': self.names,
+            'Coefficient': self.params,
+            'Std_Error': self.std_err,
+            'Z_stat': z,
+            'P_value': 2 * stats.norm.sf(np.abs(z)),
+        })
+
+    def fit_statistics(self) -> dict:
+        """Fit statistics in the layout of 5a_model_fit.csv (NaN entries left out)"""
+        out = {'N_observations': self.stats.get('n'), 'N_variables': self.stats.get('k')}
+        for label, stat in [('Pseudo_R2', 'pr2'), ('Log_Likelihood', 'logll'),
+                            ('AIC', 'aic'), ('BIC', 'bic')]:
+            if np.isfinite(self.stats.get(stat, np.nan)):
+                out[label] = self.stats[stat]
+        if self.u is not None:
+            out['RMSE'] = float(np.sqrt(np.mean(self.u.astype(np.float64) ** 2)))
+        if self.y is not None and self.predy is not None:
+            y = self.y.astype(np.float64)
+            out['MAPE'] = float(np.mean(np.abs((y - self.predy) / y)) * 100)
+        if np.isfinite(self.stats.get('rho', np.nan)):
+            out['Rho'] = self.stats['rho']
+        return out
+
+    def __repr__(self):
+        return (f"FittedModel({self.stats.get('model', '?')}, k={len(self.params)}, "
+                f"n={self.stats.get('n', '?')}, key={self.key!r})")
+
+
+class ModelCache:
+    """
+    Fitted-model records on disk (and in memory for the running process)
+    """
+
+    def __init__(self, cache_dir: Optional[str] = CACHE_DIR):
+        """
+        Initialize cache
+
+        Args:
+            cache_dir (str, optional): Directory for the records (None: memory only)
+        """
+        self.cache_dir = cache_dir
+        self._memory: Dict[str, FittedModel] = {}
+        self._lock = threading.Lock()
+        self._fit_locks: Dict[str, threading.Lock] = {}
+
+    @staticmethod
+    def key(data_key: str, spec: dict) -> str:
+        """Cache key of a data hash and a (JSON-serializable) spec"""
+        raw = data_key + json.dumps(spec, sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+    def get(self, data_key: str, spec: dict) -> Optional[FittedModel]:
+        """Cached record, or None"""
+        key = self.key(data_key, spec)
+        with self._lock:
+            if key not in self._memory and self.cache_dir is not None:
+                record = self._load(key)
+                if record is not None:
+                    self._memory[key] = record
+            return self._memory.get(key)
+
+    def put(self, data_key: str, spec: dict, model) -> FittedModel:
+        """Store a fitted model (or a FittedModel) and return its record"""
+        key = self.key(data_key, spec)
+        if isinstance(model, FittedModel):
+            record = FittedModel(model.names, model.params, model.vm, model.u, model.y,
+                                 model.predy, model.stats, spec, key)
+        else:
+            record = FittedModel.from_model(model, spec, key)
+        with self._lock:
+            self._memory[key] = record
+            if self.cache_dir is not None:
+                self._save(record)
+        return record
+
+    def fit(self, data_key: str, spec: dict, fit: Callable[[], object]) -> FittedModel:
+        """
+        Cached record, or fit() once and store it
+
+        Args:
+            data_key (str): Hash of the estimation data (spatial_design.data_key)
+            spec (dict): Model specification (estimator, regressors, weights key, ...)
+            fit (Callable): Zero-argument function returning the fitted model
+
+        Returns:
+            FittedModel: Record
+        """
+        # One fit per key; fits of other keys (and lookups) go on meanwhile
+        with self._lock:
+            fit_lock = self._fit_locks.setdefault(self.key(data_key, spec), threading.Lock())
+        with fit_lock:
+            record = self.get(data_key, spec)
+            if record is None:
+                record = self.put(data_key, spec, fit())
+        return record
+
+    def clear(self):
+        """Drop the in-memory records and the files on disk"""
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+                return
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(('.npz', '.json')):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def _paths(self, key: str) -> tuple:
+        base = os.path.join(self.cache_dir, key)
+        return base + '.npz', base + '.json'
+
+    def _load(self, key: str) -> Optional[FittedModel]:
+        npz_path, meta_path = self._paths(key)
+        if not (os.path.exists(npz_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with np.load(npz_path) as data:
+            arrays = {name: data[name] for name in ARRAYS if name in data.files}
+        return FittedModel(meta['names'], arrays['params'], arrays['vm'], arrays.get('u'),
+                           arrays.get('y'), arrays.get('predy'), meta['stats'], meta['spec'], key)
+
+    def _save(self, record: FittedModel):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        npz_path, meta_path = self._paths(record.key)
+        arrays = {name: np.asarray(getattr(record, name), dtype=dtype)
+                  for name, dtype in ARRAYS.items() if getattr(record, name) is not None}
+        with open(npz_path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(npz_path + '.tmp', npz_path)
+        meta = {'spec': record.spec, 'names': record.names, 'stats': record.stats}
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2, default=float)
+        os.replace(meta_path + '.tmp', meta_path)
+
+
+# One cache per directory, shared by every phase of the process
+_CACHES: Dict[str, ModelCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_model_cache(cache_dir: str = CACHE_DIR) -> ModelCache:
+    """Return the process-wide model cache for a directory"""
+    key = os.path.abspath(cache_dir)
+    with _CACHES_LOCK:
+        if key not in _CACHES:
+            _CACHES[key] = ModelCache(cache_dir)
+        return _CACHES[key]
+
+
+def panel_data_key(df: pd.DataFrame, y: str, x: Sequence[str], index,
+                   time_col: str = 'date') -> str:
+    """Hash of the balanced panel fit_panel_sdm would estimate on"""
+    values, keep, periods = panel_arrays(df, index, [y] + list(x), time_col)
+    return data_key(values, np.asarray(index.names)[keep].astype(str),
+                    np.asarray(periods).astype(str))
+
+
+def panel_spec(y: str, x: Sequence[str], W, durbin: Optional[Sequence[str]] = None,
+               effects: str = 'individual', bias_correction: bool = True,
+               logdet_method: str = 'auto') -> dict:
+    """Cache spec of a fit_panel_sdm call (every argument that changes the estimates)"""
+    return {
+        'model': 'panel_sdm',
+        'version': CACHE_VERSION,
+        'y': y,
+        'x': list(x),
+        'durbin': list(durbin) if durbin is not None else list(x),
+        'effects': effects,
+        'bias_correction': bool(bias_correction) and effects != 'random',
+        'weights': weights_key(W),
+        'logdet_method': logdet_method,
+    }
+
+
+def fit_panel(df: pd.DataFrame, y: str, x: Sequence[str], W, index, time_col: str = 'date',
+              durbin: Optional[Sequence[str]] = None, effects: str = 'individual',
+              bias_correction: bool = True, logdet_method: str = 'auto',
+              cache: Optional[ModelCache] = None, **kwargs) -> FittedModel:
+    """
+    fit_panel_sdm through the model cache
+
+    Args:
+        df, y, x, W, index, time_col, durbin, effects, bias_correction, logdet_method:
+            As in fit_panel_sdm (all part of the cache spec)
+        cache (ModelCache, optional): Cache (default: process-wide)
+        **kwargs: Output labels for fit_panel_sdm (name_w, name_ds); they do
+            not change the estimates and are not part of the spec
+
+    Returns:
+        FittedModel: Record of the fit
+    """
+    cache = cache or get_model_cache()
+    spec = panel_spec(y, x, W, durbin, effects, bias_correction, logdet_method)
+    return cache.fit(panel_data_key(df, y, x, index, time_col), spec,
+                     lambda: fit_panel_sdm(df, y, x, W, index, time_col=time_col, durbin=durbin,
+                                           effects=effects, bias_correction=bias_correction,
+                                           logdet_method=logdet_method, **kwargs))
+
+
+def hausman(fe: FittedModel, re: FittedModel, exclude: Sequence[str] = ('Constant',),
+            sigmamore: bool = True, rtol: float = HAUSMAN_RTOL) -> dict:
+    """
+    Hausman test of fixed against random effects
+
+        H = (b_FE - b_RE)' [V_FE - V_RE]^-1 (b_FE - b_RE)  ~  chi2(rank)
+
+    on the coefficients both models estimate (rho included, the constant
+    and regressors dropped by the within transformation excluded).
+
+    With sigmamore (as Stata's hausman option) V_FE is rescaled to the RE
+    error variance, which is efficient under H0. With T around 30 the two
+    covariances are nearly equal and their raw difference is often not
+    positive definite; the rescaled one was positive definite in every
+    replication of a simulated SDM panel and had a size closer to nominal.
+    A difference that is still not positive definite (e.g. month dummies,
+    estimated almost identically by both) is inverted on its eigenvectors
+    with eigenvalues above rtol times the largest, and the degrees of
+    freedom are their number.
+
+    Args:
+        fe (FittedModel): Fixed-effects record
+        re (FittedModel): Random-effects record
+        exclude (Sequence[str]): Coefficients left out (default: the constant)
+        sigmamore (bool): Scale V_FE by sigma2_RE / sigma2_FE (default: True)
+        rtol (float): Relative eigenvalue cut for a singular difference
+
+    Returns:
+        dict: statistic, df, p_value, variables, positive_definite
+    """
+    re_pos = {name: i for i, name in enumerate(re.names)}
+    # Coefficients without a finite variance (unidentified in either model) are skipped
+    unidentified = {name for m in (fe, re) for name, se in zip(m.names, m.std_err) if not np.isfinite(se)}
+    common: List[str] = [n for n in fe.names
+                         if n in re_pos and n not in set(exclude) and n not in unidentified]
+    i_fe = [fe.names.index(n) for n in common]
+    i_re = [re_pos[n] for n in common]
+
+    diff = fe.params[i_fe] - re.params[i_re]
+    scale = re.stats['sigma2'] / fe.stats['sigma2'] if sigmamore else 1.0
+    V = scale * fe.vm[np.ix_(i_fe, i_fe)] - re.vm[np.ix_(i_re, i_re)]
+    V = (V + V.T) / 2
+    lam, Q = np.linalg.eigh(V) if len(common) else (np.zeros(0), np.zeros((0, 0)))
+    positive_definite = bool(len(lam) and lam.min() > 0)
+    kept = lam > rtol * lam.max() if len(lam) and lam.max() > 0 else np.zeros(len(lam), dtype=bool)
+    statistic = float(((Q[:, kept].T @ diff) ** 2 / lam[kept]).sum())
+    dof = int(kept.sum())
+    p_value = float(stats.chi2.sf(statistic, dof)) if dof else np.nan
+    return {'statistic': statistic, 'df': dof, 'p_value': p_value,
+            'variables': common, 'positive_definite': positive_definite}
+
+
+def compare(models: Dict[str, FittedModel]) -> pd.DataFrame:
+    """
+    Information criteria of several records
+
+    Args:
+        models (dict): Label -> FittedModel
+
+    Returns:
+        pd.DataFrame: Model, N_observations, N_parameters, Log_Likelihood, AIC,
+            BIC, Pseudo_R2, Rho, Delta_AIC, Delta_BIC (0 for the best model)
+    """
+    table = pd.DataFrame([{
+        'Model': label,
+        'N_observations': m.stats.get('n'),
+        'N_parameters': len(m.params),
+        'Log_Likelihood': m.stats.get('logll', np.nan),
+        'AIC': m.stats.get('aic', np.nan),
+        'BIC': m.stats.get('bic', np.nan),
+        'Pseudo_R2': m.stats.get('pr2', np.nan),
+        'Rho': m.stats.get('rho', np.nan),
+    } for label, m in models.items()])
+    table['Delta_AIC'] = table['AIC'] - table['AIC'].min()
+    table['Delta_BIC'] = table['BIC'] - table['BIC'].min()
+    return table
@@ -0,0 +1,298 @@
+"""
+Incremental Monthly Panel Builder
+=================================
+Monthly commodity x location panel with temporal lag features, maintained
+incrementally from the daily merged table (feature_store.py).
+
+The monthly aggregate is persisted under a key made of a stable name of the
+daily source (e.g. the merged CSV path) and the aggregation spec. Every
+stored (series, month) row carries a fingerprint of the daily rows it was
+aggregated from, and update() re-aggregates only the months whose
+fingerprint is new or changed: appending a month aggregates that month,
+revising one day re-aggregates its month, and re-running on the same data
+aggregates nothing.
+
+Features:
+    - One aggregate per (source, aggregation spec): scripts feeding
+      differently cleaned frames do not share (or overwrite) each other's
+      history
+    - Per-(series, month) fingerprints: an order-independent sum of row
+      hashes, so partial and revised months are detected without a watermark
+    - Lags from one stacked (series x month x variable) array: each lag order
+      is a single shift along the month axis for all variables at once.
+      Lags follow calendar months, so a missing month gives a missing lag
+      instead of silently using an older row
+    - Month of year kept as an int8 code; dummy columns are only expanded for
+      estimation (with_month_dummies)
+
+Usage:
+    from yelp_bi.sdm.panel_builder import MonthlyPanelBuilder, with_month_dummies
+
+    builder = MonthlyPanelBuilder.open('sdm_results/fase1/1b_merged_dataset.csv')
+    builder.update(df_daily)                           # aggregates new / changed months only
+    panel = builder.panel(commodities=['com_1'])       # lags + int8 month code
+    df_est, month_cols = with_month_dummies(panel)     # dummies for the SDM
+"""
+
+import os
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+PANEL_DIR = os.path.join('sdm_results', 'cache', 'panel')
+
+# Part of every aggregate key; bump when aggregate_monthly() changes its output
+FORMAT_VERSION = 3
+
+PANEL_KEYS = ['commodity_id', 'location_name']
+
+PANEL_AGG = {
+    'price': 'mean',
+    'precipitation_mm': 'sum',  # Monthly total
+    'temperature_mean_c': 'mean',
+    'bbm_price_idr': 'mean',
+    'luas_panen_ha': 'first',
+    'avg_distance_km': 'first',
+    'year': 'first'
+}
+
+# Lag feature -> (source column, months)
+LAGS = {
+    'price_lag1': ('price', 1),
+    'bbm_lag1': ('bbm_price_idr', 1),
+    'rain_lag1': ('precipitation_mm', 1),
+    'rain_lag2': ('precipitation_mm', 2),
+    'rain_lag3': ('precipitation_mm', 3),
+    'temp_lag1': ('temperature_mean_c', 1),
+}
+
+# Rows without these lags are dropped from the estimation panel
+REQUIRED_LAGS = ['price_lag1', 'bbm_lag1', 'rain_lag3']
+
+
+def panel_key(source: str, agg: Dict[str, str] = PANEL_AGG,
+              keys: Sequence[str] = PANEL_KEYS) -> str:
+    """Key of a stored aggregate: source name + aggregation spec"""
+    h = hashlib.sha1()
+    h.update(f'v{FORMAT_VERSION}|{source}|{sorted(agg.items())!r}|{list(keys)!r}'.encode())
+    return h.hexdigest()[:20]
+
+
+def month_fingerprints(daily: pd.DataFrame, agg: Dict[str, str] = PANEL_AGG,
+                       keys: Sequence[str] = PANEL_KEYS) -> Tuple[np.ndarray, pd.MultiIndex, np.ndarray]:
+    """
+    Fingerprint of the daily rows behind each (series, month)
+
+    The fingerprint is the wrapping uint64 sum of the row hashes of the key,
+    date and aggregated columns, so it does not depend on row order.
+
+    Returns:
+        Tuple: (n_rows,) group code per daily row, (series, month) groups
+            (keys + year_month) and their (n_groups,) uint64 fingerprints
+    """
+    year_month = pd.to_datetime(daily['date']).dt.to_period('M')
+    codes, groups = pd.factorize(pd.MultiIndex.from_arrays(
+        [daily[k] for k in keys] + [year_month], names=list(keys) + ['year_month']))
+    columns = list(keys) + ['date'] + [col for col in agg if col in daily.columns]
+    row_hash = pd.util.hash_pandas_object(daily[columns], index=False).to_numpy()
+    fingerprints = pd.Series(row_hash).groupby(codes).sum().to_numpy(dtype=np.uint64)
+    return codes, groups, fingerprints
+
+
+def aggregate_monthly(df: pd.DataFrame, agg: Dict[str, str] = PANEL_AGG,
+                      keys: Sequence[str] = PANEL_KEYS) -> pd.DataFrame:
+    """
+    Daily rows -> one row per series and month
+
+    Args:
+        df (pd.DataFrame): Daily data with the key columns and date
+        agg (dict): Column -> aggregation (columns missing from df are skipped)
+        keys (Sequence[str]): Series keys
+
+    Returns:
+        pd.DataFrame: keys, year_month, the aggregated columns and date (month start)
+    """
+    agg = {col: how for col, how in agg.items() if col in df.columns}
+    year_month = pd.to_datetime(df['date']).dt.to_period('M').rename('year_month')
+    monthly = df.groupby([df[k] for k in keys] + [year_month], observed=True).agg(agg).reset_index()
+    monthly['date'] = monthly['year_month'].dt.to_timestamp()
+    return monthly
+
+
+def add_lags(panel: pd.DataFrame, lags: Dict[str, Tuple[str, int]] = LAGS,
+             keys: Sequence[str] = PANEL_KEYS) -> pd.DataFrame:
+    """
+    Lag features from one (series x month x variable) array
+
+    Args:
+        panel (pd.DataFrame): Monthly rows (keys, year_month, source columns)
+        lags (dict): Feature name -> (source column, months)
+        keys (Sequence[str]): Series keys
+
+    Returns:
+        pd.DataFrame: Copy of panel with the lag columns (NaN where the
+            lagged calendar month is not observed)
+    """
+    panel = panel.copy()
+    if panel.empty:
+        for name in lags:
+            panel[name] = np.nan
+        return panel
+
+    sources = list(dict.fromkeys(col for col, _ in lags.values()))
+    series, _ = pd.factorize(pd.MultiIndex.from_frame(panel[list(keys)]))
+    ordinal = panel['year_month'].array.asi8
+    t = ordinal - ordinal.min()
+    n_series, n_months = series.max() + 1, int(t.max()) + 1
+
+    cube = np.full((n_series, n_months, len(sources)), np.nan)
+    cube[series, t] = panel[sources].to_numpy(dtype=np.float64)
+
+    var = {col: j for j, col in enumerate(sources)}
+    shifted = {}
+    for k in sorted({k for _, k in lags.values()}):
+        out = np.full_like(cube, np.nan)
+        if k < n_months:
+            out[:, k:] = cube[:, :n_months - k]            # all variables in one shift
+        shifted[k] = out[series, t]
+    for name, (col, k) in lags.items():
+        panel[name] = shifted[k][:, var[col]]
+    return panel
+
+
+def with_month_dummies(panel: pd.DataFrame, drop_first: bool = True,
+                       month_col: str = 'month') -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Expand the int8 month code into month_<m> dummies for estimation
+
+    Args:
+        panel (pd.DataFrame): Panel with an int8 month column
+        drop_first (bool): Drop the first observed month (default: True, as get_dummies)
+        month_col (str): Month code column (default: 'month')
+
+    Returns:
+        Tuple[pd.DataFrame, List[str]]: Panel with uint8 dummy columns, dummy names
+    """
+    codes = panel[month_col].to_numpy()
+    months = np.unique(codes)
+    if drop_first:
+        months = months[1:]
+    names = [f'month_{m}' for m in months]
+    dummies = pd.DataFrame((codes[:, None] == months[None, :]).astype(np.uint8),
+                           index=panel.index, columns=names)
+    return pd.concat([panel, dummies], axis=1), names
+
+
+class MonthlyPanelBuilder:
+    """
+    Monthly aggregate of the daily merged data, updated month by month
+    """
+
+    def __init__(self, source: Optional[str] = None, cache_dir: Optional[str] = PANEL_DIR,
+                 agg: Dict[str, str] = PANEL_AGG, lags: Dict[str, Tuple[str, int]] = LAGS,
+                 keys: Sequence[str] = PANEL_KEYS):
+        """
+        Initialize an empty builder
+
+        Args:
+            source (str, optional): Stable name of the daily data passed to
+                update(), e.g. the merged CSV path (None: memory only)
+            cache_dir (str, optional): Directory of the persisted aggregates (None: memory only)
+            agg (dict): Monthly aggregation per column
+            lags (dict): Lag features (see LAGS)
+            keys (Sequence[str]): Series keys (default: commodity, location)
+        """
+        self.agg = dict(agg)
+        self.lags = dict(lags)
+        self.keys = list(keys)
+        self.key = panel_key(source, self.agg, self.keys) if source is not None else None
+        self.path = (os.path.join(cache_dir, f'monthly_{self.key}.pkl')
+                     if self.key is not None and cache_dir is not None else None)
+        self.monthly = pd.DataFrame()
+
+    @classmethod
+    def open(cls, source: Optional[str], cache_dir: Optional[str] = PANEL_DIR,
+             **kwargs) -> 'MonthlyPanelBuilder':
+        """Builder with the aggregate persisted for this source and spec loaded (empty if none)"""
+        builder = cls(source, cache_dir, **kwargs)
+        if builder.path is not None and os.path.exists(builder.path):
+            builder.monthly = pd.read_pickle(builder.path)
+        return builder
+
+    def save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        self.monthly.to_pickle(tmp)
+        os.replace(tmp, self.path)
+
+    def _changed(self, groups: pd.MultiIndex, fingerprints: np.ndarray) -> np.ndarray:
+        """Mask of groups that are not stored or were stored with another fingerprint"""
+        if self.monthly.empty:
+            return np.ones(len(groups), dtype=bool)
+        pos = pd.MultiIndex.from_frame(self.monthly[self.keys + ['year_month']]).get_indexer(groups)
+        stored = self.monthly['fingerprint'].to_numpy(dtype=np.uint64)
+        return (pos < 0) | (stored[np.maximum(pos, 0)] != fingerprints)
+
+    def update(self, daily: pd.DataFrame, rebuild: bool = False) -> int:
+        """
+        Aggregate the (series, month) groups that are new or changed and persist
+
+        Stored months absent from daily (e.g. other commodities) are kept.
+
+        Args:
+            daily (pd.DataFrame): Daily merged rows (any subset of series and months)
+            rebuild (bool): Drop the stored aggregate first
+
+        Returns:
+            int: Number of (series, month) rows aggregated
+        """
+        if rebuild:
+            self.monthly = pd.DataFrame()
+        if daily.empty:
+            return 0
+        codes, groups, fingerprints = month_fingerprints(daily, self.agg, self.keys)
+        changed = self._changed(groups, fingerprints)
+        if not changed.any():
+            return 0
+
+        added = aggregate_monthly(daily[changed[codes]], self.agg, self.keys)
+        added['fingerprint'] = fingerprints[groups.get_indexer(
+            pd.MultiIndex.from_frame(added[self.keys + ['year_month']]))]
+        monthly = added
+        if not self.monthly.empty:
+            stale = pd.MultiIndex.from_frame(self.monthly[self.keys + ['year_month']]).isin(
+                pd.MultiIndex.from_frame(added[self.keys + ['year_month']]))
+            monthly = pd.concat([self.monthly[~stale], added], ignore_index=True)
+        self.monthly = monthly.sort_values(self.keys + ['date']).reset_index(drop=True)
+        self.save()
+        return len(added)
+
+    def panel(self, commodities: Optional[Sequence[str]] = None, dropna: bool = True) -> pd.DataFrame:
+        """
+        Lagged monthly panel
+
+        Args:
+            commodities (Sequence[str], optional): commodity_id values (default: all)
+            dropna (bool): Drop rows missing REQUIRED_LAGS (default: True)
+
+        Returns:
+            pd.DataFrame: One row per series and month, lag columns and an
+                int8 `month` code, sorted by keys and date
+        """
+        monthly = self.monthly.drop(columns='fingerprint', errors='ignore')
+        if commodities is not None:
+            monthly = monthly[monthly['commodity_id'].isin(list(commodities))]
+        panel = add_lags(monthly.reset_index(drop=True), self.lags, self.keys)
+        if dropna:
+            panel = panel.dropna(subset=[c for c in REQUIRED_LAGS if c in self.lags])
+        panel['month'] = panel['date'].dt.month.astype(np.int8)
+        return panel.reset_index(drop=True)
+
+    def __repr__(self):
+        n_months = self.monthly['year_month'].nunique() if not self.monthly.empty else 0
+        return f"MonthlyPanelBuilder(key={self.key}, rows={len(self.monthly)}, months={n_months})"
@@ -0,0 +1,726 @@
+"""
+Panel Spatial Durbin Model
+==========================
+Maximum-likelihood SDM for balanced N x T panels with fixed effects:
+
+    y_t = rho * W y_t + X_t beta + W X_t theta + mu + alpha_t + e_t
+
+and its random-effects counterpart (mu_i ~ iid(0, sigma2_mu)).
+
+Features:
+    - Within transformation for individual, time or two-way fixed effects
+    - Random individual effects by Elhorst's iterated quasi-demeaning: the
+      SDM on y - (1 - sqrt(phi)) ybar_i alternates with a scalar search over
+      phi = sigma2 / (T sigma2_mu + sigma2)
+    - Lee-Yu (2010) bias correction via the transformation approach
+      (effective sample (N-1)(T-1) and adjusted log-determinant)
+    - I_T (x) W applied implicitly: W is only ever multiplied with (N, T*K)
+      blocks, never expanded to an NT x NT matrix; the W X lags come from the
+      process-wide spatial_design cache, so refits on the same panel and W
+      reuse them
+    - Regressors without within variation, and W X columns that are exactly
+      collinear with earlier ones (W x = x for a series that is the same in
+      every location, e.g. the national BBM price, under a row-standardized
+      W), are dropped before estimation and listed in `dropped`
+    - ln|I - rho W| from logdet.LogDet: eigenvalues for small N, sparse LU
+      or Chebyshev traces for large N (method picked from N)
+    - Asymptotic variance from the information matrix (Elhorst, 2014); its
+      trace terms in G = W (I - rho W)^-1 come from sparse solves
+      (spatial_multiplier), exact for small N and Hutchinson above
+    - Batched mode for many commodities: W, the log-det engine and (when the
+      regressors coincide) the design and OLS factorization are shared,
+      per-commodity work runs on a thread pool
+
+Usage:
+    from yelp_bi.sdm.panel_sdm import fit_panel_sdm, fit_panel_sdm_many, commodity_summary
+
+    model = fit_panel_sdm(df_panel, y='price', x=X_vars + month_cols, W=w.sparse,
+                          index=location_index, time_col='date',
+                          durbin=X_vars, effects='individual')
+    print(model.summary)
+    model.coefficient_table().to_csv('panel_coefficients.csv', index=False)
+
+    re_model = fit_panel_sdm(df_panel, 'price', X_vars, w.sparse, location_index,
+                             effects='random')     # for a Hausman test against FE
+
+    results = fit_panel_sdm_many(df_all, y='price', x=X_vars, W=w.sparse,
+                                 index=location_index, group_col='commodity_id')
+    commodity_summary(results)                  # rho, beta, theta per commodity
+
+References:
+    Lee, L.F. and Yu, J. (2010). Estimation of spatial autoregressive panel
+        data models with fixed effects. Journal of Econometrics 154, 165-185.
+    Elhorst, J.P. (2014). Spatial Econometrics: From Cross-Sectional Data to
+        Spatial Panels. Springer.
+"""
+
+import hashlib
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy import stats
+from scipy.optimize import minimize_scalar
+
+from .logdet import LogDet
+from .spatial_design import SpatialDesign, data_key, get_design_cache
+from .spatial_multiplier import SpatialMultiplier
+from .spatial_weights import subset_weights
+
+
+EFFECTS = ('none', 'individual', 'time', 'twoways')
+
+# Convergence of the random-effects phi iterations
+RE_TOL = 1e-8
+RE_MAX_ITER = 100
+
+# Columns whose within-transformed std falls below this (relative) are dropped
+_ZERO_VARIANCE_TOL = 1e-10
+
+# Columns whose distance to the span of the columns before them (|R_jj| of a QR)
+# falls below this fraction of their norm are dropped as collinear
+_COLLINEAR_TOL = 1e-8
+
+# Half-width of the first rho search around a warm start
+WARM_START_WIDTH = 0.1
+
+
+# =============================================================================
+# PANEL HELPERS
+# =============================================================================
+
+def spatial_lag(W: sp.spmatrix, A: np.ndarray) -> np.ndarray:
+    """
+    (I_T (x) W) applied to a location-major panel array
+
+    Args:
+        W (sp.spmatrix): (N, N) weights
+        A (np.ndarray): (N, T) or (N, T, K) array
+
+    Returns:
+        np.ndarray: Array of the same shape, W applied along the location axis
+    """
+    return np.asarray(W @ A.reshape(A.shape[0], -1)).reshape(A.shape)
+
+
+def within(A: np.ndarray, effects: str) -> np.ndarray:
+    """
+    Within transformation of a balanced (N, T[, K]) panel array
+
+    Args:
+        A (np.ndarray): Location-major panel array
+        effects (str): 'none', 'individual', 'time' or 'twoways'
+
+    Returns:
+        np.ndarray: Demeaned copy of A
+    """
+    if effects not in EFFECTS:
+        raise ValueError(f"Unknown effects '{effects}'. Use one of {EFFECTS}")
+    A = np.array(A, dtype=np.float64)
+    if effects in ('individual', 'twoways'):
+        A -= A.mean(axis=1, keepdims=True)
+    if effects in ('time', 'twoways'):
+        A -= A.mean(axis=0, keepdims=True)
+    return A
+
+
+def panel_arrays(df: pd.DataFrame, index, columns: Sequence[str],
+                 time_col: str = 'date') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reshape a long panel into a balanced (N, T, K) array in location-index order
+
+    Locations without observations are dropped first, then periods that are
+    not observed for every remaining location.
+
+    Args:
+        df (pd.DataFrame): Long panel with location_name, time_col and columns
+        index (LocationIndex): Canonical location order (rows of W)
+        columns (Sequence[str]): Columns to stack along the last axis
+        time_col (str): Period column (default: 'date')
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            values (N', T', K), kept index positions (N',), periods (T',)
+    """
+    df = df[df['location_name'].isin(index.names)]
+    rows = index.positions(df['location_name'])
+    periods, cols = np.unique(df[time_col].values, return_inverse=True)
+
+    values = np.full((len(index), len(periods), len(columns)), np.nan)
+    values[rows, cols] = df[list(columns)].to_numpy(dtype=np.float64)
+
+    observed = ~np.isnan(values).any(axis=2)
+    keep_rows = np.flatnonzero(observed.any(axis=1))
+    keep_cols = np.flatnonzero(observed[keep_rows].all(axis=0))
+    if len(keep_cols) < 2:
+        raise ValueError("Fewer than 2 periods are observed for every location; panel cannot be balanced")
+
+    return values[np.ix_(keep_rows, keep_cols)], keep_rows, periods[keep_cols]
+
+
+def run_tasks(tasks: Sequence[Callable], n_workers: int = 1) -> list:
+    """Call zero-argument tasks, on a thread pool when n_workers > 1 (order kept)"""
+    if n_workers <= 1 or len(tasks) <= 1:
+        return [task() for task in tasks]
+    with ThreadPool(processes=min(n_workers, len(tasks))) as pool:
+        return pool.map(lambda task: task(), tasks)
+
+
+# =============================================================================
+# ESTIMATOR
+# =============================================================================
+
+class PanelSDMResults:
+    """
+    Estimates of a panel SDM (attribute names follow spreg where they overlap)
+    """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    @property
+    def std_err(self) -> np.ndarray:
+        return np.sqrt(np.diag(self.vm))
+
+    @property
+    def z_stat(self) -> np.ndarray:
+        return self.betas.ravel() / self.std_err
+
+    @property
+    def p_values(self) -> np.ndarray:
+        return 2 * (1 - stats.norm.cdf(np.abs(self.z_stat)))
+
+    def coefficient_table(self) -> pd.DataFrame:
+        """
+        Coefficients with standard errors, z statistics and stars
+
+        Returns:
+            pd.DataFrame: Variable, Coefficient, Std_Error, Z_stat, P_value, Sig
+        """
+        table = pd.DataFrame({
+            'Variable': self.name_betas,
+            'Coefficient': self.betas.ravel(),
+            'Std_Error': self.std_err,
+            'Z_stat': self.z_stat,
+            'P_value': self.p_values,
+        })
+        table['Sig'] = table['P_value'].apply(
+            lambda p: '***' if p < 0.001 else ('**' if p < 0.01 else ('*' if p < 0.05 else ''))
+        )
+        return table
+
+    @property
+    def summary(self) -> str:
+        lines = [
+            'PANEL SPATIAL DURBIN MODEL (ML)',
+            '=' * 72,
+            f"Data set            : {self.name_ds}",
+            f"Weights             : {self.name_w}",
+            f"Dependent variable  : {self.name_y}",
+            f"Random effects      : individual (phi = {self.phi:.6g})" if self.effects == 'random'
+            else f"Fixed effects       : {self.effects}"
+            + (' (Lee-Yu bias corrected)' if self.bias_correction else ''),
+            f"N x T               : {self.n} x {self.t} = {self.n * self.t}",
+            f"Effective obs       : {self.n_eff}",
+            f"Log likelihood      : {self.logll:.4f}",
+            f"AIC / BIC           : {self.aic:.4f} / {self.bic:.4f}",
+            f"Sigma-square        : {self.sigma2:.6g}",
+            f"R2 (within)         : {self.r2:.4f}",
+            f"Pseudo R2           : {self.pr2:.4f}",
+            '-' * 72,
+            self.coefficient_table().to_string(index=False, float_format=lambda v: f"{v:.6g}"),
+        ]
+        if self.dropped:
+            lines += ['-' * 72, f"Dropped (no within variation or collinear): {', '.join(self.dropped)}"]
+        return '\n'.join(lines)
+
+
+class PanelSDM:
+    """
+    ML panel SDM on balanced, location-major arrays
+    """
+
+    def __init__(self, Y: np.ndarray, X: np.ndarray, W: sp.spmatrix,
+                 effects: str = 'individual', durbin: Optional[Sequence[bool]] = None,
+                 bias_correction: bool = True, name_y: str = 'y',
+                 name_x: Optional[List[str]] = None, name_w: str = 'w', name_ds: str = '',
+                 logdet_method: str = 'auto', logdet: Optional[LogDet] = None,
+                 design: Optional[SpatialDesign] = None, rho_start: Optional[float] = None):
+        """
+        Initialize estimator
+
+        Args:
+            Y (np.ndarray): (N, T) dependent variable
+            X (np.ndarray): (N, T, K) regressors
+            W (sp.spmatrix): (N, N) weights, rows in the same order as Y
+            effects (str): 'none', 'individual' (default), 'time' or 'twoways'
+            durbin (Sequence[bool], optional): Which X columns also enter as W X
+                (default: all)
+            bias_correction (bool): Lee-Yu transformation approach (default: True)
+            name_y, name_x, name_w, name_ds: Labels for the output
+            logdet_method (str): LogDet method ('auto', 'eigen', 'lu', 'chebyshev', 'mc')
+            logdet (LogDet, optional): Prebuilt engine for this W, shared between models
+            design (SpatialDesign, optional): Cached lags of X for this W
+                (default: looked up in the design cache)
+            rho_start (float, optional): Warm start, e.g. rho of a previous
+                estimation window; rho is first searched within
+                WARM_START_WIDTH of it
+        """
+        if effects not in EFFECTS:
+            raise ValueError(f"Unknown effects '{effects}'. Use one of {EFFECTS}")
+        self.Y = np.asarray(Y, dtype=np.float64)
+        self.X = np.asarray(X, dtype=np.float64)
+        if self.X.ndim == 2:
+            self.X = self.X[:, :, None]
+        self.W = sp.csr_matrix(W, dtype=np.float64)
+        self.n, self.t, k = self.X.shape
+        if self.Y.shape != (self.n, self.t) or self.W.shape != (self.n, self.n):
+            raise ValueError(f"Shapes do not match: Y {self.Y.shape}, X {self.X.shape}, W {self.W.shape}")
+
+        self.effects = effects
+        self.durbin = np.ones(k, dtype=bool) if durbin is None else np.asarray(durbin, dtype=bool)
+        self.bias_correction = bias_correction and effects != 'none'
+        self.name_y = name_y
+        self.name_x = list(name_x) if name_x is not None else [f'x{i}' for i in range(k)]
+        self.name_w = name_w
+        self.name_ds = name_ds
+        self.logdet_method = logdet_method
+        self.logdet = logdet
+        self.design = design
+        self.rho_start = rho_start
+
+        if effects in ('time', 'twoways') and self.bias_correction:
+            row_sums = np.asarray(self.W.sum(axis=1)).ravel()
+            if not np.allclose(row_sums, 1.0):
+                raise ValueError("Bias correction with time effects requires a row-standardized W")
+
+    def _design(self) -> Tuple[np.ndarray, List[str], List[str]]:
+        """
+        Within-transformed [X, W X] (plus constant without effects) and names
+
+        Columns without within variation are dropped, then every column in the
+        span of the columns before it (QR in column order, so a W X column
+        goes rather than its X column).
+
+        Returns:
+            Tuple: (NT, k) design, kept names, dropped names
+        """
+        WX = self.get_design().lag(1)[:, :, self.durbin]
+        blocks = [self.X, WX]
+        names = self.name_x + [f'W_{x}' for x, d in zip(self.name_x, self.durbin) if d]
+        if self.effects == 'none':
+            blocks.insert(0, np.ones((self.n, self.t, 1)))
+            names = ['Constant'] + names
+
+        Z = within(np.concatenate(blocks, axis=2), self.effects).reshape(self.n * self.t, -1)
+        scale = np.abs(Z).max(axis=0)
+        keep = Z.std(axis=0) > _ZERO_VARIANCE_TOL * np.maximum(scale, 1.0)
+        if self.effects == 'none':
+            keep[0] = True
+        R = np.linalg.qr(Z[:, keep], mode='r')
+        norms = np.linalg.norm(Z[:, keep], axis=0)
+        keep[keep] = np.abs(np.diag(R)) > _COLLINEAR_TOL * norms
+        dropped = [name for name, k in zip(names, keep) if not k]
+        return Z[:, keep], [name for name, k in zip(names, keep) if k], dropped
+
+    def _sample_terms(self) -> Tuple[int, int, bool]:
+        """(effective observations, log-det multiplier, subtract ln(1 - rho))"""
+        n, t = self.n, self.t
+        if not self.bias_correction:
+            return n * t, t, False
+        return {
+            'individual': (n * (t - 1), t - 1, False),
+            'time': ((n - 1) * t, t, True),
+            'twoways': ((n - 1) * (t - 1), t - 1, True),
+        }[self.effects]
+
+    def get_design(self) -> SpatialDesign:
+        """Spatial lags of X (from the design cache unless one was passed in)"""
+        if self.design is None:
+            self.design = get_design_cache().design(data_key(self.X), self.W, self.X, self.name_x)
+        return self.design
+
+    def get_logdet(self) -> LogDet:
+        """Log-determinant engine for W (built on first use unless one was passed in)"""
+        if self.logdet is None:
+            self.logdet = LogDet(self.W, method=self.logdet_method)
+        return self.logdet
+
+    def fit(self) -> PanelSDMResults:
+        """
+        Maximize the concentrated log-likelihood over rho
+
+        Returns:
+            PanelSDMResults: betas ([beta, theta, rho]), vm, sigma2, logll, ...
+        """
+        return self.fit_many(self.Y[None], [self.name_y])[0]
+
+    def fit_many(self, Ys: np.ndarray, names_y: Optional[Sequence[str]] = None,
+                 n_workers: int = 1) -> List[PanelSDMResults]:
+        """
+        Fit several dependent variables that share X and W
+
+        The design [X, W X], its within transformation and the OLS
+        factorization are computed once for all of them, as is the
+        log-determinant engine; only the scalar search over rho and the
+        variance are per dependent variable.
+
+        Args:
+            Ys (np.ndarray): (C, N, T) dependent variables
+            names_y (Sequence[str], optional): Labels (default: name_y_0, ...)
+            n_workers (int): Threads for the per-variable step (default: 1)
+
+        Returns:
+            List[PanelSDMResults]: One result per dependent variable
+        """
+        tasks = self.prepare_many(Ys, names_y)
+        return run_tasks(tasks, n_workers)
+
+    def prepare_many(self, Ys: np.ndarray, names_y: Optional[Sequence[str]] = None) -> list:
+        """Shared precomputation for fit_many(); returns one zero-argument fit per variable"""
+        Ys = np.asarray(Ys, dtype=np.float64).reshape(-1, self.n, self.t)
+        n_y = len(Ys)
+        names_y = list(names_y) if names_y is not None else [f'{self.name_y}_{i}' for i in range(n_y)]
+
+        Z, names, dropped = self._design()
+        stacked = np.moveaxis(Ys, 0, -1)                                   # (N, T, C)
+        y_all = within(stacked, self.effects).reshape(self.n * self.t, n_y)
+        wy_all = within(self.get_design().lag_y(stacked), self.effects).reshape(self.n * self.t, n_y)
+
+        # OLS of every y and Wy on Z in one solve; e(rho) = e0 - rho * e1
+        coefs, *_ = np.linalg.lstsq(Z, np.hstack([y_all, wy_all]), rcond=None)
+        ld = self.get_logdet()
+
+        def task(i: int):
+            return lambda: self._fit_concentrated(Z, names, dropped, y_all[:, i], wy_all[:, i],
+                                                  coefs[:, i], coefs[:, n_y + i], ld, names_y[i])
+        return [task(i) for i in range(n_y)]
+
+    def _fit_concentrated(self, Z: np.ndarray, names: List[str], dropped: List[str],
+                          y: np.ndarray, wy: np.ndarray, b0: np.ndarray, b1: np.ndarray,
+                          ld: LogDet, name_y: str) -> PanelSDMResults:
+        """Search over rho for one dependent variable given its OLS pieces"""
+        e0, e1 = y - Z @ b0, wy - Z @ b1
+        a, b, c = e0 @ e0, e0 @ e1, e1 @ e1
+
+        n_eff, ld_mult, drop_unit_root = self._sample_terms()
+        lower, upper = ld.bounds
+
+        def logdet(rho: float) -> float:
+            value = ld(rho)
+            if drop_unit_root:
+                value -= np.log(1.0 - rho)
+            return ld_mult * value
+
+        def neg_loglik(rho: float) -> float:
+            return 0.5 * n_eff * np.log((a - 2 * rho * b + rho ** 2 * c) / n_eff) - logdet(rho)
+
+        lower, upper = lower + 1e-6, upper - 1e-6
+        opt = None
+        if self.rho_start is not None:
+            lo = max(lower, self.rho_start - WARM_START_WIDTH)
+            hi = min(upper, self.rho_start + WARM_START_WIDTH)
+            opt = minimize_scalar(neg_loglik, bounds=(lo, hi), method='bounded',
+                                  options={'xatol': 1e-10})
+            # An optimum on an inner edge of the bracket means the warm start was off
+            tol = 1e-5 * (hi - lo)
+            if (opt.x - lo < tol and lo > lower) or (hi - opt.x < tol and hi < upper):
+                opt = None
+        if opt is None:
+            opt = minimize_scalar(neg_loglik, bounds=(lower, upper),
+                                  method='bounded', options={'xatol': 1e-10})
+        rho = float(opt.x)
+        beta = b0 - rho * b1
+        sigma2 = (a - 2 * rho * b + rho ** 2 * c) / n_eff
+        logll = -0.5 * n_eff * (np.log(2 * np.pi * sigma2) + 1) + logdet(rho)
+
+        vm, pr2 = self._variance(Z, y, beta, rho, sigma2, n_eff, ld_mult)
+        e = y - rho * wy - Z @ beta
+        k = len(beta) + 2
+
+        return PanelSDMResults(
+            rho=rho, beta=beta, betas=np.append(beta, rho).reshape(-1, 1),
+            name_betas=names + ['rho'], vm=vm, sigma2=sigma2,
+            logll=logll, aic=-2 * logll + 2 * k, bic=-2 * logll + np.log(n_eff) * k,
+            r2=1 - (e @ e) / (y @ y), pr2=pr2, u=e,
+            n=self.n, t=self.t, n_eff=n_eff, effects=self.effects,
+            bias_correction=self.bias_correction, dropped=dropped, iterations=opt.nfev,
+            name_y=name_y, name_w=self.name_w, name_ds=self.name_ds,
+        )
+
+    def _variance(self, Z: np.ndarray, y: np.ndarray, beta: np.ndarray, rho: float,
+                  sigma2: float, n_eff: int, ld_mult: int) -> Tuple[np.ndarray, float]:
+        """Inverse information matrix for (beta, rho) and the reduced-form pseudo R2"""
+        # G = W (I - rho W)^-1 only through solves with one sparse LU
+        M = SpatialMultiplier(self.W, rho)
+        Zb = (Z @ beta).reshape(self.n, self.t)
+        MZb = M.solve(Zb)
+        GZb = within(self.W @ MZb, self.effects).ravel()
+        tr_G, tr_GG, tr_GtG = M.variance_traces()
+
+        kz = Z.shape[1]
+        info = np.zeros((kz + 2, kz + 2))
+        info[:kz, :kz] = Z.T @ Z / sigma2
+        info[:kz, kz] = info[kz, :kz] = Z.T @ GZb / sigma2
+        info[kz, kz] = ld_mult * (tr_GG + tr_GtG) + GZb @ GZb / sigma2
+        info[kz, kz + 1] = info[kz + 1, kz] = ld_mult * tr_G / sigma2
+        info[kz + 1, kz + 1] = n_eff / (2 * sigma2 ** 2)
+        vm = np.linalg.inv(info)[:kz + 1, :kz + 1]
+
+        predy = within(MZb, self.effects).ravel()
+        pr2 = float(np.corrcoef(y, predy)[0, 1] ** 2)
+        return vm, pr2
+
+
+def fit_random_effects(Y: np.ndarray, X: np.ndarray, W: sp.spmatrix,
+                       durbin: Optional[Sequence[bool]] = None, name_y: str = 'y',
+                       name_x: Optional[List[str]] = None, name_w: str = 'w', name_ds: str = '',
+                       logdet_method: str = 'auto', logdet: Optional[LogDet] = None,
+                       tol: float = RE_TOL, max_iter: int = RE_MAX_ITER) -> PanelSDMResults:
+    """
+    ML panel SDM with random individual effects (Elhorst, 2014, ch. 3)
+
+    Given phi, the model is the pooled SDM on quasi-demeaned data
+    a* = a - (1 - sqrt(phi)) abar_i (W commutes with the transformation, so
+    W X* = (W X)*); given the residuals, phi maximizes
+
+        -NT/2 ln(e(phi)' e(phi)) + N/2 ln(phi)
+
+    The two steps alternate until phi changes by less than tol.
+
+    Args:
+        Y (np.ndarray): (N, T) dependent variable
+        X (np.ndarray): (N, T, K) regressors
+        W (sp.spmatrix): (N, N) weights
+        durbin (Sequence[bool], optional): Which X columns also enter as W X
+        name_y, name_x, name_w, name_ds: Labels for the output
+        logdet_method (str): LogDet method when no engine is passed
+        logdet (LogDet, optional): Prebuilt engine for this W
+        tol (float): Convergence tolerance on phi
+        max_iter (int): Maximum number of phi updates
+
+    Returns:
+        PanelSDMResults: effects='random', betas start with the Constant;
+            `phi` and `sigma2_mu` hold the variance components
+    """
+    Y = np.asarray(Y, dtype=np.float64)
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 2:
+        X = X[:, :, None]
+    W = sp.csr_matrix(W, dtype=np.float64)
+    n, t = Y.shape
+    name_x = list(name_x) if name_x is not None else [f'x{i}' for i in range(X.shape[2])]
+    ld = logdet if logdet is not None else LogDet(W, method=logdet_method)
+    Y_bar, X_bar = Y.mean(axis=1, keepdims=True), X.mean(axis=1, keepdims=True)
+
+    phi, rho = 1.0, None                               # start from the pooled model
+    for iteration in range(1, max_iter + 1):
+        shrink = 1.0 - np.sqrt(phi)
+        X_star = X - shrink * X_bar
+        model = PanelSDM(Y - shrink * Y_bar, X_star, W, effects='none', durbin=durbin,
+                         bias_correction=False, name_y=name_y, name_x=name_x, name_w=name_w,
+                         name_ds=name_ds, logdet=ld, design=SpatialDesign(X_star, W, name_x),
+                         rho_start=rho)
+        results = model.fit()
+        rho, phi_fit = results.rho, phi
+
+        # Untransformed residuals e = e* + (1 - sqrt(phi)) ebar_i
+        e_star = results.u.reshape(n, t)
+        e_bar = e_star.mean(axis=1, keepdims=True) / np.sqrt(phi)
+        e = e_star + shrink * e_bar
+
+        def neg_loglik(p: float) -> float:
+            r = e - (1.0 - np.sqrt(p)) * e_bar
+            return 0.5 * n * t * np.log(np.sum(r * r)) - 0.5 * n * np.log(p)
+
+        phi = float(minimize_scalar(neg_loglik, bounds=(1e-10, 1.0), method='bounded',
+                                    options={'xatol': 1e-12}).x)
+        if abs(phi - phi_fit) < tol:
+            break
+
+    # The pooled fit used a column of ones; the transformed constant is sqrt(phi) * 1
+    scale = np.ones(len(results.betas))
+    scale[0] = 1.0 / np.sqrt(phi_fit)
+    results.betas = results.betas * scale[:, None]
+    results.beta = results.betas[:-1, 0]
+    results.vm = results.vm * np.outer(scale, scale)
+
+    k = len(results.betas) + 2                         # beta, rho, sigma2, phi
+    results.logll += 0.5 * n * np.log(phi_fit)
+    results.aic = -2 * results.logll + 2 * k
+    results.bic = -2 * results.logll + np.log(n * t) * k
+    results.effects = 'random'
+    results.phi = phi_fit
+    results.sigma2_mu = results.sigma2 * (1.0 / phi_fit - 1.0) / t
+    results.re_iterations = iteration
+    return results
+
+
+def fit_panel_sdm(df: pd.DataFrame, y: str, x: Sequence[str], W: sp.spmatrix, index,
+                  time_col: str = 'date', durbin: Optional[Sequence[str]] = None,
+                  effects: str = 'individual', bias_correction: bool = True,
+                  name_w: str = 'w', name_ds: str = '',
+                  logdet_method: str = 'auto') -> PanelSDMResults:
+    """
+    Fit a panel SDM from a long DataFrame
+
+    The panel is balanced with panel_arrays(); if some locations drop out,
+    W is restricted to the remaining ones and row-standardized again.
+
+    Args:
+        df (pd.DataFrame): Long panel with location_name and time_col
+        y (str): Dependent variable
+        x (Sequence[str]): Regressors
+        W (sp.spmatrix): (N, N) weights in index order (libpysal W also accepted)
+        index (LocationIndex): Location order of W
+        time_col (str): Period column (default: 'date')
+        durbin (Sequence[str], optional): Regressors that also enter as W X
+            (default: all of x)
+        effects (str): 'none', 'individual' (default), 'time', 'twoways' or
+            'random' (random individual effects, see fit_random_effects)
+        bias_correction (bool): Lee-Yu correction (default: True; fixed effects only)
+        name_w, name_ds: Labels for the output
+        logdet_method (str): LogDet method (default: 'auto', picked from N)
+
+    Returns:
+        PanelSDMResults: Fitted model; `locations` and `periods` record the panel used
+
+    Example:
+        >>> model = fit_panel_sdm(df_panel, 'price', X_vars, w.sparse, index, durbin=X_vars[:3])
+        >>> model.rho, model.coefficient_table()
+    """
+    W = getattr(W, 'sparse', W)
+    x = list(x)
+    values, keep, periods = panel_arrays(df, index, [y] + x, time_col)
+    if len(keep) < len(index):
+        W = subset_weights(W, keep)
+
+    durbin_mask = None if durbin is None else [name in set(durbin) for name in x]
+    if effects == 'random':
+        results = fit_random_effects(values[:, :, 0], values[:, :, 1:], W, durbin=durbin_mask,
+                                     name_y=y, name_x=x, name_w=name_w, name_ds=name_ds,
+                                     logdet_method=logdet_method)
+    else:
+        model = PanelSDM(values[:, :, 0], values[:, :, 1:], W, effects=effects, durbin=durbin_mask,
+                         bias_correction=bias_correction, name_y=y, name_x=x,
+                         name_w=name_w, name_ds=name_ds, logdet_method=logdet_method)
+        results = model.fit()
+    results.locations = index.names[keep]
+    results.periods = periods
+    return results
+
+
+def fit_panel_sdm_many(df: pd.DataFrame, y: str, x: Sequence[str], W: sp.spmatrix, index,
+                       group_col: str = 'commodity_id', groups: Optional[Sequence[str]] = None,
+                       time_col: str = 'date', durbin: Optional[Sequence[str]] = None,
+                       effects: str = 'individual', bias_correction: bool = True,
+                       name_w: str = 'w', name_ds: str = '', logdet_method: str = 'auto',
+                       n_workers: Optional[int] = None) -> Dict[str, PanelSDMResults]:
+    """
+    Fit the same panel SDM for every group (e.g. commodity) of a long DataFrame
+
+    Work is shared wherever the groups allow it:
+        - groups with the same balanced locations share one restricted W and
+          one LogDet engine (with a rho grid when it is not eigenvalue based)
+        - groups that also share periods and regressor values share the
+          design [X, W X] and a single OLS solve; only y differs
+    The per-group rho search and variance run on a thread pool.
+
+    Args:
+        df (pd.DataFrame): Long panel with group_col, location_name and time_col
+        y (str): Dependent variable
+        x (Sequence[str]): Regressors
+        W (sp.spmatrix): (N, N) weights in index order
+        index (LocationIndex): Location order of W
+        group_col (str): Column that defines the groups (default: 'commodity_id')
+        groups (Sequence[str], optional): Groups to fit (default: all, sorted)
+        time_col, durbin, effects, bias_correction, name_w, name_ds, logdet_method:
+            As in fit_panel_sdm
+        n_workers (int, optional): Threads (default: cpu_count())
+
+    Returns:
+        Dict[str, PanelSDMResults]: Results keyed by group; groups whose panel
+            cannot be balanced are skipped with a message
+
+    Example:
+        >>> results = fit_panel_sdm_many(df_panel, 'price', X_vars, w.sparse, index)
+        >>> commodity_summary(results)
+    """
+    W = sp.csr_matrix(getattr(W, 'sparse', W))
+    x = list(x)
+    durbin_mask = None if durbin is None else [name in set(durbin) for name in x]
+    groups = sorted(df[group_col].dropna().unique()) if groups is None else list(groups)
+
+    # Balance each group, then bucket groups by (locations, periods, X values)
+    by_group = dict(tuple(df[df[group_col].isin(groups)].groupby(group_col, sort=False, observed=True)))
+    buckets: Dict[tuple, list] = {}
+    for group in groups:
+        if group not in by_group:
+            print(f"  {group}: no rows, skipped")
+            continue
+        try:
+            values, keep, periods = panel_arrays(by_group[group], index, [y] + x, time_col)
+        except ValueError as e:
+            print(f"  {group}: {e}, skipped")
+            continue
+        X = np.ascontiguousarray(values[:, :, 1:])
+        key = (keep.tobytes(), np.asarray(periods).tobytes(), hashlib.sha1(X.tobytes()).hexdigest())
+        buckets.setdefault(key, []).append((group, values[:, :, 0], X, keep, periods))
+
+    # One restricted W and log-det engine per location set
+    sharing: Dict[bytes, int] = {}
+    keep_rows: Dict[bytes, np.ndarray] = {}
+    for key, members in buckets.items():
+        sharing[key[0]] = sharing.get(key[0], 0) + len(members)
+        keep_rows[key[0]] = members[0][3]
+    engines: Dict[bytes, Tuple[sp.csr_matrix, LogDet]] = {}
+    for keep_key, n_groups in sharing.items():
+        keep = keep_rows[keep_key]
+        W_sub = subset_weights(W, keep) if len(keep) < len(index) else W
+        ld = LogDet(W_sub, method=logdet_method)
+        if ld.method != 'eigen' and n_groups > 1:
+            ld.build_grid()
+        engines[keep_key] = (W_sub, ld)
+
+    tasks, labels = [], []
+    for key, members in buckets.items():
+        W_sub, ld = engines[key[0]]
+        _, _, X, keep, periods = members[0]
+        model = PanelSDM(members[0][1], X, W_sub, effects=effects, durbin=durbin_mask,
+                         bias_correction=bias_correction, name_y=y, name_x=x,
+                         name_w=name_w, name_ds=name_ds, logdet=ld)
+        Ys = np.stack([member[1] for member in members])
+        tasks += model.prepare_many(Ys, [f'{y} ({member[0]})' for member in members])
+        labels += [(member[0], keep, periods) for member in members]
+
+    results = {}
+    for (group, keep, periods), result in zip(labels, run_tasks(tasks, n_workers or cpu_count())):
+        result.locations = index.names[keep]
+        result.periods = periods
+        results[group] = result
+    return {group: results[group] for group in groups if group in results}
+
+
+def commodity_summary(results: Dict[str, PanelSDMResults], stat: str = 'Coefficient') -> pd.DataFrame:
+    """
+    One row per group with rho, beta and theta side by side
+
+    Args:
+        results (Dict[str, PanelSDMResults]): Output of fit_panel_sdm_many()
+        stat (str): Column of coefficient_table() to spread (default: 'Coefficient';
+            e.g. 'P_value' or 'Std_Error')
+
+    Returns:
+        pd.DataFrame: commodity, n, t, rho, rho_se, logll, then one column per coefficient
+    """
+    rows = []
+    for group, res in results.items():
+        table = res.coefficient_table().set_index('Variable')
+        row = {'commodity': group, 'n': res.n, 't': res.t,
+               'rho': res.rho, 'rho_se': table.loc['rho', 'Std_Error'], 'logll': res.logll}
+        row.update(table[stat].drop('rho').to_dict())
+        rows.append(row)
+    return pd.DataFrame(rows)
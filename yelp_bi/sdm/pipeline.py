@@ -0,0 +1,455 @@
+"""
+Phase Pipeline
+==============
+Small DAG runner for the SDM phases: every phase declares the files it
+reads and writes, outputs are fingerprinted after each run, and a phase
+whose code, parameters and inputs are unchanged since its last successful
+run is skipped.
+
+A phase depends on another in two ways:
+
+    inputs=[path]    reads a file the other phase writes (file edge)
+    needs=[name]     uses in-memory state the other phase leaves on a shared
+                     object, e.g. self.data['merged'] after fase1b (state edge)
+
+The key of a phase hashes its name, the source of its function, its keyword
+arguments, an optional version string, the content of every input file and
+the recorded outputs of its upstream phases. A phase re-runs when its key
+changed or when one of its outputs is missing or was modified since it was
+written; an upstream phase that re-runs but writes identical files leaves its
+dependents skipped. Changes inside helper modules a phase calls are not
+seen - bump the phase's version or pass force.
+
+When a phase runs, every skipped phase it needs is first brought back into
+memory, by its `restore` callable (e.g. reading the merged CSV) or, when it
+has none, by running it again.
+
+Features:
+    - File fingerprints memoized by (size, mtime), as in the feature store
+    - Independent phases run concurrently on a thread pool (phases share
+      objects, and the numerical work releases the GIL); exclusive phases
+      (those starting their own process pool) run alone
+    - Selection by name (only) or by a phase and all its dependents (start)
+    - Manifest in sdm_results/cache/pipeline/manifest.json; a failed phase
+      is never recorded, so the next run retries it
+
+Usage:
+    from yelp_bi.sdm.pipeline import Phase, Pipeline
+
+    sdm = SpatialDurbinAnalysis()
+    pipe = Pipeline([
+        Phase('fase1b', sdm.fase1b_merge_datasets,
+              outputs=['sdm_results/fase1/1b_merged_dataset.csv'],
+              restore=lambda: sdm.data.update(merged=read_merged(...))),
+        Phase('fase2a', sdm.fase2a_global_morans_i, kwargs={'commodity': 'com_1'},
+              needs=['fase1b'], outputs=['sdm_results/fase2/2a_global_morans_i.csv']),
+    ])
+    report = pipe.run(only=['fase2a'])     # fase2a (fase1b restored if needed)
+    report = pipe.run(start='fase1b')      # fase1b and everything downstream
+"""
+
+import os
+import json
+import time
+import hashlib
+import inspect
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from multiprocessing import cpu_count
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from .feature_store import FeatureStore
+
+
+CACHE_DIR = os.path.join('sdm_results', 'cache', 'pipeline')
+
+# Input entries are paths or callables returning paths (resolved at run time)
+PathSpec = Union[str, Callable[[], Union[str, Sequence[str]]]]
+
+
+class PhaseError(RuntimeError):
+    """A phase raised; the original exception is chained"""
+
+
+class Phase:
+    """
+    One node of the pipeline
+    """
+
+    def __init__(self, name: str, fn: Callable, kwargs: Optional[dict] = None,
+                 needs: Sequence[str] = (), inputs: Sequence[PathSpec] = (),
+                 outputs: Sequence[str] = (), restore: Optional[Callable[[], object]] = None,
+                 version: str = '', description: str = '', exclusive: bool = False):
+        """
+        Initialize phase
+
+        Args:
+            name (str): Unique phase name (e.g. 'fase2a')
+            fn (Callable): Function run with **kwargs; its return value is
+                kept in Pipeline.values
+            kwargs (dict, optional): Keyword arguments, part of the phase key
+            needs (Sequence[str]): Phases whose in-memory state fn uses
+            inputs (Sequence[str | Callable]): Files fn reads (paths, or
+                callables returning one or several paths)
+            outputs (Sequence[str]): Files fn writes
+            restore (Callable, optional): Rebuilds the phase's in-memory
+                state from its outputs when it was skipped but a dependent
+                runs (default: run the phase again)
+            version (str): Bump to invalidate the phase by hand
+            description (str): Label for listings
+            exclusive (bool): Run with no other phase alongside, for phases
+                that use every CPU themselves (process pools)
+        """
+        self.name = name
+        self.fn = fn
+        self.kwargs = dict(kwargs or {})
+        self.needs = list(needs)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.restore = restore
+        self.version = version
+        self.description = description or name
+        self.exclusive = exclusive
+
+    def input_paths(self) -> List[str]:
+        """Declared inputs with callables resolved"""
+        paths = []
+        for entry in self.inputs:
+            value = entry() if callable(entry) else entry
+            paths.extend([value] if isinstance(value, str) else list(value))
+        return paths
+
+    def code_hash(self) -> str:
+        """Hash of the function source (its qualified name when no source is available)"""
+        fn = getattr(self.fn, '__func__', self.fn)
+        try:
+            source = inspect.getsource(fn)
+        except (OSError, TypeError):
+            source = getattr(fn, '__qualname__', repr(fn))
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()[:20]
+
+    def __repr__(self):
+        return f"Phase({self.name!r}, needs={self.needs}, outputs={len(self.outputs)})"
+
+
+class Pipeline:
+    """
+    Fingerprinted, concurrent runner for a DAG of phases
+    """
+
+    def __init__(self, phases: Sequence[Phase], cache_dir: str = CACHE_DIR,
+                 n_workers: Optional[int] = None):
+        """
+        Initialize pipeline
+
+        Args:
+            phases (Sequence[Phase]): Phases in their default (sequential) order
+            cache_dir (str): Directory of the manifest and file hashes
+                (default: sdm_results/cache/pipeline)
+            n_workers (int, optional): Concurrent phases (default: cpu_count();
+                1 runs the phases one by one in declaration order)
+
+        Raises:
+            ValueError: Duplicate names, unknown needs, or a cycle
+        """
+        self.phases: Dict[str, Phase] = {}
+        for phase in phases:
+            if phase.name in self.phases:
+                raise ValueError(f"Duplicate phase '{phase.name}'")
+            self.phases[phase.name] = phase
+        self.order = list(self.phases)
+        self.cache_dir = cache_dir
+        self.n_workers = n_workers
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        self.values: Dict[str, object] = {}
+        self.report: Optional[pd.DataFrame] = None
+
+        self._hashes = FeatureStore(cache_dir=cache_dir)
+        self._lock = threading.RLock()
+        self._phase_locks = {name: threading.Lock() for name in self.order}
+        self._manifest: Optional[Dict[str, dict]] = None
+        self._live: set = set()
+        self.upstream = self._edges()
+        self._check_acyclic()
+
+    # -------------------------------------------------------------------------
+    # Graph
+    # -------------------------------------------------------------------------
+
+    def _edges(self) -> Dict[str, List[str]]:
+        """Phase -> upstream phases (state edges plus file edges)"""
+        producers = {}
+        for phase in self.phases.values():
+            for path in phase.outputs:
+                producers[os.path.normpath(path)] = phase.name
+        edges = {}
+        for phase in self.phases.values():
+            unknown = [n for n in phase.needs if n not in self.phases]
+            if unknown:
+                raise ValueError(f"Phase '{phase.name}' needs unknown phases {unknown}")
+            files = [producers[os.path.normpath(p)] for p in phase.inputs
+                     if isinstance(p, str) and os.path.normpath(p) in producers]
+            edges[phase.name] = list(dict.fromkeys(phase.needs + files))
+        return edges
+
+    def _check_acyclic(self):
+        state: Dict[str, int] = {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 1:
+                raise ValueError(f"Cycle in pipeline: {' -> '.join(path + [name])}")
+            if state.get(name) == 2:
+                return
+            state[name] = 1
+            for up in self.upstream[name]:
+                visit(up, path + [name])
+            state[name] = 2
+
+        for name in self.order:
+            visit(name, [])
+
+    def downstream(self, name: str) -> List[str]:
+        """A phase and every phase depending on it, in declaration order"""
+        if name not in self.phases:
+            raise KeyError(f"Unknown phase '{name}'. Available: {self.order}")
+        found, grown = {name}, True
+        while grown:
+            new = {n for n in self.order if n not in found
+                   and any(up in found for up in self.upstream[n])}
+            found |= new
+            grown = bool(new)
+        return [n for n in self.order if n in found]
+
+    def select(self, only: Optional[Sequence[str]] = None,
+               start: Optional[str] = None) -> List[str]:
+        """
+        Phases chosen by the selectors (all phases when neither is given)
+
+        Args:
+            only (Sequence[str], optional): Phase names
+            start (str, optional): A phase; it and all its dependents are selected
+
+        Returns:
+            list: Selected phase names in declaration order
+        """
+        selected = set(self.order)
+        if only:
+            unknown = [n for n in only if n not in self.phases]
+            if unknown:
+                raise KeyError(f"Unknown phases {unknown}. Available: {self.order}")
+            selected &= set(only)
+        if start:
+            selected &= set(self.downstream(start))
+        return [n for n in self.order if n in selected]
+
+    # -------------------------------------------------------------------------
+    # Fingerprints
+    # -------------------------------------------------------------------------
+
+    def _load_manifest(self) -> Dict[str, dict]:
+        if self._manifest is None:
+            self._manifest = {}
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+        return self._manifest
+
+    def _save_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def file_hash(self, path: str) -> Optional[str]:
+        """Content hash of a file (None if it does not exist)"""
+        if not os.path.isfile(path):
+            return None
+        return self._hashes.file_hash(path)
+
+    def key(self, name: str) -> str:
+        """Current key of a phase: code, arguments, version and input content"""
+        phase = self.phases[name]
+        h = hashlib.sha1()
+        h.update(name.encode())
+        h.update(phase.code_hash().encode())
+        h.update(json.dumps(phase.kwargs, sort_keys=True, default=repr).encode())
+        h.update(phase.version.encode())
+        for path in sorted(phase.input_paths()):
+            h.update(f'{os.path.normpath(path)}={self.file_hash(path)}'.encode())
+        for up in self.upstream[name]:
+            # Outputs of the upstream run (its key when it writes no files)
+            entry = self._load_manifest().get(up, {})
+            state = entry.get('outputs') or entry.get('key')
+            h.update(f'{up}:{json.dumps(state, sort_keys=True)}'.encode())
+        return h.hexdigest()[:20]
+
+    def _outputs(self, name: str) -> Dict[str, Optional[str]]:
+        return {path: self.file_hash(path) for path in self.phases[name].outputs}
+
+    def is_fresh(self, name: str) -> bool:
+        """True if the recorded run of a phase is still valid"""
+        entry = self._load_manifest().get(name)
+        if entry is None or entry.get('key') != self.key(name):
+            return False
+        return self._outputs(name) == entry.get('outputs')
+
+    def status(self) -> pd.DataFrame:
+        """
+        One row per phase: upstream phases, fresh / stale, last run
+
+        Keys of downstream phases use the recorded outputs of their upstream
+        phases, so a stale phase shows its dependents as fresh until it has
+        run - as in run(), where they are decided after it.
+        """
+        manifest = self._load_manifest()
+        rows = []
+        for name in self.order:
+            entry = manifest.get(name, {})
+            rows.append({
+                'phase': name,
+                'description': self.phases[name].description,
+                'after': ', '.join(self.upstream[name]),
+                'state': 'fresh' if self.is_fresh(name) else ('stale' if entry else 'never run'),
+                'last_run': entry.get('finished', ''),
+                'seconds': entry.get('seconds', float('nan')),
+            })
+        return pd.DataFrame(rows)
+
+    # -------------------------------------------------------------------------
+    # Execution
+    # -------------------------------------------------------------------------
+
+    def _call(self, name: str) -> object:
+        phase = self.phases[name]
+        try:
+            value = phase.fn(**phase.kwargs)
+        except Exception as e:
+            raise PhaseError(f"Phase '{name}' failed: {e}") from e
+        with self._lock:
+            self.values[name] = value
+            self._live.add(name)
+        return value
+
+    def materialize(self, name: str):
+        """
+        Bring a phase's in-memory state back (restore, or run it again)
+
+        Called for the needs of every phase that runs; phases that ran (or
+        were restored) in this process are left alone.
+        """
+        for up in self.phases[name].needs:
+            self.materialize(up)
+        with self._phase_locks[name]:
+            if name in self._live:
+                return
+            phase = self.phases[name]
+            if phase.restore is not None:
+                print(f"[pipeline] {name}: restoring state from outputs")
+                phase.restore()
+                with self._lock:
+                    self._live.add(name)
+            else:
+                print(f"[pipeline] {name}: re-running for its state")
+                self._call(name)
+
+    def _execute(self, name: str, selected: bool, force: bool) -> dict:
+        """Decide and (if needed) run one phase; returns its report row"""
+        started = time.perf_counter()
+        if not selected:
+            return {'phase': name, 'status': 'not selected', 'seconds': 0.0}
+        with self._lock:
+            fresh = not force and self.is_fresh(name)
+        if fresh:
+            return {'phase': name, 'status': 'skipped (unchanged)', 'seconds': 0.0}
+
+        for up in self.phases[name].needs:
+            self.materialize(up)
+        with self._phase_locks[name]:
+            key = self.key(name)
+            self._call(name)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._load_manifest()[name] = {
+                'key': key,
+                'outputs': self._outputs(name),
+                'seconds': round(elapsed, 3),
+                'finished': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._save_manifest()
+        return {'phase': name, 'status': 'ran', 'seconds': elapsed}
+
+    def run(self, only: Optional[Sequence[str]] = None, start: Optional[str] = None,
+            force: bool = False) -> pd.DataFrame:
+        """
+        Run the selected phases, skipping the unchanged ones
+
+        A phase is decided once all its upstream phases are decided, so its
+        key sees the files they just wrote. Unselected phases are never run
+        for their outputs (only, as needed, for their state).
+
+        Args:
+            only (Sequence[str], optional): Run only these phases
+            start (str, optional): Run this phase and every phase downstream of it
+            force (bool): Run the selected phases even if unchanged
+
+        Returns:
+            pd.DataFrame: phase, status ('ran', 'skipped (unchanged)', 'not
+                selected', 'failed', 'not run'), seconds, error
+
+        Raises:
+            PhaseError: The first phase that failed, after the phases already
+                running have finished (no new phases are started after a failure)
+        """
+        selected = set(self.select(only, start))
+        n_workers = self.n_workers or cpu_count()
+        pending = list(self.order)
+        done: Dict[str, dict] = {}
+        failure: Optional[PhaseError] = None
+
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            running = {}
+            while pending or running:
+                if failure is None and not any(self.phases[n].exclusive for n in running.values()):
+                    ready = [n for n in pending if all(up in done for up in self.upstream[n])]
+                    for name in ready:
+                        if len(running) >= n_workers:
+                            break
+                        exclusive = self.phases[name].exclusive
+                        if exclusive and running:
+                            break                         # wait for the running phases to drain
+                        pending.remove(name)
+                        running[pool.submit(self._execute, name, name in selected, force)] = name
+                        if exclusive:
+                            break
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        done[name] = future.result()
+                    except Exception as e:                # phase or fingerprint (e.g. input path)
+                        if not isinstance(e, PhaseError):
+                            error = PhaseError(f"Phase '{name}' failed: {e}")
+                            error.__cause__ = e
+                            e = error
+                        done[name] = {'phase': name, 'status': 'failed', 'seconds': float('nan'),
+                                      'error': str(e.__cause__ or e)}
+                        failure = failure or e
+                    if done[name]['status'] != 'not selected':
+                        print(f"[pipeline] {name}: {done[name]['status']}")
+
+        for name in pending:
+            done[name] = {'phase': name, 'status': 'not run', 'seconds': 0.0}
+        report = pd.DataFrame([done[name] for name in self.order])
+        if 'error' not in report.columns:
+            report['error'] = ''
+        report['error'] = report['error'].fillna('')
+        self.report = report
+        if failure is not None:
+            raise failure
+        return report
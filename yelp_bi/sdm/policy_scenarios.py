@@ -0,0 +1,245 @@
+"""
+Policy Scenario Engine
+======================
+Counterfactual price responses of a fitted SDM to a table of shocks:
+
+    dy = (I - rho W)^-1 (dX beta + W dX theta)
+
+Each shock row is (scenario, variable, locations, magnitude, duration);
+rows sharing a scenario name are combined. All scenarios are solved together
+as the right-hand-side columns of one sparse LU solve, and parameter
+uncertainty is propagated by repeating that solve for draws from the
+coefficient covariance.
+
+Features:
+    - Location masks by name, name list, boolean array or 'all'
+    - Point responses per scenario x location (one factorization in total)
+    - scenario x location x quantile cube from Monte Carlo draws, plus
+      quantiles of the location average per scenario
+    - Cumulative effects weight each shock row by its own duration, so a
+      scenario mixing a one-period and a twelve-period shock counts the
+      first once and the second twelve times
+    - Tidy long output for CSV export
+
+Usage:
+    from yelp_bi.sdm.policy_scenarios import PolicyScenarios, shock_table
+
+    shocks = shock_table([
+        ('BBM +Rp1500', 'bbm_price_idr', 'all', 1500, 1),
+        ('Rain Jakarta', 'precipitation_mm', ['DKI Jakarta'], 50, 3),
+    ])
+    engine = PolicyScenarios(sdm, w.sparse, index)
+    engine.point(shocks)                              # DataFrame locations x scenarios
+    results = engine.simulate(shocks, n_draws=500)
+    results.to_frame().to_csv('scenario_cube.csv', index=False)
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+
+from .spatial_impacts import draw_coefficients, model_coefficients
+
+
+SHOCK_COLUMNS = ['scenario', 'variable', 'locations', 'magnitude', 'duration']
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+def shock_table(rows: Sequence[tuple]) -> pd.DataFrame:
+    """
+    Build a shock table from (scenario, variable, locations, magnitude[, duration]) tuples
+
+    Args:
+        rows (Sequence[tuple]): One tuple per shock; locations is 'all', a list
+            of location names or a boolean mask in index order; duration
+            (periods the shock lasts) defaults to 1
+
+    Returns:
+        pd.DataFrame: Columns scenario, variable, locations, magnitude, duration
+    """
+    records = [tuple(row) + (1,) * (5 - len(row)) for row in rows]
+    return pd.DataFrame.from_records(records, columns=SHOCK_COLUMNS)
+
+
+class ScenarioResults:
+    """
+    Quantile cube of scenario responses
+    """
+
+    def __init__(self, scenarios: List[str], locations: np.ndarray, quantiles: Sequence[float],
+                 cube: np.ndarray, average: np.ndarray, point: np.ndarray, duration: np.ndarray,
+                 cumulative: np.ndarray, cumulative_average: np.ndarray):
+        self.scenarios = scenarios
+        self.locations = locations
+        self.quantiles = tuple(quantiles)
+        self.cube = cube                    # (S, N, Q) per-period response quantiles
+        self.average = average              # (S, Q) quantiles of the location average
+        self.point = point                  # (S, N) per-period response at the estimates (all shocks active)
+        self.duration = duration            # (S,) periods of the longest shock
+        self.cumulative = cumulative        # (S, N) cumulative response, each shock times its duration
+        self.cumulative_average = cumulative_average    # (S, Q) quantiles of its location average
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long table: scenario, location, point, one column per quantile"""
+        S, N, _ = self.cube.shape
+        frame = pd.DataFrame({
+            'scenario': np.repeat(self.scenarios, N),
+            'location_name': np.tile(self.locations, S),
+            'point': self.point.ravel(),
+        })
+        for q, quantile in enumerate(self.quantiles):
+            frame[f'q{quantile:g}'] = self.cube[:, :, q].ravel()
+        return frame
+
+    def summary(self) -> pd.DataFrame:
+        """Per-scenario location-average response, its quantiles and the cumulative effect"""
+        frame = pd.DataFrame({'scenario': self.scenarios,
+                              'mean_effect': self.point.mean(axis=1),
+                              'max_effect': self.point.max(axis=1),
+                              'duration': self.duration})
+        for q, quantile in enumerate(self.quantiles):
+            frame[f'mean_q{quantile:g}'] = self.average[:, q]
+        frame['cumulative_effect'] = self.cumulative.mean(axis=1)
+        for q, quantile in enumerate(self.quantiles):
+            frame[f'cumulative_q{quantile:g}'] = self.cumulative_average[:, q]
+        return frame
+
+
+class PolicyScenarios:
+    """
+    Batched counterfactuals for one fitted SDM and its weights
+    """
+
+    def __init__(self, model, W: sp.spmatrix, index):
+        """
+        Initialize engine
+
+        Args:
+            model: Fitted spreg GM_Lag / ML_Lag or PanelSDMResults
+            W (sp.spmatrix): (N, N) weights the model was estimated with
+            index (LocationIndex): Location order of W
+        """
+        self.W = sp.csr_matrix(getattr(W, 'sparse', W), dtype=np.float64)
+        self.index = index
+        self.n = self.W.shape[0]
+        if len(index) != self.n:
+            raise ValueError(f"Index has {len(index)} locations, W has {self.n}")
+        self.names, self.params, self.vm = model_coefficients(model)
+        self._lookup = {name: i for i, name in enumerate(self.names)}
+
+    # -------------------------------------------------------------------------
+    # Shock design
+    # -------------------------------------------------------------------------
+
+    def _mask(self, locations) -> np.ndarray:
+        if isinstance(locations, str):
+            if locations == 'all':
+                return np.ones(self.n)
+            locations = [locations]
+        locations = np.asarray(locations)
+        if locations.dtype == bool:
+            if len(locations) != self.n:
+                raise ValueError(f"Location mask has {len(locations)} entries, expected {self.n}")
+            return locations.astype(np.float64)
+        mask = np.zeros(self.n)
+        mask[self.index.positions(locations)] = 1.0
+        return mask
+
+    def design(self, shocks: pd.DataFrame) -> Tuple[List[str], List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Shock matrices per variable
+
+        Returns:
+            Tuple: scenario names, shocked variables, D (V, N, S) with dX per
+                variable and scenario, C (V, N, S) with each row's dX times
+                its duration (the cumulative shock), and the longest duration
+                per scenario (S,)
+        """
+        missing = sorted(set(shocks['variable']) - set(self._lookup))
+        if missing:
+            raise KeyError(f"Shocked variables not in model: {missing}")
+
+        scenarios = list(pd.unique(shocks['scenario']))
+        variables = list(pd.unique(shocks['variable']))
+        D = np.zeros((len(variables), self.n, len(scenarios)))
+        C = np.zeros_like(D)
+        duration = np.ones(len(scenarios))
+        s_pos = {s: i for i, s in enumerate(scenarios)}
+        v_pos = {v: i for i, v in enumerate(variables)}
+        for row in shocks.itertuples(index=False):
+            s = s_pos[row.scenario]
+            dX = row.magnitude * self._mask(row.locations)
+            D[v_pos[row.variable], :, s] += dX
+            C[v_pos[row.variable], :, s] += row.duration * dX
+            duration[s] = max(duration[s], row.duration)
+        return scenarios, variables, D, C, duration
+
+    def _coef_rows(self, variables: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        beta_idx = np.array([self._lookup[v] for v in variables])
+        theta_idx = np.array([self._lookup.get(f'W_{v}', -1) for v in variables])
+        return beta_idx, theta_idx
+
+    def _responses(self, params: np.ndarray, D: np.ndarray, WD: np.ndarray,
+                   beta_idx: np.ndarray, theta_idx: np.ndarray) -> np.ndarray:
+        """(N, S) responses for one parameter vector: one LU, all scenarios as RHS"""
+        beta = params[beta_idx]
+        theta = np.where(theta_idx >= 0, params[np.maximum(theta_idx, 0)], 0.0)
+        B = np.tensordot(beta, D, axes=1) + np.tensordot(theta, WD, axes=1)
+        A = sp.identity(self.n, format='csc') - params[self._lookup['rho']] * self.W.tocsc()
+        return splu(A.tocsc(), permc_spec='COLAMD').solve(B)
+
+    # -------------------------------------------------------------------------
+    # Evaluation
+    # -------------------------------------------------------------------------
+
+    def point(self, shocks: pd.DataFrame) -> pd.DataFrame:
+        """
+        Per-period responses at the estimated coefficients
+
+        Returns:
+            pd.DataFrame: Locations x scenarios
+        """
+        scenarios, variables, D, _, _ = self.design(shocks)
+        WD = np.stack([self.W @ d for d in D])
+        Y = self._responses(self.params, D, WD, *self._coef_rows(variables))
+        return pd.DataFrame(Y, index=pd.Index(self.index.names, name='location_name'), columns=scenarios)
+
+    def simulate(self, shocks: pd.DataFrame, n_draws: int = 500,
+                 quantiles: Sequence[float] = QUANTILES, seed: int = 0,
+                 max_abs_rho: float = 1.0) -> ScenarioResults:
+        """
+        Responses with parameter uncertainty
+
+        Args:
+            shocks (pd.DataFrame): Shock table (see shock_table)
+            n_draws (int): Draws from N(estimates, vm)
+            quantiles (Sequence[float]): Quantiles kept in the cube
+            seed (int): Seed for the draws
+            max_abs_rho (float): Reject draws with |rho| at or above this (default: 1)
+
+        Returns:
+            ScenarioResults: (S, N, Q) cube, location-average quantiles, point
+                and cumulative responses
+        """
+        scenarios, variables, D, C, duration = self.design(shocks)
+        S = len(scenarios)
+        # Per-period and cumulative shocks as 2S right-hand sides of the same solve
+        DC = np.concatenate([D, C], axis=2)
+        WDC = np.stack([self.W @ d for d in DC])
+        beta_idx, theta_idx = self._coef_rows(variables)
+
+        draws = draw_coefficients(self.params, self.vm, n_draws, self._lookup['rho'], seed, max_abs_rho)
+
+        Y = np.empty((n_draws, self.n, 2 * S))
+        for d in range(n_draws):
+            Y[d] = self._responses(draws[d], DC, WDC, beta_idx, theta_idx)
+
+        point = self._responses(self.params, DC, WDC, beta_idx, theta_idx)
+        cube = np.moveaxis(np.quantile(Y[:, :, :S], quantiles, axis=0), 0, -1)   # (N, S, Q)
+        average = np.quantile(Y.mean(axis=1), quantiles, axis=0).T                # (2S, Q)
+        return ScenarioResults(scenarios, self.index.names, quantiles,
+                               cube.transpose(1, 0, 2), average[:S], point[:, :S].T, duration,
+                               point[:, S:].T, average[S:])
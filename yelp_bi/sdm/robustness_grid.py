@@ -0,0 +1,361 @@
+"""
+SDM Robustness Grid
+===================
+Runs the cross-sectional SDM over a grid of
+
+    commodity x weights spec x lag spec x sample window
+
+on a process pool and keeps every estimate in one tidy results table.
+
+Features:
+    - Monthly panel aggregated once for all commodities and shared by every
+      worker (sent once per worker, not once per task)
+    - Weights built once per location subset through the weights registry
+      before fanning out; workers read them from the disk cache
+    - Incremental: each cell has an id hashed from its settings, the data
+      fingerprint and the estimator version, and cells already in the
+      results file are skipped
+    - Cells sharing (commodity, weights, window) run as one task on one
+      cached spatial design, so the SAR / SDM / SDM2 variants reuse W X and
+      W^2 X instead of recomputing them per cell
+    - Tidy output: one row per (cell, coefficient); `dropped` lists the
+      regressors constant across the cell's locations (not estimated)
+
+Lag specs:
+    sar       y = rho W y + X beta               (slx_lags=0)
+    sdm       + W X theta                        (slx_lags=1, default)
+    sdm2      + W X theta1 + W^2 X theta2        (slx_lags=2)
+
+Windows:
+    'full' or 'YYYY-MM:YYYY-MM' (either side may be empty)
+
+Usage:
+    from yelp_bi.sdm.robustness_grid import RobustnessGrid, make_grid, monthly_panel
+
+    grid = make_grid([f'com_{i}' for i in range(1, 7)],
+                     ['knn:k=3', 'knn:k=5', 'knn:k=8'],
+                     lags=['sdm', 'sar'], windows=['full', '2024-01:'])
+    runner = RobustnessGrid(monthly_panel(df_merged), location_index)
+    results = runner.run(grid)          # only new cells are estimated
+
+    python -m yelp_bi.sdm.robustness_grid --commodities com_1 com_2 --weights knn:k=3 knn:k=5 --workers 4
+"""
+
+import os
+import hashlib
+import argparse
+from multiprocessing import cpu_count, get_all_start_methods, get_context
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from .location_index import LocationIndex
+from .schemas import read_merged
+from .spatial_design import data_key, get_design_cache, gm_lag
+from .spatial_impacts import model_coefficients
+from .weights_registry import CACHE_DIR, canonical_spec, get_registry
+
+
+X_VARS = ['precipitation_mm', 'temperature_mean_c', 'bbm_price_idr',
+          'luas_panen_ha', 'avg_distance_km']
+LAG_SPECS = {'sar': 0, 'sdm': 1, 'sdm2': 2}
+RESULTS_PATH = os.path.join('sdm_results', 'fase6', '6b_robustness_grid.csv')
+CELL_COLUMNS = ['cell_id', 'commodity', 'weights', 'lag', 'window']
+# Part of every cell id; bump when the estimates of a cell change (2: constant regressors dropped)
+GRID_VERSION = 2
+
+# Workers are never forked: the grid may be started from a pipeline thread,
+# and forking while other threads hold locks can deadlock the child
+START_METHOD = 'forkserver' if 'forkserver' in get_all_start_methods() else 'spawn'
+
+MONTHLY_AGG = {
+    'price': 'mean',
+    'precipitation_mm': 'sum',
+    'temperature_mean_c': 'mean',
+    'bbm_price_idr': 'mean',
+    'luas_panen_ha': 'first',
+    'avg_distance_km': 'first',
+}
+CROSS_AGG = {
+    'price': 'mean',
+    'precipitation_mm': 'mean',
+    'temperature_mean_c': 'mean',
+    'bbm_price_idr': 'mean',
+    'luas_panen_ha': 'mean',
+    'avg_distance_km': 'first',
+}
+
+
+# =============================================================================
+# DATA
+# =============================================================================
+
+def monthly_panel(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Commodity x location x month panel from the merged daily dataset (one groupby)
+
+    Returns:
+        pd.DataFrame: commodity_id, location_name, year_month, date and MONTHLY_AGG columns
+    """
+    df = df[['commodity_id', 'location_name', 'date'] + list(MONTHLY_AGG)].copy()
+    df['year_month'] = pd.to_datetime(df['date']).dt.to_period('M')
+    panel = df.groupby(['commodity_id', 'location_name', 'year_month'],
+                       observed=True).agg(MONTHLY_AGG).reset_index()
+    panel['date'] = panel['year_month'].dt.to_timestamp()
+    return panel.sort_values(['commodity_id', 'location_name', 'date'], kind='stable').reset_index(drop=True)
+
+
+def parse_window(window: str):
+    """'YYYY-MM:YYYY-MM' (or 'full') -> (start, end) timestamps, None for open ends"""
+    if window in (None, '', 'full'):
+        return None, None
+    start, _, end = window.partition(':')
+    return (pd.Timestamp(start) if start else None,
+            pd.Timestamp(end) + pd.offsets.MonthEnd(0) if end else None)
+
+
+def cross_section(panel: pd.DataFrame, commodity: str, window: str, index: LocationIndex,
+                  x_vars: Sequence[str] = X_VARS):
+    """
+    Time-averaged cross-section of one commodity and window, in index order
+
+    Returns:
+        Tuple[pd.DataFrame, LocationIndex]: Complete rows and the matching index subset
+    """
+    df = panel[panel['commodity_id'] == commodity]
+    start, end = parse_window(window)
+    if start is not None:
+        df = df[df['date'] >= start]
+    if end is not None:
+        df = df[df['date'] <= end]
+    agg = {col: CROSS_AGG[col] for col in ['price'] + list(x_vars)}
+    cross = df.groupby('location_name', observed=True).agg(agg).reset_index()
+    cross = index.align(cross).dropna()
+    return cross, index.subset(cross['location_name'])
+
+
+def data_fingerprint(panel: pd.DataFrame, index: LocationIndex) -> str:
+    """Hash of the panel contents and the location index"""
+    h = hashlib.sha1()
+    h.update(pd.util.hash_pandas_object(panel, index=False).values.tobytes())
+    h.update(index.fingerprint.encode())
+    return h.hexdigest()[:12]
+
+
+# =============================================================================
+# GRID
+# =============================================================================
+
+def make_grid(commodities: Sequence[str], weights: Sequence[str],
+              lags: Sequence[str] = ('sdm',), windows: Sequence[str] = ('full',)) -> pd.DataFrame:
+    """
+    Full factorial grid of cells
+
+    Returns:
+        pd.DataFrame: One row per (commodity, weights, lag, window)
+    """
+    unknown = [lag for lag in lags if lag not in LAG_SPECS]
+    if unknown:
+        raise ValueError(f"Unknown lag specs {unknown}. Use {list(LAG_SPECS)}")
+    index = pd.MultiIndex.from_product(
+        [list(commodities), [canonical_spec(w) for w in weights], list(lags), list(windows)],
+        names=['commodity', 'weights', 'lag', 'window'])
+    return index.to_frame(index=False)
+
+
+def cell_id(commodity: str, weights: str, lag: str, window: str, fingerprint: str) -> str:
+    key = '|'.join([commodity, canonical_spec(weights), lag, window, fingerprint, str(GRID_VERSION)])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+# =============================================================================
+# WORKERS
+# =============================================================================
+
+_WORKER: Dict[str, object] = {}
+
+
+def _init_worker(panel: pd.DataFrame, index: LocationIndex, x_vars: List[str], cache_dir: str):
+    """Pool initializer: shared inputs are received once per process"""
+    _WORKER.update(panel=panel, index=index, x_vars=x_vars, cache_dir=cache_dir)
+
+
+def _estimate_cells(cells: List[dict]) -> List[dict]:
+    """
+    Estimate cells sharing (commodity, weights, window); returns tidy rows
+
+    The cross-section, weights and spatial lags are built once and every
+    lag spec is fitted on the same cached design. A cell that fails yields
+    a single status row.
+    """
+    x_vars = _WORKER['x_vars']
+    first = cells[0]
+    try:
+        cross, sub = cross_section(_WORKER['panel'], first['commodity'], first['window'],
+                                   _WORKER['index'], x_vars)
+        if len(cross) <= len(x_vars) * 2 + 2:
+            raise ValueError(f"only {len(cross)} complete locations")
+        entry = get_registry(_WORKER['cache_dir']).for_index(first['weights'], sub)
+        X = cross[x_vars].to_numpy(dtype=np.float64)
+        design = get_design_cache().design(data_key(X), entry, X, x_vars)
+    except Exception as e:
+        return [dict({col: cell[col] for col in CELL_COLUMNS}, term=None, status=f'error: {e}')
+                for cell in cells]
+
+    y = cross['price'].to_numpy(dtype=np.float64)
+    rows: List[dict] = []
+    for cell in cells:
+        rows.extend(_estimate_cell(cell, design, y))
+    return rows
+
+
+def _estimate_cell(cell: dict, design, y: np.ndarray) -> List[dict]:
+    """Fit one lag spec on a prepared design; returns tidy rows (a single status row on failure)"""
+    base = {col: cell[col] for col in CELL_COLUMNS}
+    try:
+        model = gm_lag(design, y, slx_lags=LAG_SPECS[cell['lag']], name_y='price',
+                       name_w=cell['weights'], name_ds=f"Robustness {cell['commodity']}")
+    except Exception as e:
+        return [dict(base, term=None, status=f'error: {e}')]
+
+    names, params, vm = model_coefficients(model)
+    se = np.sqrt(np.clip(np.diag(vm), 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = params / se
+    p = 2 * stats.norm.sf(np.abs(z))
+    # Regressors constant across locations (dropped by gm_lag), e.g. the national BBM price
+    dropped = ', '.join(model.dropped)
+    return [dict(base, term=name, estimate=params[i], std_err=se[i], z_stat=z[i], p_value=p[i],
+                 n=model.n, pseudo_r2=getattr(model, 'pr2', np.nan), dropped=dropped, status='ok')
+            for i, name in enumerate(names)]
+
+
+# =============================================================================
+# RUNNER
+# =============================================================================
+
+class RobustnessGrid:
+    """
+    Incremental, parallel runner for the robustness grid
+    """
+
+    def __init__(self, panel: pd.DataFrame, index: LocationIndex, x_vars: Sequence[str] = X_VARS,
+                 results_path: str = RESULTS_PATH, cache_dir: str = CACHE_DIR,
+                 n_workers: Optional[int] = None):
+        """
+        Initialize runner
+
+        Args:
+            panel (pd.DataFrame): Output of monthly_panel()
+            index (LocationIndex): Canonical location order
+            x_vars (Sequence[str]): Regressors
+            results_path (str): Tidy results CSV (read for incremental runs, rewritten after)
+            cache_dir (str): Weights registry cache directory
+            n_workers (int, optional): Pool size (default: cpu_count())
+        """
+        self.panel = panel
+        self.index = index
+        self.x_vars = list(x_vars)
+        self.results_path = results_path
+        self.cache_dir = cache_dir
+        self.n_workers = n_workers or cpu_count()
+        self.fingerprint = data_fingerprint(panel, index)
+
+    def load(self) -> pd.DataFrame:
+        """Previously computed results (empty frame if none)"""
+        if os.path.exists(self.results_path):
+            return pd.read_csv(self.results_path)
+        return pd.DataFrame(columns=CELL_COLUMNS + ['term', 'status'])
+
+    def _prebuild_weights(self, cells: pd.DataFrame):
+        """Build each (location subset, spec) once so workers only read the disk cache"""
+        registry = get_registry(self.cache_dir)
+        for (commodity, window), group in cells.groupby(['commodity', 'window']):
+            _, sub = cross_section(self.panel, commodity, window, self.index, self.x_vars)
+            if len(sub) < 2:
+                continue
+            for spec in group['weights'].unique():
+                try:
+                    registry.for_index(spec, sub)
+                except ValueError:
+                    pass    # reported per cell by the worker
+
+    def run(self, grid: pd.DataFrame, retry_errors: bool = False) -> pd.DataFrame:
+        """
+        Estimate the cells of grid that are not in the results file yet
+
+        Args:
+            grid (pd.DataFrame): Output of make_grid()
+            retry_errors (bool): Re-run cells whose previous attempt failed
+
+        Returns:
+            pd.DataFrame: Tidy results for every cell of grid
+        """
+        grid = grid.copy()
+        grid['cell_id'] = [cell_id(r.commodity, r.weights, r.lag, r.window, self.fingerprint)
+                           for r in grid.itertuples(index=False)]
+
+        previous = self.load()
+        if retry_errors and len(previous):
+            failed = previous.loc[previous['status'] != 'ok', 'cell_id']
+            previous = previous[~previous['cell_id'].isin(failed)]
+        todo = grid[~grid['cell_id'].isin(set(previous['cell_id']))]
+        print(f"Robustness grid: {len(grid)} cells, {len(grid) - len(todo)} cached, {len(todo)} to run")
+
+        rows: List[dict] = []
+        if len(todo):
+            self._prebuild_weights(todo)
+            # One task per (commodity, weights, window): its lag specs share a design
+            tasks = [group[CELL_COLUMNS].to_dict('records') for _, group in
+                     todo.groupby(['commodity', 'weights', 'window'], sort=False)]
+            initargs = (self.panel, self.index, self.x_vars, self.cache_dir)
+            n_workers = min(self.n_workers, len(tasks))
+            if n_workers <= 1:
+                _init_worker(*initargs)
+                for task in tasks:
+                    rows.extend(_estimate_cells(task))
+            else:
+                with get_context(START_METHOD).Pool(processes=n_workers, initializer=_init_worker,
+                                                    initargs=initargs) as pool:
+                    for result in pool.imap_unordered(_estimate_cells, tasks):
+                        rows.extend(result)
+
+        new = pd.DataFrame(rows)
+        frames = [f for f in (previous, new) if len(f)]
+        results = pd.concat(frames, ignore_index=True) if frames else previous
+        if len(new):
+            os.makedirs(os.path.dirname(self.results_path) or '.', exist_ok=True)
+            results.to_csv(self.results_path, index=False)
+        # Rows in grid order (the pool returns cells as they finish)
+        order = {cid: i for i, cid in enumerate(grid['cell_id'])}
+        results = results[results['cell_id'].isin(order)]
+        results = results.iloc[np.argsort(results['cell_id'].map(order).values, kind='stable')]
+        return results.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the SDM robustness grid')
+    parser.add_argument('--data', default=os.path.join('sdm_results', 'fase1', '1b_merged_dataset.csv'))
+    parser.add_argument('--commodities', nargs='+', default=[f'com_{i}' for i in range(1, 7)])
+    parser.add_argument('--weights', nargs='+', default=['knn:k=3', 'knn:k=5', 'knn:k=8'])
+    parser.add_argument('--lags', nargs='+', default=['sdm'], choices=list(LAG_SPECS))
+    parser.add_argument('--windows', nargs='+', default=['full'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--retry-errors', action='store_true')
+    args = parser.parse_args()
+
+    df = read_merged(args.data)
+    index = LocationIndex.from_weather('.').subset(df['location_name'].unique())
+    runner = RobustnessGrid(monthly_panel(df), index, n_workers=args.workers)
+    results = runner.run(make_grid(args.commodities, args.weights, args.lags, args.windows),
+                         retry_errors=args.retry_errors)
+
+    ok = results[results['status'] == 'ok']
+    print(ok[ok['term'] == 'rho'].pivot_table(index=['commodity', 'lag', 'window'],
+                                              columns='weights', values='estimate'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""
+MASTER SCRIPT: Complete Spatial Durbin Model Analysis
+YELP BI 2025 - Rice Price Prediction
+
+This script orchestrates the entire SDM analysis pipeline:
+1. Data Preparation & Validation
+2. Exploratory Spatial Data Analysis
+3. Model Specification & Diagnostics
+4. Model Estimation
+5. Output & Interpretation
+6. Validation & Robustness
+7. Policy Simulation
+
+The phases form a DAG (pipeline.py): each phase declares the files it reads
+and writes, phases whose code, parameters and inputs did not change since
+their last run are skipped, and independent phases (e.g. 2a/2b/2c/2d and
+3a-3e after the merge, or 6b next to 4-5) run concurrently.
+
+Commands select a part of the graph: `diagnostics` (phases 1-3), `estimate`
+(phases 4-7) or `run` (all, the default). run_complete_sdm_analysis.py in
+the project root calls the same entry point.
+
+Usage:
+    python -m yelp_bi.sdm                                   # run what changed
+    python -m yelp_bi.sdm diagnostics                       # phases 1-3
+    python -m yelp_bi.sdm estimate --from fase5a            # fase5a and its dependents
+    python -m yelp_bi.sdm --list                            # phases and their state
+    python -m yelp_bi.sdm --only fase2a fase3d              # just these phases
+    python -m yelp_bi.sdm --from fase4 --force              # ... even if unchanged
+    python -m yelp_bi.sdm diagnostics --dry-run             # selected phases, nothing run
+    python -m yelp_bi.sdm --workers 1                       # one phase at a time
+
+Requirements:
+    pip install pandas numpy scipy statsmodels pysal spreg libpysal esda splot geopandas matplotlib seaborn
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+import warnings
+
+import pandas as pd
+
+warnings.filterwarnings('ignore')
+
+# Import the analysis classes
+from .analysis import SpatialDurbinAnalysis
+from .estimation import SDMEstimation
+from .feature_store import SOURCES, get_feature_store
+from ..facility_catalog import get_catalog
+from .pipeline import Phase, PhaseError, Pipeline
+from .schemas import read_merged
+
+
+MERGED_CSV = 'sdm_results/fase1/1b_merged_dataset.csv'
+
+# Phases selected by each command (None: all)
+COMMANDS = {
+    'run': None,
+    'diagnostics': ['fase1a', 'fase1b', 'fase2a', 'fase2b', 'fase2c', 'fase2d',
+                    'fase3a', 'fase3b', 'fase3c', 'fase3d', 'fase3e'],
+    'estimate': ['load', 'fase4', 'fase5a', 'fase5b', 'fase5c', 'fase6a', 'fase6b', 'fase7'],
+}
+
+
+def print_banner(text):
+    """Print formatted banner"""
+    print("\n" + "="*80)
+    print(text.center(80))
+    print("="*80 + "\n")
+
+
+def build_pipeline(sdm, sdm_est, n_workers=None):
+    """
+    Phase graph of the complete analysis
+
+    Phases 1-3 share the SpatialDurbinAnalysis object (self.data['merged']
+    from fase1b); phases 4-7 share the SDMEstimation object, which reads the
+    merged dataset CSV written by fase1b.
+
+    Args:
+        sdm (SpatialDurbinAnalysis): Diagnostic phases (1-3)
+        sdm_est (SDMEstimation): Estimation phases (4-7)
+        n_workers (int, optional): Concurrent phases (default: CPU count)
+
+    Returns:
+        Pipeline: Runner over all phases
+    """
+    store = get_feature_store(sdm.base_dir)
+    sources = [store.source_path(name) for name in SOURCES]
+    facility_csv = lambda: get_catalog(sdm.base_dir).csv_path(sdm.facility_version)
+
+    def restore_merged():
+        sdm.data['merged'] = read_merged(MERGED_CSV)
+
+    def load_estimation_data():
+        sdm_est.load_preprocessed_data()
+        sdm_est.reconstruct_spatial_weights()
+
+    def out(fase, *names):
+        return [f'sdm_results/{fase}/{name}' for name in names]
+
+    merged = ['fase1b']
+    phases = [
+        # FASE 1: Data Preparation & Validation
+        Phase('fase1a', sdm.fase1a_check_data_quality, inputs=[store.source_path('pihps')],
+              outputs=out('fase1', '1a_missing_values.csv', '1a_missing_by_commodity.csv',
+                          '1a_missing_by_location.csv', '1a_time_consistency.csv',
+                          '1a_descriptive_stats.csv'),
+              description='Data quality check'),
+        Phase('fase1b', sdm.fase1b_merge_datasets, inputs=sources + [facility_csv],
+              outputs=[MERGED_CSV] + out('fase1', '1b_merge_missing_summary.csv',
+                                         '1b_correlation_matrix.csv'),
+              restore=restore_merged, description='Dataset merging'),
+
+        # FASE 2: Exploratory Spatial Data Analysis
+        Phase('fase2a', sdm.fase2a_global_morans_i, kwargs={'commodity': 'com_1'}, needs=merged,
+              outputs=out('fase2', '2a_global_morans_i.csv'), description="Global Moran's I"),
+        Phase('fase2b', sdm.fase2b_local_morans_i, kwargs={'commodity': 'com_1'}, needs=merged,
+              outputs=out('fase2', '2b_lisa_clusters.csv', '2b_cluster_summary.csv'),
+              description="Local Moran's I (LISA)"),
+        Phase('fase2c', sdm.fase2c_construct_spatial_weights, needs=merged,
+              outputs=out('fase2', '2c_weights_comparison.csv', '2c_distance_matrix_km.csv'),
+              description='Spatial weights construction'),
+        Phase('fase2d', sdm.fase2d_weekly_spatial_autocorrelation, needs=merged,
+              outputs=out('fase2', '2d_weekly_global_morans_i.csv', '2d_weekly_lisa_clusters.csv',
+                          '2d_weekly_cluster_counts.csv'),
+              description="Weekly Moran's I / LISA series"),
+
+        # FASE 3: Model Specification & Diagnostics
+        Phase('fase3a', sdm.fase3a_stationarity_tests, needs=merged,
+              outputs=out('fase3', '3a_stationarity_tests.csv', '3a_unit_root_series.csv',
+                          '3a_panel_unit_root.csv'),
+              description='Stationarity tests', exclusive=True),
+        Phase('fase3b', sdm.fase3b_multicollinearity_test, needs=merged,
+              outputs=out('fase3', '3b_vif_results.csv', '3b_condition_indices.csv',
+                          '3b_correlation_matrix.csv'),
+              description='Multicollinearity test'),
+        Phase('fase3c', sdm.fase3c_heteroskedasticity_test, needs=merged,
+              outputs=out('fase3', '3c_heteroskedasticity_test.csv'),
+              description='Heteroskedasticity test'),
+        Phase('fase3d', sdm.fase3d_spatial_diagnostics, kwargs={'commodity': 'com_1'}, needs=merged,
+              outputs=out('fase3', '3d_spatial_diagnostics.csv', '3d_lm_diagnostics_all.csv',
+                          '3d_lm_recommendations.csv', '3d_recommendation.txt'),
+              description='Spatial diagnostic tests'),
+        Phase('fase3e', sdm.fase3e_hausman_test, needs=merged,
+              outputs=out('fase3', '3e_hausman_test.csv', '3e_hausman_recommendation.txt'),
+              description='Hausman test'),
+
+        # FASE 4-7: estimation on the merged dataset CSV
+        Phase('load', load_estimation_data, inputs=[MERGED_CSV],
+              description='Load preprocessed data and weights'),
+        Phase('fase4', sdm_est.fase4_estimate_sdm, kwargs={'commodity': 'com_1', 'w_type': 'knn3'},
+              needs=['load'], outputs=out('fase4', '4_sdm_summary.txt', '4_coefficients.csv'),
+              description='SDM estimation'),
+        Phase('fase5a', sdm_est.fase5a_model_fit_statistics, needs=['fase4'],
+              outputs=out('fase5', '5a_model_fit.csv', '5a_model_comparison.csv'),
+              description='Model fit statistics'),
+        Phase('fase5b', sdm_est.fase5b_effects_decomposition, needs=['fase4'],
+              outputs=out('fase5', '5b_effects_decomposition.csv'),
+              description='Effects decomposition'),
+        Phase('fase5c', sdm_est.fase5c_spatial_multiplier, needs=['fase4'],
+              outputs=out('fase5', '5c_spatial_multiplier_matrix.csv', '5c_multiplier_summary.csv'),
+              description='Spatial multiplier analysis'),
+        Phase('fase6a', sdm_est.fase6a_residual_diagnostics, needs=['fase4'],
+              outputs=out('fase6', '6a_residual_diagnostics.csv'),
+              description='Residual diagnostics'),
+        Phase('fase6b', sdm_est.fase6b_robustness_checks, needs=['load'],
+              outputs=out('fase6', '6b_robustness_checks.csv'),
+              description='Robustness checks', exclusive=True),
+        Phase('fase7', sdm_est.fase7_policy_simulations, needs=['fase4'],
+              outputs=out('fase7', '7_policy_simulations.csv', '7_scenario_locations.csv'),
+              description='Policy simulations'),
+    ]
+    return Pipeline(phases, n_workers=n_workers)
+
+
+def parse_args(argv=None):
+    """Command-line options (no interactive prompts)"""
+    parser = argparse.ArgumentParser(prog='python -m yelp_bi.sdm',
+                                     description='Run the SDM analysis phases (1-7)')
+    parser.add_argument('command', nargs='?', default='run', choices=list(COMMANDS),
+                        help='Phases 1-3 (diagnostics), 4-7 (estimate) or all (run, default)')
+    parser.add_argument('--only', nargs='+', metavar='PHASE',
+                        help='Run only these phases (e.g. fase2a fase3d)')
+    parser.add_argument('--from', dest='start', metavar='PHASE',
+                        help='Run this phase and every phase depending on it')
+    parser.add_argument('--force', action='store_true',
+                        help='Run the selected phases even if nothing changed')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Phases run concurrently (default: CPU count; 1 = sequential)')
+    parser.add_argument('--list', action='store_true',
+                        help='Show the phases, their dependencies and state, then exit')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Print the selected phases without reading data or running them')
+    return parser.parse_args(argv)
+
+
+def selected_phases(args):
+    """--only restricted to the phases of the command"""
+    group = COMMANDS[args.command]
+    if group is None:
+        return args.only
+    return [name for name in group if not args.only or name in args.only]
+
+
+def read_text(path):
+    """First line of a text output, or None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return f.readline().strip()
+
+
+def print_summary():
+    """Diagnostic and fit summary from the phase outputs on disk"""
+    print("\n" + "="*60)
+    print("ANALYSIS SUMMARY")
+    print("="*60)
+
+    recommendation = read_text('sdm_results/fase3/3d_recommendation.txt')
+    if recommendation:
+        print(f"\n1. Spatial Model: {recommendation}")
+    if os.path.exists('sdm_results/fase3/3e_hausman_test.csv'):
+        hausman = pd.read_csv('sdm_results/fase3/3e_hausman_test.csv')
+        print(f"2. Fixed/Random Effects: {hausman['Recommendation'].iloc[0]}")
+
+    if os.path.exists('sdm_results/fase5/5a_model_fit.csv'):
+        fit_stats = pd.read_csv('sdm_results/fase5/5a_model_fit.csv')
+        print("\nModel Fit:")
+        if 'Pseudo_R2' in fit_stats.columns:
+            print(f"  - Pseudo R²: {fit_stats['Pseudo_R2'].values[0]:.4f}")
+        if 'RMSE' in fit_stats.columns:
+            print(f"  - RMSE: Rp {fit_stats['RMSE'].values[0]:.2f}/kg")
+        if 'MAPE' in fit_stats.columns:
+            print(f"  - MAPE: {fit_stats['MAPE'].values[0]:.2f}%")
+
+
+def main(argv=None):
+    """Main execution function"""
+    args = parse_args(argv)
+
+    print_banner("SPATIAL DURBIN MODEL - COMPLETE ANALYSIS")
+    print(f"Analysis started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    sdm = SpatialDurbinAnalysis(base_dir='.')
+    sdm_est = SDMEstimation(base_dir='.')
+    pipe = build_pipeline(sdm, sdm_est, n_workers=args.workers)
+
+    if args.list:
+        print(pipe.status().to_string(index=False))
+        return
+
+    only = selected_phases(args)
+    if only == []:
+        print(f"\n✗ ERROR: none of {args.only} belongs to '{args.command}'")
+        sys.exit(1)
+    if args.dry_run:
+        try:
+            print("Selected phases: " + ', '.join(pipe.select(only, args.start)))
+        except KeyError as e:
+            print(f"\n✗ ERROR: {str(e)}")
+            sys.exit(1)
+        return
+
+    try:
+        report = pipe.run(only=only, start=args.start, force=args.force)
+    except (KeyError, PhaseError) as e:
+        print(f"\n✗ ERROR: {str(e)}")
+        if isinstance(e, PhaseError):
+            import traceback
+            cause = e.__cause__ or e
+            traceback.print_exception(type(cause), cause, cause.__traceback__)
+            print("\n" + pipe.report.to_string(index=False))
+        sys.exit(1)
+
+    print_banner("PHASES")
+    print(report.drop(columns='error').to_string(index=False))
+    ran = (report['status'] == 'ran').sum()
+    skipped = report['status'].str.startswith('skipped').sum()
+    print(f"\n{ran} phase(s) ran, {skipped} unchanged phase(s) skipped")
+
+    print_summary()
+
+    # =========================================================================
+    # FINAL SUMMARY
+    # =========================================================================
+
+    print_banner("ANALYSIS COMPLETE!")
+
+    print(f"\nAnalysis finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    print("\n📊 DELIVERABLES:")
+    print("\n1. Data Quality Report:")
+    print("   - sdm_results/fase1/1a_missing_values.csv")
+    print("   - sdm_results/fase1/1a_descriptive_stats.csv")
+    print("   - sdm_results/fase1/1b_merged_dataset.csv")
+
+    print("\n2. ESDA Results:")
+    print("   - sdm_results/fase2/2a_global_morans_i.csv")
+    print("   - sdm_results/fase2/2b_lisa_clusters.csv")
+    print("   - sdm_results/fase2/2c_distance_matrix_km.csv")
+    print("   - sdm_results/fase2/2d_weekly_global_morans_i.csv")
+    print("   - sdm_results/fase2/2d_weekly_lisa_clusters.csv")
+
+    print("\n3. Diagnostic Tests:")
+    print("   - sdm_results/fase3/3a_stationarity_tests.csv")
+    print("   - sdm_results/fase3/3a_unit_root_series.csv")
+    print("   - sdm_results/fase3/3a_panel_unit_root.csv")
+    print("   - sdm_results/fase3/3b_vif_results.csv")
+    print("   - sdm_results/fase3/3c_heteroskedasticity_test.csv")
+    print("   - sdm_results/fase3/3d_spatial_diagnostics.csv")
+    print("   - sdm_results/fase3/3d_lm_diagnostics_all.csv")
+    print("   - sdm_results/fase3/3d_lm_recommendations.csv")
+    print("   - sdm_results/fase3/3e_hausman_test.csv")
+
+    print("\n4. SDM Estimation Output:")
+    print("   - sdm_results/fase4/4_sdm_summary.txt")
+    print("   - sdm_results/fase4/4_coefficients.csv")
+
+    print("\n5. Effects Decomposition:")
+    print("   - sdm_results/fase5/5a_model_fit.csv")
+    print("   - sdm_results/fase5/5a_model_comparison.csv")
+    print("   - sdm_results/fase5/5b_effects_decomposition.csv")
+    print("   - sdm_results/fase5/5c_spatial_multiplier_matrix.csv")
+
+    print("\n6. Validation Results:")
+    print("   - sdm_results/fase6/6a_residual_diagnostics.csv")
+    print("   - sdm_results/fase6/6b_robustness_checks.csv")
+
+    print("\n7. Policy Simulations:")
+    print("   - sdm_results/fase7/7_policy_simulations.csv")
+
+    print("\n" + "="*80)
+    print("🎉 ANALYSIS COMPLETE! Check sdm_results/ for all outputs.")
+    print("="*80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Merged Dataset Schema
+=====================
+Compact column types for the daily merged table (feature_store.py,
+sdm_results/fase1/1b_merged_dataset.csv and self.data['merged']).
+
+    categorical     location_name, commodity_id, commodity_name, province_name,
+                    location_type, kabupaten_kota, retrieved_at
+    float32         price, weather, BBM price, luas panen, facility distance
+    int16           year
+    datetime (day)  date, normalized to midnight
+
+Categoricals store one small integer code per row (int8 up to 127
+categories, int16 beyond - pandas picks the width) instead of a Python
+string object, so the frame shrinks several-fold and groupbys on location
+or commodity hash integer codes instead of strings. float32 keeps seven
+significant digits, enough for Rupiah prices and weather; aggregates and
+estimators convert to float64 before any linear algebra.
+
+pandas has no datetime64[D] dtype; dates are normalized to the day and
+stored with second resolution (datetime64[s]).
+
+Groupbys over categorical keys must pass observed=True: with pandas 2's
+default (observed=False) every combination of categories gets a row, also
+ones that never occur (e.g. all commodities after filtering to com_1).
+
+Features:
+    - apply_schema: cast a frame in place of the ad-hoc object / float64 types
+    - read_merged / write_merged: the CSV of fase1b read straight into the
+      compact types (no object intermediate for the typed columns)
+    - memory_mb: deep memory footprint for before/after reports
+
+Usage:
+    from yelp_bi.sdm.schemas import apply_schema, read_merged, write_merged, memory_mb
+
+    df = apply_schema(df)                               # compact types
+    write_merged(df, 'sdm_results/fase1/1b_merged_dataset.csv')
+    df = read_merged('sdm_results/fase1/1b_merged_dataset.csv')
+    df.groupby('location_name', observed=True)['price'].mean()
+"""
+
+from typing import Dict
+
+import pandas as pd
+
+
+CATEGORY_COLUMNS = ['location_name', 'commodity_id', 'commodity_name', 'province_name',
+                    'location_type', 'kabupaten_kota', 'retrieved_at']
+
+FLOAT32_COLUMNS = ['price',
+                   'temperature_mean_c', 'precipitation_mm', 'rain_mm',
+                   'precipitation_hours', 'windspeed_max_kmh',
+                   'bbm_price_idr',
+                   'luas_panen_ha', 'produktivitas_ku_ha', 'produksi_ton',
+                   'avg_distance_km']
+
+INT16_COLUMNS = ['year']
+
+DATE_COLUMNS = ['date']
+
+# Column -> dtype of the merged table (columns not listed keep their type)
+MERGED_SCHEMA: Dict[str, str] = {
+    **{col: 'category' for col in CATEGORY_COLUMNS},
+    **{col: 'float32' for col in FLOAT32_COLUMNS},
+    **{col: 'int16' for col in INT16_COLUMNS},
+    **{col: 'datetime64[s]' for col in DATE_COLUMNS},
+    'year_month': 'period[M]',
+}
+
+
+def _cast(series: pd.Series, dtype: str) -> pd.Series:
+    """One column to a schema dtype"""
+    if dtype == 'datetime64[s]':
+        return pd.to_datetime(series).dt.normalize().astype(dtype)
+    if dtype == 'period[M]':
+        if isinstance(series.dtype, pd.PeriodDtype):
+            return series
+        return pd.to_datetime(series.astype(str), format='%Y-%m').dt.to_period('M')
+    if dtype == 'category' and isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.reorder_categories(sorted(series.cat.categories))
+    if dtype == 'int16' and series.isna().any():
+        return series.astype('float32')                  # missing years stay representable
+    return series.astype(dtype)
+
+
+def _conforms(series: pd.Series, dtype: str) -> bool:
+    """Column already of the schema type (categoricals: with sorted categories)"""
+    if dtype == 'category':
+        return (isinstance(series.dtype, pd.CategoricalDtype)
+                and series.cat.categories.is_monotonic_increasing)
+    return str(series.dtype) == dtype
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, str] = MERGED_SCHEMA) -> pd.DataFrame:
+    """
+    Cast the columns of a merged table to the compact schema
+
+    Columns missing from df are skipped; columns already of the target type
+    are left as they are. Categories are kept sorted, so frames typed here and
+    frames read by read_merged (whose parser collects categories in order of
+    appearance) compare and concatenate alike.
+
+    Args:
+        df (pd.DataFrame): Merged (or PIHPS-like) frame
+        schema (dict): Column -> dtype (default: MERGED_SCHEMA)
+
+    Returns:
+        pd.DataFrame: Frame with the typed columns (a new frame; df is not modified)
+
+    Example:
+        >>> df = apply_schema(load_daily_features())
+    """
+    casts = {col: dtype for col, dtype in schema.items()
+             if col in df.columns and not _conforms(df[col], dtype)}
+    if not casts:
+        return df
+    return df.assign(**{col: _cast(df[col], dtype) for col, dtype in casts.items()})
+
+
+def csv_dtypes(schema: Dict[str, str] = MERGED_SCHEMA) -> Dict[str, str]:
+    """dtype argument of pd.read_csv for the columns a parser can type directly"""
+    return {col: dtype for col, dtype in schema.items()
+            if dtype in ('category', 'float32')}
+
+
+def read_merged(path: str, schema: Dict[str, str] = MERGED_SCHEMA) -> pd.DataFrame:
+    """
+    Merged dataset CSV in the compact schema
+
+    Args:
+        path (str): CSV written by write_merged (or any earlier 1b_merged_dataset.csv)
+        schema (dict): Column -> dtype (default: MERGED_SCHEMA)
+
+    Returns:
+        pd.DataFrame: Typed frame
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {col: dtype for col, dtype in csv_dtypes(schema).items() if col in header}
+    dates = [col for col, dtype in schema.items()
+             if dtype.startswith('datetime64') and col in header]
+    df = pd.read_csv(path, dtype=dtypes, parse_dates=dates)
+    return apply_schema(df, schema)
+
+
+def write_merged(df: pd.DataFrame, path: str, schema: Dict[str, str] = MERGED_SCHEMA):
+    """Write a merged table as CSV after casting it to the schema"""
+    apply_schema(df, schema).to_csv(path, index=False)
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """Deep memory footprint in MB (strings counted)"""
+    return float(df.memory_usage(deep=True).sum()) / 2 ** 20
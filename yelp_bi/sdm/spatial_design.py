@@ -0,0 +1,326 @@
+"""
+Spatial Design Cache
+====================
+Spatial lags of a regressor set, computed once per (data version, W) and
+shared by every estimator, diagnostic and impacts calculation that works
+on the same inputs:
+
+    W^k X    cross-section (N, K)
+    W^k X    location-major panel (N, T, K), i.e. (I_T (x) W) X applied
+             blockwise without forming the NT x NT matrix
+
+Features:
+    - Lags built incrementally: W^2 X reuses W X, W^3 X reuses W^2 X
+    - Views on a subset of periods / columns share the lags already computed
+      (W acts within each period, so a window of W X is W X of the window)
+    - SDM design [1, X, W X, ..., W^s X] and spreg's spatial instruments
+      [W^(s+1) X, ..., W^(s+w) X], with spreg's names (W_x, W2_x, ...)
+    - gm_lag(): spatial 2SLS on the cached lags; the same estimator as
+      spreg GM_Lag with slx_lags (identical betas and covariance, regressors
+      constant across locations dropped with their lags), so the SAR / SDM /
+      SDM2 variants of one dataset share every lag
+    - Process-wide cache keyed by (data key, weights key) that also keeps
+      the impact traces of each weights matrix
+
+Usage:
+    from yelp_bi.sdm.spatial_design import data_key, get_design_cache, gm_lag
+
+    cache = get_design_cache()
+    design = cache.design(data_key(X), w, X, names=X_vars)
+    design.lag(2)                              # W^2 X (W X computed on the way)
+    sar = gm_lag(design, y, slx_lags=0, name_y='price')
+    sdm = gm_lag(design, y, slx_lags=1, name_y='price')
+
+    traces = cache.traces(w)                   # ImpactTraces, once per W
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from .spatial_impacts import ImpactTraces
+
+
+MAX_ENTRIES = 64
+
+
+def data_key(*arrays) -> str:
+    """Content hash of one or more arrays (shape, dtype and values)"""
+    h = hashlib.sha1()
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(f'{a.shape}{a.dtype}'.encode())
+        h.update(a.tobytes())
+    return h.hexdigest()[:16]
+
+
+def weights_key(W) -> str:
+    """Registry key of CachedWeights, otherwise a hash of the sparse structure and values"""
+    key = getattr(W, 'key', None)
+    if key is not None:
+        return key
+    W = sp.csr_matrix(getattr(W, 'sparse', W))
+    return data_key(W.indptr, W.indices, W.data)
+
+
+class SpatialDesign:
+    """
+    Cached powers of W applied to one regressor set
+    """
+
+    def __init__(self, X: np.ndarray, W, names: Optional[Sequence[str]] = None):
+        """
+        Initialize design (no lag is computed until requested)
+
+        Args:
+            X (np.ndarray): (N, K) cross-section or (N, T, K) location-major panel
+            W: (N, N) weights (sparse matrix, libpysal W or CachedWeights)
+            names (Sequence[str], optional): Column names of X (default: x0, x1, ...)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[:, None]
+        self.W = sp.csr_matrix(getattr(W, 'sparse', W), dtype=np.float64)
+        self.n = self.W.shape[0]
+        if X.shape[0] != self.n:
+            raise ValueError(f"X has {X.shape[0]} rows, W has {self.n}")
+        self.X = X
+        self.names = list(names) if names is not None else [f'x{i}' for i in range(X.shape[-1])]
+        if len(self.names) != X.shape[-1]:
+            raise ValueError(f"{len(self.names)} names for {X.shape[-1]} columns")
+        self._lags: Dict[int, np.ndarray] = {0: X}
+        self._y_lags: Dict[Tuple[str, int], np.ndarray] = {}
+
+    @property
+    def is_panel(self) -> bool:
+        return self.X.ndim == 3
+
+    def _apply(self, A: np.ndarray) -> np.ndarray:
+        """W along the location axis of an (N, ...) array"""
+        return np.asarray(self.W @ A.reshape(self.n, -1)).reshape(A.shape)
+
+    def lag(self, order: int = 1) -> np.ndarray:
+        """
+        W^order X, built from the highest cached lower order
+
+        Args:
+            order (int): Power of W (0 returns X)
+
+        Returns:
+            np.ndarray: Same shape as X
+        """
+        if order < 0:
+            raise ValueError("Lag order must be non-negative")
+        start = max(k for k in self._lags if k <= order)
+        for k in range(start + 1, order + 1):
+            self._lags[k] = self._apply(self._lags[k - 1])
+        return self._lags[order]
+
+    def lag_y(self, y: np.ndarray, order: int = 1) -> np.ndarray:
+        """W^order y for a dependent variable (N,) / (N, 1) / (N, T), cached by content"""
+        y = np.asarray(y, dtype=np.float64)
+        key = (data_key(y), order)
+        if key not in self._y_lags:
+            lagged = y
+            for _ in range(order):
+                lagged = self._apply(lagged)
+            self._y_lags[key] = lagged
+        return self._y_lags[key]
+
+    def view(self, periods=None, columns: Optional[Sequence[str]] = None) -> 'SpatialDesign':
+        """
+        Design on a subset of periods and/or columns, sharing the cached lags
+
+        Args:
+            periods: Slice or positions along the time axis (panels only)
+            columns (Sequence[str], optional): Column names to keep (default: all)
+
+        Returns:
+            SpatialDesign: Design whose lags are slices of this design's lags
+        """
+        if periods is not None and not self.is_panel:
+            raise ValueError("Period views need a panel design")
+        cols = list(range(len(self.names))) if columns is None else \
+            [self.names.index(name) for name in columns]
+
+        def cut(A: np.ndarray) -> np.ndarray:
+            if periods is not None:
+                A = A[:, periods]
+            return A[..., cols]
+
+        sub = SpatialDesign(cut(self.X), self.W, [self.names[c] for c in cols])
+        sub._lags = {k: cut(A) for k, A in self._lags.items()}
+        return sub
+
+    @staticmethod
+    def lag_names(names: Sequence[str], order: int) -> List[str]:
+        """spreg names of W^order x: W_x, W2_x, W3_x, ..."""
+        prefix = 'W_' if order == 1 else f'W{order}_'
+        return [prefix + name for name in names]
+
+    def _stack(self, orders: Sequence[int]) -> Tuple[np.ndarray, List[str]]:
+        blocks = [self.lag(k) for k in orders]
+        names = [name for k in orders for name in
+                 (self.names if k == 0 else self.lag_names(self.names, k))]
+        return np.concatenate(blocks, axis=-1), names
+
+    def slx(self, slx_lags: int = 1, constant: bool = True) -> Tuple[np.ndarray, List[str]]:
+        """
+        [1, X, W X, ..., W^slx_lags X] and its names
+
+        Returns:
+            Tuple[np.ndarray, List[str]]: Design with X's leading shape, names
+        """
+        Z, names = self._stack(range(slx_lags + 1))
+        if constant:
+            Z = np.concatenate([np.ones(Z.shape[:-1] + (1,)), Z], axis=-1)
+            names = ['CONSTANT'] + names
+        return Z, names
+
+    def instruments(self, slx_lags: int = 1, w_lags: int = 1) -> Tuple[np.ndarray, List[str]]:
+        """
+        Spatial instruments W^(slx_lags+1) X, ..., W^(slx_lags+w_lags) X (as in spreg)
+
+        Returns:
+            Tuple[np.ndarray, List[str]]: Instruments and names
+        """
+        return self._stack(range(slx_lags + 1, slx_lags + w_lags + 1))
+
+    def __repr__(self):
+        return (f"SpatialDesign(n={self.n}, k={len(self.names)}, panel={self.is_panel}, "
+                f"lags={sorted(self._lags)})")
+
+
+# =============================================================================
+# ESTIMATOR
+# =============================================================================
+
+def gm_lag(design: SpatialDesign, y: np.ndarray, slx_lags: int = 1, w_lags: int = 1,
+           name_y: str = 'y', name_w: Optional[str] = None, name_ds: Optional[str] = None):
+    """
+    Spatial 2SLS (spreg GM_Lag with slx_lags) on cached lags
+
+    The endogenous W y is instrumented by the exogenous design and
+    W^(s+1) X ... W^(s+w) X, exactly as GM_Lag does, so the estimates and
+    their covariance match GM_Lag; only the lags come from the cache.
+    Like GM_Lag (check_constant), columns with no spread across locations
+    (e.g. a national fuel price) are dropped before the design is built,
+    together with their lags and instruments, which would otherwise
+    duplicate the intercept.
+
+    Args:
+        design (SpatialDesign): Cross-sectional design
+        y (np.ndarray): (N,) or (N, 1) dependent variable
+        slx_lags (int): 0 = SAR, 1 = SDM, 2 = SDM with W^2 X
+        w_lags (int): Orders of instrument lags (spreg default: 1)
+        name_y, name_w, name_ds: Labels for the output
+
+    Returns:
+        spreg.TSLS: Fitted model; betas end with rho (named W_<name_y>),
+            `.rho` holds its value and `.dropped` the constant columns removed
+
+    Example:
+        >>> sdm = gm_lag(design, df_cross['price'].values, slx_lags=1, name_y='price')
+        >>> sdm.rho, sdm.pr2
+    """
+    from spreg import TSLS
+
+    if design.is_panel:
+        raise ValueError("gm_lag expects a cross-sectional design; use panel_sdm for panels")
+    y = np.asarray(y, dtype=np.float64).reshape(-1, 1)
+    varying = np.ptp(design.X, axis=0) > 0
+    dropped = [name for name, v in zip(design.names, varying) if not v]
+    if dropped:
+        if not varying.any():
+            raise ValueError(f"All regressors are constant across locations: {dropped}")
+        design.lag(slx_lags + w_lags)    # computed once on the full design, shared by the view
+        design = design.view(columns=[name for name, v in zip(design.names, varying) if v])
+    Z, names = design.slx(slx_lags, constant=False)
+    H, names_h = design.instruments(slx_lags, w_lags)
+
+    model = TSLS(y, Z, yend=design.lag_y(y), q=H, name_y=name_y, name_x=names,
+                 name_yend=[f'W_{name_y}'], name_q=names_h, name_w=name_w, name_ds=name_ds)
+    model.rho = float(model.betas[-1, 0])
+    model.slx_lags = slx_lags
+    model.dropped = dropped
+    return model
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class DesignCache:
+    """
+    LRU cache of SpatialDesign objects and impact traces
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._designs: 'OrderedDict[Tuple[str, str], SpatialDesign]' = OrderedDict()
+        self._traces: 'OrderedDict[Tuple[str, tuple], ImpactTraces]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _remember(store: OrderedDict, key, value, limit: int):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > limit:
+            store.popitem(last=False)
+
+    def design(self, key: str, W, X: np.ndarray, names: Optional[Sequence[str]] = None) -> SpatialDesign:
+        """
+        Design for (data key, weights), built on a miss
+
+        Args:
+            key (str): Data version (e.g. data_key(X) or a dataset fingerprint)
+            W: Weights (CachedWeights, libpysal W or sparse matrix)
+            X (np.ndarray): Regressors, only used on a miss
+            names (Sequence[str], optional): Column names of X
+
+        Returns:
+            SpatialDesign: Shared object; lags already computed are reused
+        """
+        cache_key = (key, weights_key(W))
+        # One builder per key when phases run concurrently (pipeline.py)
+        with self._lock:
+            if cache_key in self._designs:
+                self._designs.move_to_end(cache_key)
+                return self._designs[cache_key]
+            design = SpatialDesign(X, W, names)
+            self._remember(self._designs, cache_key, design, self.max_entries)
+            return design
+
+    def traces(self, W, **kwargs) -> ImpactTraces:
+        """ImpactTraces of W (kwargs as for ImpactTraces), computed once per W and settings"""
+        cache_key = (weights_key(W), tuple(sorted(kwargs.items())))
+        with self._lock:
+            if cache_key in self._traces:
+                self._traces.move_to_end(cache_key)
+                return self._traces[cache_key]
+            traces = ImpactTraces(getattr(W, 'sparse', W), **kwargs)
+            self._remember(self._traces, cache_key, traces, self.max_entries)
+            return traces
+
+    def clear(self):
+        with self._lock:
+            self._designs.clear()
+            self._traces.clear()
+
+    def __repr__(self):
+        return f"DesignCache(designs={len(self._designs)}, traces={len(self._traces)})"
+
+
+_CACHE: Optional[DesignCache] = None
+
+
+def get_design_cache() -> DesignCache:
+    """Return the process-wide design cache"""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = DesignCache()
+    return _CACHE
@@ -0,0 +1,260 @@
+"""
+Spatial Multiplier Service
+==========================
+Pieces of the spatial multiplier M = (I - rho W)^-1 without ever forming it.
+M[i, j] is the total (direct + feedback) effect on location i of a unit
+shock at location j.
+
+Features:
+    - One sparse LU of I - rho W per (W, rho), reused for every solve
+    - Neumann series sum_k rho^k W^k x as a factorization-free alternative
+    - Columns (shock at j -> all locations), rows, row sums and column sums
+      from one solve each
+    - Diagonal exactly (blocked solves) or estimated for large N: exact
+      I + rho W + rho^2 W^2 terms plus a Hutchinson estimate of the rest
+    - tr(G), tr(G G) and tr(G'G) of G = W M for the ML information matrix,
+      exactly (blocked solves) or by Hutchinson probes for large N
+    - Dense matrix only on request, in column blocks, for small N
+
+Usage:
+    from yelp_bi.sdm.spatial_multiplier import SpatialMultiplier
+
+    M = SpatialMultiplier(w.sparse, rho=0.42)
+    M.diagonal()                   # own-location multipliers
+    M.row_sums()                   # total effect on each location of a shock everywhere
+    M.column(index.position('DKI Jakarta'))    # shock in Jakarta -> every location
+    M.summary(index.names)
+    tr_G, tr_GG, tr_GtG = M.variance_traces()
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+
+
+DIAG_EXACT_MAX_N = 5000
+TRACE_EXACT_MAX_N = 2000
+DENSE_MAX_N = 2000
+METHODS = ('lu', 'neumann')
+
+
+class SpatialMultiplier:
+    """
+    Solves with (I - rho W) for one weights matrix and rho
+    """
+
+    def __init__(self, W: sp.spmatrix, rho: float, method: str = 'lu',
+                 tol: float = 1e-10, max_terms: int = 1000):
+        """
+        Initialize service (the LU factorization happens here)
+
+        Args:
+            W (sp.spmatrix): (N, N) weights (libpysal W also accepted)
+            rho (float): Spatial autoregressive parameter
+            method (str): 'lu' (default) or 'neumann'
+            tol (float): Neumann stopping tolerance on the max-abs term
+            max_terms (int): Neumann series cap
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown multiplier method '{method}'. Use one of {METHODS}")
+        self.W = sp.csr_matrix(getattr(W, 'sparse', W), dtype=np.float64)
+        self.n = self.W.shape[0]
+        self.rho = float(rho)
+        self.method = method
+        self.tol = tol
+        self.max_terms = max_terms
+
+        if method == 'lu':
+            A = sp.identity(self.n, format='csc') - self.rho * self.W.tocsc()
+            self._lu = splu(A.tocsc(), permc_spec='COLAMD')
+        else:
+            norm = abs(self.rho) * abs(self.W).sum(axis=1).max()
+            if norm >= 1:
+                raise ValueError(f"Neumann series does not converge (|rho| ||W||_inf = {norm:.3f} >= 1)")
+            self._WT = self.W.T.tocsr()
+
+    # -------------------------------------------------------------------------
+    # Solves
+    # -------------------------------------------------------------------------
+
+    def _neumann(self, B: np.ndarray, W: sp.csr_matrix) -> np.ndarray:
+        total = B.copy()
+        term = B
+        for _ in range(self.max_terms):
+            term = self.rho * (W @ term)
+            total += term
+            if np.abs(term).max() < self.tol:
+                break
+        return total
+
+    def solve(self, B: np.ndarray, transpose: bool = False) -> np.ndarray:
+        """
+        M @ B (or M.T @ B)
+
+        Args:
+            B (np.ndarray): (N,) or (N, m) right-hand side(s)
+            transpose (bool): Solve with (I - rho W)^T instead
+
+        Returns:
+            np.ndarray: Same shape as B
+        """
+        B = np.asarray(B, dtype=np.float64)
+        if self.method == 'lu':
+            return self._lu.solve(B, trans='T' if transpose else 'N')
+        return self._neumann(B, self._WT if transpose else self.W)
+
+    def column(self, j: int) -> np.ndarray:
+        """M[:, j]: effect on every location of a unit shock at j"""
+        e = np.zeros(self.n)
+        e[j] = 1.0
+        return self.solve(e)
+
+    def columns(self, cols: Sequence[int]) -> np.ndarray:
+        """M[:, cols] as an (N, len(cols)) array from one multi-RHS solve"""
+        cols = np.asarray(cols, dtype=np.int64)
+        E = np.zeros((self.n, len(cols)))
+        E[cols, np.arange(len(cols))] = 1.0
+        return self.solve(E)
+
+    def row(self, i: int) -> np.ndarray:
+        """M[i, :]: effect on location i of a unit shock at each location"""
+        e = np.zeros(self.n)
+        e[i] = 1.0
+        return self.solve(e, transpose=True)
+
+    def row_sums(self) -> np.ndarray:
+        """M @ 1: total effect on each location of a unit shock everywhere"""
+        return self.solve(np.ones(self.n))
+
+    def column_sums(self) -> np.ndarray:
+        """1' M: total effect on all locations of a unit shock at each location"""
+        return self.solve(np.ones(self.n), transpose=True)
+
+    # -------------------------------------------------------------------------
+    # Diagonal
+    # -------------------------------------------------------------------------
+
+    def diagonal(self, method: str = 'auto', block_size: int = 256,
+                 n_probes: int = 64, seed: int = 0) -> np.ndarray:
+        """
+        diag(M): own-location multipliers
+
+        Args:
+            method (str): 'exact' (blocked column solves), 'stochastic', or
+                'auto' (exact up to DIAG_EXACT_MAX_N locations)
+            block_size (int): Columns per solve for 'exact'
+            n_probes (int): Rademacher probes for 'stochastic'
+            seed (int): Probe seed
+
+        Returns:
+            np.ndarray: (N,) diagonal
+        """
+        if method == 'auto':
+            method = 'exact' if self.n <= DIAG_EXACT_MAX_N else 'stochastic'
+
+        if method == 'exact':
+            diag = np.empty(self.n)
+            for start in range(0, self.n, block_size):
+                cols = np.arange(start, min(start + block_size, self.n))
+                diag[cols] = self.columns(cols)[cols, np.arange(len(cols))]
+            return diag
+
+        if method == 'stochastic':
+            # M = I + rho W + rho^2 W^2 + rho^3 W^3 M: first three diagonals are
+            # exact, only the (small) remainder is estimated
+            W = self.W
+            exact = (1.0 + self.rho * W.diagonal()
+                     + self.rho ** 2 * np.asarray(W.multiply(W.T).sum(axis=1)).ravel())
+            Z = np.random.default_rng(seed).choice([-1.0, 1.0], size=(self.n, n_probes))
+            R = self.solve(Z)
+            for _ in range(3):
+                R = W @ R
+            remainder = self.rho ** 3 * np.mean(Z * R, axis=1)
+            return exact + remainder
+
+        raise ValueError(f"Unknown diagonal method '{method}'. Use 'auto', 'exact' or 'stochastic'")
+
+    def variance_traces(self, method: str = 'auto', block_size: int = 256,
+                        n_probes: int = 100, seed: int = 0) -> Tuple[float, float, float]:
+        """
+        tr(G), tr(G G) and tr(G'G) for G = W M (rho terms of the ML information matrix)
+
+        Args:
+            method (str): 'exact' (blocked column and row solves of G),
+                'stochastic' (Hutchinson), or 'auto' (exact up to TRACE_EXACT_MAX_N)
+            block_size (int): Columns per solve for 'exact'
+            n_probes (int): Rademacher probes for 'stochastic'
+            seed (int): Probe seed
+
+        Returns:
+            Tuple[float, float, float]: tr(G), tr(G G), tr(G'G)
+        """
+        if method == 'auto':
+            method = 'exact' if self.n <= TRACE_EXACT_MAX_N else 'stochastic'
+        WT = self.W.T.tocsr()
+
+        if method == 'exact':
+            # G[:, C] = W M E_C and G[C, :]' = M' W' E_C, one block of columns at a time
+            tr_G = tr_GG = tr_GtG = 0.0
+            for start in range(0, self.n, block_size):
+                cols = np.arange(start, min(start + block_size, self.n))
+                E = np.zeros((self.n, len(cols)))
+                E[cols, np.arange(len(cols))] = 1.0
+                G_cols = self.W @ self.solve(E)
+                G_rows = self.solve(WT @ E, transpose=True)
+                tr_G += G_cols[cols, np.arange(len(cols))].sum()
+                tr_GG += np.sum(G_cols * G_rows)
+                tr_GtG += np.sum(G_cols * G_cols)
+            return float(tr_G), float(tr_GG), float(tr_GtG)
+
+        if method == 'stochastic':
+            # E[z'Gz] = tr(G), E[(G'z)'(Gz)] = tr(GG), E[|Gz|^2] = tr(G'G)
+            Z = np.random.default_rng(seed).choice([-1.0, 1.0], size=(self.n, n_probes))
+            GZ = self.W @ self.solve(Z)
+            GtZ = self.solve(WT @ Z, transpose=True)
+            return (float(np.mean(np.sum(Z * GZ, axis=0))), float(np.mean(np.sum(GtZ * GZ, axis=0))),
+                    float(np.mean(np.sum(GZ * GZ, axis=0))))
+
+        raise ValueError(f"Unknown trace method '{method}'. Use 'auto', 'exact' or 'stochastic'")
+
+    # -------------------------------------------------------------------------
+    # Tables
+    # -------------------------------------------------------------------------
+
+    def summary(self, locations: Optional[Sequence[str]] = None, **diag_kwargs) -> pd.DataFrame:
+        """
+        Per-location own, spillover and total multipliers
+
+        Args:
+            locations (Sequence[str], optional): Labels in W order
+            **diag_kwargs: Passed to diagonal()
+
+        Returns:
+            pd.DataFrame: Location, Own_Effect, Spillover_to_Others, Total_Effect
+                (row sums of M: the effect on each location of a unit shock everywhere)
+        """
+        own = self.diagonal(**diag_kwargs)
+        total = self.row_sums()
+        return pd.DataFrame({
+            'Location': np.arange(self.n) if locations is None else list(locations),
+            'Own_Effect': own,
+            'Spillover_to_Others': total - own,
+            'Total_Effect': total,
+        })
+
+    def to_dense(self, block_size: int = 512) -> np.ndarray:
+        """Full (N, N) multiplier, built from column blocks (N <= DENSE_MAX_N only)"""
+        if self.n > DENSE_MAX_N:
+            raise ValueError(f"Dense multiplier refused for N = {self.n} > {DENSE_MAX_N}; "
+                             "use column()/columns() for the shocks you need")
+        M = np.empty((self.n, self.n))
+        for start in range(0, self.n, block_size):
+            cols = np.arange(start, min(start + block_size, self.n))
+            M[:, cols] = self.columns(cols)
+        return M
+
+    def __repr__(self):
+        return f"SpatialMultiplier(n={self.n}, rho={self.rho:.4f}, method={self.method!r})"
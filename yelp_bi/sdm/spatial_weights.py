@@ -0,0 +1,316 @@
+"""
+Sparse Spatial Weights Factory
+==============================
+Builds spatial weights matrices directly as scipy.sparse CSR matrices, so
+the SDM pipeline scales from the 10-15 PIHPS cities to market-level
+InfoPangan panels with thousands of locations.
+
+Features:
+    - KNN, distance band, truncated inverse-distance and facility-based
+      economic weights, all built from a KD-tree (no dense N x N matrix)
+    - Great-circle distances in km (coordinates are projected onto the
+      unit sphere by geodesic.py so KD-tree chord distances preserve
+      neighbor order)
+    - In-place row standardization of the CSR data array
+    - Export to libpysal via W.from_sparse for spreg / esda
+
+Usage:
+    from yelp_bi.sdm.spatial_weights import knn_weights, economic_weights, combine_weights, to_libpysal
+
+    coords = coords_df[['longitude', 'latitude']].values
+    W_knn = knn_weights(coords, k=3)
+    W_econ = economic_weights(coords, facility_counts)
+    W_comb = combine_weights(W_knn, W_econ, alpha=0.5)
+    w = to_libpysal(W_comb)
+
+All builders take coordinates as (longitude, latitude) in degrees, the same
+column order used with libpysal's KNN.from_array elsewhere in this project.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.spatial import cKDTree
+
+from ..geodesic import unit_sphere as _unit_sphere, chord_to_km as _chord_to_km, km_to_chord as _km_to_chord
+
+
+# Added to distances before inverting so co-located units stay finite
+DISTANCE_OFFSET_KM = 0.1
+
+
+# =============================================================================
+# GEOMETRY HELPERS
+# =============================================================================
+
+def _neighbor_pairs(coords: np.ndarray, k: Optional[int] = None,
+                    max_distance_km: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Directed neighbor pairs (i, j, distance_km), excluding i == j
+
+    Neighbors are the k nearest units, all units within max_distance_km, or
+    the union of both when both are given. With neither, every pair is
+    returned (only sensible for small N).
+    """
+    xyz = _unit_sphere(coords)
+    n = len(xyz)
+    rows, cols = [], []
+
+    if k is None and max_distance_km is None:
+        r, c = np.nonzero(~np.eye(n, dtype=bool))
+        rows.append(r)
+        cols.append(c)
+    else:
+        tree = cKDTree(xyz)
+        if k is not None:
+            r, c, _ = _knn_query(tree, xyz, k)
+            rows.append(r)
+            cols.append(c)
+        if max_distance_km is not None:
+            pairs = tree.query_pairs(_km_to_chord(max_distance_km), output_type='ndarray')
+            rows.extend([pairs[:, 0], pairs[:, 1]])
+            cols.extend([pairs[:, 1], pairs[:, 0]])
+
+    rows = np.concatenate(rows).astype(np.int64)
+    cols = np.concatenate(cols).astype(np.int64)
+    if k is not None and max_distance_km is not None:
+        pair_ids = np.unique(rows * n + cols)
+        rows, cols = pair_ids // n, pair_ids % n
+
+    dist_km = _chord_to_km(np.linalg.norm(xyz[rows] - xyz[cols], axis=1))
+    return rows, cols, dist_km
+
+
+def _knn_query(tree: cKDTree, xyz: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Query k nearest neighbors, dropping each unit itself"""
+    n = len(xyz)
+    if k >= n:
+        raise ValueError(f"k={k} must be smaller than the number of units ({n})")
+
+    chord, idx = tree.query(xyz, k=k + 1)
+    is_self = idx == np.arange(n)[:, None]
+    # With duplicate coordinates the unit itself may not be returned; drop the farthest instead
+    no_self = ~is_self.any(axis=1)
+    is_self[no_self, -1] = True
+
+    keep = ~is_self
+    rows = np.repeat(np.arange(n), k)
+    cols = idx[keep]
+    return rows, cols, _chord_to_km(chord[keep])
+
+
+def knn_distances_km(coords: np.ndarray, k: int) -> np.ndarray:
+    """
+    Distance to the k-th nearest neighbor of each unit
+
+    Args:
+        coords (np.ndarray): (n, 2) array of (longitude, latitude)
+        k (int): Neighbor rank (1 = nearest)
+
+    Returns:
+        np.ndarray: (n,) distances in km
+    """
+    xyz = _unit_sphere(coords)
+    _, _, dist_km = _knn_query(cKDTree(xyz), xyz, k)
+    return dist_km.reshape(len(xyz), k)[:, -1]
+
+
+# =============================================================================
+# SPARSE OPERATIONS
+# =============================================================================
+
+def row_standardize(W: sp.csr_matrix) -> sp.csr_matrix:
+    """
+    Row-standardize a CSR matrix in place (rows with no neighbors stay zero)
+
+    Args:
+        W (sp.csr_matrix): Weights matrix with float data
+
+    Returns:
+        sp.csr_matrix: The same object, rows summing to 1
+    """
+    row_sums = np.asarray(W.sum(axis=1)).ravel()
+    row_sums[row_sums == 0] = 1.0
+    W.data /= np.repeat(row_sums, np.diff(W.indptr))
+    return W
+
+
+def _build(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n: int,
+           transform: str) -> sp.csr_matrix:
+    """Assemble CSR from triplets and apply the requested transform"""
+    W = sp.csr_matrix((values.astype(np.float64), (rows, cols)), shape=(n, n))
+    W.sum_duplicates()
+    W.sort_indices()
+    if transform == 'r':
+        row_standardize(W)
+    elif transform == 'b':
+        W.data[:] = 1.0
+    elif transform != 'o':
+        raise ValueError(f"Unsupported transform '{transform}' (use 'r', 'o' or 'b')")
+    return W
+
+
+def combine_weights(W_a: sp.csr_matrix, W_b: sp.csr_matrix, alpha: float,
+                    transform: str = 'r') -> sp.csr_matrix:
+    """
+    Convex combination alpha * W_a + (1 - alpha) * W_b
+
+    Args:
+        W_a (sp.csr_matrix): First weights matrix (e.g. geographic KNN)
+        W_b (sp.csr_matrix): Second weights matrix (e.g. economic)
+        alpha (float): Weight on W_a, between 0 and 1
+        transform (str): 'r' to row-standardize the result (default)
+
+    Returns:
+        sp.csr_matrix: Combined weights
+    """
+    W = (alpha * W_a + (1 - alpha) * W_b).tocsr()
+    W.sort_indices()
+    if transform == 'r':
+        row_standardize(W)
+    return W
+
+
+def subset_weights(W: sp.spmatrix, keep: Sequence[int], transform: str = 'r') -> sp.csr_matrix:
+    """
+    Restrict weights to a subset of units (e.g. locations present in a panel)
+
+    Args:
+        W (sp.spmatrix): (n, n) weights matrix
+        keep (Sequence[int]): Rows / columns to keep, in the desired order
+        transform (str): 'r' to row-standardize the result again (default)
+
+    Returns:
+        sp.csr_matrix: (len(keep), len(keep)) weights
+    """
+    keep = np.asarray(keep, dtype=np.int64)
+    W_sub = sp.csr_matrix(W)[keep][:, keep].astype(np.float64)
+    W_sub.sort_indices()
+    if transform == 'r':
+        row_standardize(W_sub)
+    return W_sub
+
+
+# =============================================================================
+# WEIGHTS BUILDERS
+# =============================================================================
+
+def knn_weights(coords: np.ndarray, k: int, transform: str = 'r') -> sp.csr_matrix:
+    """
+    K-nearest-neighbor weights
+
+    Args:
+        coords (np.ndarray): (n, 2) array of (longitude, latitude)
+        k (int): Number of neighbors
+        transform (str): 'r' row-standardized (default), 'b' binary
+
+    Returns:
+        sp.csr_matrix: (n, n) weights with exactly k neighbors per row
+    """
+    xyz = _unit_sphere(coords)
+    rows, cols, _ = _knn_query(cKDTree(xyz), xyz, k)
+    return _build(rows, cols, np.ones(len(rows)), len(xyz), transform)
+
+
+def distance_band_weights(coords: np.ndarray, threshold_km: float,
+                          binary: bool = True, power: float = 1.0,
+                          transform: str = 'r') -> sp.csr_matrix:
+    """
+    Distance band weights: neighbors are all units within threshold_km
+
+    Args:
+        coords (np.ndarray): (n, 2) array of (longitude, latitude)
+        threshold_km (float): Band radius in km
+        binary (bool): 1 for every neighbor (default) or inverse distance
+        power (float): Distance decay exponent when binary=False
+        transform (str): 'r' row-standardized (default), 'o' original
+
+    Returns:
+        sp.csr_matrix: (n, n) weights; units without neighbors have empty rows
+    """
+    rows, cols, dist_km = _neighbor_pairs(coords, max_distance_km=threshold_km)
+    values = np.ones(len(rows)) if binary else (dist_km + DISTANCE_OFFSET_KM) ** -power
+    return _build(rows, cols, values, len(coords), transform)
+
+
+def inverse_distance_weights(coords: np.ndarray, k: Optional[int] = None,
+                             max_distance_km: Optional[float] = None,
+                             power: float = 1.0, offset_km: float = DISTANCE_OFFSET_KM,
+                             transform: str = 'r') -> sp.csr_matrix:
+    """
+    Truncated inverse-distance weights 1 / (d_ij + offset_km) ** power
+
+    The matrix is truncated to the k nearest neighbors and/or units within
+    max_distance_km. Leaving both as None keeps every pair, matching the
+    dense inverse-distance matrix used for the 10-city PIHPS panel.
+
+    Args:
+        coords (np.ndarray): (n, 2) array of (longitude, latitude)
+        k (int, optional): Keep the k nearest neighbors
+        max_distance_km (float, optional): Keep neighbors within this distance
+        power (float): Distance decay exponent (default: 1)
+        offset_km (float): Added to distances before inverting (default: 0.1)
+        transform (str): 'r' row-standardized (default), 'o' original
+
+    Returns:
+        sp.csr_matrix: (n, n) weights
+    """
+    rows, cols, dist_km = _neighbor_pairs(coords, k=k, max_distance_km=max_distance_km)
+    values = (dist_km + offset_km) ** -power
+    return _build(rows, cols, values, len(coords), transform)
+
+
+def economic_weights(coords: np.ndarray, mass: Sequence[float], k: Optional[int] = None,
+                     max_distance_km: Optional[float] = None,
+                     offset_km: float = DISTANCE_OFFSET_KM,
+                     transform: str = 'r') -> sp.csr_matrix:
+    """
+    Facility-network (gravity) weights sqrt(m_i * m_j) / (d_ij + offset_km)
+
+    Args:
+        coords (np.ndarray): (n, 2) array of (longitude, latitude)
+        mass (Sequence[float]): Economic mass per unit, e.g. number of
+            distribution facilities around each location
+        k (int, optional): Keep the k nearest neighbors
+        max_distance_km (float, optional): Keep neighbors within this distance
+        offset_km (float): Added to distances before inverting (default: 0.1)
+        transform (str): 'r' row-standardized (default), 'o' original
+
+    Returns:
+        sp.csr_matrix: (n, n) weights
+    """
+    mass = np.asarray(mass, dtype=np.float64)
+    rows, cols, dist_km = _neighbor_pairs(coords, k=k, max_distance_km=max_distance_km)
+    values = np.sqrt(mass[rows] * mass[cols]) / (dist_km + offset_km)
+    return _build(rows, cols, values, len(coords), transform)
+
+
+# =============================================================================
+# LIBPYSAL EXPORT
+# =============================================================================
+
+def to_libpysal(W: sp.spmatrix, ids: Optional[Sequence] = None, transform: str = 'r'):
+    """
+    Convert a sparse weights matrix to a libpysal W for spreg / esda
+
+    Args:
+        W (sp.spmatrix): (n, n) weights matrix
+        ids (Sequence, optional): Unit ids in row order (default: 0..n-1)
+        transform (str): Transform flag recorded on the W object
+
+    Returns:
+        libpysal.weights.W: Weights object with the same entries
+    """
+    from libpysal.weights import W as PysalW, WSP
+
+    W = sp.csr_matrix(W)
+    if np.diff(W.indptr).min() == 0:
+        # W.from_sparse drops units without neighbors; WSP keeps them as islands
+        w = WSP(W, id_order=list(range(W.shape[0]))).to_W(silence_warnings=True)
+    else:
+        w = PysalW.from_sparse(W)
+    if ids is not None:
+        w.remap_ids(list(ids))
+    w.transform = transform
+    return w
@@ -0,0 +1,300 @@
+"""
+Unit-Root Battery
+=================
+Per-series stationarity tests with panel unit-root tests on top.
+
+Every (commodity, location) series of each variable gets its own ADF and
+KPSS test; panel tests then combine the series of a variable within each
+commodity (or any other grouping):
+
+    IPS      Im-Pesaran-Shin W_tbar: standardized mean of the ADF t-statistics
+    Fisher   Maddala-Wu P = -2 sum ln p_i ~ chi2(2N) and
+             Choi Z = sum Phi^-1(p_i) / sqrt(N) ~ N(0, 1)
+
+H0 of ADF and of the panel tests is a unit root in every series; H0 of KPSS
+is stationarity.
+
+Features:
+    - Series dispatched to a process pool (sequential for a single worker);
+      workers come from a forkserver (spawn where unavailable), never a bare
+      fork, since the battery may be started from a pipeline thread
+    - Results cached by series hash (values + test settings): re-runs after
+      new data only test the series that changed. Identical series (e.g.
+      weather of one location repeated for every commodity) are tested once
+      and counted once in the panel tests
+    - Series that are too short or constant are reported, not tested
+
+Usage:
+    from yelp_bi.sdm.unit_root import UnitRootBattery
+
+    battery = UnitRootBattery(regression='c', n_workers=4)
+    series = battery.run(df_merged, ['price', 'precipitation_mm'])
+    panel = battery.panel(series)                             # per commodity and variable
+    summary = battery.panel(series, by=['variable'])          # one row per variable
+"""
+
+import os
+import hashlib
+import warnings
+from multiprocessing import cpu_count, get_all_start_methods, get_context
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+CACHE_PATH = os.path.join('sdm_results', 'cache', 'unit_root', 'series_tests.csv')
+
+SERIES_KEYS = ['commodity_id', 'location_name']
+
+# Forking a process while other threads hold locks (BLAS, the pipeline's own)
+# can deadlock the child
+START_METHOD = 'forkserver' if 'forkserver' in get_all_start_methods() else 'spawn'
+
+# Asymptotic mean and variance of the Dickey-Fuller t-statistic (Nabeya 1999),
+# used to standardize the IPS t-bar
+DF_T_MOMENTS = {'c': (-1.5331, 0.7079), 'ct': (-2.1814, 0.5817)}
+
+TEST_COLUMNS = ['adf_stat', 'adf_pvalue', 'adf_lags', 'n_obs', 'adf_crit_1', 'adf_crit_5',
+                'adf_crit_10', 'kpss_stat', 'kpss_pvalue', 'kpss_lags', 'status']
+
+# Keeps p-values of extreme statistics finite in the Fisher combinations
+P_CLIP = 1e-16
+
+
+def series_hash(values: np.ndarray, settings: str) -> str:
+    """Content hash of a series and the test settings it is run with"""
+    h = hashlib.sha1(settings.encode())
+    h.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return h.hexdigest()[:16]
+
+
+def _test_series(task) -> dict:
+    """
+    ADF and KPSS on one series (pool worker)
+
+    Args:
+        task (tuple): (hash, values, regression, autolag, maxlag, min_obs)
+
+    Returns:
+        dict: series_hash and TEST_COLUMNS
+    """
+    from statsmodels.tsa.stattools import adfuller, kpss
+
+    key, values, regression, autolag, maxlag, min_obs = task
+    row = dict.fromkeys(TEST_COLUMNS, np.nan)
+    row.update(series_hash=key, n_obs=len(values))
+    if len(values) < min_obs:
+        return dict(row, status='too short')
+    if np.ptp(values) == 0:
+        return dict(row, status='constant')
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            adf = adfuller(values, maxlag=maxlag, regression=regression, autolag=autolag)
+            k = kpss(values, regression=regression, nlags='auto')
+    except Exception as e:
+        return dict(row, status=f'error: {e}')
+    row.update(adf_stat=adf[0], adf_pvalue=adf[1], adf_lags=adf[2], n_obs=adf[3],
+               adf_crit_1=adf[4]['1%'], adf_crit_5=adf[4]['5%'], adf_crit_10=adf[4]['10%'],
+               kpss_stat=k[0], kpss_pvalue=k[1], kpss_lags=k[2], status='ok')
+    return row
+
+
+def ips_test(t_stats: np.ndarray, regression: str = 'c') -> Dict[str, float]:
+    """
+    Im-Pesaran-Shin panel unit-root test from per-series ADF t-statistics
+
+    The t-bar is standardized with the asymptotic Dickey-Fuller moments, so
+    the test is approximate for short series.
+
+    Args:
+        t_stats (np.ndarray): ADF t-statistics of N series
+        regression (str): 'c' or 'ct', as in the ADF regressions
+
+    Returns:
+        dict: t_bar, W_tbar (N(0, 1) under H0, left tail) and its p-value
+    """
+    if regression not in DF_T_MOMENTS:
+        raise ValueError(f"IPS needs regression 'c' or 'ct', got '{regression}'")
+    t_stats = np.asarray(t_stats, dtype=np.float64)
+    mean, var = DF_T_MOMENTS[regression]
+    t_bar = t_stats.mean()
+    w = np.sqrt(len(t_stats)) * (t_bar - mean) / np.sqrt(var)
+    return {'t_bar': t_bar, 'W_tbar': w, 'W_tbar_pvalue': stats.norm.cdf(w)}
+
+
+def fisher_test(p_values: np.ndarray) -> Dict[str, float]:
+    """
+    Fisher-type panel unit-root tests from per-series ADF p-values
+
+    Args:
+        p_values (np.ndarray): ADF p-values of N independent series
+
+    Returns:
+        dict: Maddala-Wu P (chi2 with 2N df) and Choi Z (N(0, 1), left tail)
+            with their p-values
+    """
+    p = np.clip(np.asarray(p_values, dtype=np.float64), P_CLIP, 1 - P_CLIP)
+    n = len(p)
+    P = -2 * np.log(p).sum()
+    Z = stats.norm.ppf(p).sum() / np.sqrt(n)
+    return {'Fisher_P': P, 'Fisher_P_pvalue': stats.chi2.sf(P, 2 * n),
+            'Choi_Z': Z, 'Choi_Z_pvalue': stats.norm.cdf(Z)}
+
+
+class UnitRootBattery:
+    """
+    Cached, parallel ADF / KPSS per series plus IPS and Fisher panel tests
+    """
+
+    def __init__(self, regression: str = 'c', autolag: Optional[str] = 'AIC',
+                 maxlag: Optional[int] = None, alpha: float = 0.05, min_obs: int = 20,
+                 cache_path: Optional[str] = CACHE_PATH, n_workers: Optional[int] = None):
+        """
+        Initialize battery
+
+        Args:
+            regression (str): Deterministic terms, 'c' (default) or 'ct'
+            autolag (str, optional): ADF lag selection ('AIC', 'BIC', 't-stat' or None)
+            maxlag (int, optional): Maximum ADF lag (default: statsmodels' 12 (T/100)^(1/4))
+            alpha (float): Significance level of the reject flags (default: 0.05)
+            min_obs (int): Shorter series are not tested (default: 20)
+            cache_path (str, optional): CSV of per-series results (None: no cache)
+            n_workers (int, optional): Pool size (default: cpu_count())
+        """
+        self.regression = regression
+        self.autolag = autolag
+        self.maxlag = maxlag
+        self.alpha = alpha
+        self.min_obs = min_obs
+        self.cache_path = cache_path
+        self.n_workers = n_workers or cpu_count()
+        self.settings = f'{regression}|{autolag}|{maxlag}|{min_obs}'
+
+    # -------------------------------------------------------------------------
+    # Cache
+    # -------------------------------------------------------------------------
+
+    def load(self) -> pd.DataFrame:
+        """Cached per-series results (empty frame if none)"""
+        if self.cache_path is not None and os.path.exists(self.cache_path):
+            return pd.read_csv(self.cache_path, dtype={'series_hash': str})
+        return pd.DataFrame(columns=['series_hash'] + TEST_COLUMNS)
+
+    def _save(self, cache: pd.DataFrame):
+        if self.cache_path is None:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp = self.cache_path + '.tmp'
+        cache.to_csv(tmp, index=False)
+        os.replace(tmp, self.cache_path)
+
+    # -------------------------------------------------------------------------
+    # Per-series tests
+    # -------------------------------------------------------------------------
+
+    def series(self, df: pd.DataFrame, variables: Sequence[str],
+               keys: Sequence[str] = SERIES_KEYS, time_col: str = 'date') -> pd.DataFrame:
+        """
+        One row per (keys, variable) series with its values and hash
+
+        Args:
+            df (pd.DataFrame): Long data with the key columns and time_col
+            variables (Sequence[str]): Columns to test
+            keys (Sequence[str]): Series keys (default: commodity, location)
+            time_col (str): Ordering column (default: 'date')
+
+        Returns:
+            pd.DataFrame: keys, variable, series_hash, values (missing values dropped)
+        """
+        keys = [k for k in keys if k in df.columns]
+        ordered = df.sort_values(keys + [time_col], kind='stable')
+        rows = []
+        for group, sub in ordered.groupby(keys, sort=True, observed=True):
+            group = group if isinstance(group, tuple) else (group,)
+            for var in variables:
+                values = sub[var].dropna().to_numpy(dtype=np.float64)
+                rows.append(dict(zip(keys, group), variable=var,
+                                 series_hash=series_hash(values, self.settings), values=values))
+        return pd.DataFrame(rows)
+
+    def run(self, df: pd.DataFrame, variables: Sequence[str],
+            keys: Sequence[str] = SERIES_KEYS, time_col: str = 'date') -> pd.DataFrame:
+        """
+        ADF and KPSS on every series; only series missing from the cache are tested
+
+        Args:
+            df (pd.DataFrame): Long data with the key columns and time_col
+            variables (Sequence[str]): Columns to test
+            keys (Sequence[str]): Series keys (default: commodity, location)
+            time_col (str): Ordering column (default: 'date')
+
+        Returns:
+            pd.DataFrame: keys, variable, series_hash, test results and the
+                ADF_Reject (unit root rejected) / KPSS_Reject (stationarity
+                rejected) flags at alpha
+        """
+        table = self.series(df, variables, keys, time_col)
+        cache = self.load()
+        known = set(cache['series_hash'])
+        todo = table[~table['series_hash'].isin(known)].drop_duplicates('series_hash')
+        print(f"Unit-root battery: {len(table)} series, {table['series_hash'].nunique()} distinct, "
+              f"{len(todo)} to test")
+
+        rows: List[dict] = []
+        if len(todo):
+            tasks = [(r.series_hash, r.values, self.regression, self.autolag, self.maxlag, self.min_obs)
+                     for r in todo.itertuples(index=False)]
+            n_workers = min(self.n_workers, len(tasks))
+            if n_workers <= 1:
+                rows = [_test_series(task) for task in tasks]
+            else:
+                chunksize = max(1, len(tasks) // (4 * n_workers))
+                with get_context(START_METHOD).Pool(processes=n_workers) as pool:
+                    rows = list(pool.imap_unordered(_test_series, tasks, chunksize=chunksize))
+            cache = pd.concat([f for f in (cache, pd.DataFrame(rows)) if len(f)], ignore_index=True)
+            self._save(cache)
+
+        results = table.drop(columns='values').merge(
+            cache.drop_duplicates('series_hash', keep='last'), on='series_hash', how='left')
+        ok = results['status'] == 'ok'
+        results['ADF_Reject'] = ok & (results['adf_pvalue'] < self.alpha)
+        results['KPSS_Reject'] = ok & (results['kpss_pvalue'] < self.alpha)
+        return results
+
+    # -------------------------------------------------------------------------
+    # Panel tests
+    # -------------------------------------------------------------------------
+
+    def panel(self, results: pd.DataFrame,
+              by: Sequence[str] = ('commodity_id', 'variable')) -> pd.DataFrame:
+        """
+        IPS and Fisher-type panel tests per group of series
+
+        Series with identical values are counted once per group.
+
+        Args:
+            results (pd.DataFrame): Output of run()
+            by (Sequence[str]): Grouping columns (default: commodity and variable)
+
+        Returns:
+            pd.DataFrame: by, N_Series, ADF / KPSS reject shares, IPS and
+                Fisher statistics with p-values, and Stationary (IPS rejects
+                the unit root at alpha)
+        """
+        by = [b for b in by if b in results.columns]
+        tested = results[results['status'] == 'ok'].drop_duplicates(by + ['series_hash'])
+        rows = []
+        for group, sub in tested.groupby(by, sort=False):
+            group = group if isinstance(group, tuple) else (group,)
+            row = dict(zip(by, group), N_Series=len(sub),
+                       ADF_Reject_Share=sub['ADF_Reject'].mean(),
+                       KPSS_Reject_Share=sub['KPSS_Reject'].mean(),
+                       Median_Lags=sub['adf_lags'].median())
+            row.update(ips_test(sub['adf_stat'].to_numpy(), self.regression))
+            row.update(fisher_test(sub['adf_pvalue'].to_numpy()))
+            row['Stationary'] = row['W_tbar_pvalue'] < self.alpha
+            rows.append(row)
+        return pd.DataFrame(rows)
@@ -0,0 +1,299 @@
+"""
+Spatial Weights Registry
+========================
+Disk-backed cache of sparse spatial weights keyed by the coordinates, the
+location order and a weights spec, so every SDM phase (and every run) reuses
+the same matrix instead of rebuilding KNN3/5/8 from the weather CSV.
+
+Spec format:
+    "<kind>:<param>=<value>,..."
+
+    knn:k=5,transform=r          K nearest neighbors
+    band:threshold_km=45.2       Distance band
+    idw                          Inverse distance, all pairs
+    idw:k=8,power=2              Truncated inverse distance
+    economic                     Facility gravity weights (needs mass)
+    combined:alpha=0.5,k=3       alpha * KNN(k) + (1 - alpha) * economic (needs mass)
+
+Usage:
+    from yelp_bi.sdm.weights_registry import get_registry, load_location_coords
+
+    coords_df = load_location_coords('.')
+    registry = get_registry()
+
+    entry = registry.get('knn:k=5', coords_df[['longitude', 'latitude']].values,
+                         coords_df['location_name'].values)
+    entry.sparse   # scipy.sparse CSR matrix
+    entry.w        # libpysal W (built on first access)
+
+    # Preferred: build against the shared LocationIndex so rows follow its order
+    from yelp_bi.sdm.location_index import LocationIndex
+    index = LocationIndex.from_weather('.')
+    entry = registry.for_index('knn:k=5', index)
+    entry.index is index   # True
+
+Cached files live in sdm_results/cache/weights/<key>.npz with a JSON
+sidecar holding the spec and location order.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .spatial_weights import (knn_weights, distance_band_weights, inverse_distance_weights,
+                             economic_weights, combine_weights, to_libpysal)
+
+
+CACHE_DIR = os.path.join('sdm_results', 'cache', 'weights')
+
+# Parameter types per spec kind; defaults are filled in before hashing
+SPEC_PARAMS = {
+    'knn': {'k': int, 'transform': str},
+    'band': {'threshold_km': float, 'binary': int, 'transform': str},
+    'idw': {'k': int, 'max_distance_km': float, 'power': float, 'transform': str},
+    'economic': {'k': int, 'max_distance_km': float, 'transform': str},
+    'combined': {'alpha': float, 'k': int, 'transform': str},
+}
+SPEC_DEFAULTS = {
+    'knn': {'k': 3, 'transform': 'r'},
+    'band': {'binary': 1, 'transform': 'r'},
+    'idw': {'power': 1.0, 'transform': 'r'},
+    'economic': {'transform': 'r'},
+    'combined': {'alpha': 0.5, 'k': 3, 'transform': 'r'},
+}
+NEEDS_MASS = {'economic', 'combined'}
+
+
+def parse_spec(spec: str) -> tuple:
+    """
+    Parse a weights spec into (kind, params) with defaults applied
+
+    Example:
+        >>> parse_spec('knn:k=5')
+        ('knn', {'k': 5, 'transform': 'r'})
+    """
+    kind, _, raw = spec.strip().partition(':')
+    if kind not in SPEC_PARAMS:
+        raise ValueError(f"Unknown weights kind '{kind}'. Use one of {sorted(SPEC_PARAMS)}")
+
+    params = dict(SPEC_DEFAULTS[kind])
+    for item in filter(None, (p.strip() for p in raw.split(','))):
+        name, _, value = item.partition('=')
+        if name not in SPEC_PARAMS[kind]:
+            raise ValueError(f"Unknown parameter '{name}' for '{kind}' weights")
+        params[name] = SPEC_PARAMS[kind][name](value)
+
+    if kind == 'band' and 'threshold_km' not in params:
+        raise ValueError("band weights need threshold_km")
+    return kind, params
+
+
+def canonical_spec(spec: str) -> str:
+    """Spec string with defaults filled in and parameters sorted"""
+    kind, params = parse_spec(spec)
+    return kind + ':' + ','.join(f"{k}={params[k]}" for k in sorted(params))
+
+
+def build_weights(spec: str, coords: np.ndarray, mass: Optional[Sequence[float]] = None) -> sp.csr_matrix:
+    """
+    Build a sparse weights matrix from a spec (no caching)
+
+    Args:
+        spec (str): Weights spec, e.g. "knn:k=5"
+        coords (np.ndarray): (n, 2) array of (longitude, latitude)
+        mass (Sequence[float], optional): Economic mass for economic/combined
+
+    Returns:
+        sp.csr_matrix: (n, n) weights
+    """
+    kind, p = parse_spec(spec)
+    if kind in NEEDS_MASS and mass is None:
+        raise ValueError(f"'{kind}' weights need a mass vector (e.g. facility counts)")
+
+    if kind == 'knn':
+        return knn_weights(coords, k=p['k'], transform=p['transform'])
+    if kind == 'band':
+        return distance_band_weights(coords, threshold_km=p['threshold_km'],
+                                     binary=bool(p['binary']), transform=p['transform'])
+    if kind == 'idw':
+        return inverse_distance_weights(coords, k=p.get('k'), max_distance_km=p.get('max_distance_km'),
+                                        power=p['power'], transform=p['transform'])
+    if kind == 'economic':
+        return economic_weights(coords, mass, k=p.get('k'), max_distance_km=p.get('max_distance_km'),
+                                transform=p['transform'])
+    # combined
+    W_geo = knn_weights(coords, k=p['k'])
+    W_econ = economic_weights(coords, mass)
+    return combine_weights(W_geo, W_econ, p['alpha'], transform=p['transform'])
+
+
+class CachedWeights:
+    """
+    A weights matrix together with the location order it was built for
+    """
+
+    def __init__(self, key: str, spec: str, sparse: sp.csr_matrix, locations: Sequence[str]):
+        self.key = key
+        self.spec = spec
+        self.sparse = sparse
+        self.locations = list(locations)
+        self.index = None   # LocationIndex when built through for_index()
+        self._w = None
+
+    @property
+    def n(self) -> int:
+        return self.sparse.shape[0]
+
+    @property
+    def w(self):
+        """libpysal W for spreg / esda, converted once"""
+        if self._w is None:
+            self._w = to_libpysal(self.sparse, transform=parse_spec(self.spec)[1]['transform'])
+        return self._w
+
+    def __repr__(self):
+        return f"CachedWeights({self.spec!r}, n={self.n}, nnz={self.sparse.nnz})"
+
+
+class WeightsRegistry:
+    """
+    Memory- and disk-backed cache of spatial weights
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        """
+        Initialize registry
+
+        Args:
+            cache_dir (str): Directory for persisted matrices
+                (default: sdm_results/cache/weights)
+        """
+        self.cache_dir = cache_dir
+        self._memory: Dict[str, CachedWeights] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(spec: str, coords: np.ndarray, locations: Sequence[str],
+                 mass: Optional[Sequence[float]] = None) -> str:
+        """Hash of (coordinates, location order, canonical spec, mass)"""
+        h = hashlib.sha1()
+        h.update(canonical_spec(spec).encode())
+        h.update(np.ascontiguousarray(coords, dtype=np.float64).tobytes())
+        h.update('\x1f'.join(map(str, locations)).encode('utf-8'))
+        if mass is not None:
+            h.update(np.ascontiguousarray(mass, dtype=np.float64).tobytes())
+        return h.hexdigest()[:20]
+
+    def get(self, spec: str, coords: np.ndarray, locations: Sequence[str],
+            mass: Optional[Sequence[float]] = None) -> CachedWeights:
+        """
+        Return cached weights, building and persisting them on a miss
+
+        Args:
+            spec (str): Weights spec, e.g. "knn:k=5,transform=r"
+            coords (np.ndarray): (n, 2) array of (longitude, latitude), row order = W order
+            locations (Sequence[str]): Location names in the same order
+            mass (Sequence[float], optional): Economic mass for economic/combined
+
+        Returns:
+            CachedWeights: Sparse matrix, libpysal W and location order
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        if len(coords) != len(locations):
+            raise ValueError(f"{len(coords)} coordinates but {len(locations)} locations")
+
+        spec = canonical_spec(spec)
+        key = self.make_key(spec, coords, locations, mass)
+        # One builder per key when phases run concurrently (pipeline.py)
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+
+            entry = self._load(key)
+            if entry is None:
+                entry = CachedWeights(key, spec, build_weights(spec, coords, mass), locations)
+                self._save(entry)
+            self._memory[key] = entry
+            return entry
+
+    def for_index(self, spec: str, index, mass: Optional[Sequence[float]] = None) -> CachedWeights:
+        """
+        Weights whose rows follow a LocationIndex
+
+        Args:
+            spec (str): Weights spec
+            index (LocationIndex): Canonical location order
+            mass (Sequence[float], optional): Economic mass aligned with index
+
+        Returns:
+            CachedWeights: Entry with `.index` set to the given index
+        """
+        entry = self.get(spec, index.coords, index.names, mass)
+        if entry.index is None or entry.index != index:
+            entry.index = index
+        return entry
+
+    def clear(self, disk: bool = False):
+        """Forget in-memory entries (and delete persisted files if disk=True)"""
+        self._memory.clear()
+        if disk and os.path.isdir(self.cache_dir):
+            for fname in os.listdir(self.cache_dir):
+                if fname.endswith(('.npz', '.json')):
+                    os.remove(os.path.join(self.cache_dir, fname))
+
+    def _paths(self, key: str) -> tuple:
+        base = os.path.join(self.cache_dir, key)
+        return base + '.npz', base + '.json'
+
+    def _load(self, key: str) -> Optional[CachedWeights]:
+        npz_path, meta_path = self._paths(key)
+        if not (os.path.exists(npz_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return CachedWeights(key, meta['spec'], sp.load_npz(npz_path).tocsr(), meta['locations'])
+
+    def _save(self, entry: CachedWeights):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        npz_path, meta_path = self._paths(entry.key)
+        sp.save_npz(npz_path, entry.sparse)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'spec': entry.spec, 'locations': entry.locations}, f, ensure_ascii=False, indent=2)
+
+
+# Location coordinates per weather file, read once per process
+_COORDS: Dict[str, pd.DataFrame] = {}
+
+
+def load_location_coords(base_dir: str = '.', weather_file: str = 'weather_pihps_historical.csv') -> pd.DataFrame:
+    """
+    Unique (location_name, latitude, longitude) rows from the weather data
+
+    Only the three coordinate columns are read, and the result is memoized,
+    so phases no longer re-parse the full weather CSV to recover coordinates.
+
+    Returns:
+        pd.DataFrame: One row per location, in first-appearance order
+    """
+    path = os.path.abspath(os.path.join(base_dir, weather_file))
+    if path not in _COORDS:
+        df = pd.read_csv(path, usecols=['location_name', 'latitude', 'longitude'])
+        _COORDS[path] = df.drop_duplicates().reset_index(drop=True)
+    return _COORDS[path].copy()
+
+
+_REGISTRIES: Dict[str, WeightsRegistry] = {}
+
+
+def get_registry(cache_dir: str = CACHE_DIR) -> WeightsRegistry:
+    """Return the process-wide registry for a cache directory"""
+    key = os.path.abspath(cache_dir)
+    if key not in _REGISTRIES:
+        _REGISTRIES[key] = WeightsRegistry(cache_dir)
+    return _REGISTRIES[key]